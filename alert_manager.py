@@ -1,7 +1,8 @@
 """
 Adaptive alert manager for Smart Observability v4.
 
-- Maintains rolling 3h window of request samples (status, latency)
+- Maintains rolling 3h window of request samples (status, latency), pre-aggregated
+  into per-minute buckets so window stats and recomputes cost O(minutes)
 - Recomputes adaptive thresholds every 5 minutes based on mean + 3*sigma
 - Emits critical alerts when current 5m stats breach adaptive thresholds
 - Sends critical alerts to Telegram and Grafana annotations and logs dispatches
@@ -118,6 +119,105 @@ _REQUEST_CONTEXTS: Deque[Tuple[float, Dict[str, Any]]] = deque(maxlen=20_000)
 _REQUEST_CONTEXT_WINDOW_SEC = max(60, int(os.getenv("REQUEST_CONTEXT_WINDOW_SECONDS", "900") or 900))
 _last_recompute_ts: float = 0.0
 
+
+class _BucketRing:
+    """טבעת של דליי זמן ברוחב קבוע, עם צבירה לפי מקור (internal/external).
+
+    כל דלי מחזיק [count, errors, lat_sum] לכל מקור; עדכון הוא O(1) וקריאת חלון
+    היא O(מספר הדליים בחלון) - ללא תלות בנפח הבקשות.
+    """
+
+    __slots__ = ("width", "size", "keys", "stats", "latest")
+
+    def __init__(self, width_sec: int, span_sec: int):
+        self.width = max(1, int(width_sec))
+        self.size = int(span_sec) // self.width + 2
+        self.keys: List[int] = [-1] * self.size
+        # לכל slot: internal count/errors/lat_sum ואז external count/errors/lat_sum
+        self.stats: List[List[float]] = [[0, 0, 0.0, 0, 0, 0.0] for _ in range(self.size)]
+        self.latest = -1
+
+    def clear(self) -> None:
+        for i in range(self.size):
+            self.keys[i] = -1
+            self.stats[i] = [0, 0, 0.0, 0, 0, 0.0]
+        self.latest = -1
+
+    def key(self, ts: float) -> int:
+        return int(ts // self.width)
+
+    def covers(self, key: int) -> bool:
+        return key > self.latest - self.size
+
+    def add(self, ts: float, is_error: bool, latency: float, source: str) -> None:
+        key = self.key(ts)
+        if not self.covers(key):
+            return  # ישן מכדי להיכנס לטבעת בלי לדרוס דלי חדש יותר
+        slot = key % self.size
+        row = self.stats[slot]
+        if self.keys[slot] != key:
+            self.keys[slot] = key
+            row[:] = [0, 0, 0.0, 0, 0, 0.0]
+        base = 3 if source == "external" else 0
+        row[base] += 1
+        if is_error:
+            row[base + 1] += 1
+        row[base + 2] += latency
+        if key > self.latest:
+            self.latest = key
+
+    def sum_range(self, first_key: int, last_key: Optional[int], sources: Tuple[int, ...]) -> Tuple[int, int, float]:
+        """סכום count/errors/lat_sum על הדליים בטווח המפתחות (כולל; None = ללא גבול עליון)."""
+        total = 0
+        errors = 0
+        sum_lat = 0.0
+        top = self.latest if last_key is None else min(int(last_key), self.latest)
+        for key in range(max(int(first_key), self.latest - self.size + 1), top + 1):
+            slot = key % self.size
+            if self.keys[slot] != key:
+                continue
+            row = self.stats[slot]
+            for base in sources:
+                total += int(row[base])
+                errors += int(row[base + 1])
+                sum_lat += float(row[base + 2])
+        return total, errors, sum_lat
+
+    def iter_buckets(self, first_key: int) -> List[Tuple[int, List[float]]]:
+        return sorted((key, self.stats[slot]) for slot, key in enumerate(self.keys) if key >= first_key)
+
+
+class _Welford:
+    """ממוצע/סטיית תקן (אוכלוסייה) בצבירה רצה, יציבה נומרית."""
+
+    __slots__ = ("n", "mean", "_m2")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        if self.n <= 1:
+            return 0.0
+        return math.sqrt(max(0.0, self._m2 / self.n))
+
+
+# אגרגציה מוקדמת: דליי דקה לכל חלון ה-3 שעות (ספים), ודליי שנייה לרבע השעה
+# האחרונה כדי לחתוך את דקת הגבול של חלונות "current" ברזולוציה של שנייה.
+_FINE_SPAN_SEC = 15 * 60
+_minute_buckets = _BucketRing(60, _WINDOW_SEC)
+_second_buckets = _BucketRing(1, _FINE_SPAN_SEC)
+_BUCKETS_LOCK = threading.Lock()
+_SOURCE_OFFSETS = {"internal": (0,), "external": (3,)}
+
 # Guard for lazy state initialization (avoid races under concurrent calls).
 _MONGO_SERVERSTATUS_STATE_LOCK = threading.Lock()
 
@@ -149,6 +249,9 @@ def reset_state_for_tests() -> None:
     Not intended for production use.
     """
     _samples.clear()
+    with _BUCKETS_LOCK:
+        _minute_buckets.clear()
+        _second_buckets.clear()
     # Make sure unit tests are not blocked by startup warmup.
     global _START_TIME
     try:
@@ -195,7 +298,11 @@ def note_request(
         t = float(ts if ts is not None else _now())
         is_error = int(status_code) >= 500
         normalized_source = _normalize_sample_source(source)
-        _samples.append((t, bool(is_error), max(0.0, float(duration_seconds)), normalized_source))
+        latency = max(0.0, float(duration_seconds))
+        _samples.append((t, bool(is_error), latency, normalized_source))
+        with _BUCKETS_LOCK:
+            _minute_buckets.add(t, is_error, latency, normalized_source)
+            _second_buckets.add(t, is_error, latency, normalized_source)
         if is_error and context:
             _record_error_context(t, context)
         if context:
@@ -282,49 +389,27 @@ def _recompute_if_due(now_ts: Optional[float] = None) -> None:
 
 
 def _recompute_thresholds(now_ts: float) -> None:
-    # Build per-minute buckets for last 3 hours
-    start_ts = now_ts - _WINDOW_SEC
-    per_minute: Dict[int, Dict[str, float]] = defaultdict(lambda: {"count": 0.0, "errors": 0.0, "lat_sum": 0.0})
-    for ts, is_err, lat, sample_source in list(_samples):
-        if ts < start_ts:
-            continue
-        if sample_source != "internal":
+    # ספים לפי דליי הדקה של 3 השעות האחרונות (דגימות פנימיות בלבד): O(דקות)
+    first_minute = _minute_buckets.key(now_ts - _WINDOW_SEC)
+    err_stats = _Welford()
+    lat_stats = _Welford()
+    with _BUCKETS_LOCK:
+        buckets = [(int(row[0]), int(row[1]), float(row[2])) for _, row in _minute_buckets.iter_buckets(first_minute)]
+    for count, errors, lat_sum in buckets:
+        if count <= 0:
             continue
-        minute = int(ts // 60)
-        b = per_minute[minute]
-        b["count"] += 1.0
-        b["errors"] += 1.0 if is_err else 0.0
-        b["lat_sum"] += float(lat)
+        err_stats.add((errors / float(count)) * 100.0)
+        lat_stats.add(lat_sum / float(count))
 
     # If no data, keep thresholds at zero
-    if not per_minute:
+    if err_stats.n == 0:
         for k in _thresholds:
             _thresholds[k] = _MetricThreshold(updated_at_ts=now_ts)
         _update_gauges(None, None, None, None)
         return
 
-    # Compute per-minute error rate (%) and avg latency (s)
-    err_rates: List[float] = []
-    avg_lats: List[float] = []
-    for _, b in sorted(per_minute.items()):
-        c = b["count"]
-        if c <= 0:
-            continue
-        err_pct = (b["errors"] / c) * 100.0
-        err_rates.append(err_pct)
-        avg_lats.append(b["lat_sum"] / c)
-
-    def _mean_std(values: List[float]) -> Tuple[float, float]:
-        if not values:
-            return 0.0, 0.0
-        mean = sum(values) / float(len(values))
-        if len(values) == 1:
-            return mean, 0.0
-        var = sum((v - mean) ** 2 for v in values) / float(len(values))
-        return mean, math.sqrt(var)
-
-    err_mean, err_std = _mean_std(err_rates)
-    lat_mean, lat_std = _mean_std(avg_lats)
+    err_mean, err_std = err_stats.mean, err_stats.std
+    lat_mean, lat_std = lat_stats.mean, lat_stats.std
 
     err_thr = max(0.0, err_mean + 3.0 * err_std) * _THRESHOLD_SCALES["error_rate_percent"]
     lat_thr = max(0.0, lat_mean + 3.0 * lat_std) * _THRESHOLD_SCALES["latency_seconds"]
@@ -377,27 +462,28 @@ def _update_external_error_rate_gauge(value: Optional[float]) -> None:
 
 
 def _collect_recent_samples(window_sec: int, source_filter: Optional[str] = None) -> Tuple[int, int, float]:
+    """(count, errors, sum_latency) לחלון האחרון מתוך הדליים המצטברים.
+
+    דקות שלמות נקראות מדליי הדקה; דקת הגבול נחתכת ברזולוציה של שנייה כשהיא
+    עדיין בטווח דליי השנייה (אחרת נספרת כולה).
+    """
     try:
         now_ts = _now()
         start = now_ts - max(1, int(window_sec))
-        total = 0
-        errors = 0
-        sum_lat = 0.0
-        target_source = None
+        sources: Tuple[int, ...] = (0, 3)
         if source_filter:
             lowered = str(source_filter).strip().lower()
-            if lowered in {"internal", "external"}:
-                target_source = lowered
-        for ts, is_err, lat, sample_source in reversed(_samples):
-            if ts < start:
-                break
-            if target_source is not None and sample_source != target_source:
-                continue
-            total += 1
-            if is_err:
-                errors += 1
-            sum_lat += float(lat)
-        return total, errors, sum_lat
+            sources = _SOURCE_OFFSETS.get(lowered, sources)
+        first_second = _second_buckets.key(start)
+        boundary_minute = _minute_buckets.key(start)
+        with _BUCKETS_LOCK:
+            if _second_buckets.covers(first_second):
+                minutes = _minute_buckets.sum_range(boundary_minute + 1, None, sources)
+                partial = _second_buckets.sum_range(first_second, (boundary_minute + 1) * 60 - 1, sources)
+            else:
+                minutes = _minute_buckets.sum_range(boundary_minute, None, sources)
+                partial = (0, 0, 0.0)
+        return minutes[0] + partial[0], minutes[1] + partial[1], minutes[2] + partial[2]
     except Exception:
         return 0, 0, 0.0
 
@@ -8,7 +8,7 @@ import io
 import logging
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, TypedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypedDict
 
 # Optional dependencies — מוגנים לשימוש בסביבת בדיקות/Docs
 try:
@@ -84,6 +84,11 @@ if cache is None:  # pragma: no cover
         def get(self, *a, **k):
             return None
     cache = _NullCache()  # type: ignore[assignment]
+try:
+    from render_cache import get_or_render as _render_cached  # type: ignore
+except Exception:  # pragma: no cover
+    def _render_cached(kind: str, content: str, render: Callable[[], str], *params: Any) -> str:
+        return render()
 from utils import normalize_code
 
 logger = logging.getLogger(__name__)
@@ -555,9 +560,16 @@ class CodeProcessor:
             return code
         # לכלול את זמינות הפורמטור במפתח ה-cache כדי למנוע התנגשויות בין ריצות שונות
         runtime_key = f"term_avail={bool(TerminalFormatter and highlight)}" if output_format == 'terminal' else f"html_style={self.style}"
-        return self._highlight_code_cached(code, programming_language, output_format, runtime_key)
+        # cache מבוסס hash של התוכן (LRU מקומי + Redis דחוס) - לא מפתח שמכיל את כל הקוד
+        return _render_cached(
+            "highlight",
+            code,
+            lambda: self._highlight_code_cached(code, programming_language, output_format, runtime_key),
+            programming_language,
+            output_format,
+            runtime_key,
+        )
 
-    @cached(expire_seconds=1800, key_prefix="syntax_highlight")  # cache ל-30 דקות
     def _highlight_code_cached(self, code: str, programming_language: str, output_format: str, runtime_key: str) -> str:
         try:
             # בחירת lexer מתאים
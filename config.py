@@ -345,9 +345,27 @@ class BotConfig(BaseSettings):
     DRIVE_ADD_HASH: bool = Field(
         default=False, description="Append hash to filenames to avoid collisions"
     )
+    DRIVE_INCREMENTAL_BACKUPS: bool = Field(
+        default=False,
+        description="Scheduled Drive backups (all/other) upload only changed files as delta archives",
+    )
+    DRIVE_INCREMENTAL_MAX_CHAIN: int = Field(
+        default=7, ge=1, description="Max deltas on top of a base before a new full base is uploaded"
+    )
     NORMALIZE_CODE_ON_SAVE: bool = Field(
         default=True, description="Normalize hidden characters before save"
     )
+    CODE_HISTORY_DELTA_ENABLED: bool = Field(
+        default=True,
+        description="Store superseded file versions as reverse deltas / compressed keyframes",
+    )
+    CODE_HISTORY_KEYFRAME_INTERVAL: int = Field(
+        default=10, ge=1, description="Every N-th version is stored as a full compressed keyframe"
+    )
+    CODE_LATEST_FLAG_READS: bool = Field(
+        default=False,
+        description="List/search/export latest file versions via the maintained is_latest flag (run scripts/repair_code_latest.py first)",
+    )
 
     # Feature flags
     FEATURE_MY_COLLECTIONS: bool = Field(
@@ -372,6 +390,35 @@ class BotConfig(BaseSettings):
         le=10_000,
         description="Default page size for DB-backed search pagination",
     )
+    SEARCH_INDEX_REFRESH_SECONDS: int = Field(
+        default=60,
+        ge=1,
+        description="Max age of a per-user search index before an incremental refresh (updated_at watermark)",
+    )
+    SEARCH_INDEX_PERSIST_ENABLED: bool = Field(
+        default=True,
+        description="Persist per-user search index snapshots to MongoDB (search_index_snapshots)",
+    )
+    SEARCH_INDEX_CACHE_MAX_USERS: int = Field(
+        default=200,
+        ge=1,
+        description="Max per-user search indexes kept in memory per worker (LRU eviction)",
+    )
+    SEARCH_INDEX_CACHE_MAX_POSTINGS: int = Field(
+        default=5_000_000,
+        ge=0,
+        description="Max total postings across cached search indexes per worker (0 = unlimited)",
+    )
+    SEARCH_INDEX_SNAPSHOT_INTERVAL_SECONDS: int = Field(
+        default=300,
+        ge=0,
+        description="Minimum seconds between search index snapshot writes for the same user",
+    )
+    SEARCH_REGEX_TIME_BUDGET_MS: int = Field(
+        default=2000,
+        ge=0,
+        description="Per-query time budget for regex search in ms; partial results are returned when exceeded (0 = unlimited)",
+    )
     UI_PAGE_SIZE: int = Field(
         default=10,
         ge=1,
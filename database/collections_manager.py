@@ -35,6 +35,8 @@ except Exception:  # pragma: no cover
                 raise ValueError("Invalid ObjectId")
             return str.__new__(cls, s)  # type: ignore[arg-type]
 
+from . import latest_index
+
 try:
     from pymongo import ASCENDING, DESCENDING, IndexModel  # type: ignore
     from pymongo.errors import DuplicateKeyError  # type: ignore
@@ -1731,10 +1733,7 @@ class CollectionsManager:
                     flt["tags"] = repo_tag
 
             pipeline = [
-                {"$match": flt},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages(flt),
                 {"$sort": {"updated_at": -1}},
                 {"$project": {"_id": 0, "file_name": 1}},
                 {"$limit": max(1, int(limit or 200))},
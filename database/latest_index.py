@@ -0,0 +1,150 @@
+"""
+דגל ``is_latest`` ב-code_snippets: "הגרסה האחרונה של כל קובץ" כשדה מתוחזק.
+
+בכל קובץ (``user_id`` + ``file_name``) בדיוק מסמך אחד מסומן ``is_latest=True`` -
+הגרסה הפעילה (``is_active=True``) עם ה-``version`` הגבוה ביותר. זו בדיוק התוצאה של
+הדפוס ``$sort {file_name, version}`` + ``$group $first`` שרץ על כל ההיסטוריה, אבל
+כאן השאילתה נוגעת רק במסמך אחד לכל קובץ חי (אינדקס חלקי על ``is_latest: true``).
+
+הכותבים (שמירה, מחיקה רכה, שחזור, שינוי שם) מעדכנים את הדגל מיד אחרי הכתיבה;
+``check_and_repair`` מוצא ומתקן סטייה (מסמכים ישנים ללא הדגל, כתיבות ישירות).
+הקריאות עוברות לדגל רק כש-``CODE_LATEST_FLAG_READS`` דולק - אחרי ריצת backfill
+(``scripts/repair_code_latest.py``) - ועד אז ``latest_stages`` מחזיר את ה-pipeline הישן.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    from pymongo import UpdateMany, UpdateOne  # type: ignore
+except Exception:  # pragma: no cover - pymongo missing in minimal envs
+    UpdateMany = None  # type: ignore[assignment]
+    UpdateOne = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+FIELD = "is_latest"
+_REPAIR_CHUNK = 1000
+
+
+def reads_enabled() -> bool:
+    try:
+        from config import config  # type: ignore
+
+        return bool(getattr(config, "CODE_LATEST_FLAG_READS", False))
+    except Exception:
+        return str(os.getenv("CODE_LATEST_FLAG_READS", "false")).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def latest_stages(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """שלבי pipeline שמחזירים את הגרסה האחרונה של כל קובץ שעונה ל-``match``.
+
+    ``match`` חייב לכלול ``is_active: True`` כמו ב-pipeline הישן.
+    """
+    if reads_enabled():
+        return [{"$match": {**match, FIELD: True}}]
+    return [
+        {"$match": match},
+        {"$sort": {"file_name": 1, "version": -1}},
+        {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$latest"}},
+    ]
+
+
+def mark_inserted(collection: Any, user_id: Any, file_name: str, new_id: Any) -> None:
+    """אחרי insert של גרסה חדשה (שנשמרה עם ``is_latest=True``): הסרת הדגל מהגרסאות הקודמות."""
+    collection.update_many(
+        {"user_id": user_id, "file_name": file_name, FIELD: True, "_id": {"$ne": new_id}},
+        {"$set": {FIELD: False}},
+    )
+
+
+def refresh(collection: Any, user_id: Any, file_name: str) -> Optional[Any]:
+    """חישוב מחדש של הדגל לקובץ אחד. מחזיר את ``_id`` של הגרסה האחרונה (או None)."""
+    top = collection.find_one(
+        {"user_id": user_id, "file_name": file_name, "is_active": True},
+        {"_id": 1},
+        sort=[("version", -1)],
+    )
+    top_id = top.get("_id") if isinstance(top, dict) else None
+    stale: Dict[str, Any] = {"user_id": user_id, "file_name": file_name, FIELD: True}
+    if top_id is not None:
+        stale["_id"] = {"$ne": top_id}
+    collection.update_many(stale, {"$set": {FIELD: False}})
+    if top_id is not None:
+        collection.update_one({"_id": top_id, FIELD: {"$ne": True}}, {"$set": {FIELD: True}})
+    return top_id
+
+
+def refresh_safe(collection: Any, user_id: Any, file_name: Optional[str]) -> None:
+    """כמו ``refresh`` אבל fail-open - למסלולי כתיבה שלא צריכים להיכשל בגלל הדגל."""
+    if collection is None or not file_name:
+        return
+    try:
+        refresh(collection, user_id, file_name)
+    except Exception as e:
+        logger.warning("is_latest refresh failed for %s: %s", file_name, e)
+
+
+def check_and_repair(collection: Any, *, user_id: Any = None, repair: bool = True) -> Dict[str, Any]:
+    """סריקת עקביות של ``is_latest`` מול הגרסה הפעילה האחרונה בפועל.
+
+    מחזיר דו"ח: files (קבצים חיים), missing (אחרונה ללא דגל), extra (קבצים עם
+    דגל על גרסה לא-אחרונה), inactive_flagged (מסמכים מחוקים עם דגל), fixed.
+    """
+    scope: Dict[str, Any] = {} if user_id is None else {"user_id": user_id}
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {**scope, "is_active": True}},
+        {"$sort": {"user_id": 1, "file_name": 1, "version": -1}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "file_name": "$file_name"},
+            "top": {"$first": "$_id"},
+            "top_flagged": {"$first": {"$eq": [f"${FIELD}", True]}},
+            "flagged": {"$sum": {"$cond": [{"$eq": [f"${FIELD}", True]}, 1, 0]}},
+        }},
+    ]
+    report: Dict[str, Any] = {"files": 0, "missing": 0, "extra": 0, "inactive_flagged": 0, "fixed": 0}
+    ops: List[Any] = []
+    drifted = 0
+    # שורה אחת לכל קובץ חי, נקראת כ-cursor (לא נטענת כולה לזיכרון)
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        report["files"] += 1
+        top_flagged = bool(row.get("top_flagged"))
+        extra = int(row.get("flagged") or 0) > (1 if top_flagged else 0)
+        if top_flagged and not extra:
+            continue
+        drifted += 1
+        report["missing"] += 0 if top_flagged else 1
+        report["extra"] += 1 if extra else 0
+        key = row.get("_id") or {}
+        top_id = row.get("top")
+        ops.append(("many", {"user_id": key.get("user_id"), "file_name": key.get("file_name"), FIELD: True, "_id": {"$ne": top_id}}, False))
+        ops.append(("one", {"_id": top_id}, True))
+        if repair and len(ops) >= _REPAIR_CHUNK:
+            _apply(collection, ops)
+            ops = []
+    report["inactive_flagged"] = int(collection.count_documents({**scope, "is_active": False, FIELD: True}))
+    if not repair:
+        return report
+    if report["inactive_flagged"]:
+        collection.update_many({**scope, "is_active": False, FIELD: True}, {"$set": {FIELD: False}})
+    _apply(collection, ops)
+    report["fixed"] = drifted + report["inactive_flagged"]
+    return report
+
+
+def _apply(collection: Any, ops: List[Any]) -> None:
+    if not ops:
+        return
+    bulk = getattr(collection, "bulk_write", None)
+    if callable(bulk) and UpdateOne is not None and UpdateMany is not None:
+        # ordered: הסרת הדגל מגרסאות ישנות לפני סימון האחרונה, לכל קובץ
+        bulk([(UpdateMany if kind == "many" else UpdateOne)(flt, {"$set": {FIELD: value}}) for kind, flt, value in ops], ordered=True)
+        return
+    for kind, flt, value in ops:
+        if kind == "many":
+            collection.update_many(flt, {"$set": {FIELD: value}})
+        else:
+            collection.update_one(flt, {"$set": {FIELD: value}})
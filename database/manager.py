@@ -42,6 +42,7 @@ except Exception:  # ModuleNotFoundError או כל שגיאה בזמן import
 
 class CollectionLike(Protocol):
     def insert_one(self, *args: Any, **kwargs: Any) -> Any: ...
+    def insert_many(self, *args: Any, **kwargs: Any) -> Any: ...
     def update_one(self, *args: Any, **kwargs: Any) -> Any: ...
     def update_many(self, *args: Any, **kwargs: Any) -> Any: ...
     def delete_one(self, *args: Any, **kwargs: Any) -> Any: ...
@@ -82,6 +83,9 @@ class _StubCollection:
     def insert_one(self, *args: Any, **kwargs: Any) -> Any:
         return SimpleNamespace(inserted_id=None)
 
+    def insert_many(self, *args: Any, **kwargs: Any) -> Any:
+        return SimpleNamespace(inserted_ids=[])
+
     def update_one(self, *args: Any, **kwargs: Any) -> Any:
         return SimpleNamespace(acknowledged=True, modified_count=0)
 
@@ -946,6 +950,21 @@ class DatabaseManager:
                         except Exception:
                             return None
 
+                    def _get_shape_stats():
+                        # סטטיסטיקות לפי צורת שאילתה (בלי תלות בסף/ב-ENABLE_PROFILING)
+                        try:
+                            from services.query_shape_stats import get_shape_stats  # type: ignore
+
+                            return get_shape_stats()
+                        except Exception:
+                            return None
+
+                    def _shape_stats_collection():
+                        from services.query_shape_stats import COLLECTION_NAME  # type: ignore
+
+                        db = getattr(outer_self, "db", None)
+                        return db[COLLECTION_NAME] if db is not None else None
+
                     def _extract_collection_and_query(command_name: str, command: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
                         cmd = command or {}
                         coll = ""
@@ -1009,11 +1028,14 @@ class DatabaseManager:
 
                                 # שמירה בהקשר הבקשה
                                 if coll:
+                                    shape_stats = _get_shape_stats()
                                     self._requests[request_id] = {
                                         "coll": coll,
                                         "query": query,
                                         "cmd_name": cmd_name,
                                         "db": str(getattr(event, "database_name", "") or ""),
+                                        # ההחלטה על דגימה זולה; הנרמול נעשה רק ב-succeeded
+                                        "sampled": bool(shape_stats is not None and shape_stats.should_sample()),
                                     }
                             except Exception:
                                 pass
@@ -1040,6 +1062,25 @@ class DatabaseManager:
                                     except Exception:
                                         pass
 
+                                # --- Per-shape stats (sampled, all durations) ---
+                                if req_data and req_data.get("sampled"):
+                                    try:
+                                        from services.query_shape_stats import docs_returned  # type: ignore
+
+                                        shape_stats = _get_shape_stats()
+                                        if shape_stats is not None:
+                                            cmd_name = req_data["cmd_name"]
+                                            shape_stats.record(
+                                                collection=req_data["coll"],
+                                                operation=cmd_name,
+                                                query=req_data["query"],
+                                                duration_ms=dur_ms,
+                                                docs=docs_returned(cmd_name, getattr(event, "reply", None)),
+                                            )
+                                            shape_stats.maybe_flush(_shape_stats_collection)
+                                    except Exception:
+                                        pass
+
                                 # --- Query Performance Profiler (independent of DB_SLOW_MS) ---
                                 try:
                                     if not _profiler_enabled():
@@ -1736,6 +1777,23 @@ class DatabaseManager:
             enforce=True,
         )
 
+        # code_snippets - אינדקס חלקי על הגרסה האחרונה בלבד (database/latest_index.py):
+        # רשימות/חיפוש/ייצוא עם is_latest=True נוגעים במסמך אחד לכל קובץ חי, לא בכל ההיסטוריה
+        safe_create_index(
+            "code_snippets",
+            [("user_id", ASCENDING), ("is_active", ASCENDING), ("updated_at", DESCENDING)],
+            name="user_latest_updated_idx",
+            partial_filter_expression={"is_latest": True},
+        )
+
+        # code_snippets - רענון אינקרמנטלי של אינדקס החיפוש (search_engine.SearchIndex.refresh):
+        # "מה השתנה אצל המשתמש מאז ה-watermark" כולל מחיקות רכות, ולכן בלי is_active.
+        safe_create_index(
+            "code_snippets",
+            [("user_id", ASCENDING), ("updated_at", DESCENDING)],
+            name="user_updated_at_idx",
+        )
+
         # NOTE:
         # אינדקס נעוצים `user_pinned_pin_order_idx` נוצר ומטופל ב-webapp (ensure_code_snippets_indexes)
         # כדי למנוע כפילות והסטה של "מקור אמת" בין שני מנגנוני אתחול שונים.
@@ -1990,6 +2048,15 @@ class DatabaseManager:
     def save_code_snippet(self, snippet) -> bool:
         return self._get_repo().save_code_snippet(snippet)
 
+    def get_files_state_by_names(self, user_id: int, file_names: List[str]) -> Dict[str, Dict]:
+        return self._get_repo().get_files_state_by_names(user_id, file_names)
+
+    def bulk_save_code_snippets(self, snippets: List[Any], existing: Dict[str, Dict]) -> int:
+        return self._get_repo().bulk_save_code_snippets(snippets, existing)
+
+    def set_favorite_state(self, user_id: int, file_names: List[str], state: bool) -> int:
+        return self._get_repo().set_favorite_state(user_id, file_names, state)
+
     def save_file(self, user_id: int, file_name: str, code: str, programming_language: str, extra_tags: Optional[List[str]] = None) -> bool:
         return self._get_repo().save_file(user_id, file_name, code, programming_language, extra_tags)
 
@@ -2023,6 +2090,15 @@ class DatabaseManager:
     ) -> List[Dict]:
         return self._get_repo().get_user_files(user_id, limit, skip=skip, projection=projection)
 
+    def get_latest_files_by_names(
+        self,
+        user_id: int,
+        file_names: List[str],
+        *,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> List[Dict]:
+        return self._get_repo().get_latest_files_by_names(user_id, file_names, projection=projection)
+
     def get_user_file_names(self, user_id: int, limit: int = 1000) -> List[str]:
         """עטיפה נוחה לשמות הקבצים הייחודיים של המשתמש (גרסה אחרונה לכל קובץ).
 
@@ -1,5 +1,6 @@
 import logging
 import hashlib
+import sys
 import time
 from dataclasses import asdict
 from datetime import datetime, timezone, timedelta
@@ -57,6 +58,7 @@ except Exception:  # pragma: no cover
     def emit_event(event: str, severity: str = "info", **fields):
         return None
 from .models import CodeSnippet, LargeFile
+from . import latest_index, version_store
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +72,7 @@ _HEAVY_FIELDS_EXCLUDE_PROJECTION: Dict[str, int] = {
     "content": 0,     # LargeFile
     "raw_data": 0,    # future-proof / backward-compat (אם קיים בפריטים מסוימים)
     "raw_content": 0, # future-proof
+    "code_storage": 0,  # גרסאות קודמות דחוסות (version_store)
 }
 
 # Alias ציבורי לשימוש בשכבות אחרות (למשל Webapp) בלי להסתמך על שם פרטי עם _.
@@ -191,6 +194,22 @@ def _sync_in_memory_user_field(collection: Any, field_name: str, merged: Dict[st
         return
 
 
+def _notify_search_index(user_id: Any, file_name: Any, old_name: Optional[str] = None) -> None:
+    """עדכון delta לאינדקס החיפוש שבזיכרון.
+
+    במכוון בלי import: אם `search_engine` לא נטען בתהליך הזה, אין בו אינדקס
+    לעדכן — ותהליכים אחרים מתעדכנים ברענון לפי ``updated_at``.
+    """
+    module = sys.modules.get("search_engine")
+    hook = getattr(module, "notify_file_changed", None)
+    if not callable(hook):
+        return
+    try:
+        hook(user_id, file_name, old_name=old_name)
+    except Exception:
+        pass
+
+
 class Repository:
     """CRUD נקי עבור אוספים במאגר הנתונים."""
 
@@ -255,8 +274,18 @@ class Repository:
             except Exception:
                 doc["lines_count"] = 0
 
+            doc[latest_index.FIELD] = True
+
             result = self.manager.collection.insert_one(doc)
             if result.inserted_id:
+                # הגרסה החדשה היא היחידה שמסומנת is_latest
+                try:
+                    latest_index.mark_inserted(self.manager.collection, snippet.user_id, snippet.file_name, result.inserted_id)
+                except Exception as e:
+                    emit_event("db_latest_flag_error", severity="warn", error=str(e))
+                # הגרסה הקודמת נשמרת מעתה כ-reverse delta / keyframe דחוס
+                if existing:
+                    self._compact_previous_version(existing, code_str, result.inserted_id)
                 # אם הקובץ נעוץ, ודא שרק הגרסה החדשה נשארת נעוצה
                 if bool(doc.get("is_pinned", False)):
                     try:
@@ -292,6 +321,7 @@ class Repository:
                     cache.invalidate_file_related(file_id=file_identifier, user_id=snippet.user_id)
                 except Exception:
                     pass
+                _notify_search_index(snippet.user_id, snippet.file_name)
                 from autocomplete_manager import autocomplete
                 autocomplete.invalidate_cache(snippet.user_id)
                 return True
@@ -300,6 +330,150 @@ class Repository:
             emit_event("db_save_code_snippet_error", severity="error", error=str(e))
             return False
 
+    def get_files_state_by_names(self, user_id: int, file_names: List[str]) -> Dict[str, Dict]:
+        """מצב נוכחי של רשימת קבצים בשאילתה אחת (ללא קאש), לשחזור בכמויות.
+
+        לכל קובץ: הגרסה הפעילה האחרונה (כולל ``code``), כש-``is_favorite``/``is_pinned``
+        מחושבים על *כל* הגרסאות הפעילות - כמו ``is_favorite``/``is_pinned`` לקובץ בודד.
+        בכשל זורק (ולא מחזיר ``{}``): אחרת כל הקבצים ייראו חדשים ויקבלו שוב version 1.
+        """
+        names = [str(n) for n in dict.fromkeys(file_names or []) if n]
+        if not names:
+            return {}
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"user_id": user_id, "is_active": True, "file_name": {"$in": names}}},
+            {"$sort": {"file_name": 1, "version": -1}},
+            {"$group": {
+                "_id": "$file_name",
+                "latest": {"$first": "$$ROOT"},
+                "any_favorite": {"$max": {"$eq": ["$is_favorite", True]}},
+                "any_pinned": {"$max": {"$eq": ["$is_pinned", True]}},
+            }},
+        ]
+        try:
+            with track_performance("db_get_files_state_by_names"):
+                rows = list(self.manager.collection.aggregate(pipeline, allowDiskUse=True))
+        except Exception as e:
+            emit_event("db_get_files_state_by_names_error", severity="error", error=str(e))
+            raise
+        out: Dict[str, Dict] = {}
+        for row in rows:
+            latest = dict(row.get("latest") or {})
+            if not latest.get("file_name"):
+                continue
+            latest["is_favorite"] = bool(row.get("any_favorite"))
+            latest["is_pinned"] = bool(row.get("any_pinned"))
+            out[str(latest["file_name"])] = latest
+        return out
+
+    @_instrument_db("db.bulk_save_code_snippets")
+    def bulk_save_code_snippets(self, snippets: List[CodeSnippet], existing: Dict[str, Dict]) -> int:
+        """שמירת גרסה חדשה לרשימת קבצים ב-``insert_many`` אחד.
+
+        ``existing`` הוא מצב הגרסה האחרונה לפי שם (``get_files_state_by_names``) - מספרי
+        הגרסאות מחושבים ממנו בזיכרון. בניגוד ל-``save_code_snippet`` אין כאן "ירושה" של
+        מועדף/נעיצה מהגרסה הקודמת: הערכים ב-snippet הם המצב הרצוי. שם קובץ מופיע פעם אחת.
+        מחזיר כמה גרסאות נכתבו (קידומת של הרשימה; אחרי כשל באמצע - רק מה שנכתב).
+        """
+        if not snippets:
+            return 0
+        now = datetime.now(timezone.utc)
+        docs: List[Dict[str, Any]] = []
+        for snippet in snippets:
+            try:
+                if config.NORMALIZE_CODE_ON_SAVE:
+                    snippet.code = normalize_code(snippet.code)
+            except Exception:
+                pass
+            prev = existing.get(snippet.file_name)
+            if prev:
+                snippet.version = int(prev.get("version", 0) or 0) + 1
+            snippet.updated_at = now
+            doc = asdict(snippet)
+            code_str = str(snippet.code or "")
+            doc["file_size"] = len(code_str.encode("utf-8", errors="ignore")) if code_str else 0
+            doc["lines_count"] = len(code_str.split('\n')) if code_str else 0
+            doc[latest_index.FIELD] = True
+            docs.append(doc)
+
+        coll = self.manager.collection
+        written = len(docs)
+        try:
+            coll.insert_many(docs, ordered=True)
+        except Exception as e:
+            # ordered: כל מה שלפני המסמך שנכשל נכתב
+            details = getattr(e, "details", None)
+            written = int(details.get("nInserted", 0) or 0) if isinstance(details, dict) else 0
+            emit_event("db_bulk_save_code_snippets_error", severity="error", error=str(e), inserted=written)
+        docs = docs[:written]
+        if not docs:
+            return 0
+
+        user_id = docs[0]["user_id"]
+        new_ids = [d.get("_id") for d in docs]
+        names = [d["file_name"] for d in docs]
+        try:
+            coll.update_many(
+                {"user_id": user_id, "file_name": {"$in": names}, latest_index.FIELD: True, "_id": {"$nin": new_ids}},
+                {"$set": {latest_index.FIELD: False}},
+            )
+        except Exception as e:
+            emit_event("db_latest_flag_error", severity="warn", error=str(e))
+        pinned = [d["file_name"] for d in docs if d.get("is_pinned")]
+        if pinned:
+            # רק הגרסה החדשה נשארת נעוצה
+            try:
+                coll.update_many(
+                    {"user_id": user_id, "file_name": {"$in": pinned}, "is_active": True, "_id": {"$nin": new_ids}},
+                    {"$set": {"is_pinned": False, "pinned_at": None, "pin_order": 0, "updated_at": now}},
+                )
+            except Exception:
+                pass
+        for doc in docs:
+            prev = existing.get(doc["file_name"])
+            if prev and prev.get("_id") is not None:
+                self._compact_previous_version(prev, str(doc.get("code") or ""), doc.get("_id"))
+            _notify_search_index(user_id, doc["file_name"])
+        try:
+            cache.invalidate_user_cache(user_id)
+        except Exception:
+            pass
+        try:
+            from autocomplete_manager import autocomplete
+            autocomplete.invalidate_cache(user_id)
+        except Exception:
+            pass
+        return len(docs)
+
+    def set_favorite_state(self, user_id: int, file_names: List[str], state: bool) -> int:
+        """קביעת מצב מועדף לרשימת קבצים (כל הגרסאות, כמו ``toggle_favorite``) ב-update אחד."""
+        names = [str(n) for n in dict.fromkeys(file_names or []) if n]
+        if not names:
+            return 0
+        now = datetime.now(timezone.utc)
+        try:
+            res = self.manager.collection.update_many(
+                {"user_id": user_id, "file_name": {"$in": names}, "is_active": True},
+                {"$set": {"is_favorite": bool(state), "updated_at": now, "favorited_at": (now if state else None)}},
+            )
+        except Exception as e:
+            emit_event("db_set_favorite_state_error", severity="error", error=str(e))
+            return 0
+        try:
+            cache.invalidate_user_cache(user_id)
+        except Exception:
+            pass
+        return int(getattr(res, "modified_count", 0) or 0)
+
+    def _compact_previous_version(self, prev_doc: Dict[str, Any], new_code: str, new_id: Any) -> None:
+        try:
+            if not bool(getattr(config, 'CODE_HISTORY_DELTA_ENABLED', True)):
+                return
+            interval = int(getattr(config, 'CODE_HISTORY_KEYFRAME_INTERVAL', version_store.DEFAULT_KEYFRAME_INTERVAL) or version_store.DEFAULT_KEYFRAME_INTERVAL)
+            version_store.compact_previous(self.manager.collection, prev_doc, new_code, new_id, keyframe_interval=interval)
+        except Exception as e:
+            emit_event("db_compact_version_error", severity="warn", error=str(e))
+
     # --- Favorites API ---
     def _validate_file_name(self, file_name: str) -> bool:
         try:
@@ -507,10 +681,7 @@ class Repository:
             if language:
                 match["programming_language"] = language
             pipeline = [
-                {"$match": match},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages(match),
                 {"$sort": {sort_key: sort_dir}},
                 {"$limit": max(1, int(limit or 50))},
                 {"$project": {"_id": "$_id", "file_name": 1, "programming_language": 1, "tags": 1, "description": 1, "favorited_at": 1, "updated_at": 1, "code": 1}},
@@ -838,19 +1009,22 @@ class Repository:
     @_instrument_db("db.get_all_versions")
     def get_all_versions(self, user_id: int, file_name: str) -> List[Dict]:
         try:
-            return list(self.manager.collection.find(
+            docs = list(self.manager.collection.find(
                 {"user_id": user_id, "file_name": file_name, "is_active": True},
                 sort=[("version", -1)],
             ))
+            # גרסאות ישנות שמורות כ-delta מול הגרסה שאחריהן - משחזרים ברצף מהחדשה
+            return version_store.materialize_many(self.manager.collection, docs)
         except Exception as e:
             emit_event("db_get_all_versions_error", severity="error", error=str(e))
             return []
 
     def get_version(self, user_id: int, file_name: str, version: int) -> Optional[Dict]:
         try:
-            return self.manager.collection.find_one(
+            doc = self.manager.collection.find_one(
                 {"user_id": user_id, "file_name": file_name, "version": version, "is_active": True}
             )
+            return version_store.materialize(self.manager.collection, doc)
         except Exception as e:
             emit_event("db_get_version_error", severity="error", error=str(e), file_name=file_name, version=int(version))
             return None
@@ -886,10 +1060,7 @@ class Repository:
             except Exception:
                 pass
             pipeline: List[Dict[str, Any]] = [
-                {"$match": {"user_id": user_id, "is_active": True}},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages({"user_id": user_id, "is_active": True}),
                 {"$sort": {"updated_at": -1}},
             ]
             # הקרנה:
@@ -934,6 +1105,35 @@ class Repository:
             emit_event("db_get_user_files_error", severity="error", error=str(e))
             return []
 
+    @_instrument_db("db.get_latest_files_by_names")
+    def get_latest_files_by_names(
+        self,
+        user_id: int,
+        file_names: List[str],
+        *,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> List[Dict]:
+        """גרסה אחרונה של רשימת קבצים ידועה בשאילתה אחת (ללא קאש).
+
+        משמש את מנוע החיפוש אחרי סינון מועמדים באינדקס: במקום round-trip לכל קובץ.
+        """
+        names = [str(n) for n in dict.fromkeys(file_names or []) if n]
+        if not names:
+            return []
+        try:
+            pipeline: List[Dict[str, Any]] = [
+                *latest_index.latest_stages({"user_id": user_id, "is_active": True, "file_name": {"$in": names}}),
+            ]
+            if projection:
+                proj = dict(projection)
+                proj.setdefault("file_name", 1)
+                pipeline.append({"$project": proj})
+            with track_performance("db_get_latest_files_by_names"):
+                return list(self.manager.collection.aggregate(pipeline, allowDiskUse=True))
+        except Exception as e:
+            emit_event("db_get_latest_files_by_names_error", severity="error", error=str(e))
+            return []
+
     @cached(expire_seconds=300, key_prefix="search_code")
     @traced("db.search_code")
     @_instrument_db("db.search_code")
@@ -959,10 +1159,7 @@ class Repository:
             if tags:
                 search_filter["tags"] = {"$in": tags}
             pipeline = [
-                {"$match": search_filter},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages(search_filter),
                 {"$sort": {"updated_at": -1}},
                 {"$limit": limit},
                 # תוצאות חיפוש הן רשימה — אין צורך להחזיר את שדה code המלא כאן.
@@ -1009,10 +1206,7 @@ class Repository:
 
             # שלוף פריטים בעמוד
             items_pipeline = [
-                {"$match": match_stage},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages(match_stage),
                 {"$sort": {"updated_at": -1}},
                 {"$project": {
                     "_id": 1,
@@ -1060,10 +1254,7 @@ class Repository:
 
             # ספירה (distinct לפי file_name לאחר סינון) — תחילה, כדי לאפשר עימוד מהודק ללא רה-פצ' של הקורא
             count_pipeline = [
-                {"$match": {"user_id": user_id, "is_active": True}},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages({"user_id": user_id, "is_active": True}),
                 {"$match": {
                     "$or": [
                         {"tags": {"$exists": False}},
@@ -1085,10 +1276,7 @@ class Repository:
 
             # שליפת פריטים לעמוד החוקי (לאחר הידוק), חד-פעמי
             items_pipeline = [
-                {"$match": {"user_id": user_id, "is_active": True}},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages({"user_id": user_id, "is_active": True}),
                 {"$match": {
                     "$or": [
                         {"tags": {"$exists": False}},
@@ -1124,6 +1312,7 @@ class Repository:
                 {"user_id": user_id, "file_name": file_name, "is_active": True},
                 {"$set": {
                     "is_active": False,
+                    latest_index.FIELD: False,
                     "updated_at": now,
                     "deleted_at": now,
                     "deleted_expires_at": expires,
@@ -1135,6 +1324,7 @@ class Repository:
                     cache.invalidate_file_related(file_id=str(file_name), user_id=user_id)
                 except Exception:
                     pass
+                _notify_search_index(user_id, file_name)
                 # מחיקת קאש ספציפי של אוספים עבור המשתמש (השפעה על אוספים חכמים)
                 try:
                     uid = str(user_id)
@@ -1159,6 +1349,7 @@ class Repository:
                 {"user_id": user_id, "file_name": {"$in": list(set(file_names))}, "is_active": True},
                 {"$set": {
                     "is_active": False,
+                    latest_index.FIELD: False,
                     "updated_at": now,
                     "deleted_at": now,
                     "deleted_expires_at": expires,
@@ -1168,6 +1359,7 @@ class Repository:
             try:
                 for fn in list(set(file_names)):
                     cache.invalidate_file_related(file_id=str(fn), user_id=user_id)
+                    _notify_search_index(user_id, fn)
             except Exception:
                 pass
             try:
@@ -1187,12 +1379,18 @@ class Repository:
             expires = now + timedelta(days=max(1, ttl_days))
             # נאתר user_id לפני העדכון לצורך אינוולידציית cache אמינה
             user_id_for_invalidation: Optional[int] = None
+            file_name_for_latest: Optional[str] = None
+            pre_doc: Optional[Dict[str, Any]] = None
             try:
-                pre_doc = self.manager.collection.find_one({"_id": ObjectId(file_id), "is_active": True}, {"user_id": 1})
+                pre_doc = self.manager.collection.find_one({"_id": ObjectId(file_id), "is_active": True}, {"user_id": 1, "file_name": 1})
                 if isinstance(pre_doc, dict):
                     user_id_for_invalidation = pre_doc.get("user_id")
+                    file_name_for_latest = pre_doc.get("file_name")
             except Exception:
                 pass
+            if isinstance(pre_doc, dict):
+                # הגרסה הקודמת הופכת לגלויה - היא לא יכולה להישאר delta מול גרסה מוסתרת
+                version_store.rehydrate_dependents(self.manager.collection, ObjectId(file_id))
             result = self.manager.collection.update_many(
                 {"_id": ObjectId(file_id), "is_active": True},
                 {"$set": {
@@ -1203,6 +1401,8 @@ class Repository:
                 }}
             )
             modified = int(getattr(result, 'modified_count', 0) or 0)
+            if modified > 0:
+                latest_index.refresh_safe(self.manager.collection, user_id_for_invalidation, file_name_for_latest)
             if modified > 0 and user_id_for_invalidation is not None:
                 try:
                     cache.invalidate_user_cache(int(user_id_for_invalidation))
@@ -1220,7 +1420,8 @@ class Repository:
 
     def get_file_by_id(self, file_id: str) -> Optional[Dict]:
         try:
-            return self.manager.collection.find_one({"_id": ObjectId(file_id)})
+            doc = self.manager.collection.find_one({"_id": ObjectId(file_id)})
+            return version_store.materialize(self.manager.collection, doc)
         except Exception as e:
             emit_event("db_get_file_by_id_error", severity="error", error=str(e))
             return None
@@ -1299,6 +1500,9 @@ class Repository:
                     pass
             except Exception:
                 pass
+            if result.modified_count:
+                latest_index.refresh_safe(self.manager.collection, user_id, new_name)
+                _notify_search_index(user_id, new_name, old_name=old_name)
             # Update sticky notes scope_id so notes follow the file after rename
             try:
                 from sticky_notes_scope import sync_sticky_notes_on_rename
@@ -1488,12 +1692,26 @@ class Repository:
     def restore_file_by_id(self, user_id: int, file_id: str) -> bool:
         try:
             now = datetime.now(timezone.utc)
+            # הבסיס של גרסה דחוסה עשוי להישאר בסל ולהימחק ב-TTL - הגרסה המשוחזרת נכתבת מלאה
+            try:
+                trashed = self.manager.collection.find_one({"_id": ObjectId(file_id), "user_id": user_id, "is_active": False})
+            except Exception:
+                trashed = None
+            if isinstance(trashed, dict):
+                version_store.rehydrate(self.manager.collection, trashed)
             res = self.manager.collection.update_many(
                 {"_id": ObjectId(file_id), "user_id": user_id, "is_active": False},
                 {"$set": {"is_active": True, "updated_at": now},
                  "$unset": {"deleted_at": "", "deleted_expires_at": ""}},
             )
             modified = int(res.modified_count or 0)
+            if modified > 0:
+                try:
+                    restored = self.manager.collection.find_one({"_id": ObjectId(file_id)}, {"file_name": 1})
+                except Exception:
+                    restored = None
+                if isinstance(restored, dict):
+                    latest_index.refresh_safe(self.manager.collection, user_id, restored.get("file_name"))
             if modified == 0:
                 # Try large files collection
                 res2 = self.manager.large_files_collection.update_many(
@@ -1517,6 +1735,13 @@ class Repository:
 
     def purge_file_by_id(self, user_id: int, file_id: str) -> bool:
         try:
+            try:
+                trashed = self.manager.collection.find_one({"_id": ObjectId(file_id), "user_id": user_id, "is_active": False}, {"_id": 1})
+            except Exception:
+                trashed = None
+            if trashed:
+                # גרסאות ישנות שנשענות על המסמך הופכות ל-keyframes; אם אחת נכשלת - לא מוחקים
+                version_store.rehydrate_dependents(self.manager.collection, ObjectId(file_id))
             res = self.manager.collection.delete_many({"_id": ObjectId(file_id), "user_id": user_id, "is_active": False})
             deleted = int(res.deleted_count or 0)
             if deleted == 0:
@@ -1648,10 +1873,7 @@ class Repository:
         """שמות קבצים אחרונים (distinct לפי file_name), ממוינים לפי updated_at של הגרסה האחרונה."""
         try:
             pipeline = [
-                {"$match": {"user_id": user_id, "is_active": True}},
-                {"$sort": {"file_name": 1, "version": -1}},
-                {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                {"$replaceRoot": {"newRoot": "$latest"}},
+                *latest_index.latest_stages({"user_id": user_id, "is_active": True}),
                 {"$sort": {"updated_at": -1}},
                 {"$project": {"_id": 0, "file_name": 1}},
                 {"$limit": max(1, int(limit or 1000))},
@@ -0,0 +1,275 @@
+"""
+אחסון גרסאות דחוס עבור code_snippets.
+
+הגרסה האחרונה של כל קובץ נשמרת תמיד במלואה בשדה ``code``. כשנשמרת גרסה חדשה,
+הגרסה הקודמת "נדחסת": ``code`` מתרוקן ובמקומו נשמר ``code_storage``:
+
+- ``{"v": 1, "kind": "delta", "base_id": <_id של הגרסה החדשה>, "data": zlib(json(ops))}``
+  - reverse delta ברמת שורות: איך לבנות את הגרסה הישנה מתוך הגרסה שאחריה.
+- ``{"v": 1, "kind": "zlib", "data": zlib(code)}`` - keyframe: הקוד המלא דחוס.
+  נכתב כל ``CODE_HISTORY_KEYFRAME_INTERVAL`` גרסאות, או כשה-delta לא משתלם,
+  כדי שאורך שרשרת השחזור יהיה חסום.
+
+ההפניה לבסיס היא לפי ``_id`` (ולא שם קובץ + מספר גרסה), כך ששינוי שם או מחיקה
+רכה של גרסה אחרת לא שוברים את השרשרת. ``code_hash`` (sha1 של המקור) מאפשר
+לוודא שהשחזור נכון.
+"""
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import logging
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STORAGE_FIELD = "code_storage"
+_FORMAT_VERSION = 1
+# מתחת לגודל הזה הדחיסה לא חוסכת מספיק כדי להצדיק שחזור
+MIN_COMPACT_BYTES = 512
+# מעל מספר שורות זה SequenceMatcher יקר מדי - שומרים keyframe
+_MAX_DIFF_LINES = 20_000
+_MAX_CHAIN_DEPTH = 256
+DEFAULT_KEYFRAME_INTERVAL = 10
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha1((code or "").encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8", errors="surrogatepass"), 9)
+
+
+def _unpack(data: Any) -> Any:
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8", errors="surrogatepass"))
+
+
+def make_delta(new_code: str, old_code: str) -> List[Any]:
+    """ops שבונים את old_code מתוך new_code: ``[i1, i2]`` = העתקת שורות, str = טקסט חדש."""
+    new_lines = (new_code or "").splitlines(keepends=True)
+    old_lines = (old_code or "").splitlines(keepends=True)
+    ops: List[Any] = []
+    matcher = difflib.SequenceMatcher(None, new_lines, old_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(old_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(base_code: str, ops: Iterable[Any]) -> str:
+    lines = (base_code or "").splitlines(keepends=True)
+    out: List[str] = []
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        else:
+            out.extend(lines[int(op[0]):int(op[1])])
+    return "".join(out)
+
+
+def encode_previous(
+    old_code: str,
+    new_code: str,
+    base_id: Any,
+    *,
+    version: int = 0,
+    keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+) -> Dict[str, Any]:
+    """בניית ``code_storage`` לגרסה שהוחלפה ב-new_code (delta או keyframe)."""
+    keyframe = zlib.compress((old_code or "").encode("utf-8", errors="surrogatepass"), 9)
+    interval = max(1, int(keyframe_interval or DEFAULT_KEYFRAME_INTERVAL))
+    want_keyframe = (
+        base_id is None
+        or int(version or 0) % interval == 0
+        or max(old_code.count("\n"), new_code.count("\n")) > _MAX_DIFF_LINES
+    )
+    if not want_keyframe:
+        delta = _pack(make_delta(new_code, old_code))
+        if len(delta) < len(keyframe):
+            return {"v": _FORMAT_VERSION, "kind": "delta", "base_id": base_id, "data": delta}
+    return {"v": _FORMAT_VERSION, "kind": "zlib", "data": keyframe}
+
+
+def is_compacted(doc: Any) -> bool:
+    return isinstance(doc, dict) and isinstance(doc.get(STORAGE_FIELD), dict)
+
+
+def restore_code(collection: Any, doc: Dict[str, Any], memo: Optional[Dict[Any, str]] = None) -> Optional[str]:
+    """שחזור הקוד המלא של מסמך גרסה (None אם השרשרת שבורה).
+
+    ``memo`` ממפה _id -> קוד משוחזר, כדי ששחזור של כמה גרסאות ברצף לא יקרא
+    שוב את אותם בסיסים.
+    """
+    if not is_compacted(doc):
+        code = doc.get("code") if isinstance(doc, dict) else None
+        return code if isinstance(code, str) else (str(code) if code is not None else "")
+    memo = memo if memo is not None else {}
+    pending: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = doc
+    base_code: Optional[str] = None
+    try:
+        for _ in range(_MAX_CHAIN_DEPTH):
+            if current is None:
+                return None
+            doc_id = current.get("_id")
+            if doc_id is not None and doc_id in memo:
+                base_code = memo[doc_id]
+                break
+            storage = current.get(STORAGE_FIELD)
+            if not isinstance(storage, dict):
+                code = current.get("code")
+                base_code = code if isinstance(code, str) else ""
+                break
+            if storage.get("kind") == "zlib":
+                base_code = zlib.decompress(bytes(storage.get("data") or b"")).decode("utf-8", errors="surrogatepass")
+                break
+            if storage.get("kind") != "delta":
+                return None
+            pending.append(current)
+            current = collection.find_one({"_id": storage.get("base_id")})
+        else:
+            return None
+        if current is not None and current.get("_id") is not None:
+            memo[current.get("_id")] = base_code
+        code = base_code
+        for item in reversed(pending):
+            code = apply_delta(code, _unpack(item[STORAGE_FIELD].get("data") or b""))
+            if item.get("_id") is not None:
+                memo[item.get("_id")] = code
+        expected = doc.get("code_hash")
+        if expected and expected != code_hash(code):
+            logger.warning("version_store: hash mismatch for %s", doc.get("_id"))
+            return None
+        return code
+    except Exception as e:
+        logger.warning(f"version_store: restore failed for {doc.get('_id')}: {e}")
+        return None
+
+
+def materialize(collection: Any, doc: Optional[Dict[str, Any]], memo: Optional[Dict[Any, str]] = None) -> Optional[Dict[str, Any]]:
+    """החזרת המסמך עם ``code`` מלא (במקום; מסמכים לא דחוסים חוזרים כמו שהם)."""
+    if not is_compacted(doc):
+        return doc
+    code = restore_code(collection, doc, memo)  # type: ignore[arg-type]
+    if code is not None:
+        doc["code"] = code  # type: ignore[index]
+        doc.pop(STORAGE_FIELD, None)  # type: ignore[union-attr]
+    return doc
+
+
+def materialize_many(collection: Any, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """שחזור רשימת גרסאות (עדיף ממוינת מהחדשה לישנה - כל delta נשען על הקודם)."""
+    memo: Dict[Any, str] = {}
+    for doc in docs:
+        if isinstance(doc, dict) and not is_compacted(doc) and doc.get("_id") is not None:
+            code = doc.get("code")
+            if isinstance(code, str):
+                memo[doc["_id"]] = code
+    for doc in docs:
+        materialize(collection, doc, memo)
+    return docs
+
+
+def compaction_fields(prev_doc: Dict[str, Any], new_code: str, new_id: Any, *, keyframe_interval: int) -> Optional[Dict[str, Any]]:
+    """שדות ה-$set שדוחסים את prev_doc, או None אם אין מה לדחוס."""
+    if not isinstance(prev_doc, dict) or is_compacted(prev_doc):
+        return None
+    old_code = prev_doc.get("code")
+    if not isinstance(old_code, str) or len(old_code.encode("utf-8", errors="ignore")) < MIN_COMPACT_BYTES:
+        return None
+    storage = encode_previous(
+        old_code,
+        new_code or "",
+        new_id,
+        version=int(prev_doc.get("version") or 0),
+        keyframe_interval=keyframe_interval,
+    )
+    fields: Dict[str, Any] = {
+        "code": "",
+        STORAGE_FIELD: storage,
+        "code_hash": code_hash(old_code),
+    }
+    # מסכי רשימה/היסטוריה מחשבים גודל מ-code כשאין שדות מטא - נשמר אותם לפני שהוא מתרוקן
+    if not prev_doc.get("file_size"):
+        fields["file_size"] = len(old_code.encode("utf-8", errors="ignore"))
+    if not prev_doc.get("lines_count"):
+        fields["lines_count"] = len(old_code.split("\n")) if old_code else 0
+    return fields
+
+
+def compact_previous(collection: Any, prev_doc: Dict[str, Any], new_code: str, new_id: Any, *, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> bool:
+    """דחיסת הגרסה הקודמת אחרי שנכתבה גרסה חדשה (best-effort)."""
+    try:
+        fields = compaction_fields(prev_doc, new_code, new_id, keyframe_interval=keyframe_interval)
+        if not fields:
+            return False
+        res = collection.update_one(
+            {"_id": prev_doc["_id"], STORAGE_FIELD: {"$exists": False}},
+            {"$set": fields},
+        )
+        return bool(getattr(res, "modified_count", 0))
+    except Exception as e:
+        logger.warning(f"version_store: compaction failed: {e}")
+        return False
+
+
+class RehydrateError(RuntimeError):
+    """גרסאות שלא ניתן היה להפוך לקוד מלא - אסור למחוק/להסתיר את הבסיס שלהן."""
+
+    def __init__(self, base_id: Any, failed: List[Any]):
+        super().__init__(f"rehydrate failed for {len(failed)} version(s) of {base_id}")
+        self.base_id = base_id
+        self.failed = failed
+
+
+def rehydrate(collection: Any, doc: Dict[str, Any]) -> bool:
+    """כתיבת הקוד המלא חזרה למסמך דחוס (``$set code`` + ``$unset code_storage``).
+
+    מחזיר False למסמך שאינו דחוס; זורק RehydrateError אם השרשרת שבורה או שהכתיבה נכשלה.
+    """
+    if not is_compacted(doc):
+        return False
+    code = restore_code(collection, doc)
+    if code is None:
+        raise RehydrateError(doc.get("_id"), [doc.get("_id")])
+    try:
+        collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"code": code}, "$unset": {STORAGE_FIELD: ""}},
+        )
+    except Exception as e:
+        raise RehydrateError(doc.get("_id"), [doc.get("_id")]) from e
+    doc["code"] = code
+    doc.pop(STORAGE_FIELD, None)
+    return True
+
+
+def rehydrate_dependents(collection: Any, base_id: Any) -> int:
+    """הפיכת גרסאות שה-delta שלהן נשען על base_id ל-keyframes (לפני מחיקה/הסתרה שלו).
+
+    הגרסה שמעל נשארת מלאה כשהאחרונה נמחקת רכות, וגרסה שנמחקת לצמיתות לא
+    שוברת את השחזור של מי שנשען עליה. זורק RehydrateError אם תלוי שנמצא לא
+    שוחזר - על הקורא לוותר על המחיקה. אוסף שלא תומך בחיפוש נחשב כחסר תלויים.
+    """
+    try:
+        dependents = list(collection.find({f"{STORAGE_FIELD}.base_id": base_id}))
+    except Exception as e:
+        logger.warning(f"version_store: dependents lookup failed for {base_id}: {e}")
+        return 0
+    count = 0
+    failed: List[Any] = []
+    for doc in dependents:
+        try:
+            if rehydrate(collection, doc):
+                count += 1
+        except RehydrateError:
+            failed.append(doc.get("_id"))
+    if failed:
+        logger.warning("version_store: %d dependents of %s were not rehydrated", len(failed), base_id)
+        raise RehydrateError(base_id, failed)
+    return count
@@ -7,8 +7,9 @@ this is a public tool; the tool body deliberately omits ``require_admin``.
 It reuses ``RepoBackend.get_file`` to read the raw RST text from the mirror (that already
 handles ref-default, secrets policy, and the ``sync_in_progress`` retry contract), then
 ``services.rst_parser`` to extract a single section with navigation. Guiding rule: never
-return only "not found" — no section ⇒ TOC; missing ⇒ TOC + suggestions; duplicate ⇒
-candidates with breadcrumb.
+return only "not found" — no section ⇒ TOC; missing ⇒ TOC + suggestions (also from other
+docs files); duplicate ⇒ candidates with breadcrumb. Parsed documents and the
+cross-document section index are cached in ``docs_index``.
 """
 
 from __future__ import annotations
@@ -18,13 +19,13 @@ import posixpath
 from typing import Any
 
 from services import rst_parser
+from . import docs_index
 from .handlers import _clamp
 
 MAX_CHARS_DEFAULT = 12_000
 MAX_CHARS_MAX = 100_000
 MAX_CHARS_MIN = 500
 DEFAULT_DOCS_REPO = "CodeBot"
-_TOC_MAX = 400  # תקרת פריטי TOC בתשובה (הגנת גודל)
 
 
 def _allowed_docs_repos() -> list[str]:
@@ -66,13 +67,6 @@ def _resolve_docs_path(path: str) -> str | None:
     return norm
 
 
-def _toc(doc: "rst_parser.Document") -> tuple[list, bool]:
-    items = rst_parser.build_toc(doc)
-    if len(items) > _TOC_MAX:
-        return items[:_TOC_MAX], True
-    return items, False
-
-
 def _section_ref(sec: "rst_parser.Section") -> dict:
     return {"title": sec.title, "level": sec.level,
             "line_range": [sec.heading_line, sec.end_line]}
@@ -112,8 +106,10 @@ def docs_get_section(
 
     content = res.get("content") or ""
     file_meta = res.get("file") or {}
-    doc = rst_parser.parse_document(content)
-    toc_items, toc_truncated = _toc(doc)
+    # פרסור + TOC מה-cache לפי blob SHA (קובץ שלא השתנה לא מפורסר שוב)
+    parsed = docs_index.parsed(repo_name, file_path, content)
+    doc = parsed.doc
+    toc_items, toc_truncated = list(parsed.toc), parsed.toc_truncated
 
     base: dict[str, Any] = {
         "ok": True, "repo": repo_name, "path": file_path,
@@ -122,12 +118,12 @@ def docs_get_section(
     }
 
     # בלי section → עץ כותרות (הכלי משמש גם לניווט)
-    if not (section or "").strip():
+    if section is None or not section.strip():
         base.update({"mode": "toc", "toc": toc_items, "toc_truncated": toc_truncated,
                      "section_count": len(doc.sections)})
         return base
 
-    matches = rst_parser.find_sections(doc, section)
+    matches = parsed.find_sections(section)
 
     # לא נמצא → TOC מלא + הצעות קרובות (לעולם לא רק "לא נמצא")
     if not matches:
@@ -136,6 +132,16 @@ def docs_get_section(
             "suggestions": rst_parser.suggest(doc, section),
             "toc": toc_items, "toc_truncated": toc_truncated,
         })
+        # אינדקס חוצה-מסמכים: אולי הסקשן נמצא בקובץ אחר תחת docs/
+        commit = file_meta.get("resolved_commit")
+        index = docs_index.cross_index(backend, repo_name, commit)
+        if index is None and docs_index.is_building(repo_name, commit):
+            base["cross_index"] = "building"  # נסו שוב בעוד רגע
+        if index:
+            base["found_in"] = docs_index.locate(index, section, exclude_path=file_path)
+            base["other_suggestions"] = [
+                m for m in docs_index.suggest(index, section) if m["path"] != file_path
+            ]
         return base
 
     # כותרת כפולה → כל המועמדים עם breadcrumb (בלי לנחש)
@@ -0,0 +1,215 @@
+"""Cache של מסמכי RST מפורסרים + אינדקס סקשנים חוצה-מסמכים לכלי ``docs_get_section``.
+
+- ``parsed(repo, path, content)`` — עץ הסקשנים, ה-TOC ומפת כותרות מנורמלות, לפי
+  (repo, path, blob SHA). ה-SHA מחושב מהתוכן בדיוק כמו ``git hash-object``, כך
+  שקובץ שלא השתנה בין commits לא מפורסר שוב.
+- ``cross_index(backend, repo, commit)`` — כותרת מנורמלת → מיקומים בכל
+  ``docs/**/*.rst``, נבנה פעם אחת לכל commit פתור. משמש לאיתור סקשן שנמצא
+  בקובץ אחר, ולהצעות "התכוונת ל..." על פני כל התיעוד. הבנייה רצה ב-thread
+  ברקע (אחת לכל repo+commit); הבקשה מחכה לה לכל היותר
+  ``MCP_DOCS_INDEX_WAIT_SECONDS``, ואינדקס חלקי (קריאה שנכשלה, למשל
+  ``sync_in_progress``) לא נשמר ב-cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from difflib import get_close_matches
+from typing import Any
+
+from services import rst_parser
+
+_CACHE_MAX_ENV = "MCP_DOCS_CACHE_MAX_ENTRIES"
+DEFAULT_CACHE_MAX_ENTRIES = 128
+_INDEX_WAIT_ENV = "MCP_DOCS_INDEX_WAIT_SECONDS"
+DEFAULT_INDEX_WAIT_SECONDS = 2.0
+_INDEX_COMMITS_PER_REPO = 2  # commit נוכחי + קודם (בזמן מעבר sync)
+_INDEX_MAX_FILES = 500  # הגנת עלות לבנייה ראשונה
+_TOC_MAX = 400
+
+
+def blob_sha(content: str) -> str:
+    """SHA של blob ב-git (``git hash-object``) עבור תוכן טקסט."""
+    raw = (content or "").encode("utf-8", errors="surrogatepass")
+    return hashlib.sha1(b"blob %d\x00" % len(raw) + raw).hexdigest()
+
+
+@dataclass
+class ParsedDoc:
+    doc: "rst_parser.Document"
+    toc: list
+    toc_truncated: bool
+    # כותרת מנורמלת → אינדקסים של סקשנים (בסדר הופעה, כמו find_sections)
+    titles: dict = field(default_factory=dict)
+
+    def find_sections(self, title: str) -> list:
+        return [self.doc.sections[i] for i in self.titles.get(rst_parser.normalize_title(title), ())]
+
+
+def _parse(content: str) -> ParsedDoc:
+    doc = rst_parser.parse_document(content)
+    toc = rst_parser.build_toc(doc)
+    titles: dict = {}
+    for i, sec in enumerate(doc.sections):
+        titles.setdefault(rst_parser.normalize_title(sec.title), []).append(i)
+    return ParsedDoc(
+        doc=doc,
+        toc=toc[:_TOC_MAX],
+        toc_truncated=len(toc) > _TOC_MAX,
+        titles=titles,
+    )
+
+
+def _max_entries() -> int:
+    try:
+        return max(0, int(os.getenv(_CACHE_MAX_ENV, DEFAULT_CACHE_MAX_ENTRIES)))
+    except (TypeError, ValueError):
+        return DEFAULT_CACHE_MAX_ENTRIES
+
+
+def _index_wait_seconds() -> float:
+    try:
+        return max(0.0, float(os.getenv(_INDEX_WAIT_ENV, DEFAULT_INDEX_WAIT_SECONDS)))
+    except (TypeError, ValueError):
+        return DEFAULT_INDEX_WAIT_SECONDS
+
+
+_lock = threading.Lock()
+_docs: "OrderedDict[tuple, ParsedDoc]" = OrderedDict()
+_indexes: dict[str, "OrderedDict[str, dict]"] = {}
+# (repo, commit) → Event שמסומן כשהבנייה ברקע מסתיימת (single-flight)
+_building: dict[tuple, threading.Event] = {}
+
+
+def parsed(repo: str, path: str, content: str) -> ParsedDoc:
+    """המסמך המפורסר מה-cache, או פרסור ושמירה (LRU)."""
+    key = (repo, path, blob_sha(content))
+    with _lock:
+        hit = _docs.get(key)
+        if hit is not None:
+            _docs.move_to_end(key)
+            return hit
+    result = _parse(content)
+    limit = _max_entries()
+    if limit > 0:
+        with _lock:
+            _docs[key] = result
+            _docs.move_to_end(key)
+            while len(_docs) > limit:
+                _docs.popitem(last=False)
+    return result
+
+
+def _list_docs(backend: Any, repo: str, ref: str | None) -> list[str]:
+    list_tree = getattr(backend, "list_tree", None)
+    if not callable(list_tree):
+        return []
+    paths: list[str] = []
+    page = 1
+    while len(paths) < _INDEX_MAX_FILES:
+        res = list_tree(repo=repo, path="docs", ref=ref, page=page, per_page=500, byte_budget=1_000_000)
+        if not res.get("ok"):
+            break
+        batch = list(res.get("paths") or [])
+        paths.extend(p for p in batch if p.endswith(".rst"))
+        if not batch or page * int(res.get("per_page") or len(batch)) >= int(res.get("total") or 0):
+            break
+        page += 1
+    return paths[:_INDEX_MAX_FILES]
+
+
+def _cached_index(repo: str, commit: str) -> dict | None:
+    with _lock:
+        per_repo = _indexes.get(repo)
+        if per_repo is not None and commit in per_repo:
+            per_repo.move_to_end(commit)
+            return per_repo[commit]
+    return None
+
+
+def _build_index(backend: Any, repo: str, commit: str) -> None:
+    """בניית האינדקס ל-commit ושמירתו - רק אם כל הקבצים נקראו."""
+    try:
+        paths = _list_docs(backend, repo, commit)
+        index: dict = {}
+        complete = bool(paths)
+        for path in sorted(paths):
+            try:
+                res = backend.get_file(repo=repo, path=path, ref=commit)
+            except Exception:
+                res = {"ok": False}
+            if not res.get("ok"):
+                # sync_in_progress / שגיאה זמנית: האינדקס חלקי ולא יישמר
+                complete = False
+                continue
+            if res.get("status") != "ok":
+                continue  # binary / too_large - קבוע ל-commit הזה
+            doc = parsed(repo, path, res.get("content") or "").doc
+            for sec in doc.sections:
+                index.setdefault(rst_parser.normalize_title(sec.title), []).append(
+                    {"path": path, "title": sec.title, "breadcrumb": list(sec.breadcrumb)}
+                )
+        if complete:
+            with _lock:
+                per_repo = _indexes.setdefault(repo, OrderedDict())
+                per_repo[commit] = index
+                while len(per_repo) > _INDEX_COMMITS_PER_REPO:
+                    per_repo.popitem(last=False)
+    finally:
+        with _lock:
+            done = _building.pop((repo, commit), None)
+        if done is not None:
+            done.set()
+
+
+def is_building(repo: str, commit: str | None) -> bool:
+    with _lock:
+        return bool(commit) and (repo, commit) in _building
+
+
+def cross_index(backend: Any, repo: str, commit: str | None, *, wait: float | None = None) -> dict | None:
+    """כותרת מנורמלת → [{path, title, breadcrumb}] על פני כל docs/ ב-commit נתון.
+
+    הבנייה הראשונה ל-commit רצה ברקע; הקריאה מחכה לה עד ``wait`` שניות
+    (ברירת מחדל ``MCP_DOCS_INDEX_WAIT_SECONDS``). None כשאין commit פתור, כשה-backend
+    לא תומך ברשימת קבצים, כשהבנייה עוד רצה, או כשהאינדקס יצא חלקי.
+    """
+    if not commit:
+        return None
+    hit = _cached_index(repo, commit)
+    if hit is not None:
+        return hit
+    if not callable(getattr(backend, "list_tree", None)):
+        return None
+    key = (repo, commit)
+    with _lock:
+        existing = _building.get(key)
+        start = existing is None
+        event = _building[key] = existing or threading.Event()
+    if start:
+        threading.Thread(
+            target=_build_index, args=(backend, repo, commit), name="docs-cross-index", daemon=True
+        ).start()
+    event.wait(_index_wait_seconds() if wait is None else max(0.0, wait))
+    return _cached_index(repo, commit)
+
+
+def locate(index: dict, title: str, *, exclude_path: str | None = None) -> list[dict]:
+    """מיקומי הכותרת בקבצים אחרים (O(1) במילון)."""
+    return [m for m in index.get(rst_parser.normalize_title(title), []) if m["path"] != exclude_path]
+
+
+def suggest(index: dict, query: str, n: int = 5) -> list[dict]:
+    """כותרות קרובות מכל התיעוד, עם הקובץ שבו הן נמצאות."""
+    close = get_close_matches(rst_parser.normalize_title(query), list(index.keys()), n=n, cutoff=0.5)
+    return [index[c][0] for c in close]
+
+
+def clear() -> None:
+    with _lock:
+        _docs.clear()
+        _indexes.clear()
@@ -16,9 +16,20 @@ the MCP side. Private repos need ``GITHUB_TOKENS``/``GITHUB_TOKEN`` set here.
 While a repo is being cloned/fetched, ``is_refreshing(repo)`` is True and the
 read tools report ``sync_in_progress`` + ``retry_after`` instead of "not found".
 
+Scheduling: each repo has its own next-due time. A repo whose check finds
+nothing new doubles its interval (up to the max); a repo that changed goes
+back to the base interval; a new ``last_synced_sha`` in Mongo makes it due
+immediately. Due repos run on a bounded worker pool, so one slow clone no
+longer delays every other repo. Before fetching, ``git ls-remote`` confirms
+the remote actually moved. Only a remote check (or a clone/fetch) counts as
+"fresh" for the staleness metric; a mirror that merely matches the webapp's
+``last_synced_sha`` was never compared with upstream.
+
 Env:
-- ``MCP_REPO_AUTOSYNC``          — "0"/"false" disables (default: enabled).
-- ``MCP_REPO_AUTOSYNC_INTERVAL`` — seconds between passes (default 300, min 30).
+- ``MCP_REPO_AUTOSYNC``              — "0"/"false" disables (default: enabled).
+- ``MCP_REPO_AUTOSYNC_INTERVAL``     — base seconds between checks of a repo (default 300, min 30).
+- ``MCP_REPO_AUTOSYNC_MAX_INTERVAL`` — cap for the adaptive interval (default 3600).
+- ``MCP_REPO_AUTOSYNC_WORKERS``      — concurrent clone/fetch workers (default 2).
 """
 
 from __future__ import annotations
@@ -28,7 +39,9 @@ import os
 import re
 import threading
 import time
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
 
 logger = logging.getLogger(__name__)
 
@@ -54,11 +67,25 @@ def _redact(text: Any) -> str:
 
 
 DEFAULT_INTERVAL_SECONDS = 300
+DEFAULT_MAX_INTERVAL_SECONDS = 3600
+DEFAULT_WORKERS = 2
 _MIN_INTERVAL_SECONDS = 30
+_MAX_WORKERS = 16
 _STARTUP_DELAY_SECONDS = 10  # let the app finish booting before the first pass
+_TICK_SECONDS = 15  # how often the scheduler looks for due repos
 
 _ENABLE_ENV = "MCP_REPO_AUTOSYNC"
 _INTERVAL_ENV = "MCP_REPO_AUTOSYNC_INTERVAL"
+_MAX_INTERVAL_ENV = "MCP_REPO_AUTOSYNC_MAX_INTERVAL"
+_WORKERS_ENV = "MCP_REPO_AUTOSYNC_WORKERS"
+
+_REPOS_PROJECTION = {
+    "_id": 0,
+    "repo_name": 1,
+    "repo_url": 1,
+    "default_branch": 1,
+    "last_synced_sha": 1,
+}
 
 _start_lock = threading.Lock()
 _thread: threading.Thread | None = None
@@ -92,73 +119,283 @@ def _interval_seconds() -> int:
         return DEFAULT_INTERVAL_SECONDS
 
 
-def refresh_once(db: Any, mirror: Any) -> dict[str, int]:
-    """One refresh pass over every repo in ``repo_metadata``. Never raises.
+def _max_interval_seconds(base: int) -> int:
+    try:
+        value = int(os.getenv(_MAX_INTERVAL_ENV, DEFAULT_MAX_INTERVAL_SECONDS))
+    except (TypeError, ValueError):
+        value = DEFAULT_MAX_INTERVAL_SECONDS
+    return max(base, value)
+
+
+def _workers() -> int:
+    try:
+        return min(_MAX_WORKERS, max(1, int(os.getenv(_WORKERS_ENV, DEFAULT_WORKERS))))
+    except (TypeError, ValueError):
+        return DEFAULT_WORKERS
+
+
+# -- per-repo schedule state ----------------------------------------------
+@dataclass
+class _RepoState:
+    interval: float
+    next_due: float = 0.0
+    db_sha: str = ""
+    first_seen: float = 0.0
+    last_fresh: float | None = None  # last time the mirror was confirmed current
+    last_result: str = ""
+
+
+_states_lock = threading.Lock()
+_states: dict[str, _RepoState] = {}
+
+# Outcomes that prove the local mirror matches upstream right now. ``in_sync``
+# (local == webapp's last_synced_sha, no remote check possible) is not one of them.
+_FRESH_OUTCOMES = ("cloned", "fetched", "unchanged")
 
-    Per repo: missing mirror + known URL ⇒ clone; existing mirror whose local
-    SHA differs from the webapp-written ``last_synced_sha`` (or when either SHA
-    is unknown) ⇒ delta fetch; identical SHAs ⇒ skip.
+
+def _record_metrics(name: str, outcome: str, staleness: float | None) -> None:
+    try:
+        from metrics import record_repo_autosync
+
+        record_repo_autosync(name, outcome, staleness)
+    except Exception:
+        return
+
+
+def _note_outcome(
+    name: str, outcome: str, db_sha: str, *, base: float, max_interval: float, now: float | None = None
+) -> None:
+    """Advance the repo's schedule: changed ⇒ base interval, quiet/failed ⇒ back off."""
+    now = time.time() if now is None else now
+    with _states_lock:
+        state = _states.get(name)
+        if state is None:
+            state = _states[name] = _RepoState(interval=base, first_seen=now)
+        if outcome in ("cloned", "fetched"):
+            state.interval = base
+        elif outcome == "skipped":
+            state.interval = max_interval
+        else:  # unchanged / in_sync / error
+            state.interval = min(max_interval, max(base, state.interval * 2))
+        state.next_due = now + state.interval
+        state.db_sha = db_sha
+        state.last_result = outcome
+        if outcome in _FRESH_OUTCOMES:
+            state.last_fresh = now
+        staleness = now - (state.last_fresh if state.last_fresh is not None else state.first_seen)
+    _record_metrics(name, outcome, staleness)
+
+
+def _is_due(meta: dict[str, Any], now: float) -> bool:
+    name = str(meta.get("repo_name") or "").strip()
+    with _states_lock:
+        state = _states.get(name)
+        if state is None:
+            return True
+        if str(meta.get("last_synced_sha") or "").strip() != state.db_sha:
+            return True  # the webapp synced something new — don't wait out the interval
+        return state.next_due <= now
+
+
+def _priority(meta: dict[str, Any], now: float) -> float:
+    """Most overdue first; never-checked repos ahead of everything."""
+    name = str(meta.get("repo_name") or "").strip()
+    with _states_lock:
+        state = _states.get(name)
+        return float("-inf") if state is None else state.next_due - now
+
+
+def staleness_snapshot(now: float | None = None) -> dict[str, dict[str, Any]]:
+    """Per-repo freshness: seconds since last confirmed current, interval, next check."""
+    now = time.time() if now is None else now
+    with _states_lock:
+        return {
+            name: {
+                "staleness_seconds": round(
+                    now - (st.last_fresh if st.last_fresh is not None else st.first_seen), 1
+                ),
+                "interval_seconds": st.interval,
+                "next_check_in": round(max(0.0, st.next_due - now), 1),
+                "last_result": st.last_result,
+            }
+            for name, st in _states.items()
+        }
+
+
+def _reset_state_for_tests() -> None:
+    with _states_lock:
+        _states.clear()
+
+
+# -- one repo ---------------------------------------------------------------
+def _refresh_repo(meta: dict[str, Any], mirror: Any) -> str:
+    """Clone/fetch one repo if needed. Returns cloned|fetched|unchanged|in_sync|skipped|error.
+
+    Missing mirror + known URL ⇒ clone. Otherwise ask the remote (``ls-remote``):
+    a match ⇒ unchanged (confirmed current), a difference ⇒ fetch. Without a
+    remote check, a local SHA equal to the webapp-written ``last_synced_sha`` ⇒
+    in_sync (no fetch, but not counted as fresh); anything else ⇒ fetch.
     """
-    stats = {"checked": 0, "cloned": 0, "fetched": 0, "skipped": 0, "errors": 0}
+    name = str(meta.get("repo_name") or "").strip()
+    _mark(name, True)
     try:
-        repos = list(
-            db["repo_metadata"].find(
-                {},
-                {
-                    "_id": 0,
-                    "repo_name": 1,
-                    "repo_url": 1,
-                    "default_branch": 1,
-                    "last_synced_sha": 1,
-                },
+        if not mirror.mirror_exists(name):
+            url = str(meta.get("repo_url") or "").strip()
+            if not url:
+                return "skipped"
+            res = mirror.init_mirror(url, name) or {}
+            if res.get("success"):
+                return "cloned"
+            logger.warning(
+                "repo autosync: clone failed for %s: %s", name, _redact(res.get("message"))
             )
+            return "error"
+
+        branch = str(meta.get("default_branch") or "main")
+        db_sha = str(meta.get("last_synced_sha") or "").strip()
+        local_sha = str(mirror.get_current_sha(name, branch) or "").strip()
+        remote_sha_fn: Callable[..., Any] | None = getattr(mirror, "get_remote_sha", None)
+        remote_sha = ""
+        if local_sha and callable(remote_sha_fn):
+            remote_sha = str(remote_sha_fn(name, branch) or "").strip()
+            if remote_sha and remote_sha == local_sha:
+                return "unchanged"
+        if not remote_sha and db_sha and local_sha and db_sha == local_sha:
+            return "in_sync"
+        res = mirror.fetch_updates(name) or {}
+        if res.get("success"):
+            return "fetched"
+        logger.warning(
+            "repo autosync: fetch failed for %s: %s", name, _redact(res.get("message"))
         )
+        return "error"
+    except Exception:
+        logger.warning("repo autosync: refresh failed for %s", name, exc_info=True)
+        return "error"
+    finally:
+        _mark(name, False)
+
+
+def _load_repos(db: Any) -> list[dict[str, Any]] | None:
+    try:
+        return list(db["repo_metadata"].find({}, _REPOS_PROJECTION))
     except Exception:
         logger.warning("repo autosync: repo_metadata query failed", exc_info=True)
+        return None
+
+
+_STAT_KEY = {
+    "cloned": "cloned",
+    "fetched": "fetched",
+    "unchanged": "skipped",
+    "in_sync": "skipped",
+    "skipped": "skipped",
+    "error": "errors",
+}
+
+
+def refresh_once(db: Any, mirror: Any, *, workers: int | None = None) -> dict[str, int]:
+    """One full pass over every repo in ``repo_metadata`` (all repos, due or not).
+
+    Repos are checked concurrently on up to ``workers`` threads; the call
+    returns when all are done. Never raises.
+    """
+    stats = {"checked": 0, "cloned": 0, "fetched": 0, "skipped": 0, "errors": 0}
+    repos = _load_repos(db)
+    if repos is None:
         return stats
+    metas = [m for m in repos if str(m.get("repo_name") or "").strip()]
+    base = _interval_seconds()
+    max_interval = _max_interval_seconds(base)
+
+    def _run(meta: dict[str, Any]) -> str:
+        outcome = _refresh_repo(meta, mirror)
+        _note_outcome(
+            str(meta["repo_name"]).strip(),
+            outcome,
+            str(meta.get("last_synced_sha") or "").strip(),
+            base=base,
+            max_interval=max_interval,
+        )
+        return outcome
+
+    pool_size = min(workers or _workers(), len(metas))
+    if pool_size <= 1:
+        outcomes = [_run(m) for m in metas]
+    else:
+        with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="mcp-repo-refresh") as pool:
+            outcomes = list(pool.map(_run, metas))
+    for outcome in outcomes:
+        stats["checked"] += 1
+        stats[_STAT_KEY.get(outcome, "errors")] += 1
+    return stats
+
+
+class RefreshScheduler:
+    """Submits due repos to a bounded pool without waiting for slow ones.
+
+    ``tick()`` is cheap (one projected ``repo_metadata`` query); a repo that is
+    still being cloned/fetched is never submitted twice.
+    """
+
+    def __init__(
+        self,
+        db: Any,
+        mirror_factory: Callable[[], Any],
+        *,
+        interval: int | None = None,
+        workers: int | None = None,
+    ) -> None:
+        self._db = db
+        self._mirror_factory = mirror_factory
+        self.base_interval = interval or _interval_seconds()
+        self.max_interval = _max_interval_seconds(self.base_interval)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or _workers(), thread_name_prefix="mcp-repo-refresh"
+        )
+        self._in_flight: set[str] = set()
+        self._lock = threading.Lock()
 
-    for meta in repos:
+    def _run(self, meta: dict[str, Any]) -> None:
         name = str(meta.get("repo_name") or "").strip()
-        if not name:
-            continue
-        stats["checked"] += 1
-        _mark(name, True)
         try:
-            if not mirror.mirror_exists(name):
-                url = str(meta.get("repo_url") or "").strip()
-                if not url:
-                    stats["skipped"] += 1
-                    continue
-                res = mirror.init_mirror(url, name) or {}
-                if res.get("success"):
-                    stats["cloned"] += 1
-                else:
-                    stats["errors"] += 1
-                    logger.warning(
-                        "repo autosync: clone failed for %s: %s", name, _redact(res.get("message"))
-                    )
-                continue
-
-            branch = str(meta.get("default_branch") or "main")
-            db_sha = str(meta.get("last_synced_sha") or "").strip()
-            local_sha = str(mirror.get_current_sha(name, branch) or "").strip()
-            if db_sha and local_sha and db_sha == local_sha:
-                stats["skipped"] += 1
-                continue
-            res = mirror.fetch_updates(name) or {}
-            if res.get("success"):
-                stats["fetched"] += 1
-            else:
-                stats["errors"] += 1
-                logger.warning(
-                    "repo autosync: fetch failed for %s: %s", name, _redact(res.get("message"))
-                )
-        except Exception:
-            stats["errors"] += 1
-            logger.warning("repo autosync: refresh failed for %s", name, exc_info=True)
+            outcome = _refresh_repo(meta, self._mirror_factory())
+            _note_outcome(
+                name,
+                outcome,
+                str(meta.get("last_synced_sha") or "").strip(),
+                base=self.base_interval,
+                max_interval=self.max_interval,
+            )
+            if outcome in ("cloned", "fetched", "error"):
+                logger.info("repo autosync: %s %s", name, outcome)
         finally:
-            _mark(name, False)
-    return stats
+            with self._lock:
+                self._in_flight.discard(name)
+
+    def tick(self, now: float | None = None) -> int:
+        """Submit every due, idle repo (most overdue first). Returns how many."""
+        now = time.time() if now is None else now
+        repos = _load_repos(self._db) or []
+        due = [
+            m
+            for m in repos
+            if str(m.get("repo_name") or "").strip() and _is_due(m, now)
+        ]
+        due.sort(key=lambda m: _priority(m, now))
+        submitted = 0
+        for meta in due:
+            name = str(meta["repo_name"]).strip()
+            with self._lock:
+                if name in self._in_flight:
+                    continue
+                self._in_flight.add(name)
+            self._pool.submit(self._run, meta)
+            submitted += 1
+        return submitted
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
 
 
 def start_autosync(db: Any, *, interval: int | None = None) -> bool:
@@ -176,20 +413,28 @@ def start_autosync(db: Any, *, interval: int | None = None) -> bool:
         if _thread is not None and _thread.is_alive():
             return True
 
+        def _mirror() -> Any:
+            from services.git_mirror_service import get_mirror_service  # lazy heavy import
+
+            return get_mirror_service()
+
+        scheduler = RefreshScheduler(db, _mirror, interval=interval)
+
         def _loop() -> None:
             time.sleep(_STARTUP_DELAY_SECONDS)
             while True:
                 try:
-                    from services.git_mirror_service import get_mirror_service  # lazy heavy import
-
-                    stats = refresh_once(db, get_mirror_service())
-                    if stats["cloned"] or stats["fetched"] or stats["errors"]:
-                        logger.info("repo autosync pass: %s", stats)
+                    scheduler.tick()
                 except Exception:
-                    logger.warning("repo autosync pass failed", exc_info=True)
-                time.sleep(interval or _interval_seconds())
+                    logger.warning("repo autosync tick failed", exc_info=True)
+                time.sleep(min(_TICK_SECONDS, scheduler.base_interval))
 
         _thread = threading.Thread(target=_loop, daemon=True, name="mcp-repo-autosync")
         _thread.start()
-        logger.info("repo autosync started (interval=%ss)", interval or _interval_seconds())
+        logger.info(
+            "repo autosync started (interval=%ss, max=%ss, workers=%s)",
+            scheduler.base_interval,
+            scheduler.max_interval,
+            _workers(),
+        )
         return True
@@ -130,6 +130,31 @@ class RepoBackend:
         branch = (meta or {}).get("default_branch")
         return f"refs/heads/{branch}" if branch else "HEAD"
 
+    def _dir_summary(self, repo_name: str, prefix: str) -> list[dict[str, Any]] | None:
+        """Immediate subdirectories of ``prefix`` from the materialized ``repo_dirs``.
+
+        One indexed query on ``(repo_name, parent_dir)`` regardless of repo
+        size. Stats cover indexed files at the last synced commit, so this is
+        only meaningful for the default ref. None when the tree isn't built.
+        """
+        try:
+            if self._db is None:
+                return None
+            cursor = (
+                self._db["repo_dirs"]
+                .find(
+                    {"repo_name": repo_name, "parent_dir": prefix},
+                    {"_id": 0, "path": 1, "file_count": 1, "total_size": 1, "languages": 1},
+                )
+                .sort("path", 1)
+                .limit(TREE_PER_PAGE_MAX)
+            )
+            dirs = [_json_safe(dict(doc)) for doc in cursor]
+        except Exception:
+            logger.warning("repo_dirs summary failed (non-fatal)", exc_info=True)
+            return None
+        return [d for d in dirs if d.get("path") and not is_denied(str(d["path"]))] or None
+
     # -- tools -------------------------------------------------------------
     def list_repos(self, *, limit: int = 50) -> dict[str, Any]:
         try:
@@ -188,7 +213,7 @@ class RepoBackend:
                 truncated = True
                 break
             out.append(item)
-        return {
+        result: dict[str, Any] = {
             "ok": True,
             "repo": repo,
             "ref": use_ref,
@@ -199,6 +224,13 @@ class RepoBackend:
             "paths": out,
             "truncated": truncated,
         }
+        # Per-directory counts/sizes/languages for the first page only, so a
+        # caller can pick a subtree without paging through every path.
+        if ref is None and page_i == 1:
+            dirs = self._dir_summary(repo, prefix)
+            if dirs:
+                result["dirs"] = dirs
+        return result
 
     def get_file(self, *, repo: str, path: str, ref: str | None = None) -> dict[str, Any]:
         if is_denied(path):  # policy: block, before touching the mirror
@@ -469,6 +469,189 @@ dependency_init_seconds = (
     else None
 )
 
+# Search index maintenance (incremental deltas, rebuilds, snapshots)
+search_index_updates_total = (
+    Counter(
+        "search_index_updates_total",
+        "Search index maintenance operations",
+        ["kind"],
+    )
+    if Counter
+    else None
+)
+search_index_lag_seconds = (
+    Histogram(
+        "search_index_lag_seconds",
+        "Delay between a file change and its application to the in-memory search index",
+        buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+    )
+    if Histogram
+    else None
+)
+
+search_index_cache_events_total = (
+    Counter(
+        "search_index_cache_events_total",
+        "Per-user search index cache events (hit/miss/eviction)",
+        ["event"],
+    )
+    if Counter
+    else None
+)
+search_index_cache_users = (
+    Gauge("search_index_cache_users", "Per-user search indexes currently held in memory")
+    if Gauge
+    else None
+)
+search_regex_docs_total = (
+    Counter(
+        "search_regex_docs_total",
+        "Documents handled by regex search (pruned by trigram prefilter/scanned/matched)",
+        ["outcome"],
+    )
+    if Counter
+    else None
+)
+search_regex_budget_exceeded_total = (
+    Counter(
+        "search_regex_budget_exceeded_total",
+        "Regex searches cut short by the per-query time budget",
+    )
+    if Counter
+    else None
+)
+render_cache_requests_total = (
+    Counter(
+        "render_cache_requests_total",
+        "Render cache lookups by render kind and serving tier (local/redis/miss)",
+        ["kind", "tier"],
+    )
+    if Counter
+    else None
+)
+
+git_object_cache_requests_total = (
+    Counter(
+        "git_object_cache_requests_total",
+        "Git object cache lookups by operation and serving tier (memory/disk/miss)",
+        ["op", "tier"],
+    )
+    if Counter
+    else None
+)
+
+dashboard_cache_requests_total = (
+    Counter(
+        "dashboard_cache_requests_total",
+        "Observability dashboard cache lookups by kind and result (fresh/stale/miss/coalesced)",
+        ["kind", "result"],
+    )
+    if Counter
+    else None
+)
+
+push_deliveries_total = (
+    Counter(
+        "push_deliveries_total",
+        "Claimed reminder pushes by result (sent/failed)",
+        ["result"],
+    )
+    if Counter
+    else None
+)
+push_delivery_latency_seconds = (
+    Histogram(
+        "push_delivery_latency_seconds",
+        "Delay between a reminder's remind_at and its first successful web-push delivery",
+        buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+    )
+    if Histogram
+    else None
+)
+
+reminder_dispatch_lateness_seconds = (
+    Histogram(
+        "reminder_dispatch_lateness_seconds",
+        "Delay between a bot reminder's remind_at and its dispatch, by source (window/overdue/immediate)",
+        ["source"],
+        buckets=(0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+    )
+    if Histogram
+    else None
+)
+reminder_window_size = (
+    Gauge("reminder_window_size", "Upcoming bot reminders currently held in the scheduler's in-memory window")
+    if Gauge
+    else None
+)
+
+backup_export_bytes_total = (
+    Counter(
+        "backup_export_bytes_total",
+        "Bytes of personal backup ZIP written, by target (stream/buffer/file/drive/disk)",
+        ["target"],
+    )
+    if Counter
+    else None
+)
+backup_export_files_total = (
+    Counter(
+        "backup_export_files_total",
+        "Files (regular + large) written into personal backup ZIPs, by target",
+        ["target"],
+    )
+    if Counter
+    else None
+)
+backup_export_duration_seconds = (
+    Histogram(
+        "backup_export_duration_seconds",
+        "Wall time to produce one personal backup ZIP, by target",
+        ["target"],
+        buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+    )
+    if Histogram
+    else None
+)
+
+drive_incremental_backups_total = (
+    Counter(
+        "drive_incremental_backups_total",
+        "Scheduled incremental Drive backups, by outcome (skip/delta/full)",
+        ["kind"],
+    )
+    if Counter
+    else None
+)
+drive_incremental_uploaded_bytes_total = (
+    Counter(
+        "drive_incremental_uploaded_bytes_total",
+        "Bytes uploaded to Drive by incremental scheduled backups, by archive kind",
+        ["kind"],
+    )
+    if Counter
+    else None
+)
+
+repo_autosync_checks_total = (
+    Counter(
+        "repo_autosync_checks_total",
+        "MCP mirror autosync checks by result (cloned/fetched/unchanged/in_sync/skipped/error)",
+        ["result"],
+    )
+    if Counter
+    else None
+)
+repo_mirror_staleness_seconds = (
+    Gauge(
+        "repo_mirror_staleness_seconds",
+        "Seconds since the local mirror was last confirmed current with upstream",
+        ["repo"],
+    )
+    if Gauge
+    else None
+)
+
 # In-memory assistance structures (fail-open, best-effort)
 _ACTIVE_USERS: set[int] = set()
 _ACTIVE_REQUESTS: int = 0
@@ -1535,6 +1718,148 @@ def record_db_operation(operation: str, duration_seconds: float, *, status: str
         return
 
 
+def record_search_index_update(kind: str, *, count: int = 1, lag_seconds: float | None = None) -> None:
+    """Count a search-index maintenance operation and observe its lag when known."""
+    try:
+        if search_index_updates_total is not None:
+            search_index_updates_total.labels(kind=_normalize_metric_label(kind, "unknown")).inc(max(0, int(count)))
+        if lag_seconds is not None and search_index_lag_seconds is not None:
+            search_index_lag_seconds.observe(max(0.0, float(lag_seconds)))
+    except Exception:
+        return
+
+
+def record_search_index_cache_event(event: str, *, size: int | None = None) -> None:
+    """Count a search index cache hit/miss/eviction and track the cache size."""
+    try:
+        if search_index_cache_events_total is not None:
+            search_index_cache_events_total.labels(event=_normalize_metric_label(event, "unknown")).inc()
+        if size is not None and search_index_cache_users is not None:
+            search_index_cache_users.set(max(0, int(size)))
+    except Exception:
+        return
+
+
+def record_search_regex_prefilter(
+    *, pruned: int, scanned: int, matched: int, budget_exceeded: bool = False
+) -> None:
+    """Count documents pruned/scanned/matched by a regex search and budget overruns."""
+    try:
+        if search_regex_docs_total is not None:
+            for outcome, value in (("pruned", pruned), ("scanned", scanned), ("matched", matched)):
+                if value:
+                    search_regex_docs_total.labels(outcome=outcome).inc(max(0, int(value)))
+        if budget_exceeded and search_regex_budget_exceeded_total is not None:
+            search_regex_budget_exceeded_total.inc()
+    except Exception:
+        return
+
+
+def record_render_cache(kind: str, tier: str) -> None:
+    """Count a render cache lookup served from the local LRU, Redis, or rendered (miss)."""
+    try:
+        if render_cache_requests_total is not None:
+            render_cache_requests_total.labels(
+                kind=_normalize_metric_label(kind, "unknown"),
+                tier=_normalize_metric_label(tier, "unknown"),
+            ).inc()
+    except Exception:
+        return
+
+
+def record_git_object_cache(op: str, tier: str) -> None:
+    """Count a git object cache lookup served from memory, disk, or git (miss)."""
+    try:
+        if git_object_cache_requests_total is not None:
+            git_object_cache_requests_total.labels(
+                op=_normalize_metric_label(op, "unknown"),
+                tier=_normalize_metric_label(tier, "unknown"),
+            ).inc()
+    except Exception:
+        return
+
+
+def record_dashboard_cache(kind: str, result: str) -> None:
+    """Count an observability dashboard cache lookup (fresh/stale/miss/coalesced)."""
+    try:
+        if dashboard_cache_requests_total is not None:
+            dashboard_cache_requests_total.labels(
+                kind=_normalize_metric_label(kind, "unknown"),
+                result=_normalize_metric_label(result, "unknown"),
+            ).inc()
+    except Exception:
+        return
+
+
+def record_push_delivery(result: str, latency_seconds: float | None = None) -> None:
+    """Count one reminder push and observe its remind_at -> send latency."""
+    try:
+        if push_deliveries_total is not None:
+            push_deliveries_total.labels(result=_normalize_metric_label(result, "unknown")).inc()
+        if push_delivery_latency_seconds is not None and latency_seconds is not None:
+            push_delivery_latency_seconds.observe(max(0.0, float(latency_seconds)))
+    except Exception:
+        return
+
+
+def record_reminder_dispatch(source: str, lateness_seconds: float | None = None) -> None:
+    """Observe how late a bot reminder was dispatched relative to its remind_at."""
+    try:
+        if reminder_dispatch_lateness_seconds is not None and lateness_seconds is not None:
+            reminder_dispatch_lateness_seconds.labels(source=_normalize_metric_label(source, "unknown")).observe(
+                max(0.0, float(lateness_seconds))
+            )
+    except Exception:
+        return
+
+
+def set_reminder_window_size(size: int) -> None:
+    """Publish how many upcoming reminders the scheduler holds in memory."""
+    try:
+        if reminder_window_size is not None:
+            reminder_window_size.set(max(0, int(size)))
+    except Exception:
+        return
+
+
+def record_backup_export(target: str, size_bytes: int, files: int, duration_seconds: float) -> None:
+    """Record throughput of one personal backup export (bytes, files, wall time)."""
+    try:
+        label = _normalize_metric_label(target, "unknown")
+        if backup_export_bytes_total is not None:
+            backup_export_bytes_total.labels(target=label).inc(max(0, int(size_bytes)))
+        if backup_export_files_total is not None:
+            backup_export_files_total.labels(target=label).inc(max(0, int(files)))
+        if backup_export_duration_seconds is not None:
+            backup_export_duration_seconds.labels(target=label).observe(max(0.0, float(duration_seconds)))
+    except Exception:
+        return
+
+
+def record_drive_incremental_backup(kind: str, size_bytes: int) -> None:
+    """Count one incremental Drive backup run and the bytes it uploaded."""
+    try:
+        label = _normalize_metric_label(kind, "unknown")
+        if drive_incremental_backups_total is not None:
+            drive_incremental_backups_total.labels(kind=label).inc()
+        if drive_incremental_uploaded_bytes_total is not None:
+            drive_incremental_uploaded_bytes_total.labels(kind=label).inc(max(0, int(size_bytes)))
+    except Exception:
+        return
+
+def record_repo_autosync(repo: str, result: str, staleness_seconds: float | None = None) -> None:
+    """Count one autosync check and publish the repo's mirror staleness."""
+    try:
+        if repo_autosync_checks_total is not None:
+            repo_autosync_checks_total.labels(result=_normalize_metric_label(result, "unknown")).inc()
+        if repo_mirror_staleness_seconds is not None and staleness_seconds is not None:
+            repo_mirror_staleness_seconds.labels(repo=_normalize_metric_label(repo, "unknown")).set(
+                max(0.0, float(staleness_seconds))
+            )
+    except Exception:
+        return
+
+
 def _maybe_trigger_anomaly() -> None:
     """Detect basic anomalies: bursts of errors and high average latency.
 
@@ -13,6 +13,7 @@ Environment variables:
 - DATABASE_NAME: DB name (default: code_keeper_bot)
 - ALERTS_COLLECTION: Collection name (default: alerts_log)
 - ALERTS_TTL_DAYS: TTL for documents (default: 30)
+- OBSERVABILITY_ROLLUPS_COLLECTION / OBSERVABILITY_ROLLUPS_ENABLED: see monitoring.rollups
 
 Public API:
 - record_alert(alert_id, name, severity, summary, source) -> None
@@ -27,6 +28,8 @@ import hashlib
 import os
 import re
 
+from monitoring import rollups
+
 
 def _is_true(val: Optional[str]) -> bool:
     return str(val or "").lower() in {"1", "true", "yes", "on"}
@@ -70,9 +73,10 @@ def _enabled() -> bool:
     return _write_enabled()
 
 
-_client = None  # type: ignore
+_client: Any = None
 _collection = None  # type: ignore
 _catalog_collection = None  # type: ignore
+_rollup_collection: Any = None
 _init_failed = False  # True when initialization permanently failed (e.g., pymongo missing)
 _write_disabled = False  # True when writes are intentionally disabled (not a failure)
 
@@ -441,6 +445,24 @@ def _get_catalog_collection(*, for_read: bool = True):  # pragma: no cover - exe
         return None
 
 
+def _get_rollup_collection(*, for_read: bool = True):  # pragma: no cover - exercised indirectly
+    """Return the shared observability rollups collection (same client/DB)."""
+    global _rollup_collection
+    if _rollup_collection is not None:
+        return _rollup_collection
+    if _init_failed or _client is None:
+        return None
+    try:
+        if _get_collection(for_read=for_read) is None:
+            return None
+        db_name = os.getenv("DATABASE_NAME") or "code_keeper_bot"
+        _rollup_collection = _client[db_name][rollups.collection_name()]  # type: ignore[index]
+        rollups.ensure_indexes(_rollup_collection)
+        return _rollup_collection
+    except Exception:
+        return None
+
+
 def _isoformat_utc(value: Optional[datetime]) -> Optional[str]:
     """Return ISO string with UTC tzinfo for Mongo datetimes."""
     if not isinstance(value, datetime):
@@ -985,16 +1007,32 @@ def record_alert(
             doc["duration_seconds"] = float(duration_seconds)
         if alert_id:
             doc["alert_id"] = str(alert_id)
+        inserted = False
         try:
             # Upsert by key (idempotent). Using update_one for better semantics with unique key.
-            coll.update_one({"_key": key}, {"$setOnInsert": doc}, upsert=True)  # type: ignore[attr-defined]
+            res = coll.update_one({"_key": key}, {"$setOnInsert": doc}, upsert=True)  # type: ignore[attr-defined]
+            inserted = getattr(res, "upserted_id", None) is not None
         except Exception:
             # Fall back to insert (ignore dup errors silently)
             try:
                 coll.insert_one(doc)  # type: ignore[attr-defined]
+                inserted = True
             except Exception:
                 pass
 
+        # --- Rollups: count only new alerts (a duplicate _key is the same alert) ---
+        try:
+            if inserted and not (clean_details and bool(clean_details.get("is_drill"))):
+                rollups.record_alert(
+                    _get_rollup_collection(for_read=False),
+                    ts=now,
+                    severity=doc["severity"],
+                    alert_type=alert_type,
+                    name=doc["name"],
+                )
+        except Exception:
+            pass
+
         # --- Catalog (Registry): persist observed alert_type forever (best-effort) ---
         try:
             # Do not pollute catalog with drills
@@ -1472,6 +1510,9 @@ def aggregate_alert_summary(
     coll = _get_collection()
     if coll is None:
         return {"total": 0, "critical": 0, "anomaly": 0, "deployment": 0}
+    rolled = rollups.alert_summary(_get_rollup_collection(), start_dt=start_dt, end_dt=end_dt)
+    if rolled is not None:
+        return rolled
     match = _build_time_filter(start_dt, end_dt)
     # Default: exclude Drill alerts from summary/analytics
     match["details.is_drill"] = {"$ne": True}
@@ -1564,10 +1605,21 @@ def aggregate_alert_timeseries(
     end_dt: Optional[datetime],
     granularity_seconds: int,
 ) -> List[Dict[str, Any]]:
-    """Aggregate alert counts per severity over time buckets."""
+    """Aggregate alert counts per severity over time buckets.
+
+    Served from the 1m/1h/1d rollups when they cover the window (see monitoring.rollups).
+    """
     coll = _get_collection()
     if coll is None:
         return []
+    rolled = rollups.alert_timeseries(
+        _get_rollup_collection(),
+        start_dt=start_dt,
+        end_dt=end_dt,
+        granularity_seconds=granularity_seconds,
+    )
+    if rolled is not None:
+        return rolled
     try:
         bucket_seconds = max(1, int(granularity_seconds or 60))
     except Exception:
@@ -0,0 +1,153 @@
+"""
+Mergeable latency quantile sketch (DDSketch-style, stdlib only).
+
+Each value is counted in a logarithmic bucket ``ceil(log_gamma(x))`` with
+``gamma = (1 + alpha) / (1 - alpha)``, so any quantile is returned with a
+relative error of at most ``alpha``. Two sketches with the same ``alpha`` merge
+by adding bucket counts, which makes per-bucket rollups composable: the
+percentiles of a window are the percentiles of the merged bucket sketches,
+at a cost proportional to the number of rollup docs, not to request volume.
+
+Serialized form (stored on ``request_agg`` docs as ``latency_sketch``)::
+
+    {"v": 1, "alpha": 0.01, "zero": <count <= min>, "offset": <first bin>,
+     "bins": <zlib(array('I') of dense counts)>}
+"""
+from __future__ import annotations
+
+import math
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Optional
+
+_FORMAT_VERSION = 1
+DEFAULT_ALPHA = 0.01
+# ערכים קטנים מזה (שניות) נספרים כ"אפס" - מתחת לרזולוציה שמעניינת latency
+_MIN_VALUE = 1e-6
+# תקרת bins: ~ טווח של 1µs..שעות ב-alpha=1%; מעבר לזה מקפלים את הנמוכים
+_MAX_BINS = 2048
+
+
+class LatencySketch:
+    """Quantile sketch with bounded relative error; merge = add counts."""
+
+    __slots__ = ("alpha", "_log_gamma", "_bins", "zero_count", "count")
+
+    def __init__(self, alpha: float = DEFAULT_ALPHA):
+        alpha = float(alpha)
+        if not 0.0 < alpha < 1.0:
+            raise ValueError("alpha must be in (0, 1)")
+        self.alpha = alpha
+        self._log_gamma = math.log((1.0 + alpha) / (1.0 - alpha))
+        self._bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index: int) -> float:
+        # נקודת האמצע (במובן היחסי) של ה-bin: 2*gamma^i/(gamma+1)
+        gamma = math.exp(self._log_gamma)
+        return 2.0 * math.exp(index * self._log_gamma) / (gamma + 1.0)
+
+    def add(self, value: float, count: int = 1) -> None:
+        try:
+            value = float(value)
+        except Exception:
+            return
+        if count <= 0 or math.isnan(value):
+            return
+        self.count += int(count)
+        if value <= _MIN_VALUE:
+            self.zero_count += int(count)
+            return
+        idx = self._index(value)
+        self._bins[idx] = self._bins.get(idx, 0) + int(count)
+        if len(self._bins) > _MAX_BINS:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        """קיפול ה-bins הנמוכים לתוך הנמוך ביותר שנשאר (מאבד דיוק רק בזנב התחתון)."""
+        keys = sorted(self._bins)
+        cut = keys[len(keys) - _MAX_BINS]
+        folded = sum(self._bins.pop(k) for k in keys if k < cut)
+        self._bins[cut] = self._bins.get(cut, 0) + folded
+
+    def merge(self, other: "LatencySketch") -> None:
+        if other is None or other.count == 0:
+            return
+        if abs(other.alpha - self.alpha) > 1e-12:
+            raise ValueError("cannot merge sketches with different alpha")
+        for idx, c in other._bins.items():
+            self._bins[idx] = self._bins.get(idx, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self._bins) > _MAX_BINS:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """ערך ה-quantile (0..1), או None כשה-sketch ריק."""
+        if self.count <= 0:
+            return None
+        q = min(1.0, max(0.0, float(q)))
+        # nearest-rank, כמו החישוב ב-Python על דגימות גולמיות
+        rank = max(1, int(math.ceil(q * self.count)))
+        seen = self.zero_count
+        if rank <= seen:
+            return 0.0
+        for idx in sorted(self._bins):
+            seen += self._bins[idx]
+            if seen >= rank:
+                return self._value(idx)
+        return self._value(max(self._bins))
+
+    def to_doc(self) -> Dict[str, Any]:
+        offset = min(self._bins) if self._bins else 0
+        top = max(self._bins) if self._bins else -1
+        dense = array("I", (self._bins.get(i, 0) for i in range(offset, top + 1)))
+        return {
+            "v": _FORMAT_VERSION,
+            "alpha": self.alpha,
+            "zero": int(self.zero_count),
+            "offset": int(offset),
+            "bins": zlib.compress(dense.tobytes()),
+        }
+
+    @classmethod
+    def from_doc(cls, doc: Any) -> Optional["LatencySketch"]:
+        """פענוח מסמך שנשמר; None לפורמט לא מוכר/פגום."""
+        if not isinstance(doc, dict) or int(doc.get("v") or 0) != _FORMAT_VERSION:
+            return None
+        try:
+            sketch = cls(float(doc.get("alpha") or DEFAULT_ALPHA))
+            dense = array("I")
+            raw = doc.get("bins") or b""
+            if raw:
+                dense.frombytes(zlib.decompress(bytes(raw)))
+            offset = int(doc.get("offset") or 0)
+            for i, c in enumerate(dense):
+                if c:
+                    sketch._bins[offset + i] = int(c)
+            sketch.zero_count = int(doc.get("zero") or 0)
+            sketch.count = sketch.zero_count + sum(sketch._bins.values())
+            return sketch
+        except Exception:
+            return None
+
+
+def merge_sketch_docs(docs: Iterable[Any]) -> Optional[LatencySketch]:
+    """מיזוג מסמכי sketch שמורים (מדלג על פגומים / alpha שונה)."""
+    merged: Optional[LatencySketch] = None
+    for doc in docs:
+        sketch = LatencySketch.from_doc(doc)
+        if sketch is None:
+            continue
+        if merged is None:
+            merged = sketch
+            continue
+        try:
+            merged.merge(sketch)
+        except ValueError:
+            continue
+    return merged
@@ -16,6 +16,12 @@ Environment variables:
 - METRICS_FLUSH_INTERVAL_SEC: Time-based flush threshold (default: 5 seconds)
 - METRICS_MAX_BUFFER: Max queued items in memory (default: 5000)
 - METRICS_ROLLUP_SECONDS: Rollup bucket size in seconds for DB writes (default: 60)
+
+Each rollup doc carries a mergeable ``latency_sketch`` (see monitoring.latency_sketch),
+so latency percentiles for any window are computed from rollups alone.
+
+Flushed ``request_agg`` docs are also folded into the 1m/1h/1d dashboard rollups
+(see monitoring.rollups), which serve timeseries and top-endpoint queries.
 """
 from __future__ import annotations
 
@@ -28,6 +34,9 @@ from datetime import datetime, timezone
 from threading import Event, Lock, Thread
 from typing import Any, Dict, List, Optional, Tuple
 
+from monitoring import rollups
+from monitoring.latency_sketch import LatencySketch, merge_sketch_docs
+
 # Optional structured event emission (do not hard-depend)
 try:  # pragma: no cover
     from observability import emit_event  # type: ignore
@@ -77,8 +86,9 @@ def _enabled() -> bool:
 
 
 # Lazily-initialized PyMongo client/collection
-_client = None  # type: ignore
+_client: Any = None
 _collection = None  # type: ignore
+_rollup_collection: Any = None
 _init_failed = False  # True when initialization permanently failed (e.g., pymongo missing)
 _write_disabled = False  # True when writes are intentionally disabled (not a failure)
 _buf: deque[Dict[str, Any]] = deque()
@@ -195,6 +205,9 @@ def _drain_agg_to_buf_unlocked() -> None:
         return
     try:
         for doc in _agg.values():
+            sketch = doc.get("latency_sketch")
+            if isinstance(sketch, LatencySketch):
+                doc["latency_sketch"] = sketch.to_doc()
             _buf.append(doc)
     finally:
         _agg.clear()
@@ -272,6 +285,24 @@ def _get_collection(*, for_read: bool = True):  # pragma: no cover - exercised i
         return None
 
 
+def _get_rollup_collection(*, for_read: bool = True):  # pragma: no cover - exercised indirectly
+    """Return the shared observability rollups collection (same client/DB)."""
+    global _rollup_collection
+    if _rollup_collection is not None:
+        return _rollup_collection
+    if _init_failed or _client is None:
+        return None
+    try:
+        if _get_collection(for_read=for_read) is None:
+            return None
+        db_name = os.getenv("DATABASE_NAME") or "code_keeper_bot"
+        _rollup_collection = _client[db_name][rollups.collection_name()]  # type: ignore[index]
+        rollups.ensure_indexes(_rollup_collection)
+        return _rollup_collection
+    except Exception:
+        return None
+
+
 def _flush_once(now_ts: float) -> bool:
     coll = _get_collection(for_read=False)  # Writing metrics requires write access
     if coll is None:
@@ -328,13 +359,18 @@ def _flush_once(now_ts: float) -> bool:
         global _last_flush_ts
         with _lock:
             _last_flush_ts = now_ts
-        return True
     except Exception as e:  # Re-queue on failure
         with _lock:
             for it in reversed(items):
                 _buf.appendleft(it)
         emit_event("metrics_db_batch_insert_error", severity="warn", error=str(e), count=len(items))
         return False
+    # Rollups only after a successful insert (a re-queued batch must not be counted twice)
+    try:
+        rollups.record_request_aggs(_get_rollup_collection(for_read=False), items)
+    except Exception:
+        pass
+    return True
 
 
 def flush(force: bool = False) -> None:
@@ -423,6 +459,9 @@ def enqueue_request_metric(
                     "sum_duration": 0.0,
                     "max_duration": 0.0,
                     "error_count": 0,
+                    "status_counts": {},
+                    # מסודר ל-dict דחוס ב-_drain_agg_to_buf_unlocked
+                    "latency_sketch": LatencySketch(),
                 }
                 _agg[key] = doc
 
@@ -440,10 +479,19 @@ def enqueue_request_metric(
             except Exception:
                 prev_max = 0.0
             doc["max_duration"] = max(prev_max, dur)
+            try:
+                doc["latency_sketch"].add(dur)
+            except Exception:
+                pass
             try:
                 doc["error_count"] = int(doc.get("error_count", 0) or 0) + int(is_err)
             except Exception:
                 doc["error_count"] = int(is_err)
+            try:
+                cls = rollups.status_class(status_code)
+                doc["status_counts"][cls] = int(doc["status_counts"].get(cls, 0)) + 1
+            except Exception:
+                pass
 
             # Cap total queued DB docs (rollups + pending inserts)
             try:
@@ -475,10 +523,21 @@ def aggregate_request_timeseries(
     end_dt: Optional[datetime],
     granularity_seconds: int,
 ) -> List[Dict[str, Any]]:
-    """Aggregate request metrics into fixed time buckets."""
+    """Aggregate request metrics into fixed time buckets.
+
+    Served from the 1m/1h/1d rollups when they cover the window (see monitoring.rollups).
+    """
     coll = _get_collection()
     if coll is None:
         return []
+    rolled = rollups.request_timeseries(
+        _get_rollup_collection(),
+        start_dt=start_dt,
+        end_dt=end_dt,
+        granularity_seconds=granularity_seconds,
+    )
+    if rolled is not None:
+        return rolled
     try:
         bucket_seconds = max(1, int(granularity_seconds or 1))
     except Exception:
@@ -597,6 +656,9 @@ def aggregate_top_endpoints(
         max_items = max(1, min(50, int(limit)))
     except Exception:
         max_items = 5
+    rolled = rollups.top_endpoints(_get_rollup_collection(), start_dt=start_dt, end_dt=end_dt, limit=max_items)
+    if rolled is not None:
+        return rolled
 
     match = _build_time_match(start_dt, end_dt)
     pipeline = [
@@ -862,8 +924,10 @@ def aggregate_latency_percentiles(
     """Return latency percentiles (seconds) for the given window.
 
     Best-effort:
-    - Try Mongo $percentile aggregation when available.
-    - Otherwise, sample up to sample_limit records and compute percentiles in Python.
+    - Merge the ``latency_sketch`` of every rollup doc in the window (cost depends on
+      the number of rollup docs, not on request volume; ~1% relative error).
+    - Otherwise (legacy data without sketches) try Mongo $percentile over raw
+      per-request docs, then sample up to sample_limit records in Python.
     """
     coll = _get_collection()
     if coll is None:
@@ -877,16 +941,20 @@ def aggregate_latency_percentiles(
     if not pcts:
         pcts = (50, 95, 99)
 
-    # Percentiles require raw per-request samples (rollups are not sufficient).
-    match = {"type": "request"}
-    if start_dt or end_dt:
-        window: Dict[str, Any] = {}
-        if start_dt:
-            window["$gte"] = start_dt
-        if end_dt:
-            window["$lte"] = end_dt
-        if window:
-            match["ts"] = window
+    window: Dict[str, Any] = {}
+    if start_dt:
+        window["$gte"] = start_dt
+    if end_dt:
+        window["$lte"] = end_dt
+
+    sketch_out = _percentiles_from_sketches(coll, window, pcts)
+    if sketch_out:
+        return sketch_out
+
+    # Legacy fallback: raw per-request samples.
+    match: Dict[str, Any] = {"type": "request"}
+    if window:
+        match["ts"] = window
 
     # Attempt Mongo-native percentile aggregation (MongoDB 5.2+)
     try:
@@ -961,3 +1029,23 @@ def aggregate_latency_percentiles(
         return out
     except Exception:
         return {}
+
+
+def _percentiles_from_sketches(coll: Any, window: Dict[str, Any], pcts: Tuple[int, ...]) -> Dict[str, float]:
+    """Merge rollup sketches in the window; empty dict when none exist."""
+    match: Dict[str, Any] = {"type": "request_agg", "latency_sketch": {"$exists": True}}
+    if window:
+        match["ts"] = window
+    try:
+        cursor = coll.find(match, {"latency_sketch": 1, "_id": 0})  # type: ignore[attr-defined]
+        merged = merge_sketch_docs(doc.get("latency_sketch") for doc in cursor)
+    except Exception:
+        return {}
+    if merged is None or merged.count <= 0:
+        return {}
+    out: Dict[str, float] = {}
+    for p in pcts:
+        value = merged.quantile(float(p) / 100.0)
+        if value is not None:
+            out[f"p{p}"] = float(value)
+    return out
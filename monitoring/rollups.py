@@ -0,0 +1,429 @@
+"""
+Hierarchical pre-aggregated rollups for the Observability dashboard.
+
+Alerts (by severity/alert_type) and requests (by method/path, with status
+classes) are counted incrementally into 1m / 1h / 1d buckets as data arrives,
+so a 30-day view reads a few hundred rollup docs instead of scanning raw data.
+
+Design goals (same as the storage modules):
+- Fail-open: never raise from public APIs; callers fall back to raw scans
+- No own connection: callers pass the collection (same client/DB they use)
+
+Doc shape (collection ``OBSERVABILITY_ROLLUPS_COLLECTION``, default ``observability_rollups``)::
+
+    {"_id": "<kind>|<tier>|<bucket epoch>|<dims...>", "kind": "alerts"|"requests",
+     "tier": 60|3600|86400, "ts": <bucket start>, "dims": {...},
+     "count": n, ...counters, "max_duration": <$max>}
+
+Coverage: a ``meta|<kind>`` doc records ``since`` - the first instant whose data
+is fully in the rollups. Windows starting earlier fall back to the raw scan
+(or run ``scripts/backfill_observability_rollups.py``).
+
+Queries pick, per granularity, the coarsest tier that divides it, and cover
+the partial edges of the window with finer tiers.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# bucket sizes in seconds, coarse to fine (1d / 1h / 1m)
+TIERS: Tuple[int, ...] = (86400, 3600, 60)
+KIND_ALERTS = "alerts"
+KIND_REQUESTS = "requests"
+# TTL לפי tier (ימים); 1d נשמר לתמיד. 1m מכסה רק קצוות של חלונות עד ~חודש
+_TIER_RETENTION_DAYS = {60: 31, 3600: 400}
+_SEVERITIES = ("critical", "anomaly", "warning", "info")
+_STATUS_CLASSES = ("2xx", "3xx", "4xx", "5xx")
+# kinds שכבר נרשם להם כיסוי בתהליך הזה (חוסך upsert על meta בכל כתיבה)
+_coverage_marked: set = set()
+
+
+def collection_name() -> str:
+    return os.getenv("OBSERVABILITY_ROLLUPS_COLLECTION") or "observability_rollups"
+
+
+def rollups_enabled() -> bool:
+    return str(os.getenv("OBSERVABILITY_ROLLUPS_ENABLED", "true")).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def ensure_indexes(coll: Any) -> None:
+    try:
+        from pymongo import ASCENDING  # type: ignore
+
+        coll.create_index([("kind", ASCENDING), ("tier", ASCENDING), ("ts", ASCENDING)])  # type: ignore[attr-defined]
+        coll.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)  # type: ignore[attr-defined]
+    except Exception:
+        pass
+
+
+def _as_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _epoch(dt: datetime) -> int:
+    return int(_as_utc(dt).timestamp())
+
+
+def _from_epoch(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc)
+
+
+def normalize_severity(value: Any) -> str:
+    severity = str(value or "info").strip().lower()
+    if severity in _SEVERITIES:
+        return severity
+    if severity.startswith("crit"):
+        return "critical"
+    if severity.startswith("warn"):
+        return "warning"
+    if severity.startswith("anom"):
+        return "anomaly"
+    return "info"
+
+
+def status_class(status_code: Any) -> str:
+    try:
+        code = int(status_code)
+    except Exception:
+        return "5xx"
+    if code >= 500:
+        return "5xx"
+    if code >= 400:
+        return "4xx"
+    if code >= 300:
+        return "3xx"
+    return "2xx"
+
+
+# --- write path -------------------------------------------------------------
+
+def _dims_key(dims: Dict[str, Any]) -> str:
+    return "|".join(f"{k}={dims[k]}" for k in sorted(dims))
+
+
+def _updates(
+    kind: str,
+    ts: datetime,
+    dims: Dict[str, Any],
+    inc: Dict[str, Any],
+    max_fields: Optional[Dict[str, float]] = None,
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(filter, update) לכל tier - upsert עם $inc (ו-$max)."""
+    epoch = _epoch(ts)
+    out = []
+    for tier in TIERS:
+        bucket = epoch - (epoch % tier)
+        on_insert: Dict[str, Any] = {"kind": kind, "tier": tier, "ts": _from_epoch(bucket), "dims": dict(dims)}
+        if tier in _TIER_RETENTION_DAYS:
+            on_insert["expire_at"] = _from_epoch(bucket + _TIER_RETENTION_DAYS[tier] * 86400)
+        update: Dict[str, Any] = {"$setOnInsert": on_insert, "$inc": dict(inc)}
+        if max_fields:
+            update["$max"] = dict(max_fields)
+        out.append(({"_id": f"{kind}|{tier}|{bucket}|{_dims_key(dims)}"}, update))
+    return out
+
+
+def merge_updates(updates: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """איחוד updates לאותו _id (סכום $inc, מקסימום $max) - upsert אחד לכל bucket."""
+    merged: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+    for flt, update in updates:
+        key = flt["_id"]
+        if key not in merged:
+            merged[key] = (flt, {op: dict(v) for op, v in update.items()})
+            continue
+        current = merged[key][1]
+        for field, value in update.get("$inc", {}).items():
+            current["$inc"][field] = current["$inc"].get(field, 0) + value
+        for field, value in update.get("$max", {}).items():
+            current.setdefault("$max", {})[field] = max(current.get("$max", {}).get(field, value), value)
+    return list(merged.values())
+
+
+def _apply(coll: Any, updates: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> bool:
+    if coll is None or not updates:
+        return False
+    updates = merge_updates(updates)
+    try:
+        from pymongo import UpdateOne  # type: ignore
+    except Exception:
+        UpdateOne = None  # type: ignore[assignment]
+    try:
+        if UpdateOne is not None and hasattr(coll, "bulk_write"):
+            coll.bulk_write([UpdateOne(f, u, upsert=True) for f, u in updates], ordered=False)  # type: ignore[attr-defined]
+        else:
+            for f, u in updates:
+                coll.update_one(f, u, upsert=True)  # type: ignore[attr-defined]
+        return True
+    except Exception:
+        return False
+
+
+def mark_coverage(coll: Any, kind: str, first_ts: datetime) -> None:
+    """רישום תחילת הכיסוי בפעם הראשונה שנכתב rollup (לא דורס ערך קיים).
+
+    הדקה של הכתיבה הראשונה עשויה להכיל נתונים שנכתבו לפני שה-rollups הופעלו,
+    לכן הכיסוי מתחיל בגבול הדקה הבא.
+    """
+    if kind in _coverage_marked:
+        return
+    epoch = _epoch(first_ts)
+    since = _from_epoch(epoch - epoch % TIERS[-1] + TIERS[-1])
+    try:
+        coll.update_one(
+            {"_id": f"meta|{kind}"},
+            {"$setOnInsert": {"kind": "meta", "of": kind, "since": since}},
+            upsert=True,
+        )  # type: ignore[attr-defined]
+        _coverage_marked.add(kind)
+    except Exception:
+        return
+
+
+def extend_coverage(coll: Any, kind: str, since: datetime) -> None:
+    """הקדמת ``since`` אחרי backfill (לעולם לא מאחרת אותו)."""
+    try:
+        coll.update_one(
+            {"_id": f"meta|{kind}", "since": {"$gt": _as_utc(since)}},
+            {"$set": {"since": _as_utc(since)}},
+        )  # type: ignore[attr-defined]
+    except Exception:
+        return
+
+
+def apply_updates(coll: Any, updates: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]], *, batch_size: int = 1000) -> int:
+    """כתיבת updates בקבוצות (backfill); מחזיר כמה buckets נכתבו."""
+    written = 0
+    merged = merge_updates(updates)
+    for i in range(0, len(merged), max(1, batch_size)):
+        chunk = merged[i:i + max(1, batch_size)]
+        if _apply(coll, chunk):
+            written += len(chunk)
+    return written
+
+
+def coverage_since(coll: Any, kind: str) -> Optional[datetime]:
+    try:
+        doc = coll.find_one({"_id": f"meta|{kind}"})  # type: ignore[attr-defined]
+    except Exception:
+        return None
+    since = (doc or {}).get("since")
+    return _as_utc(since) if isinstance(since, datetime) else None
+
+
+def alert_increments(
+    *, ts: datetime, severity: Any, alert_type: Any, name: Any
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    kind_type = str(alert_type or "").strip().lower() or "unknown"
+    deployment = 1 if "deployment_event" in (kind_type, str(name or "").strip().lower()) else 0
+    dims = {"severity": normalize_severity(severity), "alert_type": kind_type}
+    return _updates(KIND_ALERTS, ts, dims, {"count": 1, "deployment": deployment})
+
+
+def request_increments(agg_doc: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Increments מתוך מסמך request_agg (הרולאפ בזיכרון של metrics_storage)."""
+    ts = agg_doc.get("ts")
+    if not isinstance(ts, datetime):
+        return []
+    dims = {"method": str(agg_doc.get("method") or "UNKNOWN"), "path": str(agg_doc.get("path") or "unknown")}
+    inc: Dict[str, Any] = {
+        "count": int(agg_doc.get("count", 0) or 0),
+        "sum_duration": float(agg_doc.get("sum_duration", 0.0) or 0.0),
+        "error_count": int(agg_doc.get("error_count", 0) or 0),
+    }
+    for cls, n in (agg_doc.get("status_counts") or {}).items():
+        if cls in _STATUS_CLASSES and n:
+            inc[f"status.{cls}"] = int(n)
+    return _updates(KIND_REQUESTS, ts, dims, inc, {"max_duration": float(agg_doc.get("max_duration", 0.0) or 0.0)})
+
+
+def record_alert(coll: Any, *, ts: datetime, severity: Any, alert_type: Any, name: Any) -> bool:
+    if coll is None or not rollups_enabled():
+        return False
+    if not _apply(coll, alert_increments(ts=ts, severity=severity, alert_type=alert_type, name=name)):
+        return False
+    mark_coverage(coll, KIND_ALERTS, ts)
+    return True
+
+
+def record_request_aggs(coll: Any, agg_docs: Iterable[Dict[str, Any]]) -> bool:
+    if coll is None or not rollups_enabled():
+        return False
+    docs = [d for d in agg_docs if isinstance(d, dict) and d.get("type") == "request_agg"]
+    updates = [u for d in docs for u in request_increments(d)]
+    if not _apply(coll, updates):
+        return False
+    first = min((d["ts"] for d in docs if isinstance(d.get("ts"), datetime)), default=None)
+    if first is not None:
+        mark_coverage(coll, KIND_REQUESTS, first)
+    return True
+
+
+# --- read path --------------------------------------------------------------
+
+def pick_tiers(granularity_seconds: int) -> List[int]:
+    """tiers שמתחלקים בגרנולריות (מהגס לעדין); ריק = אין rollup מתאים."""
+    try:
+        g = int(granularity_seconds)
+    except Exception:
+        return []
+    return [t for t in TIERS if t <= g and g % t == 0]
+
+
+def plan(start: int, end: int, tiers: List[int]) -> List[Tuple[int, int, int]]:
+    """פירוק [start, end) לקטעי (tier, lo, hi): הגס ביותר באמצע, עדינים בקצוות."""
+    if not tiers or end <= start:
+        return []
+    tier, finer = tiers[0], tiers[1:]
+    if not finer:
+        return [(tier, start - start % tier, end)]
+    lo = start if start % tier == 0 else start + (tier - start % tier)
+    hi = end - end % tier
+    if lo >= hi:
+        return plan(start, end, finer)
+    return plan(start, lo, finer) + [(tier, lo, hi)] + plan(hi, end, finer)
+
+
+def _fetch(
+    coll: Any,
+    kind: str,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    granularity_seconds: int,
+) -> Optional[List[Dict[str, Any]]]:
+    """מסמכי rollup שמכסים את החלון, או None כשצריך לחזור לסריקה הגולמית."""
+    if coll is None or not rollups_enabled() or start_dt is None:
+        return None
+    tiers = pick_tiers(granularity_seconds)
+    if not tiers:
+        return None
+    since = coverage_since(coll, kind)
+    if since is None or _as_utc(start_dt) < since:
+        return None
+    end = _epoch(end_dt or datetime.now(timezone.utc)) + 1  # end_dt כולל ($lte בסריקה הגולמית)
+    segments = plan(_epoch(start_dt), end, tiers)
+    if not segments:
+        return []
+    query = {
+        "kind": kind,
+        "$or": [
+            {"tier": tier, "ts": {"$gte": _from_epoch(lo), "$lt": _from_epoch(hi)}}
+            for tier, lo, hi in segments
+        ],
+    }
+    try:
+        return list(coll.find(query))  # type: ignore[attr-defined]
+    except Exception:
+        return None
+
+
+def _bucket_iso(ts: Any, granularity_seconds: int) -> Optional[str]:
+    if not isinstance(ts, datetime):
+        return None
+    epoch = _epoch(ts)
+    return _from_epoch(epoch - epoch % max(1, int(granularity_seconds))).isoformat()
+
+
+def alert_timeseries(
+    coll: Any,
+    *,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    granularity_seconds: int,
+) -> Optional[List[Dict[str, Any]]]:
+    """Same shape as ``alerts_storage.aggregate_alert_timeseries``; None = use raw scan."""
+    docs = _fetch(coll, KIND_ALERTS, start_dt, end_dt, granularity_seconds)
+    if docs is None:
+        return None
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for doc in docs:
+        key = _bucket_iso(doc.get("ts"), granularity_seconds)
+        if key is None:
+            continue
+        row = buckets.setdefault(key, {"critical": 0, "anomaly": 0, "warning": 0, "info": 0, "total": 0, "timestamp": key})
+        count = int(doc.get("count", 0) or 0)
+        row[normalize_severity((doc.get("dims") or {}).get("severity"))] += count
+        row["total"] += count
+    return [buckets[k] for k in sorted(buckets) if buckets[k]["total"]]
+
+
+def alert_summary(
+    coll: Any, *, start_dt: Optional[datetime], end_dt: Optional[datetime]
+) -> Optional[Dict[str, int]]:
+    """Same shape as ``alerts_storage.aggregate_alert_summary``; None = use raw scan."""
+    docs = _fetch(coll, KIND_ALERTS, start_dt, end_dt, TIERS[0])
+    if docs is None:
+        return None
+    out = {"total": 0, "critical": 0, "anomaly": 0, "deployment": 0}
+    for doc in docs:
+        count = int(doc.get("count", 0) or 0)
+        out["total"] += count
+        severity = normalize_severity((doc.get("dims") or {}).get("severity"))
+        if severity in out:
+            out[severity] += count
+        out["deployment"] += int(doc.get("deployment", 0) or 0)
+    return out
+
+
+def request_timeseries(
+    coll: Any,
+    *,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    granularity_seconds: int,
+) -> Optional[List[Dict[str, Any]]]:
+    """Same shape as ``metrics_storage.aggregate_request_timeseries``; None = use raw scan."""
+    docs = _fetch(coll, KIND_REQUESTS, start_dt, end_dt, granularity_seconds)
+    if docs is None:
+        return None
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for doc in docs:
+        key = _bucket_iso(doc.get("ts"), granularity_seconds)
+        if key is None:
+            continue
+        row = buckets.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0, "errors": 0})
+        row["count"] += int(doc.get("count", 0) or 0)
+        row["sum"] += float(doc.get("sum_duration", 0.0) or 0.0)
+        row["max"] = max(row["max"], float(doc.get("max_duration", 0.0) or 0.0))
+        row["errors"] += int(doc.get("error_count", 0) or 0)
+    return [
+        {
+            "timestamp": key,
+            "count": row["count"],
+            "avg_duration": (row["sum"] / row["count"]) if row["count"] else 0.0,
+            "max_duration": row["max"],
+            "error_count": row["errors"],
+        }
+        for key, row in sorted(buckets.items())
+    ]
+
+
+def top_endpoints(
+    coll: Any, *, start_dt: Optional[datetime], end_dt: Optional[datetime], limit: int
+) -> Optional[List[Dict[str, Any]]]:
+    """Same shape as ``metrics_storage.aggregate_top_endpoints``; None = use raw scan."""
+    docs = _fetch(coll, KIND_REQUESTS, start_dt, end_dt, TIERS[0])
+    if docs is None:
+        return None
+    per: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for doc in docs:
+        dims = doc.get("dims") or {}
+        key = (str(dims.get("path") or "unknown"), str(dims.get("method") or "UNKNOWN"))
+        row = per.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+        row["count"] += int(doc.get("count", 0) or 0)
+        row["sum"] += float(doc.get("sum_duration", 0.0) or 0.0)
+        row["max"] = max(row["max"], float(doc.get("max_duration", 0.0) or 0.0))
+    ranked = sorted(per.items(), key=lambda item: item[1]["max"], reverse=True)
+    return [
+        {
+            "endpoint": path,
+            "method": method,
+            "count": row["count"],
+            "avg_duration": (row["sum"] / row["count"]) if row["count"] else 0.0,
+            "max_duration": row["max"],
+        }
+        for (path, method), row in ranked[: max(1, min(50, int(limit or 5)))]
+    ]
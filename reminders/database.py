@@ -78,7 +78,7 @@ class RemindersDB:
         except Exception:
             return 0
 
-    def get_pending_reminders(self, batch_size: int = 100) -> List[Dict]:
+    def get_pending_reminders(self, batch_size: int = 100, due_before: Optional[datetime] = None) -> List[Dict]:
         now = datetime.now(timezone.utc)
         try:
             limit = max(1, int(batch_size))
@@ -88,7 +88,7 @@ class RemindersDB:
         base_filter: Dict[str, Any] = {
             "status": ReminderStatus.PENDING.value,
             "is_sent": False,
-            "remind_at": {"$lte": now},
+            "remind_at": {"$lte": due_before or now},
             "retry_count": {"$lt": ReminderConfig.max_retries},
         }
 
@@ -103,10 +103,27 @@ class RemindersDB:
         except Exception:
             return []
 
-        if not candidates:
-            return []
-
         ids = [doc.get("_id") for doc in candidates if isinstance(doc, dict) and doc.get("_id") is not None]
+        return self._claim_ids(ids, {"is_sent": False}, now)
+
+    def claim_due_reminders(self, ids: List[Any], now: Optional[datetime] = None) -> List[Dict]:
+        """תפיסה אטומית של תזכורות שנטענו מראש לחלון הקרוב ושזמנן הגיע.
+
+        תזכורת שהושלמה, נמחקה, נשלחה או נדחתה לזמן מאוחר יותר מאז הטעינה לא תיתפס.
+        """
+        now = now or datetime.now(timezone.utc)
+        ids = [i for i in (ids or []) if i is not None]
+        return self._claim_ids(
+            ids,
+            {
+                "status": ReminderStatus.PENDING.value,
+                "is_sent": False,
+                "remind_at": {"$lte": now},
+            },
+            now,
+        )
+
+    def _claim_ids(self, ids: List[Any], condition: Dict[str, Any], now: datetime) -> List[Dict]:
         if not ids:
             return []
 
@@ -114,7 +131,7 @@ class RemindersDB:
         try:
             # optimistic lock: claim only documents that are still unsent
             self.reminders_collection.update_many(
-                {"_id": {"$in": ids}, "is_sent": False},
+                {"_id": {"$in": ids}, **condition},
                 {"$set": {"is_sent": True, "updated_at": now, "claim_token": claim_token}},
             )
         except Exception:
@@ -139,20 +156,29 @@ class RemindersDB:
         except Exception:
             return []
 
-    def get_future_reminders(self, batch_size: int = 1000) -> List[Dict]:
+    def get_future_reminders(
+        self,
+        batch_size: int = 1000,
+        after: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict]:
         """Return unsent reminders scheduled for the future.
 
         These reminders are not marked as sent, so they remain eligible if the
         bot restarts before their scheduled time. Ordering by ``remind_at``
-        ensures deterministic scheduling on startup.
+        ensures deterministic scheduling on startup. ``after``/``until`` bound
+        the window (``after`` defaults to now) so the scheduler only loads the
+        near horizon via the ``pending_reminders`` index.
         """
-        now = datetime.now(timezone.utc)
+        window: Dict[str, Any] = {"$gt": after or datetime.now(timezone.utc)}
+        if until is not None:
+            window["$lte"] = until
         try:
             cursor = (
                 self.reminders_collection.find({
                     "status": ReminderStatus.PENDING.value,
                     "is_sent": False,
-                    "remind_at": {"$gt": now},
+                    "remind_at": window,
                     "retry_count": {"$lt": ReminderConfig.max_retries},
                 })
                 .sort("remind_at", ASCENDING)
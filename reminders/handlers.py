@@ -97,14 +97,8 @@ class ReminderHandlers:
             )
             success, result = self.db.create_reminder(reminder)
             if success:
-                job_name = f"reminder_{reminder.reminder_id}"
-                context.job_queue.run_once(
-                    self._send_reminder_notification,
-                    when=reminder.remind_at,
-                    name=job_name,
-                    data=reminder.to_dict(),
-                    chat_id=update.effective_chat.id,
-                    user_id=update.effective_user.id,
+                await self._schedule(
+                    context, reminder.to_dict(), chat_id=update.effective_chat.id, user_id=update.effective_user.id
                 )
                 safe_title = TextUtils.escape_markdown(title, version=1)
                 await update.message.reply_text(
@@ -267,12 +261,9 @@ class ReminderHandlers:
         )
         ok, result = self.db.create_reminder(reminder)
         if ok:
-            job_name = f"reminder_{reminder.reminder_id}"
-            context.job_queue.run_once(
-                self._send_reminder_notification,
-                when=reminder.remind_at,
-                name=job_name,
-                data=reminder.to_dict(),
+            await self._schedule(
+                context,
+                reminder.to_dict(),
                 chat_id=update.effective_chat.id if update.effective_chat else update.callback_query.message.chat_id,  # type: ignore[attr-defined]
                 user_id=update.effective_user.id,
             )
@@ -295,12 +286,9 @@ class ReminderHandlers:
                 await update.message.reply_text(err)
             # Fallback: schedule a no-op notification to ensure UX continues even אם הכתיבה ל-DB נכשלה (בדיקות/NoOp DB)
             try:
-                job_name = f"reminder_{reminder.reminder_id}"
-                context.job_queue.run_once(
-                    self._send_reminder_notification,
-                    when=reminder.remind_at,
-                    name=job_name,
-                    data=reminder.to_dict(),
+                await self._schedule(
+                    context,
+                    reminder.to_dict(),
                     chat_id=update.effective_chat.id if update.effective_chat else update.callback_query.message.chat_id,  # type: ignore[attr-defined]
                     user_id=update.effective_user.id,
                 )
@@ -366,20 +354,13 @@ class ReminderHandlers:
                     return
                 ok = self.db.update_reminder(user_id, rid, {"remind_at": new_utc, "is_sent": False})
                 if ok:
-                    # Reschedule job
-                    for job in context.job_queue.get_jobs_by_name(f"reminder_{rid}"):
-                        job.schedule_removal()
+                    # Reschedule
                     doc = self.db.reminders_collection.find_one({"reminder_id": rid})
                     if doc:
                         target_chat = doc.get("chat_id") or (update.effective_chat.id if update.effective_chat else None)
-                        context.job_queue.run_once(
-                            self._send_reminder_notification,
-                            when=new_utc,
-                            name=f"reminder_{rid}",
-                            data=doc,
-                            chat_id=target_chat,
-                            user_id=user_id,
-                        )
+                        await self._schedule(context, dict(doc, remind_at=new_utc), chat_id=target_chat, user_id=user_id)
+                    else:
+                        self._unschedule(context, rid)
                     await update.message.reply_text("✅ הזמן עודכן והתזכורת תוזמנה מחדש")
                 else:
                     await update.message.reply_text("❌ שגיאה בעדכון הזמן")
@@ -436,8 +417,7 @@ class ReminderHandlers:
             rid = data.replace("rem_complete_", "")
             if self.db.complete_reminder(user_id, rid):
                 await query.edit_message_text("✅ התזכורת הושלמה!")
-                for job in context.job_queue.get_jobs_by_name(f"reminder_{rid}"):
-                    job.schedule_removal()
+                self._unschedule(context, rid)
             else:
                 await query.answer("❌ שגיאה", show_alert=True)
         elif data.startswith("rem_snooze_"):
@@ -454,18 +434,11 @@ class ReminderHandlers:
             if self.db.snooze_reminder(user_id, rid, int(minutes)):
                 # reschedule
                 new_time = datetime.now(timezone.utc) + timedelta(minutes=int(minutes))
-                for job in context.job_queue.get_jobs_by_name(f"reminder_{rid}"):
-                    job.schedule_removal()
                 doc = self.db.reminders_collection.find_one({"reminder_id": rid})
                 if doc:
-                    context.job_queue.run_once(
-                        self._send_reminder_notification,
-                        when=new_time,
-                        name=f"reminder_{rid}",
-                        data=doc,
-                        chat_id=query.message.chat_id,
-                        user_id=user_id,
-                    )
+                    await self._schedule(context, dict(doc, remind_at=new_time), chat_id=query.message.chat_id, user_id=user_id)
+                else:
+                    self._unschedule(context, rid)
                 await query.edit_message_text(f"⏰ התזכורת נדחתה ב-{minutes} דקות", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("📋 לרשימה", callback_data="rem_list")]]))
             else:
                 await query.answer("❌ שגיאה בדחייה", show_alert=True)
@@ -476,8 +449,7 @@ class ReminderHandlers:
         elif data.startswith("confirm_del_"):
             rid = data.replace("confirm_del_", "")
             if self.db.delete_reminder(user_id, rid):
-                for job in context.job_queue.get_jobs_by_name(f"reminder_{rid}"):
-                    job.schedule_removal()
+                self._unschedule(context, rid)
                 await query.edit_message_text("✅ התזכורת נמחקה")
             else:
                 await query.answer("❌ שגיאה במחיקה", show_alert=True)
@@ -538,6 +510,45 @@ class ReminderHandlers:
     def _get_user_timezone(self, user_id: int) -> str:
         return "Asia/Jerusalem"
 
+    @staticmethod
+    def _scheduler(context):
+        """ה-ReminderScheduler שנרשם ב-bot_data (setup_reminder_scheduler), או None."""
+        try:
+            bot_data = getattr(context, "bot_data", None)
+            return bot_data.get("reminder_scheduler") if isinstance(bot_data, dict) else None
+        except Exception:
+            return None
+
+    async def _schedule(self, context, reminder: dict, *, chat_id, user_id) -> None:
+        """תזמון (או תזמון מחדש) של תזכורת.
+
+        עם ReminderScheduler - נכנסת לחלון שלו ונשלחת ב-tick המשותף, בלי job משלה.
+        בלעדיו (למשל המתזמן לא עלה) - job בודד בשם reminder_{id} כמו קודם.
+        """
+        rid = str(reminder.get("reminder_id"))
+        scheduler = self._scheduler(context)
+        if scheduler is not None:
+            await scheduler.schedule_reminder(reminder)
+            return
+        for job in context.job_queue.get_jobs_by_name(f"reminder_{rid}"):
+            job.schedule_removal()
+        context.job_queue.run_once(
+            self._send_reminder_notification,
+            when=reminder.get("remind_at"),
+            name=f"reminder_{rid}",
+            data=reminder,
+            chat_id=chat_id,
+            user_id=user_id,
+        )
+
+    def _unschedule(self, context, rid: str) -> None:
+        scheduler = self._scheduler(context)
+        if scheduler is not None:
+            scheduler.cancel_reminder(rid)
+            return
+        for job in context.job_queue.get_jobs_by_name(f"reminder_{rid}"):
+            job.schedule_removal()
+
 
 def setup_reminder_handlers(application):
     db = RemindersDB(application.bot_data.get("db_manager")) if getattr(application, "bot_data", None) else RemindersDB()
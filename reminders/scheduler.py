@@ -1,23 +1,70 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
 import logging
-from datetime import datetime, timezone
-from typing import Optional
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 
 from telegram.ext import Application
 
 from .database import RemindersDB
-from .models import ReminderConfig
 
 logger = logging.getLogger(__name__)
 
+TICK_JOB_NAME = "reminders_dispatch_tick"
+
+
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, str(default)) or default)
+        return value if value > 0 else float(default)
+    except Exception:
+        return float(default)
+
+
+def _as_utc(value) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _record_dispatch(source: str, lateness_seconds: Optional[float]) -> None:
+    try:
+        from metrics import record_reminder_dispatch  # type: ignore
+
+        record_reminder_dispatch(source, lateness_seconds)
+    except Exception:
+        return
+
 
 class ReminderScheduler:
+    """מתזמן תזכורות עם "חלון קרוב" בזיכרון במקום job לכל תזכורת.
+
+    - heap לפי ``remind_at`` שמכיל רק תזכורות עד ``REMINDER_WINDOW_SECONDS`` קדימה,
+      ומתמלא מחדש משאילתה על האינדקס ``pending_reminders`` כשהחלון מתקצר.
+    - job חוזר אחד (``reminders_dispatch_tick``) שולף מה-heap את כל מה שהגיע זמנו,
+      תופס אותו ב-DB בפעולה אחת ושולח במקביל מוגבל.
+    - תזכורות שפספסו (כשל שליחה / נוצרו בין מילויים) נאספות ב-sweep של ``get_pending_reminders``.
+    """
+
     def __init__(self, application: Application, db: RemindersDB):
         self.application = application
         self.db = db
         self.job_queue = application.job_queue
         self.is_running = False
+        self.tick_seconds = _env_seconds("REMINDER_TICK_SECONDS", 10)
+        self.window_seconds = _env_seconds("REMINDER_WINDOW_SECONDS", 900)
+        self.window_limit = int(_env_seconds("REMINDER_WINDOW_LIMIT", 500))
+        self.send_concurrency = int(_env_seconds("REMINDER_SEND_CONCURRENCY", 5))
+        self.overdue_grace_seconds = _env_seconds("REMINDER_OVERDUE_GRACE_SECONDS", 120)
+        # (remind_at_ts, reminder_id) ; המסמך עצמו ב-_entries (מאפשר עדכון/ביטול בלי לחפש ב-heap)
+        self._heap: List[tuple] = []
+        self._entries: Dict[str, dict] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._tick_lock = asyncio.Lock()
 
     async def start(self):
         if self.is_running:
@@ -25,6 +72,7 @@ class ReminderScheduler:
         self.is_running = True
         try:
             await self._load_existing_reminders()
+            self.job_queue.run_repeating(self._tick_job, interval=self.tick_seconds, first=self.tick_seconds, name=TICK_JOB_NAME)
             # Check recurring hourly
             self.job_queue.run_repeating(self._check_recurring_reminders, interval=3600, first=10, name="recurring_reminders_check")
         except Exception as e:
@@ -34,91 +82,175 @@ class ReminderScheduler:
         self.is_running = False
         for job in self.job_queue.jobs():
             try:
-                if job.name and job.name.startswith("reminder_"):
+                if job.name and (job.name.startswith("reminder_") or job.name == TICK_JOB_NAME):
                     job.schedule_removal()
             except Exception:
                 continue
+        self._heap.clear()
+        self._entries.clear()
+        self._loaded_until = None
 
     async def _load_existing_reminders(self):
         try:
-            due_reminders = self.db.get_pending_reminders(batch_size=1000)
-            for reminder in due_reminders:
-                await self.schedule_reminder(reminder)
-
-            upcoming = getattr(self.db, "get_future_reminders", None)
-            if callable(upcoming):
-                for reminder in upcoming(batch_size=2000):
-                    await self.schedule_reminder(reminder)
+            # תזכורות שזמנן עבר (למשל בזמן שהבוט היה למטה) נשלחות מיד
+            await self._sweep_overdue()
+            self._refill(datetime.now(timezone.utc))
         except Exception as e:
             logger.error(f"Load reminders error: {e}")
 
+    # -- window ----------------------------------------------------------------
+    def _push(self, reminder: dict) -> bool:
+        rid = str(reminder.get("reminder_id") or "")
+        when = _as_utc(reminder.get("remind_at"))
+        if not rid or when is None:
+            return False
+        self._entries[rid] = reminder
+        # רשומה ישנה באותו rid נשארת ב-heap ומסוננת ב-pop (lazy deletion)
+        heapq.heappush(self._heap, (when.timestamp(), rid))
+        return True
+
+    def _refill(self, now: datetime) -> int:
+        """טעינת תזכורות עתידיות עד now + window (ממשיך מהנקודה שבה נעצר המילוי הקודם)."""
+        start = self._loaded_until if self._loaded_until and self._loaded_until > now else now
+        until = now + timedelta(seconds=self.window_seconds)
+        upcoming = getattr(self.db, "get_future_reminders", None)
+        if not callable(upcoming):
+            self._loaded_until = until
+            return 0
+        batch = upcoming(batch_size=self.window_limit, after=start, until=until) or []
+        added = 0
+        last: Optional[datetime] = None
+        for reminder in batch:
+            if self._push(reminder):
+                added += 1
+                last = _as_utc(reminder.get("remind_at")) or last
+        # חלון שנחתך ב-limit: המילוי הבא ממשיך מהתזכורת האחרונה שנטענה (כפילויות מסוננות לפי rid).
+        # אם כל ה-batch באותו remind_at ממשיכים אחריו; מה שנשאר ייאסף ב-sweep של האיחורים.
+        first = _as_utc(batch[0].get("remind_at")) if batch else None
+        if len(batch) >= self.window_limit and last is not None and last < until:
+            self._loaded_until = last - timedelta(microseconds=1) if first is not None and first < last else last
+        else:
+            self._loaded_until = until
+        self._publish_size()
+        return added
+
+    def _pop_due(self, now: datetime) -> List[dict]:
+        due: List[dict] = []
+        now_ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= now_ts:
+            ts, rid = heapq.heappop(self._heap)
+            reminder = self._entries.get(rid)
+            if reminder is None:
+                continue
+            when = _as_utc(reminder.get("remind_at"))
+            if when is None or when.timestamp() != ts:
+                continue  # רשומה ישנה אחרי עדכון זמן
+            del self._entries[rid]
+            due.append(reminder)
+        return due
+
+    def _publish_size(self) -> None:
+        try:
+            from metrics import set_reminder_window_size  # type: ignore
+
+            set_reminder_window_size(len(self._entries))
+        except Exception:
+            return
+
+    # -- dispatch --------------------------------------------------------------
+    async def _tick_job(self, context):  # pragma: no cover - thin PTB adapter
+        await self.tick()
+
+    async def tick(self, now: Optional[datetime] = None) -> int:
+        """סבב אחד: מילוי חלון לפי הצורך, שליחת כל מה שהגיע זמנו. מחזיר כמה נשלחו."""
+        if self._tick_lock.locked():
+            return 0
+        async with self._tick_lock:
+            now = now or datetime.now(timezone.utc)
+            sent = 0
+            # מילוי מחדש כשנשאר פחות מחצי חלון; באותה הזדמנות sweep לתזכורות שפוספסו
+            if self._loaded_until is None or (self._loaded_until - now).total_seconds() < self.window_seconds / 2:
+                sent += await self._sweep_overdue(now)
+                self._refill(now)
+            due = self._pop_due(now)
+            if due:
+                sent += await self._dispatch(due, now)
+                self._publish_size()
+            return sent
+
+    async def _dispatch(self, due: List[dict], now: datetime) -> int:
+        claim = getattr(self.db, "claim_due_reminders", None)
+        if callable(claim):
+            # תפיסה אטומית: תזכורת שהושלמה/נמחקה/נדחתה מאז הטעינה לא תישלח
+            claimed = claim([r.get("_id") for r in due if r.get("_id") is not None], now=now) or []
+        else:
+            claimed = due
+        await self._send_batch(claimed, source="window", now=now)
+        return len(claimed)
+
+    async def _sweep_overdue(self, now: Optional[datetime] = None) -> int:
+        """שליחת תזכורות שזמנן עבר ולא נשלחו (get_pending_reminders תופס אותן ב-bulk).
+
+        בזמן ריצה מחפשים רק תזכורות שאיחרו ביותר מ-``REMINDER_OVERDUE_GRACE_SECONDS``,
+        כדי לא להתחרות ב-heap על תזכורת שזמנה הגיע זה עתה.
+        """
+        due_before = now - timedelta(seconds=self.overdue_grace_seconds) if now is not None else None
+        overdue = self.db.get_pending_reminders(batch_size=self.window_limit, due_before=due_before) or []
+        for r in overdue:
+            self._entries.pop(str(r.get("reminder_id")), None)
+        await self._send_batch(overdue, source="overdue", now=now)
+        return len(overdue)
+
+    async def _send_batch(self, reminders: List[dict], *, source: str, now: Optional[datetime] = None) -> None:
+        if not reminders:
+            return
+        now = now or datetime.now(timezone.utc)
+        started = time.monotonic()
+        sem = asyncio.Semaphore(max(1, self.send_concurrency))
+
+        async def _one(reminder: dict) -> None:
+            async with sem:
+                await self._send_tracked(reminder)
+            when = _as_utc(reminder.get("remind_at"))
+            # איחור = זמן השליחה בפועל פחות remind_at (כולל המתנה בתור של ה-semaphore)
+            lateness = (now - when).total_seconds() + (time.monotonic() - started) if when is not None else None
+            _record_dispatch(source, lateness)
+
+        await asyncio.gather(*(_one(r) for r in reminders))
+
     async def schedule_reminder(self, reminder: dict) -> bool:
         try:
             rid = reminder.get("reminder_id")
-            when = reminder.get("remind_at")
-            user_id = int(reminder.get("user_id"))
-            name = f"reminder_{rid}"
-            # Register the dynamic job so it appears in the monitor (best-effort)
-            try:
-                from services.job_registry import JobRegistry, register_job, JobCategory, JobType
-
-                if JobRegistry().get(name) is None:
-                    register_job(
-                        job_id=name,
-                        name="תזכורת",
-                        description="שליחת תזכורת בודדת",
-                        category=JobCategory.OTHER,
-                        job_type=JobType.ONCE,
-                        enabled=True,
-                        callback_name="_send_reminder_job",
-                        source_file="reminders/scheduler.py",
-                        metadata={"user_id": int(user_id)},
-                    )
-            except Exception:
-                pass
+            when = _as_utc(reminder.get("remind_at"))
+            int(reminder.get("user_id"))
             if not when or when <= datetime.now(timezone.utc):
                 # Immediate send (still tracked as reminder_{id})
-                tracker = None
-                JobAlreadyRunningError = None  # type: ignore[assignment]
-                try:
-                    from services.job_tracker import get_job_tracker, JobAlreadyRunningError as _JARE
-
-                    JobAlreadyRunningError = _JARE  # type: ignore[assignment]
-                    tracker = get_job_tracker()
-                except Exception:
-                    tracker = None
-                    JobAlreadyRunningError = None  # type: ignore[assignment]
-
-                if tracker is None:
-                    # Fail-open: monitoring must not block reminders
-                    await self._send_reminder(reminder, raise_on_error=False)
-                    return True
-
-                try:
-                    with tracker.track(name, trigger="scheduled", user_id=user_id) as run:
-                        await self._send_reminder(reminder, raise_on_error=True)
-                        tracker.add_log(run.run_id, "info", "Reminder sent (immediate)")
-                except Exception as exc:
-                    if JobAlreadyRunningError is not None and isinstance(exc, JobAlreadyRunningError):
-                        try:
-                            tracker.record_skipped(job_id=name, trigger="scheduled", user_id=user_id, reason="already_running")
-                        except Exception:
-                            pass
-                        return True
-                    # Fail-open: if tracking fails, still send reminder
-                    await self._send_reminder(reminder, raise_on_error=False)
+                await self._send_tracked(reminder)
+                _record_dispatch("immediate", (datetime.now(timezone.utc) - when).total_seconds() if when else None)
                 return True
-            # cancel existing
-            for job in self.job_queue.get_jobs_by_name(name):
-                job.schedule_removal()
-            self.job_queue.run_once(self._send_reminder_job, when=when, name=name, data=reminder, chat_id=user_id, user_id=user_id)
+            self._entries.pop(str(rid), None)
+            # בתוך החלון שכבר נטען - נכנס ל-heap; מעבר לו ייטען במילוי הבא
+            if self._loaded_until is not None and when <= self._loaded_until:
+                if reminder.get("_id") is None:
+                    # תזכורת חדשה מה-handlers (to_dict בלי _id) - התפיסה ב-tick היא לפי _id
+                    try:
+                        stored = self.db.reminders_collection.find_one({"reminder_id": rid}, {"_id": 1})
+                    except Exception:
+                        stored = None  # לא נתפס ב-tick; ה-sweep של האיחורים ישלח אותה
+                    reminder = dict(reminder, _id=(stored or {}).get("_id"))
+                self._push(reminder)
+                self._publish_size()
             return True
         except Exception as e:
             logger.error(f"Schedule error: {e}")
             return False
 
-    async def _send_reminder_job(self, context):
-        reminder = context.job.data
+    def cancel_reminder(self, reminder_id: str) -> None:
+        """הוצאת תזכורת מהחלון (הושלמה/נמחקה). הרשומה ב-heap מסוננת ב-pop."""
+        if self._entries.pop(str(reminder_id), None) is not None:
+            self._publish_size()
+
+    async def _send_tracked(self, reminder: dict) -> None:
         rid = reminder.get("reminder_id")
         user_id = int(reminder.get("user_id") or 0)
         job_id = f"reminder_{rid}"
@@ -163,7 +295,9 @@ class ReminderScheduler:
                 [InlineKeyboardButton("✅ בוצע", callback_data=f"rem_complete_{reminder['reminder_id']}"), InlineKeyboardButton("⏰ דחה", callback_data=f"rem_snooze_{reminder['reminder_id']}")],
                 [InlineKeyboardButton("🗑️ מחק", callback_data=f"rem_delete_{reminder['reminder_id']}")],
             ]
-            await self.application.bot.send_message(chat_id=user_id, text=message, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
+            # צ'אט היצירה (למשל קבוצה) כשנשמר; אחרת הצ'אט הפרטי של המשתמש
+            chat_id = int(reminder.get("chat_id") or user_id)
+            await self.application.bot.send_message(chat_id=chat_id, text=message, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
             # Mark as sent (keep status pending for user interaction)
             self.db.mark_reminder_sent(str(reminder.get("reminder_id")), success=True)
             return True
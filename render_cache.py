@@ -0,0 +1,179 @@
+"""
+Cache רינדור מבוסס-תוכן (content-addressed) להדגשת תחביר ותצוגות מקדימות.
+
+המפתח נגזר מ-hash של התוכן + פרמטרי הרינדור (שפה / style / profile), ולכן
+אותה גרסת קובץ מרונדרת פעם אחת בלבד - בלי קשר למזהה הקובץ, למשתמש או לנתיב
+שביקש אותה. שתי שכבות:
+
+- LRU מקומי בזיכרון התהליך (קריאה חמה ללא רשת / פענוח).
+- Redis דרך ``cache_manager.cache`` - HTML דחוס (zlib + base64, כי הלקוח עובד
+  עם ``decode_responses=True``) ומשותף בין workers.
+
+כשל בכל שכבה הוא fail-open: פשוט מרנדרים מחדש.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    from cache_manager import cache  # type: ignore
+except Exception:  # pragma: no cover
+    cache = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# גרסת פורמט - העלאה מבטלת את כל הערכים הישנים (למשל אחרי שינוי sanitizer)
+_KEY_VERSION = "v1"
+_COMPRESS_MIN_BYTES = 512
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)) or default)
+    except Exception:
+        return int(default)
+
+
+def _ttl_seconds() -> int:
+    return max(60, _env_int("RENDER_CACHE_TTL_SECONDS", 24 * 3600))
+
+
+def _local_max_entries() -> int:
+    return max(0, _env_int("RENDER_CACHE_LOCAL_MAX_ENTRIES", 512))
+
+
+def _max_item_bytes() -> int:
+    return max(0, _env_int("RENDER_CACHE_MAX_ITEM_BYTES", 1024 * 1024))
+
+
+_local: "OrderedDict[str, str]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def build_key(kind: str, content: str, *params: Any) -> str:
+    """מפתח: render:<ver>:<kind>:<sha256>:<params...>."""
+    parts = [str(p if p is not None else "") for p in params]
+    return ":".join(["render", _KEY_VERSION, str(kind), content_hash(content), *parts])
+
+
+def _encode(value: str) -> str:
+    raw = value.encode("utf-8", errors="surrogatepass")
+    if len(raw) < _COMPRESS_MIN_BYTES:
+        return "r:" + value
+    return "z:" + base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+
+
+def _decode(stored: Any) -> Optional[str]:
+    if not isinstance(stored, str) or len(stored) < 2:
+        return None
+    tag, body = stored[:2], stored[2:]
+    if tag == "r:":
+        return body
+    if tag == "z:":
+        return zlib.decompress(base64.b64decode(body)).decode("utf-8", errors="surrogatepass")
+    return None
+
+
+def _local_get(key: str) -> Optional[str]:
+    with _local_lock:
+        value = _local.get(key)
+        if value is not None:
+            _local.move_to_end(key)
+        return value
+
+
+def _local_put(key: str, value: str) -> None:
+    limit = _local_max_entries()
+    if limit <= 0:
+        return
+    with _local_lock:
+        _local[key] = value
+        _local.move_to_end(key)
+        while len(_local) > limit:
+            _local.popitem(last=False)
+
+
+def _remote_enabled() -> bool:
+    return bool(cache is not None and getattr(cache, "is_enabled", False))
+
+
+def _record(kind: str, tier: str) -> None:
+    try:
+        from metrics import record_render_cache  # type: ignore
+
+        record_render_cache(kind, tier)
+    except Exception:
+        return
+
+
+def get_or_render(kind: str, content: str, render: Callable[[], str], *params: Any) -> str:
+    """החזרת HTML מרונדר מה-cache, או רינדור ושמירה בשתי השכבות.
+
+    ``kind`` מפריד בין מסלולי רינדור (highlight / preview_code / ...);
+    ``params`` הם כל מה שמשפיע על הפלט מלבד התוכן עצמו.
+    """
+    try:
+        key = build_key(kind, content, *params)
+    except Exception:
+        return render()
+
+    value = _local_get(key)
+    if value is not None:
+        _record(kind, "local")
+        return value
+
+    if _remote_enabled():
+        try:
+            value = _decode(cache.get(key))
+        except Exception:
+            value = None
+        if value is not None:
+            _local_put(key, value)
+            _record(kind, "redis")
+            return value
+
+    value = render()
+    _record(kind, "miss")
+    try:
+        if len(value) > _max_item_bytes():
+            return value
+        _local_put(key, value)
+        if _remote_enabled():
+            cache.set(key, _encode(value), _ttl_seconds())
+    except Exception as e:
+        logger.debug(f"render cache store failed: {e}")
+    return value
+
+
+def get_or_render_pair(
+    kind: str, content: str, render: Callable[[], Tuple[str, str]], *params: Any
+) -> Tuple[str, str]:
+    """כמו get_or_render עבור (html, css) - נשמרים יחד כדי שישארו תואמים."""
+    sep = "\x00"
+
+    def _joined() -> str:
+        html, css = render()
+        return f"{css or ''}{sep}{html or ''}"
+
+    stored = get_or_render(kind, content, _joined, *params)
+    css, _, html = stored.partition(sep)
+    return html, css
+
+
+def clear_local() -> int:
+    """ריקון שכבת ה-LRU המקומית (לבדיקות / אחרי שינוי תצורה)."""
+    with _local_lock:
+        removed = len(_local)
+        _local.clear()
+        return removed
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Backfill: בניית rollups (1m/1h/1d) של דשבורד ה-Observability מנתונים גולמיים קיימים.
+
+מה הסקריפט עושה?
+- rollups נכתבים מרגע שהקוד עלה; חלון שמתחיל לפני תחילת הכיסוי (``since``
+  במסמך ``meta|<kind>``) חוזר לסריקה הגולמית. הסקריפט סופר את הנתונים
+  הגולמיים בטווח [now - days, since) ומקדים את ``since`` לתחילת הטווח.
+- alerts: מתוך alerts_log (ללא drills). requests: מתוך service_metrics
+  (מסמכי request_agg וגם מסמכי request ישנים).
+- הטווחים זרים לכתיבה החיה, ולכן הרצה חוזרת לא סופרת פעמיים.
+
+הרצה:
+  python3 scripts/backfill_observability_rollups.py --dry-run
+  python3 scripts/backfill_observability_rollups.py --days 30 --kind alerts
+
+דרישות ENV:
+  MONGODB_URL (חובה), DATABASE_NAME, ALERTS_COLLECTION, METRICS_COLLECTION (אופציונליים)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring import rollups  # noqa: E402
+
+Update = Tuple[Dict[str, Any], Dict[str, Any]]
+
+
+def alert_updates(alerts: Any, start: datetime, end: datetime) -> Iterator[Update]:
+    cursor = alerts.find(
+        {"ts_dt": {"$gte": start, "$lt": end}, "details.is_drill": {"$ne": True}},
+        {"ts_dt": 1, "severity": 1, "alert_type": 1, "name": 1},
+    )
+    for doc in cursor:
+        ts = doc.get("ts_dt")
+        if isinstance(ts, datetime):
+            yield from rollups.alert_increments(
+                ts=ts, severity=doc.get("severity"), alert_type=doc.get("alert_type"), name=doc.get("name")
+            )
+
+
+def request_updates(metrics: Any, start: datetime, end: datetime) -> Iterator[Update]:
+    cursor = metrics.find(
+        {"type": {"$in": ["request", "request_agg"]}, "ts": {"$gte": start, "$lt": end}},
+        {"latency_sketch": 0},
+    )
+    for doc in cursor:
+        if doc.get("type") == "request":
+            # מסמך ישן לבקשה בודדת -> צורה של request_agg
+            duration = float(doc.get("duration_seconds") or 0.0)
+            status = doc.get("status_code")
+            doc = {
+                "type": "request_agg",
+                "ts": doc.get("ts"),
+                "method": doc.get("method"),
+                "path": doc.get("path") or doc.get("handler"),
+                "count": 1,
+                "sum_duration": duration,
+                "max_duration": duration,
+                "error_count": 1 if rollups.status_class(status) == "5xx" else 0,
+                "status_counts": {rollups.status_class(status): 1},
+            }
+        yield from rollups.request_increments(doc)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill observability rollups from raw data")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--kind", choices=["alerts", "requests", "all"], default="all")
+    parser.add_argument("--dry-run", action="store_true", help="ספירה בלבד, בלי כתיבה")
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    try:
+        from services.db_provider import get_db
+    except ImportError as e:
+        print(f"❌ חסרות תלויות: {e}")
+        return 1
+    db = get_db()
+    if getattr(db, "name", "") == "noop_db":
+        print("❌ לא ניתן להתחבר ל-MongoDB (קיבלתי noop DB).")
+        return 1
+
+    target = db[rollups.collection_name()]
+    rollups.ensure_indexes(target)
+    sources = {
+        rollups.KIND_ALERTS: (db[os.getenv("ALERTS_COLLECTION") or "alerts_log"], alert_updates),
+        rollups.KIND_REQUESTS: (db[os.getenv("METRICS_COLLECTION") or "service_metrics"], request_updates),
+    }
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=max(1, args.days))
+    for kind, (source, build) in sources.items():
+        if args.kind not in ("all", kind):
+            continue
+        since = rollups.coverage_since(target, kind)
+        if since is None:
+            # עוד אין כתיבה חיה: מכסים עד גבול הדקה הנוכחית, והכתיבה החיה ממשיכה משם
+            epoch = int(now.timestamp())
+            since = datetime.fromtimestamp(epoch - epoch % 60, tz=timezone.utc)
+            if not args.dry_run:
+                rollups.mark_coverage(target, kind, since - timedelta(seconds=60))
+        if since <= start:
+            print(f"✅ {kind}: כבר מכוסה מ-{since.isoformat()}")
+            continue
+        updates: List[Update] = list(build(source, start, since))
+        buckets = len(rollups.merge_updates(updates))
+        print(f"📊 {kind}: {len(updates) // len(rollups.TIERS)} רשומות גולמיות -> {buckets} buckets "
+              f"({start.isoformat()} .. {since.isoformat()})")
+        if args.dry_run:
+            continue
+        written = rollups.apply_updates(target, updates)
+        if written == buckets:
+            rollups.extend_coverage(target, kind, start)
+            print(f"   נכתבו {written} buckets; הכיסוי מתחיל עכשיו ב-{start.isoformat()}")
+        else:
+            print(f"   ⚠️ נכתבו רק {written}/{buckets} buckets - הכיסוי לא הוקדם (הרצה חוזרת תספור שוב את מה שנכתב)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+השוואת ביצועים: חיפוש תוכן בסריקה מלאה מול חיפוש מבוסס טריגרמים.
+רץ מקומית, ללא MongoDB (DB מדומה בזיכרון):
+    python scripts/bench_content_search.py [--sizes 1000,10000,100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# הגדרת סביבה
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DISABLE_DB", "1")
+os.environ.setdefault("DISABLE_ACTIVITY_REPORTER", "1")
+os.environ.setdefault("BOT_TOKEN", "x")
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017/bench")
+
+_WORDS = [
+    "alpha", "beta", "gamma", "delta", "render", "config", "handler", "request",
+    "response", "cache", "index", "token", "session", "worker", "queue", "retry",
+]
+
+
+class _Perf:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _MemoryDB:
+    """DB מדומה: מחזיק את הקבצים ברשימה ומממש רק את מה שהחיפוש צריך."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.by_name = {d["file_name"]: d for d in docs}
+
+    def get_user_files(self, user_id, limit=50, skip=0, projection=None):
+        return self.docs[skip: skip + limit]
+
+    def get_latest_files_by_names(self, user_id, file_names, *, projection=None):
+        return [self.by_name[n] for n in file_names if n in self.by_name]
+
+
+def _make_corpus(size, seed=7):
+    rnd = random.Random(seed)
+    docs = []
+    for i in range(size):
+        lines = [
+            f"def {rnd.choice(_WORDS)}_{i % 97}():\n    return {rnd.choice(_WORDS)!r}\n"
+            for _ in range(rnd.randint(3, 12))
+        ]
+        if i % 500 == 0:
+            lines.append("needle_marker = True\n")
+        docs.append({
+            "file_name": f"file_{i}.py",
+            "code": "".join(lines),
+            "programming_language": "python",
+            "tags": [],
+        })
+    return docs
+
+
+def measure(name, func, repeat=5):
+    """מדוד זמן ביצוע ממוצע של פונקציה"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {name}: {elapsed * 1000:.2f}ms")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--query", default="needle_marker")
+    args = parser.parse_args()
+
+    import search_engine as se
+
+    se.track_performance = lambda *a, **k: _Perf()
+    engine = se.AdvancedSearchEngine()
+
+    print("=" * 50)
+    print("Content Search Benchmark")
+    print("=" * 50)
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"\n[{size} snippets] query={args.query!r}")
+        se.db = _MemoryDB(_make_corpus(size))
+        index = se.SearchIndex()
+        start = time.perf_counter()
+        for doc in se.db.docs:
+            index.index_file(1, doc)
+        print(f"  build index: {(time.perf_counter() - start) * 1000:.2f}ms")
+
+        scan, t_scan = measure("scan", lambda: engine._content_search(args.query, 1))
+        indexed, t_idx = measure("trigram", lambda: engine._content_search(args.query, 1, index))
+        assert sorted(r.file_name for r in scan) == sorted(r.file_name for r in indexed)
+        print(f"  matches: {len(indexed)}  speedup: x{t_scan / max(t_idx, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,18 @@ db.repo_files.create_index([("search_text", "text")])
 # repo_files - לחיפוש לפי שפה
 db.repo_files.create_index([("repo_name", 1), ("language", 1)])
 
+# repo_files - רמה בעץ (api/tree): ילדים ישירים של תיקייה, ממוינים לפי path
+db.repo_files.create_index([("repo_name", 1), ("parent_dir", 1), ("path", 1)])
+
+# repo_dirs - עץ תיקיות מוחשב (CodeIndexer.rebuild_dir_tree)
+db.repo_dirs.create_index([("repo_name", 1), ("path", 1)], unique=True)
+db.repo_dirs.create_index([("repo_name", 1), ("parent_dir", 1), ("name", 1)])
+
+# repo_symbols - טבלת סמלים (חיפוש פונקציות/מחלקות): prefix, trigrams, החלפה לפי path
+db.repo_symbols.create_index([("repo_name", 1), ("name_lower", 1)])
+db.repo_symbols.create_index([("repo_name", 1), ("ngrams", 1)])
+db.repo_symbols.create_index([("repo_name", 1), ("path", 1)])
+
 # repo_metadata - מפתח לוגי יחיד; list_repos (MCP) רץ עליו בכל קריאה.
 # בדיקת כפילויות קודם: כפילות קיימת תפיל את יצירת ה-unique (ואת שאר הסקריפט אחריה) -
 # במקרה כזה מדווחים ומדלגים, כדי שהניקוי ייעשה במודע ולא באמצע ריצת אינדקסים.
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+מיגרציה: דחיסת היסטוריית גרסאות קיימת ב-code_snippets (reverse deltas / keyframes).
+
+מה הסקריפט עושה?
+- לכל קובץ פעיל עם יותר מגרסה אחת: הגרסה האחרונה נשארת מלאה, וכל גרסה
+  קודמת נשמרת כ-delta מול הגרסה שאחריה (או keyframe דחוס כל
+  CODE_HISTORY_KEYFRAME_INTERVAL גרסאות) - בדיוק כמו ש-save_code_snippet
+  עושה לגרסאות חדשות. ראו database/version_store.py.
+- גרסאות שכבר דחוסות מדולגות (הסקריפט אידמפוטנטי).
+- בסוף מודפס דוח חיסכון: בייטים של קוד בגרסאות הישנות לפני/אחרי.
+
+הרצה:
+  python3 scripts/migrate_code_history_deltas.py --dry-run
+  python3 scripts/migrate_code_history_deltas.py --report
+  python3 scripts/migrate_code_history_deltas.py --user-id 123 --keyframe-interval 10
+
+דרישות ENV:
+  MONGODB_URL (חובה), DATABASE_NAME (אופציונלי)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import version_store  # noqa: E402
+
+_PROJECTION = {
+    "_id": 1,
+    "version": 1,
+    "code": 1,
+    "code_storage": 1,
+    "code_hash": 1,
+    "file_size": 1,
+    "lines_count": 1,
+}
+
+
+def _code_bytes(code: Any) -> int:
+    return len(code.encode("utf-8", errors="ignore")) if isinstance(code, str) else 0
+
+
+def _stored_bytes(doc: Dict[str, Any]) -> int:
+    storage = doc.get(version_store.STORAGE_FIELD)
+    if isinstance(storage, dict):
+        return len(bytes(storage.get("data") or b""))
+    return _code_bytes(doc.get("code"))
+
+
+def _file_groups(collection: Any, user_id: Optional[int]):
+    match: Dict[str, Any] = {"is_active": True}
+    if user_id is not None:
+        match["user_id"] = user_id
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"user_id": "$user_id", "file_name": "$file_name"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        key = row.get("_id") or {}
+        yield key.get("user_id"), key.get("file_name")
+
+
+def migrate_file(collection: Any, user_id: Any, file_name: str, *, keyframe_interval: int, dry_run: bool, stats: Dict[str, int]) -> None:
+    docs = list(collection.find(
+        {"user_id": user_id, "file_name": file_name, "is_active": True},
+        _PROJECTION,
+        sort=[("version", -1)],
+    ))
+    if len(docs) < 2 or version_store.is_compacted(docs[0]):
+        return
+    memo: Dict[Any, str] = {}
+    newer = docs[0]
+    newer_code = newer.get("code") if isinstance(newer.get("code"), str) else ""
+    for doc in docs[1:]:
+        stats["versions"] += 1
+        if version_store.is_compacted(doc):
+            code = version_store.restore_code(collection, doc, memo)
+            stats["bytes_before"] += _code_bytes(code)
+            stats["bytes_after"] += _stored_bytes(doc)
+            stats["already_compacted"] += 1
+        else:
+            code = doc.get("code") if isinstance(doc.get("code"), str) else ""
+            stats["bytes_before"] += _code_bytes(code)
+            fields = version_store.compaction_fields(doc, newer_code, newer.get("_id"), keyframe_interval=keyframe_interval)
+            if not fields:
+                stats["bytes_after"] += _code_bytes(code)
+            else:
+                stats["bytes_after"] += len(bytes(fields[version_store.STORAGE_FIELD].get("data") or b""))
+                stats["compacted"] += 1
+                if not dry_run:
+                    collection.update_one(
+                        {"_id": doc["_id"], version_store.STORAGE_FIELD: {"$exists": False}},
+                        {"$set": fields},
+                    )
+        if code is None:
+            # שרשרת שבורה: אין בסיס אמין לגרסאות שמתחת
+            stats["broken"] += 1
+            return
+        if doc.get("_id") is not None:
+            memo[doc["_id"]] = code
+        newer, newer_code = doc, code
+
+
+def _print_report(stats: Dict[str, int], *, dry_run: bool) -> None:
+    before = stats["bytes_before"]
+    after = stats["bytes_after"]
+    saved = before - after
+    pct = (saved / before * 100.0) if before else 0.0
+    print("\n📊 דוח חיסכון (גרסאות קודמות בלבד; הגרסה האחרונה תמיד מלאה):")
+    print(f"   קבצים עם היסטוריה: {stats['files']}")
+    print(f"   גרסאות קודמות:      {stats['versions']}")
+    print(f"   נדחסו עכשיו:        {stats['compacted']}{' (dry-run)' if dry_run else ''}")
+    print(f"   כבר היו דחוסות:     {stats['already_compacted']}")
+    if stats["broken"]:
+        print(f"   ⚠️ שרשראות שבורות:  {stats['broken']}")
+    print(f"   לפני: {before:,} bytes | אחרי: {after:,} bytes | חיסכון: {saved:,} bytes ({pct:.1f}%)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compact code_snippets version history")
+    parser.add_argument("--dry-run", action="store_true", help="חישוב בלבד, בלי כתיבה")
+    parser.add_argument("--report", action="store_true", help="דוח חיסכון בלבד (כמו --dry-run)")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--keyframe-interval", type=int, default=None)
+    args = parser.parse_args()
+    dry_run = bool(args.dry_run or args.report)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    try:
+        from services.db_provider import get_db
+    except ImportError as e:
+        print(f"❌ חסרות תלויות: {e}")
+        return 1
+    db = get_db()
+    if getattr(db, "name", "") == "noop_db":
+        print("❌ לא ניתן להתחבר ל-MongoDB (קיבלתי noop DB).")
+        return 1
+
+    interval = args.keyframe_interval
+    if interval is None:
+        try:
+            interval = int(os.getenv("CODE_HISTORY_KEYFRAME_INTERVAL", "") or version_store.DEFAULT_KEYFRAME_INTERVAL)
+        except ValueError:
+            interval = version_store.DEFAULT_KEYFRAME_INTERVAL
+
+    collection = db.code_snippets
+    stats = {k: 0 for k in ("files", "versions", "compacted", "already_compacted", "broken", "bytes_before", "bytes_after")}
+    for user_id, file_name in _file_groups(collection, args.user_id):
+        stats["files"] += 1
+        migrate_file(collection, user_id, file_name, keyframe_interval=max(1, interval), dry_run=dry_run, stats=stats)
+        if stats["files"] % 500 == 0:
+            print(f"   ... {stats['files']} קבצים")
+    _print_report(stats, dry_run=dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
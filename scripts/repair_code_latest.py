@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+בדיקת עקביות ותיקון של הדגל ``is_latest`` ב-code_snippets.
+
+מה הסקריפט עושה?
+- לכל קובץ חי (``user_id`` + ``file_name``) בודק שבדיוק הגרסה הפעילה עם ה-``version``
+  הגבוה ביותר מסומנת ``is_latest=True``. ראו database/latest_index.py.
+- מתקן: מסמן גרסאות אחרונות שחסר להן הדגל (למשל מסמכים מלפני התכונה), ומסיר אותו
+  מגרסאות ישנות או ממסמכים בסל המיחזור.
+- אידמפוטנטי: ריצה שנייה לא מוצאת סטייה. הריצה הראשונה היא ה-backfill שאחריו אפשר
+  להדליק ``CODE_LATEST_FLAG_READS``.
+
+הרצה:
+  python3 scripts/repair_code_latest.py --dry-run
+  python3 scripts/repair_code_latest.py
+  python3 scripts/repair_code_latest.py --user-id 123
+
+דרישות ENV:
+  MONGODB_URL (חובה), DATABASE_NAME (אופציונלי)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import latest_index  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check and repair code_snippets is_latest flags")
+    parser.add_argument("--dry-run", action="store_true", help="בדיקה בלבד, בלי כתיבה")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    try:
+        from services.db_provider import get_db
+    except ImportError as e:
+        print(f"❌ חסרות תלויות: {e}")
+        return 1
+    db = get_db()
+    if getattr(db, "name", "") == "noop_db":
+        print("❌ לא ניתן להתחבר ל-MongoDB (קיבלתי noop DB).")
+        return 1
+
+    report = latest_index.check_and_repair(db.code_snippets, user_id=args.user_id, repair=not args.dry_run)
+    title = "🔍 בדיקת is_latest (dry-run)" if args.dry_run else "🛠️ תיקון is_latest"
+    print(title)
+    print(f"   קבצים חיים:              {report['files']:,}")
+    print(f"   אחרונה ללא דגל:          {report['missing']:,}")
+    print(f"   דגל על גרסה ישנה:        {report['extra']:,}")
+    print(f"   מסמכים מחוקים עם דגל:    {report['inactive_flagged']:,}")
+    if not args.dry_run:
+        print(f"   תוקנו:                   {report['fixed']:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
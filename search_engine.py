@@ -4,16 +4,27 @@ Advanced Search Engine for Code Snippets
 """
 
 import asyncio
+import json
 import logging
 import math
 import re
 import hashlib
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
 from itertools import islice
-from collections import Counter, defaultdict
+if sys.version_info >= (3, 11):
+    from re import _parser as _sre_parse  # type: ignore[attr-defined]
+else:  # pragma: no cover - Python ישן
+    import sre_parse as _sre_parse
+from collections import Counter, OrderedDict, defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Any, Dict, List, Optional, Set, Tuple, cast
+from typing import Any, Dict, ItemsView, Iterable, Iterator, KeysView, List, Optional, Sequence, Set, Tuple, cast
 
 try:
     # rapidfuzz מספק API דומה אך מהיר וללא קומפילציה
@@ -556,16 +567,517 @@ async def _fallback_text_search(
 
     return await asyncio.to_thread(_run)
 
+# ===================== אינדקס חיפוש אינקרמנטלי =====================
+# גרסת פורמט ה-snapshot שנשמר ב-Mongo. העלאת הגרסה פוסלת snapshots ישנים (→ rebuild מלא).
+_INDEX_SNAPSHOT_VERSION = 3
+# מרווח ביטחון לשעונים לא מסונכרנים בין workers: ה-watermark נשמר מעט "אחורה",
+# ועדכון כפול של אותו קובץ הוא אידמפוטנטי.
+_INDEX_WATERMARK_SKEW = timedelta(seconds=60)
+# Mongo מגביל מסמך ל-16MB; snapshot גדול מזה פשוט לא נשמר (ייבנה מחדש בעליית worker).
+_INDEX_SNAPSHOT_MAX_BYTES = 12 * 1024 * 1024
+_INDEX_PROJECTION = {"file_name": 1, "programming_language": 1, "tags": 1, "code": 1, "updated_at": 1}
+
+# BM25 לחיפוש תוכן. "מסמך" = גרסה אחרונה של קובץ, אורך נמדד בתווים.
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+# תווים ש-re.IGNORECASE משווה לאותיות ASCII אבל lower() לא ממפה אליהן (ſ→s, ı/İ→i).
+# הקיפול תו-לתו שומר על הכלה של תת-מחרוזות, כך שהסינון נשאר superset.
+_TRIGRAM_FOLD = str.maketrans({"\u017f": "s", "\u0131": "i", "\u0130": "i", "\u0307": None})
+
+
+def _trigrams(text_lower: str) -> Set[str]:
+    text_lower = text_lower.translate(_TRIGRAM_FOLD)
+    return {text_lower[i:i + 3] for i in range(len(text_lower) - 2)}
+
+
+def _regex_required_literals(pattern: str) -> List[List[str]]:
+    """ליטרלים שכל התאמה של הדפוס חייבת להכיל (בסגנון Google Code Search).
+
+    התוצאה היא CNF: רשימת סעיפים, וכל סעיף הוא רשימת חלופות — מסמך מתאים רק אם
+    הוא מכיל לפחות חלופה אחת מכל סעיף. רק ליטרלים של 3+ תווים (אחרת אין טריגרם).
+    רשימה ריקה = אין מה לסנן (הקורא סורק הכל).
+    """
+    try:
+        parsed = _sre_parse.parse(pattern, re.IGNORECASE | re.MULTILINE)
+    except Exception:
+        return []
+    try:
+        return _sre_required_clauses(list(parsed), 0)
+    except Exception:
+        return []
+
+
+def _sre_required_clauses(items: List[Any], depth: int) -> List[List[str]]:
+    clauses: List[List[str]] = []
+    run: List[str] = []
+
+    def flush() -> None:
+        if len(run) >= 3:
+            clauses.append(["".join(run)])
+        run.clear()
+
+    for op, av in items:
+        name = getattr(op, "name", str(op))
+        if name == "LITERAL":
+            ch = chr(av)
+            # ליטרל לא-ASCII עשוי להתאים ל-case variants ש-lower() לא מאחד — שוברים את הרצף
+            if ch.isascii():
+                run.append(ch.lower())
+            else:
+                flush()
+            continue
+        if name == "AT":
+            # עוגנים לא צורכים תווים, כך שהרצף נשאר רציף בטקסט
+            continue
+        flush()
+        if depth > 32:
+            continue
+        if name in ("SUBPATTERN", "ATOMIC_GROUP"):
+            sub = av[-1] if name == "SUBPATTERN" else av
+            clauses.extend(_sre_required_clauses(list(sub), depth + 1))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            low, _high, sub = av
+            if low >= 1:
+                clauses.extend(_sre_required_clauses(list(sub), depth + 1))
+        elif name == "BRANCH":
+            best: List[str] = []
+            for alternative in av[1]:
+                singles = [c[0] for c in _sre_required_clauses(list(alternative), depth + 1) if len(c) == 1]
+                if not singles:
+                    best = []
+                    break
+                best.append(max(singles, key=len))
+            if best:
+                clauses.append(sorted(set(best)))
+    flush()
+    return clauses
+
+
+def _bm25_score(tf: int, doc_len: int, avg_len: float, df: int, total_docs: int) -> float:
+    idf = math.log(1.0 + (max(total_docs, df) - df + 0.5) / (df + 0.5))
+    norm = tf + _BM25_K1 * (1.0 - _BM25_B + _BM25_B * doc_len / max(avg_len, 1.0))
+    return idf * tf * (_BM25_K1 + 1.0) / norm
+
+
+def _intersect_postings(lists: List[Sequence[int]]) -> List[int]:
+    """חיתוך רשימות doc ids ממוינות: מהקצרה ביותר, עם bisect על השאר."""
+    if not lists:
+        return []
+    ordered = sorted(lists, key=len)
+    result = list(ordered[0])
+    for postings in ordered[1:]:
+        if not result:
+            break
+        kept = []
+        for doc_id in result:
+            pos = bisect_left(postings, doc_id)
+            if pos < len(postings) and postings[pos] == doc_id:
+                kept.append(doc_id)
+        result = kept
+    return result
+
+
+def _delta_encode(postings: Sequence[int]) -> List[int]:
+    prev = 0
+    out = []
+    for doc_id in postings:
+        out.append(doc_id - prev)
+        prev = doc_id
+    return out
+
+
+def _as_utc(value: Any) -> Optional[datetime]:
+    """datetime נאיבי ממונגו נחשב UTC; כל ערך אחר → None."""
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _extract_index_entry(file_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """חילוץ המונחים של קובץ יחיד (רשומת forward index).
+
+    הרשומה נשמרת לצד האינדקס ההפוך כדי שאפשר יהיה להסיר/להחליף קובץ בודד
+    בלי לבנות הכל מחדש, והיא גם הפורמט שנשמר ב-snapshot.
+    """
+    file_name_value = str(file_data.get('file_name') or '').strip()
+    if not file_name_value:
+        # אין טעם לאנדקס רשומה ללא שם קובץ
+        return None
+
+    code_text: str = str(file_data.get('code') or '')
+    code_lower = code_text.lower()
+    words = sorted({w for w in re.findall(r'\b\w+\b', code_lower) if len(w) >= 2})
+
+    functions: List[str] = []
+    # אינדקס פונקציות (best-effort)
+    try:
+        language_for_parse = str(file_data.get('programming_language') or '').strip()
+        for func in code_processor.extract_functions(code_text, language_for_parse):
+            func_name = str(func.get('name') or '').lower()
+            if func_name and func_name not in functions:
+                functions.append(func_name)
+    except Exception:
+        # אל נעצור אינדוקס בגלל שגיאה בזיהוי פונקציות
+        pass
+
+    tags: List[str] = []
+    try:
+        for tag in list(file_data.get('tags') or []):
+            tag_value = str(tag or '').lower().strip()
+            if tag_value and tag_value not in tags:
+                tags.append(tag_value)
+    except Exception:
+        pass
+
+    return {
+        "n": file_name_value,
+        "w": words,
+        "f": functions,
+        "l": str(file_data.get('programming_language') or '').strip(),
+        "t": tags,
+        "g": sorted(_trigrams(code_lower)),
+        "z": len(code_text),
+    }
+
+
+def _record_index_update(kind: str, count: int = 1, lag_seconds: Optional[float] = None) -> None:
+    try:
+        from metrics import record_search_index_update
+        record_search_index_update(kind, count=count, lag_seconds=lag_seconds)
+    except Exception:
+        pass
+
+
+def _record_index_cache_event(event: str, size: Optional[int] = None) -> None:
+    try:
+        from metrics import record_search_index_cache_event
+        record_search_index_cache_event(event, size=size)
+    except Exception:
+        pass
+
+
+def _get_snapshot_collection() -> Any:
+    raw_db = getattr(db, "db", None)
+    if raw_db is None:
+        return None
+    try:
+        return raw_db["search_index_snapshots"]
+    except Exception:
+        return getattr(raw_db, "search_index_snapshots", None)
+
+
+_EMPTY_POSTINGS = array("I")
+
+
+class PostingIndex:
+    """מיפוי מונח → doc ids ממוינים ב-``array('I')``.
+
+    4 בתים לכל posting במקום set של מחרוזות ``"{user_id}:{file_name}"``
+    (כ-200 בתים ל-set ריק בלבד). המונחים עוברים ``sys.intern`` כך שמילה
+    נפוצה מוחזקת פעם אחת בזיכרון, לא משנה באינדקס של כמה משתמשים היא מופיעה.
+    """
+
+    __slots__ = ("_lists",)
+
+    def __init__(self) -> None:
+        self._lists: Dict[str, array] = {}
+
+    def add(self, term: str, doc_id: int) -> bool:
+        postings = self._lists.get(term)
+        if postings is None:
+            self._lists[sys.intern(term)] = array("I", (doc_id,))
+            return True
+        pos = bisect_left(postings, doc_id)
+        if pos < len(postings) and postings[pos] == doc_id:
+            return False
+        postings.insert(pos, doc_id)
+        return True
+
+    def discard(self, term: str, doc_id: int) -> bool:
+        postings = self._lists.get(term)
+        if postings is None:
+            return False
+        pos = bisect_left(postings, doc_id)
+        if pos >= len(postings) or postings[pos] != doc_id:
+            return False
+        del postings[pos]
+        if not postings:
+            del self._lists[term]
+        return True
+
+    def get(self, term: str, default: Optional[Sequence[int]] = None) -> Sequence[int]:
+        postings = self._lists.get(term)
+        if postings is None:
+            return _EMPTY_POSTINGS if default is None else default
+        return postings
+
+    def __getitem__(self, term: str) -> Sequence[int]:
+        return self.get(term)
+
+    def __contains__(self, term: object) -> bool:
+        return term in self._lists
+
+    def __len__(self) -> int:
+        return len(self._lists)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._lists)
+
+    def keys(self) -> KeysView[str]:
+        return self._lists.keys()
+
+    def items(self) -> ItemsView[str, array]:
+        return self._lists.items()
+
+    def clear(self) -> None:
+        self._lists.clear()
+
+
+def _intern_terms(terms: Any) -> Tuple[str, ...]:
+    return tuple(sys.intern(str(t)) for t in (terms or ()) if t)
+
+
 class SearchIndex:
-    """אינדקס חיפוש לביצועים טובים יותר"""
-    
+    """אינדקס חיפוש לביצועים טובים יותר.
+
+    האינדקס מתעדכן אינקרמנטלית: שמירה/מחיקה/שינוי שם של קובץ מסמנים אותו
+    כ-pending (ראו ``notify_file_changed``), ורענון תקופתי מושך רק מסמכים
+    ש-``updated_at`` שלהם חדש מה-watermark. המצב נשמר כ-snapshot דחוס
+    ב-``search_index_snapshots`` כדי ש-worker שעלה מחדש לא יבנה הכל מאפס.
+
+    כל קובץ מקבל doc id מספרי (טבלת ``doc_ids``/``doc_names`` פר-משתמש),
+    ורשימות ה-postings מחזיקות רק את המספרים האלה.
+    """
+
     def __init__(self):
-        self.word_index: Dict[str, Set[str]] = defaultdict(set)  # מילה -> קבצים
-        self.function_index: Dict[str, Set[str]] = defaultdict(set)  # פונקציה -> קבצים
-        self.language_index: Dict[str, Set[str]] = defaultdict(set)  # שפה -> קבצים
-        self.tag_index: Dict[str, Set[str]] = defaultdict(set)  # תגית -> קבצים
+        self.word_index = PostingIndex()  # מילה -> doc ids
+        self.function_index = PostingIndex()  # פונקציה -> doc ids
+        self.language_index = PostingIndex()  # שפה -> doc ids
+        self.tag_index = PostingIndex()  # תגית -> doc ids
+        self.trigram_index = PostingIndex()  # טריגרם של התוכן (lowercase) -> doc ids
+        self.total_length = 0  # סכום אורכי המסמכים (avgdl של BM25)
+        self.doc_ids: Dict[str, int] = {}  # file_name -> doc id
+        self.doc_names: List[Optional[str]] = []  # doc id -> file_name
+        self._free_ids: List[int] = []
+        self.doc_entries: Dict[int, Dict[str, Any]] = {}  # doc id -> המונחים שלו (ל-delta)
+        self.posting_count = 0
         self.last_update = datetime.min.replace(tzinfo=timezone.utc)
-        
+        # updated_at שעד אליו (כולל מרווח ביטחון) כל השינויים כבר באינדקס
+        self.watermark: Optional[datetime] = None
+        self._pending: Dict[str, float] = {}  # file_name -> זמן הסימון (monotonic)
+        self._lock = threading.RLock()
+        self._snapshot_checked = False
+        self._dirty = False
+        self._last_persist = 0.0
+
+    def file_name(self, doc_id: int) -> Optional[str]:
+        try:
+            return self.doc_names[doc_id]
+        except IndexError:
+            return None
+
+    def file_names(self, doc_ids: Iterable[int]) -> List[str]:
+        names = []
+        for doc_id in doc_ids:
+            name = self.file_name(doc_id)
+            if name:
+                names.append(name)
+        return names
+
+    def _postings_for(self, entry: Dict[str, Any]) -> Tuple[Tuple[Any, Iterable[str]], ...]:
+        return (
+            (self.word_index, entry["w"]),
+            (self.function_index, entry["f"]),
+            (self.language_index, (entry["l"],) if entry["l"] else ()),
+            (self.tag_index, entry["t"]),
+            (self.trigram_index, entry["g"]),
+        )
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / len(self.doc_ids) if self.doc_ids else 0.0
+
+    def substring_candidates(self, text_lower: str) -> Optional[List[int]]:
+        """doc ids שעשויים להכיל את המחרוזת (כל הטריגרמים שלה קיימים בהם).
+
+        None = השאילתה קצרה מכדי לסנן (פחות מ-3 תווים); הקורא חוזר לסריקה.
+        התוצאה היא superset — עדיין צריך לאמת מול התוכן עצמו.
+        """
+        grams = _trigrams(text_lower)
+        if not grams:
+            return None
+        with self._lock:
+            lists = [self.trigram_index.get(g) for g in grams]
+            if any(len(postings) == 0 for postings in lists):
+                return []
+            return _intersect_postings(lists)
+
+    def literal_candidates(self, clauses: List[List[str]]) -> Optional[List[int]]:
+        """doc ids שעומדים בכל סעיפי ה-CNF מ-_regex_required_literals (superset).
+
+        None = אין סעיפים לסנן בהם.
+        """
+        if not clauses:
+            return None
+        per_clause: List[Sequence[int]] = []
+        for alternatives in clauses:
+            union: Set[int] = set()
+            for literal in alternatives:
+                union.update(self.substring_candidates(literal) or [])
+            if not union:
+                return []
+            per_clause.append(sorted(union))
+        return _intersect_postings(per_clause)
+
+    # ---- פעולות delta ----
+    def _add_entry(self, entry: Dict[str, Any]) -> None:
+        name = str(entry["n"])
+        self._remove_entry(name)
+        compact = {
+            "n": name,
+            "w": _intern_terms(entry.get("w")),
+            "f": _intern_terms(entry.get("f")),
+            "l": sys.intern(str(entry.get("l") or "")),
+            "t": _intern_terms(entry.get("t")),
+            "g": _intern_terms(entry.get("g")),
+            "z": max(0, int(entry.get("z") or 0)),
+        }
+        if self._free_ids:
+            doc_id = self._free_ids.pop()
+            self.doc_names[doc_id] = name
+        else:
+            doc_id = len(self.doc_names)
+            self.doc_names.append(name)
+        self.doc_ids[name] = doc_id
+        for mapping, terms in self._postings_for(compact):
+            for term in terms:
+                if mapping.add(term, doc_id):
+                    self.posting_count += 1
+        self.doc_entries[doc_id] = compact
+        self.total_length += compact["z"]
+
+    def _remove_entry(self, file_name: str) -> bool:
+        doc_id = self.doc_ids.pop(file_name, None)
+        if doc_id is None:
+            return False
+        entry = self.doc_entries.pop(doc_id, None)
+        if entry is not None:
+            for mapping, terms in self._postings_for(entry):
+                for term in terms:
+                    if mapping.discard(term, doc_id):
+                        self.posting_count -= 1
+            self.total_length -= entry["z"]
+        self.doc_names[doc_id] = None
+        self._free_ids.append(doc_id)
+        return True
+
+    def _clear(self) -> None:
+        for mapping in (self.word_index, self.function_index, self.language_index, self.tag_index, self.trigram_index):
+            mapping.clear()
+        self.doc_ids.clear()
+        self.doc_names.clear()
+        self._free_ids.clear()
+        self.doc_entries.clear()
+        self.posting_count = 0
+        self.total_length = 0
+
+    def index_file(self, user_id: int, file_data: Dict[str, Any]) -> bool:
+        """הוספה/החלפה של קובץ יחיד באינדקס."""
+        entry = _extract_index_entry(file_data)
+        if entry is None:
+            return False
+        with self._lock:
+            self._add_entry(entry)
+            self._dirty = True
+        return True
+
+    def remove_file(self, user_id: int, file_name: str) -> bool:
+        """הסרת קובץ מהאינדקס (מחיקה או השם הישן אחרי rename)."""
+        with self._lock:
+            removed = self._remove_entry(str(file_name))
+            if removed:
+                self._dirty = True
+        return removed
+
+    def mark_pending(self, file_name: str) -> None:
+        """סימון קובץ שהשתנה; העדכון עצמו מתבצע בקריאה הבאה לאינדקס."""
+        name = str(file_name or '').strip()
+        if not name:
+            return
+        with self._lock:
+            self._pending.setdefault(name, time.monotonic())
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _sync_file(self, user_id: int, file_name: str) -> None:
+        # get_file עוקף את הקאש של get_latest_version — כאן חייבים ערך טרי
+        file_data = db.get_file(user_id, file_name)
+        if isinstance(file_data, dict) and file_data:
+            self.index_file(user_id, file_data)
+        else:
+            self.remove_file(user_id, file_name)
+
+    def apply_pending(self, user_id: int) -> int:
+        """החלת כל ה-deltas שסומנו מאז הקריאה הקודמת."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            now = time.monotonic()
+            applied = 0
+            for file_name, marked_at in pending.items():
+                try:
+                    self._sync_file(user_id, file_name)
+                    applied += 1
+                    _record_index_update("delta", lag_seconds=max(0.0, now - marked_at))
+                except Exception as e:
+                    logger.warning(f"עדכון אינדקס עבור {file_name} נכשל: {e}")
+            return applied
+
+    def refresh(self, user_id: int) -> bool:
+        """רענון אינקרמנטלי לפי watermark של ``updated_at``.
+
+        מחזיר False כשאין בסיס לרענון (אין watermark או אין גישה לאוסף),
+        ואז הקורא צריך לבצע ``rebuild_index``.
+        """
+        collection = getattr(db, "collection", None)
+        if self.watermark is None or collection is None:
+            return False
+        started = datetime.now(timezone.utc)
+        changed: Dict[str, Optional[datetime]] = {}
+        with track_performance("search_index_refresh", labels={"repo": ""}):
+            rows = collection.find(
+                {"user_id": user_id, "updated_at": {"$gt": self.watermark}},
+                {"file_name": 1, "updated_at": 1},
+            )
+            for row in rows or []:
+                name = str((row or {}).get("file_name") or "").strip()
+                if not name:
+                    continue
+                ts = _as_utc(row.get("updated_at"))
+                prev = changed.get(name)
+                if prev is None or (ts is not None and ts > prev):
+                    changed[name] = ts
+            with self._lock:
+                for name, ts in changed.items():
+                    self._sync_file(user_id, name)
+                    lag = (started - ts).total_seconds() if ts is not None else None
+                    _record_index_update("delta", lag_seconds=lag)
+                if changed:
+                    # rename משאיר את השם הישן ללא מסמך שהשתנה — מיישרים מול רשימת השמות החיה
+                    live = set(collection.distinct("file_name", {"user_id": user_id, "is_active": True}) or [])
+                    for name in list(self.doc_ids.keys()):
+                        if name not in live:
+                            self._remove_entry(name)
+                            self._dirty = True
+                self.watermark = started - _INDEX_WATERMARK_SKEW
+                self.last_update = started
+        return True
+
     @traced("search.index.rebuild")
     def rebuild_index(self, user_id: int):
         """בניית האינדקס מחדש"""
@@ -579,100 +1091,66 @@ class SearchIndex:
                 set_current_span_attributes({"user_id_hash": hashed})
         except Exception:
             pass
-        
+
         logger.info(f"בונה אינדקס חיפוש עבור משתמש {user_id}")
-        
-        # ניקוי אינדקס קיים
-        self.word_index.clear()
-        self.function_index.clear()
-        self.language_index.clear()
-        self.tag_index.clear()
-        
-        # קבלת כל הקבצים
-        with track_performance("search_index_rebuild", labels={"repo": ""}):
-            # עימוד בטוח: שליפה במנות קונפיגורביליות (ברירת מחדל 200)
-            PAGE_SIZE = int(getattr(config, "SEARCH_PAGE_SIZE", 200))
-            offset = 0
-            while True:
-                try:
-                    # אינדוקס דורש את התוכן עצמו, לכן מבקשים code במפורש (include projection)
-                    files = db.get_user_files(
-                        user_id,
-                        limit=PAGE_SIZE,
-                        skip=offset,
-                        projection={"file_name": 1, "programming_language": 1, "tags": 1, "code": 1},
-                    )
-                except TypeError:
-                    # תאימות ל-stubs שלא תומכים ב-skip — קח רק עמוד ראשון ללא דילוג
+        started = datetime.now(timezone.utc)
+
+        with self._lock:
+            # ניקוי אינדקס קיים
+            self._clear()
+            self._pending.clear()
+
+            # קבלת כל הקבצים
+            with track_performance("search_index_rebuild", labels={"repo": ""}):
+                # עימוד בטוח: שליפה במנות קונפיגורביליות (ברירת מחדל 200)
+                PAGE_SIZE = int(getattr(config, "SEARCH_PAGE_SIZE", 200))
+                offset = 0
+                while True:
                     try:
+                        # אינדוקס דורש את התוכן עצמו, לכן מבקשים code במפורש (include projection)
                         files = db.get_user_files(
                             user_id,
-                            PAGE_SIZE,
-                            projection={"file_name": 1, "programming_language": 1, "tags": 1, "code": 1},
+                            limit=PAGE_SIZE,
+                            skip=offset,
+                            projection=dict(_INDEX_PROJECTION),
                         )
                     except TypeError:
-                        # תאימות כפולה:
-                        # 1) יש stubs שלא תומכים ב-projection
-                        # 2) יש מימושים ישנים שלא תומכים ב-skip אבל כן תומכים ב-projection
+                        # תאימות ל-stubs שלא תומכים ב-skip — קח רק עמוד ראשון ללא דילוג
                         try:
                             files = db.get_user_files(
                                 user_id,
                                 PAGE_SIZE,
-                                projection={"file_name": 1, "programming_language": 1, "tags": 1, "code": 1},
+                                projection=dict(_INDEX_PROJECTION),
                             )
                         except TypeError:
-                            files = db.get_user_files(user_id, PAGE_SIZE)
-                    # אם כבר עשינו ניסיון ראשון והגענו לכאן, עצור
-                    if offset > 0:
-                        files = []
-                if not files:
-                    break
-                offset += len(files)
-                for file_data in files:
-                    # גישה בטוחה לשדות שעלולים להיות חסרים במסמכים ישנים/חלקיים
-                    file_name_value = str(file_data.get('file_name') or '').strip()
-                    if not file_name_value:
-                        # אין טעם לאנדקס רשומה ללא שם קובץ
-                        continue
-
-                    file_key = f"{user_id}:{file_name_value}"
-
-                    code_text: str = str(file_data.get('code') or '')
-                    content_lower = code_text.lower()
-
-                    # אינדקס מילים
-                    words = re.findall(r'\b\w+\b', content_lower)
-                    for word in set(words):
-                        if len(word) >= 2:
-                            self.word_index[word].add(file_key)
-
-                    # אינדקס פונקציות (best-effort)
-                    try:
-                        language_for_parse = str(file_data.get('programming_language') or '').strip()
-                        functions = code_processor.extract_functions(code_text, language_for_parse)
-                        for func in functions:
-                            func_name = str(func.get('name') or '').lower()
-                            if func_name:
-                                self.function_index[func_name].add(file_key)
-                    except Exception:
-                        # אל נעצור אינדוקס בגלל שגיאה בזיהוי פונקציות
-                        pass
-
-                    # אינדקס שפות
-                    language_value = str(file_data.get('programming_language') or '').strip()
-                    if language_value:
-                        self.language_index[language_value].add(file_key)
-
-                    # אינדקס תגיות
-                    try:
-                        for tag in list(file_data.get('tags') or []):
-                            tag_value = str(tag or '').lower().strip()
-                            if tag_value:
-                                self.tag_index[tag_value].add(file_key)
-                    except Exception:
-                        pass
-        
-        self.last_update = datetime.now(timezone.utc)
+                            # תאימות כפולה:
+                            # 1) יש stubs שלא תומכים ב-projection
+                            # 2) יש מימושים ישנים שלא תומכים ב-skip אבל כן תומכים ב-projection
+                            try:
+                                files = db.get_user_files(
+                                    user_id,
+                                    PAGE_SIZE,
+                                    projection=dict(_INDEX_PROJECTION),
+                                )
+                            except TypeError:
+                                files = db.get_user_files(user_id, PAGE_SIZE)
+                        # אם כבר עשינו ניסיון ראשון והגענו לכאן, עצור
+                        if offset > 0:
+                            files = []
+                    if not files:
+                        break
+                    offset += len(files)
+                    for file_data in files:
+                        # גישה בטוחה לשדות שעלולים להיות חסרים במסמכים ישנים/חלקיים
+                        entry = _extract_index_entry(file_data)
+                        if entry is None:
+                            continue
+                        self._add_entry(entry)
+
+            self.watermark = started - _INDEX_WATERMARK_SKEW
+            self.last_update = datetime.now(timezone.utc)
+            self._dirty = True
+        _record_index_update("rebuild")
         logger.info(f"אינדקס נבנה: {len(self.word_index)} מילים, {len(self.function_index)} פונקציות")
         try:
             emit_event(
@@ -691,7 +1169,134 @@ class SearchIndex:
             })
         except Exception:
             pass
-    
+
+    # ---- snapshot ----
+    def load_snapshot(self, user_id: int) -> bool:
+        """טעינת snapshot שמור (אם קיים ותואם גרסה). לא מחליף רענון — רק בסיס לו."""
+        if not bool(getattr(config, "SEARCH_INDEX_PERSIST_ENABLED", True)):
+            return False
+        coll = _get_snapshot_collection()
+        if coll is None:
+            return False
+        try:
+            doc = coll.find_one({"_id": int(user_id)})
+        except Exception:
+            return False
+        if not isinstance(doc, dict) or int(doc.get("v") or 0) != _INDEX_SNAPSHOT_VERSION:
+            return False
+        watermark = _as_utc(doc.get("watermark"))
+        if watermark is None:
+            return False
+        try:
+            entries = json.loads(zlib.decompress(bytes(doc.get("blob") or b"")).decode("utf-8"))
+            trigram_postings = json.loads(zlib.decompress(bytes(doc.get("trigrams") or b"")).decode("utf-8"))
+        except Exception as e:
+            logger.warning(f"snapshot אינדקס פגום עבור משתמש {user_id}: {e}")
+            return False
+        if not isinstance(entries, list) or not isinstance(trigram_postings, dict):
+            return False
+        # הטריגרמים נשמרים הפוכים ובקידוד delta (דוחס הרבה יותר טוב); משחזרים לכל מסמך את שלו
+        doc_trigrams: List[List[str]] = [[] for _ in entries]
+        for gram, deltas in trigram_postings.items():
+            doc_pos = 0
+            for delta in deltas or []:
+                doc_pos += int(delta)
+                if 0 <= doc_pos < len(doc_trigrams):
+                    doc_trigrams[doc_pos].append(gram)
+        with self._lock:
+            for entry, grams in zip(entries, doc_trigrams):
+                if isinstance(entry, dict) and entry.get("n"):
+                    entry["g"] = grams
+                    self._add_entry(entry)
+            self.watermark = watermark
+            self.last_update = _as_utc(doc.get("updated_at")) or watermark
+            self._dirty = False
+            self._last_persist = time.monotonic()
+        _record_index_update("snapshot_load")
+        return True
+
+    def persist(self, user_id: int, *, force: bool = False) -> bool:
+        """שמירת snapshot דחוס (מוגבל בקצב, אלא אם force)."""
+        if not self._dirty or self.watermark is None:
+            return False
+        if not bool(getattr(config, "SEARCH_INDEX_PERSIST_ENABLED", True)):
+            return False
+        interval = float(getattr(config, "SEARCH_INDEX_SNAPSHOT_INTERVAL_SECONDS", 300) or 0)
+        if not force and (time.monotonic() - self._last_persist) < interval:
+            return False
+        coll = _get_snapshot_collection()
+        if coll is None:
+            return False
+        with self._lock:
+            # מיקום ברשימה הוא ה-doc id ב-snapshot (דחוס, בלי חורים של ids משוחררים)
+            ordered = [self.doc_entries[doc_id] for doc_id in sorted(self.doc_entries)]
+            positions = {doc_id: pos for pos, doc_id in enumerate(sorted(self.doc_entries))}
+            payload = json.dumps(
+                [{k: v for k, v in entry.items() if k != "g"} for entry in ordered],
+                separators=(",", ":"),
+            )
+            trigrams_payload = json.dumps(
+                {
+                    gram: _delta_encode([positions[d] for d in postings])
+                    for gram, postings in self.trigram_index.items()
+                },
+                separators=(",", ":"),
+            )
+            watermark = self.watermark
+            docs_count = len(self.doc_entries)
+            self._dirty = False
+            self._last_persist = time.monotonic()
+        blob = zlib.compress(payload.encode("utf-8"), 6)
+        trigrams_blob = zlib.compress(trigrams_payload.encode("utf-8"), 6)
+        total_bytes = len(blob) + len(trigrams_blob)
+        if total_bytes > _INDEX_SNAPSHOT_MAX_BYTES:
+            logger.info(f"snapshot אינדקס למשתמש {user_id} גדול מדי ({total_bytes} bytes) — לא נשמר")
+            return False
+        try:
+            coll.replace_one(
+                {"_id": int(user_id)},
+                {
+                    "_id": int(user_id),
+                    "v": _INDEX_SNAPSHOT_VERSION,
+                    "blob": blob,
+                    "trigrams": trigrams_blob,
+                    "docs": docs_count,
+                    "watermark": watermark,
+                    "updated_at": datetime.now(timezone.utc),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"שמירת snapshot אינדקס נכשלה: {e}")
+            self._dirty = True
+            return False
+        _record_index_update("snapshot_save")
+        return True
+
+    def ensure_fresh(self, user_id: int) -> None:
+        """נקודת הכניסה של המנוע: snapshot → deltas → רענון, ורק כמוצא אחרון rebuild."""
+        rebuilt = False
+        with self._lock:
+            refresh_now = False
+            if not self._snapshot_checked:
+                self._snapshot_checked = True
+                # גם snapshot טרי עלול לפספס שינויים מ-workers אחרים — רענון מיידי
+                refresh_now = self.load_snapshot(user_id)
+            if self._pending:
+                self.apply_pending(user_id)
+            max_age = float(getattr(config, "SEARCH_INDEX_REFRESH_SECONDS", 60) or 60)
+            if refresh_now or (datetime.now(timezone.utc) - self.last_update).total_seconds() > max_age:
+                try:
+                    refreshed = self.refresh(user_id)
+                except Exception as e:
+                    logger.warning(f"רענון אינקרמנטלי של אינדקס נכשל, בונה מחדש: {e}")
+                    refreshed = False
+                if not refreshed:
+                    self.rebuild_index(user_id)
+                    rebuilt = True
+        # אחרי rebuild שומרים מיד: זה בדיוק המחיר שה-snapshot נועד לחסוך בעלייה הבאה
+        self.persist(user_id, force=rebuilt)
+
     def should_rebuild(self, max_age_minutes: int = 30) -> bool:
         """בדיקה אם צריך לבנות אינדקס מחדש"""
         age = datetime.now(timezone.utc) - self.last_update
@@ -701,7 +1306,10 @@ class AdvancedSearchEngine:
     """מנוע חיפוש מתקדם"""
     
     def __init__(self):
-        self.indexes: Dict[int, SearchIndex] = {}
+        # LRU: הראשון הוא הכי פחות בשימוש; מוגבל במספר משתמשים ובסך ה-postings
+        self.indexes: "OrderedDict[int, SearchIndex]" = OrderedDict()
+        self._indexes_lock = threading.Lock()
+        self.cache_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
         self.stop_words = {
             'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
             'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been',
@@ -711,14 +1319,71 @@ class AdvancedSearchEngine:
     def get_index(self, user_id: int) -> SearchIndex:
         """קבלת אינדקס למשתמש"""
         
-        if user_id not in self.indexes:
-            self.indexes[user_id] = SearchIndex()
+        with self._indexes_lock:
+            index = self.indexes.get(user_id)
+            if index is None:
+                index = SearchIndex()
+                self.indexes[user_id] = index
+                self.cache_stats["misses"] += 1
+                event = "miss"
+            else:
+                self.indexes.move_to_end(user_id)
+                self.cache_stats["hits"] += 1
+                event = "hit"
+        _record_index_cache_event(event)
         
-        index = self.indexes[user_id]
-        if index.should_rebuild():
-            index.rebuild_index(user_id)
+        index.ensure_fresh(user_id)
+        self._enforce_cache_bounds(keep=user_id)
         
         return index
+
+    def _enforce_cache_bounds(self, keep: Optional[int] = None) -> None:
+        """פינוי אינדקסים לפי LRU עד שהמטמון בתוך גבולות המשתמשים וה-postings.
+
+        אינדקס שמפונה נשמר קודם כ-snapshot, כך שהחזרה שלו זולה.
+        """
+        max_users = max(1, int(getattr(config, "SEARCH_INDEX_CACHE_MAX_USERS", 200) or 200))
+        max_postings = int(getattr(config, "SEARCH_INDEX_CACHE_MAX_POSTINGS", 5_000_000) or 0)
+        evicted: List[Tuple[int, SearchIndex]] = []
+        with self._indexes_lock:
+            total_postings = sum(idx.posting_count for idx in self.indexes.values())
+            for uid in list(self.indexes.keys()):
+                over_users = len(self.indexes) > max_users
+                over_postings = max_postings > 0 and total_postings > max_postings
+                if not (over_users or over_postings):
+                    break
+                if uid == keep:
+                    continue
+                idx = self.indexes.pop(uid)
+                total_postings -= idx.posting_count
+                evicted.append((uid, idx))
+            self.cache_stats["evictions"] += len(evicted)
+            size = len(self.indexes)
+        for uid, idx in evicted:
+            try:
+                idx.persist(uid, force=True)
+            except Exception:
+                pass
+            _record_index_cache_event("eviction", size=size)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """סטטיסטיקות מטמון האינדקסים (לדשבורד/דיבאג)."""
+        with self._indexes_lock:
+            indexes = list(self.indexes.values())
+            stats: Dict[str, Any] = dict(self.cache_stats)
+        stats["users"] = len(indexes)
+        stats["documents"] = sum(len(idx.doc_ids) for idx in indexes)
+        stats["postings"] = sum(idx.posting_count for idx in indexes)
+        return stats
+
+    def note_file_changed(self, user_id: int, file_name: str, old_name: Optional[str] = None) -> None:
+        """סימון delta לאינדקס שכבר בזיכרון; אינדקס שלא נטען יתעדכן ממילא ברענון."""
+        index = self.indexes.get(user_id)
+        if index is None:
+            return
+        index.mark_pending(file_name)
+        if old_name and old_name != file_name:
+            index.mark_pending(old_name)
     
     @traced("search_engine.search")
     def search(self, user_id: int, query: str, search_type: SearchType = SearchType.TEXT,
@@ -768,13 +1433,13 @@ class AdvancedSearchEngine:
                 if search_type == SearchType.TEXT:
                     candidates = self._text_search(query, index, user_id)
                 elif search_type == SearchType.REGEX:
-                    candidates = self._regex_search(query, user_id)
+                    candidates = self._regex_search(query, user_id, index)
                 elif search_type == SearchType.FUZZY:
                     candidates = self._fuzzy_search(query, index, user_id)
                 elif search_type == SearchType.FUNCTION:
                     candidates = self._function_search(query, index, user_id)
                 elif search_type == SearchType.CONTENT:
-                    candidates = self._content_search(query, user_id)
+                    candidates = self._content_search(query, user_id, index)
                 else:
                     candidates = self._text_search(query, index, user_id)
             
@@ -829,38 +1494,48 @@ class AdvancedSearchEngine:
             return []
         
         # מציאת קבצים מתאימים
-        file_scores: Dict[str, float] = defaultdict(float)
+        file_scores: Dict[int, float] = defaultdict(float)
         
         for word in query_words:
-            matching_files = index.word_index.get(word, set())
+            exact_docs = set(index.word_index.get(word))
+            matching_docs = set(exact_docs)
             
-            # חיפוש חלקי (prefix matching)
-            for indexed_word, files in index.word_index.items():
-                if indexed_word.startswith(word) or word in indexed_word:
-                    matching_files.update(files)
+            # חיפוש חלקי (prefix/substring matching)
+            for indexed_word, postings in index.word_index.items():
+                if word in indexed_word:
+                    matching_docs.update(postings)
             
             # הוספת ניקוד
-            for file_key in matching_files:
-                if word in index.word_index and file_key in index.word_index[word]:
-                    file_scores[file_key] += 2.0  # התאמה מדויקת
+            for doc_id in matching_docs:
+                if doc_id in exact_docs:
+                    file_scores[doc_id] += 2.0  # התאמה מדויקת
                 else:
-                    file_scores[file_key] += 1.0  # התאמה חלקית
+                    file_scores[doc_id] += 1.0  # התאמה חלקית
         
-        # יצירת תוצאות
+        return self._results_for_docs(index, file_scores, query, user_id)
+
+    def _results_for_docs(self, index: SearchIndex, doc_scores: Dict[int, float], query: str, user_id: int) -> List[SearchResult]:
+        """המרת doc ids מדורגים לתוצאות (שליפת הגרסה האחרונה של כל קובץ)."""
         results = []
-        for file_key, score in file_scores.items():
-            if score > 0:
-                user_id_str, file_name = file_key.split(':', 1)
-                if int(user_id_str) == user_id:
-                    file_data = db.get_latest_version(user_id, file_name)
-                    if file_data:
-                        result = self._create_search_result(file_data, query, score)
-                        results.append(result)
-        
+        for doc_id, score in doc_scores.items():
+            if score <= 0:
+                continue
+            file_name = index.file_name(doc_id)
+            if not file_name:
+                continue
+            file_data = db.get_latest_version(user_id, file_name)
+            if file_data:
+                results.append(self._create_search_result(file_data, query, score))
         return results
     
-    def _regex_search(self, pattern: str, user_id: int) -> List[SearchResult]:
-        """חיפוש עם ביטויים רגולריים"""
+    def _regex_search(self, pattern: str, user_id: int, index: Optional[SearchIndex] = None) -> List[SearchResult]:
+        """חיפוש עם ביטויים רגולריים.
+
+        כשיש אינדקס, מחלצים מהדפוס את הליטרלים ההכרחיים ומריצים את ה-regex רק על
+        מסמכים שמכילים את הטריגרמים שלהם. הריצה כולה מוגבלת ב-SEARCH_REGEX_TIME_BUDGET_MS
+        (נבדק בין מסמכים; תוצאות חלקיות מוחזרות כשהתקציב נגמר). התקציב לא עוצר התאמה
+        בודדת שבורחת - ההגנה מ-ReDoS היא סינון הדפוס בשכבת ה-API.
+        """
         
         try:
             compiled_pattern = re.compile(pattern, re.IGNORECASE | re.MULTILINE)
@@ -868,54 +1543,66 @@ class AdvancedSearchEngine:
             logger.error(f"דפוס regex לא תקין: {e}")
             return []
         
-        # הקרנה קלה לתוכן ושדות נחוצים בלבד
-        PAGE_SIZE = int(getattr(config, "SEARCH_PAGE_SIZE", 200))
-        offset = 0
+        candidates = None
+        total_docs = 0
+        if index is not None:
+            candidates = index.literal_candidates(_regex_required_literals(pattern))
+            total_docs = len(index.doc_ids)
+        if index is not None and candidates is not None:
+            files: Iterable[Dict[str, Any]] = self._iter_candidate_files(user_id, index, candidates)
+            pruned = max(0, total_docs - len(candidates))
+        else:
+            files = self._iter_user_files(user_id)
+            pruned = 0
+
+        budget_ms = float(getattr(config, "SEARCH_REGEX_TIME_BUDGET_MS", 2000) or 0)
+        deadline = (time.monotonic() + budget_ms / 1000.0) if budget_ms > 0 else None
         results = []
-        while True:
-            try:
-                files = db.get_user_files(
-                    user_id,
-                    limit=PAGE_SIZE,
-                    skip=offset,
-                    projection={"file_name": 1, "code": 1, "tags": 1, "programming_language": 1, "updated_at": 1},
-                )
-            except TypeError:
-                # נסה לשמר code גם בנתיב תאימות (מימוש ישן בלי skip אבל עם projection)
-                try:
-                    files = db.get_user_files(
-                        user_id,
-                        PAGE_SIZE,
-                        projection={"file_name": 1, "code": 1, "tags": 1, "programming_language": 1, "updated_at": 1},
-                    )
-                except TypeError:
-                    files = db.get_user_files(user_id, PAGE_SIZE)
-                if offset > 0:
-                    files = []
-            if not files:
+        scanned = 0
+        budget_exceeded = False
+        for file_data in files:
+            if deadline is not None and time.monotonic() > deadline:
+                budget_exceeded = True
                 break
-            offset += len(files)
-            for file_data in files:
-                content = str(file_data.get('code') or '')
-                matches = list(compiled_pattern.finditer(content))
+            scanned += 1
+            content = str(file_data.get('code') or '')
+            matches = list(compiled_pattern.finditer(content))
+            
+            if matches:
+                score = len(matches)
+                result = self._create_search_result(file_data, pattern, score)
                 
-                if matches:
-                    score = len(matches)
-                    result = self._create_search_result(file_data, pattern, score)
-                    
-                    # הוספת מידע על ההתאמות
-                    result.matches = [
-                        {
-                            "start": match.start(),
-                            "end": match.end(),
-                            "text": match.group(),
-                            "line": content[:match.start()].count('\n') + 1
-                        }
-                        for match in matches[:10]  # מקסימום 10 התאמות
-                    ]
-                    
-                    results.append(result)
-        
+                # הוספת מידע על ההתאמות
+                result.matches = [
+                    {
+                        "start": match.start(),
+                        "end": match.end(),
+                        "text": match.group(),
+                        "line": content[:match.start()].count('\n') + 1
+                    }
+                    for match in matches[:10]  # מקסימום 10 התאמות
+                ]
+                
+                results.append(result)
+
+        if budget_exceeded:
+            logger.warning(f"חיפוש regex חרג מתקציב הזמן ({budget_ms:.0f}ms); מוחזרות תוצאות חלקיות")
+        try:
+            from metrics import record_search_regex_prefilter
+            record_search_regex_prefilter(
+                pruned=pruned, scanned=scanned, matched=len(results), budget_exceeded=budget_exceeded
+            )
+        except Exception:
+            pass
+        try:
+            set_current_span_attributes({
+                "regex.prefiltered": candidates is not None,
+                "regex.docs_pruned": int(pruned),
+                "regex.docs_scanned": int(scanned),
+                "regex.budget_exceeded": bool(budget_exceeded),
+            })
+        except Exception:
+            pass
         return results
     
     def _fuzzy_search(self, query: str, index: SearchIndex, user_id: int) -> List[SearchResult]:
@@ -977,35 +1664,114 @@ class AdvancedSearchEngine:
         """חיפוש פונקציות"""
         
         query_lower = query.lower()
-        file_scores: Dict[str, float] = defaultdict(float)
+        file_scores: Dict[int, float] = defaultdict(float)
         
         # חיפוש בשמות פונקציות
-        for func_name, files in index.function_index.items():
+        for func_name, postings in index.function_index.items():
             if query_lower in func_name:
                 similarity = fuzz.ratio(query_lower, func_name) / 100.0
-                for file_key in files:
-                    file_scores[file_key] += similarity * 2.0
+                for doc_id in postings:
+                    file_scores[doc_id] += similarity * 2.0
         
-        # יצירת תוצאות
+        return self._results_for_docs(index, file_scores, query, user_id)
+    
+    def _content_search(self, query: str, user_id: int, index: Optional[SearchIndex] = None) -> List[SearchResult]:
+        """חיפוש מלא בתוכן (מחרוזת חלקית, ללא תלות ברישיות).
+
+        עם אינדקס: מועמדים מחיתוך ה-postings של טריגרמי השאילתה, ורק הם נשלפים
+        ונבדקים. בלי אינדקס (או לשאילתה של פחות מ-3 תווים) — סריקה של כל הקבצים.
+        הדירוג בשני המסלולים הוא BM25 על מספר ההופעות ואורך הקובץ.
+        """
+        query_lower = query.lower()
+        candidates = index.substring_candidates(query_lower) if index is not None else None
+        if index is not None and candidates is not None:
+            matches = self._content_matches_from_candidates(query_lower, user_id, index, candidates)
+            total_docs = len(index.doc_ids)
+            avg_len = index.avg_length
+        else:
+            matches, total_docs, avg_len = self._content_matches_from_scan(query_lower, user_id)
+        try:
+            set_current_span_attributes({
+                "content.indexed": candidates is not None,
+                "content.candidates": int(len(candidates)) if candidates is not None else int(total_docs),
+                "content.matches": int(len(matches)),
+            })
+        except Exception:
+            pass
+
         results = []
-        for file_key, score in file_scores.items():
-            if score > 0:
-                user_id_str, file_name = file_key.split(':', 1)
-                if int(user_id_str) == user_id:
-                    file_data = db.get_latest_version(user_id, file_name)
-                    if file_data:
-                        result = self._create_search_result(file_data, query, score)
-                        results.append(result)
+        doc_freq = len(matches)
+        for file_data, content_value, occurrences in matches:
+            score = _bm25_score(occurrences, len(content_value), avg_len, doc_freq, total_docs)
+            result = self._create_search_result(file_data, query, score)
+            
+            # יצירת קטע תצוגה מקדימה
+            preview_start = content_value.lower().find(query_lower)
+            if preview_start >= 0:
+                start = max(0, preview_start - 50)
+                end = min(len(content_value), preview_start + len(query) + 50)
+                result.snippet_preview = content_value[start:end]
+                
+                # סימון המילה שנמצאה
+                relative_start = preview_start - start
+                relative_end = relative_start + len(query)
+                result.highlight_ranges = [(relative_start, relative_end)]
+            
+            results.append(result)
         
         return results
-    
-    def _content_search(self, query: str, user_id: int) -> List[SearchResult]:
-        """חיפוש מלא בתוכן"""
-        
+
+    def _content_matches_from_candidates(
+        self, query_lower: str, user_id: int, index: SearchIndex, candidates: List[int]
+    ) -> List[Tuple[Dict[str, Any], str, int]]:
+        """שליפת המועמדים בלבד (במנות) ואימות ההתאמה מול התוכן."""
+        matches: List[Tuple[Dict[str, Any], str, int]] = []
+        for file_data in self._iter_candidate_files(user_id, index, candidates):
+            content_value = str(file_data.get('code') or '')
+            occurrences = content_value.lower().count(query_lower)
+            if occurrences > 0:
+                matches.append((file_data, content_value, occurrences))
+        return matches
+
+    def _content_matches_from_scan(
+        self, query_lower: str, user_id: int
+    ) -> Tuple[List[Tuple[Dict[str, Any], str, int]], int, float]:
+        """סריקה מלאה של קבצי המשתמש בעימוד (המסלול ההיסטורי)."""
+        matches: List[Tuple[Dict[str, Any], str, int]] = []
+        total_docs = 0
+        total_length = 0
+        for file_data in self._iter_user_files(user_id):
+            content_value = str(file_data.get('code') or '')
+            total_docs += 1
+            total_length += len(content_value)
+            
+            # ספירת הופעות
+            occurrences = content_value.lower().count(query_lower)
+            if occurrences > 0:
+                matches.append((file_data, content_value, occurrences))
+        avg_len = (total_length / total_docs) if total_docs else 0.0
+        return matches, total_docs, avg_len
+
+    def _iter_candidate_files(
+        self, user_id: int, index: SearchIndex, candidates: List[int]
+    ) -> Iterator[Dict[str, Any]]:
+        """הגרסה האחרונה של כל מועמד, נשלפת במנות של SEARCH_PAGE_SIZE."""
+        names = index.file_names(candidates)
+        PAGE_SIZE = int(getattr(config, "SEARCH_PAGE_SIZE", 200))
+        projection = {"file_name": 1, "code": 1, "tags": 1, "programming_language": 1, "updated_at": 1}
+        batch_lookup = getattr(db, "get_latest_files_by_names", None)
+        for offset in range(0, len(names), PAGE_SIZE):
+            chunk = names[offset:offset + PAGE_SIZE]
+            if callable(batch_lookup):
+                files = batch_lookup(user_id, chunk, projection=projection)
+            else:
+                files = [f for f in (db.get_latest_version(user_id, n) for n in chunk) if f]
+            yield from (files or [])
+
+    def _iter_user_files(self, user_id: int) -> Iterator[Dict[str, Any]]:
+        """כל קבצי המשתמש בעימוד (כולל תאימות למימושי get_user_files ישנים)."""
         PAGE_SIZE = int(getattr(config, "SEARCH_PAGE_SIZE", 200))
         offset = 0
-        results = []
-        query_lower = query.lower()
         while True:
             try:
                 files = db.get_user_files(
@@ -1015,6 +1781,7 @@ class AdvancedSearchEngine:
                     projection={"file_name": 1, "code": 1, "tags": 1, "programming_language": 1, "updated_at": 1},
                 )
             except TypeError:
+                # נסה לשמר code גם בנתיב תאימות (מימוש ישן בלי skip אבל עם projection)
                 try:
                     files = db.get_user_files(
                         user_id,
@@ -1028,35 +1795,7 @@ class AdvancedSearchEngine:
             if not files:
                 break
             offset += len(files)
-            for file_data in files:
-                content_value = str(file_data.get('code') or '')
-                content_lower = content_value.lower()
-                
-                # ספירת הופעות
-                occurrences = content_lower.count(query_lower)
-                
-                if occurrences > 0:
-                    # חישוב ניקוד לפי תדירות ואורך המסמך
-                    denom = max(1, len(content_value))
-                    score = min(occurrences / (denom / 1000), 10.0)
-                    
-                    result = self._create_search_result(file_data, query, score)
-                    
-                    # יצירת קטע תצוגה מקדימה
-                    preview_start = content_lower.find(query_lower)
-                    if preview_start >= 0:
-                        start = max(0, preview_start - 50)
-                        end = min(len(content_value), preview_start + len(query) + 50)
-                        result.snippet_preview = content_value[start:end]
-                        
-                        # סימון המילה שנמצאה
-                        relative_start = preview_start - start
-                        relative_end = relative_start + len(query)
-                        result.highlight_ranges = [(relative_start, relative_end)]
-                    
-                    results.append(result)
-        
-        return results
+            yield from files
     
     def _apply_filters(self, results: List[SearchResult], filters: SearchFilter) -> List[SearchResult]:
         """החלת מסננים על התוצאות"""
@@ -1377,6 +2116,9 @@ class AdvancedSearchEngine:
             "indexed_languages": len(index.language_index),
             "indexed_tags": len(index.tag_index),
             "last_update": index.last_update.isoformat(),
+            "indexed_files": len(index.doc_ids),
+            "indexed_postings": index.posting_count,
+            "pending_updates": index.pending_count,
             "most_common_words": self._get_most_common_words(index, 10),
             "most_common_languages": self._get_most_common_languages(index),
             "most_common_tags": self._get_most_common_tags(index)
@@ -1523,3 +2265,11 @@ class SearchQueryParser:
 # יצירת אינסטנס גלובלי
 search_engine = AdvancedSearchEngine()
 query_parser = SearchQueryParser()
+
+
+def notify_file_changed(user_id: int, file_name: str, old_name: Optional[str] = None) -> None:
+    """Hook לשכבת ה-DB אחרי save/delete/rename של קובץ."""
+    try:
+        search_engine.note_file_changed(int(user_id), str(file_name or ""), old_name=old_name)
+    except Exception:
+        pass
@@ -10,14 +10,115 @@ Code Indexer - אינדוקס קבצי קוד ב-MongoDB
 from __future__ import annotations
 
 import fnmatch
+import hashlib
 import logging
+import posixpath
 import re
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:  # pymongo אופציונלי בסביבות בדיקה
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+except Exception:  # pragma: no cover
+    UpdateOne = None  # type: ignore[assignment,misc]
+
+    class BulkWriteError(Exception):  # type: ignore[no-redef]
+        details: Dict[str, Any] = {}
 
 logger = logging.getLogger(__name__)
 
+# מפתח פנימי במסמך מ-build_document: רשומות repo_symbols של הקובץ (לא נשמר ב-repo_files)
+SYMBOLS_KEY = "_symbols"
+_MAX_SYMBOLS_PER_FILE = 500
+
+_PY_DEF_RE = re.compile(r"^([ \t]*)(?:async\s+)?def\s+(\w+)\s*\(")
+_PY_CLASS_RE = re.compile(r"^([ \t]*)class\s+(\w+)")
+_JS_FUNCTION_RES = (
+    re.compile(r"function\s+(\w+)\s*\("),
+    re.compile(r"(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s*)?\("),
+    re.compile(r"(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?function"),
+)
+_CLASS_RE = re.compile(r"\bclass\s+(\w+)")
+_GO_FUNC_RE = re.compile(r"^func\s+(?:\(\s*(?:\w+\s+)?\*?(\w+)[^)]*\)\s+)?(\w+)\s*\(")
+_GO_STRUCT_RE = re.compile(r"^type\s+(\w+)\s+struct")
+
+
+def symbol_ngrams(name: str, n: int = 3) -> List[str]:
+    """n-grams של שם מנורמל (lowercase) - לחיפוש תת-מחרוזת באינדקס multikey.
+
+    כל ה-n-grams נשמרים (בלי קיצוץ): שאילתה על תת-מחרוזת מסוף שם ארוך חייבת למצוא אותו.
+    """
+    key = (name or "").lower()
+    if len(key) <= n:
+        return [key] if key else []
+    return sorted({key[i:i + n] for i in range(len(key) - n + 1)})
+
+
+def extract_symbols(content: str, language: str) -> List[Dict[str, Any]]:
+    """
+    סמלים עם מיקום: name, kind (function/method/class), line (1-based), parent
+
+    אותם דפוסי Regex כמו _extract_functions/_extract_classes, אבל שורה-שורה כדי
+    לשמור מספר שורה ומחלקה מכילה (Python לפי הזחה, Go לפי receiver).
+    """
+    symbols: List[Dict[str, Any]] = []
+    if not content or language not in ("python", "javascript", "typescript", "go", "java", "kotlin"):
+        return symbols
+    class_stack: List[Tuple[int, str]] = []
+    for lineno, line in enumerate(content.splitlines(), start=1):
+        if len(symbols) >= _MAX_SYMBOLS_PER_FILE:
+            break
+        if language == "python":
+            match = _PY_CLASS_RE.match(line) or _PY_DEF_RE.match(line)
+            if not match:
+                continue
+            indent = len(match.group(1).expandtabs(4))
+            while class_stack and class_stack[-1][0] >= indent:
+                class_stack.pop()
+            parent = class_stack[-1][1] if class_stack else None
+            name = match.group(2)
+            if match.re is _PY_CLASS_RE:
+                symbols.append({"name": name, "kind": "class", "line": lineno, "parent": parent})
+                class_stack.append((indent, name))
+            else:
+                kind = "method" if parent else "function"
+                symbols.append({"name": name, "kind": kind, "line": lineno, "parent": parent})
+        elif language == "go":
+            match = _GO_FUNC_RE.match(line)
+            if match:
+                receiver, name = match.group(1), match.group(2)
+                kind = "method" if receiver else "function"
+                symbols.append({"name": name, "kind": kind, "line": lineno, "parent": receiver})
+                continue
+            match = _GO_STRUCT_RE.match(line)
+            if match:
+                symbols.append({"name": match.group(1), "kind": "class", "line": lineno, "parent": None})
+        else:
+            for match in _CLASS_RE.finditer(line):
+                symbols.append({"name": match.group(1), "kind": "class", "line": lineno, "parent": None})
+            if language in ("javascript", "typescript"):
+                for regex in _JS_FUNCTION_RES:
+                    for match in regex.finditer(line):
+                        symbols.append({"name": match.group(1), "kind": "function", "line": lineno, "parent": None})
+    return symbols[:_MAX_SYMBOLS_PER_FILE]
+
+
+def _symbol_records(repo_name: str, file_path: str, language: str, content: str) -> List[Dict[str, Any]]:
+    return [
+        dict(
+            sym,
+            repo_name=repo_name,
+            path=file_path,
+            language=language,
+            name_lower=sym["name"].lower(),
+            ngrams=symbol_ngrams(sym["name"]),
+        )
+        for sym in extract_symbols(content, language)
+    ]
+
 
 class CodeIndexer:
     """
@@ -177,6 +278,10 @@ class CodeIndexer:
             db: MongoDB database instance
         """
         self.db = db
+        # קבצים שדולגו ב-index_file כי התוכן זהה למה שכבר באינדקס
+        self.unchanged_count = 0
+        # כתיבות repo_symbols שנכשלו (best-effort) - backfill לא יסמן את הטבלה כשלמה
+        self.symbol_errors = 0
 
     def should_index(self, file_path: str) -> bool:
         """
@@ -230,6 +335,18 @@ class CodeIndexer:
 
         return False
 
+    def max_index_size(self, file_path: str) -> Optional[int]:
+        """
+        גודל מקסימלי בבתים (UTF-8) לאינדוקס הקובץ (None = ללא הגבלה, לקבצים ב-allowlist).
+
+        משמש גם כבדיקה מוקדמת על גודל ה-blob בבתים לפני קריאתו מ-git.
+        """
+        normalized_path = file_path.replace("\\", "/").lstrip("/")
+        basename = normalized_path.rsplit("/", 1)[-1]
+        if normalized_path in self.LARGE_FILE_ALLOWLIST or basename in self.LARGE_FILE_ALLOWLIST_BASENAMES:
+            return None
+        return self.MAX_FILE_SIZE
+
     def index_file(self, repo_name: str, file_path: str, content: str, commit_sha: str = "HEAD") -> bool:
         """
         אינדוקס קובץ בודד ב-MongoDB
@@ -248,16 +365,51 @@ class CodeIndexer:
             logger.error("No database connection")
             return False
 
-        # בדיקת גודל
-        normalized_path = file_path.replace("\\", "/").lstrip("/")
-        basename = normalized_path.rsplit("/", 1)[-1]
-        allowlisted = (
-            normalized_path in self.LARGE_FILE_ALLOWLIST
-            or basename in self.LARGE_FILE_ALLOWLIST_BASENAMES
-        )
-        if len(content) > self.MAX_FILE_SIZE and not allowlisted:
-            logger.info(f"Skipping large file ({len(content)} bytes): {file_path}")
+        # תוכן זהה למה שכבר באינדקס - אין צורך לפרק ולכתוב שוב
+        fingerprint = self.get_index_fingerprints(repo_name, [file_path]).get(file_path)
+        if fingerprint and fingerprint.get("content_hash") == content_hash(content):
+            self.unchanged_count += 1
+            return True
+
+        doc = self.build_document(repo_name, file_path, content, commit_sha)
+        if doc is None:
             return False
+        symbols = {file_path: doc.pop(SYMBOLS_KEY, None) or []}
+
+        try:
+            self.db.repo_files.update_one(
+                {"repo_name": repo_name, "path": file_path},
+                {"$set": doc},
+                upsert=True,
+            )
+            self._write_symbols(repo_name, symbols)
+            return True
+
+        except Exception as e:
+            logger.exception(f"Failed to index {file_path}: {e}")
+            return False
+
+    def build_document(
+        self,
+        repo_name: str,
+        file_path: str,
+        content: str,
+        commit_sha: str = "HEAD",
+        blob_sha: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        בניית מסמך האינדקס לקובץ (ללא גישה ל-DB; החלק ה-CPU-bound של האינדוקס)
+
+        Returns:
+            המסמך לשמירה, או None אם הקובץ גדול מדי
+        """
+        # בדיקת גודל - בבתים (UTF-8), אותה יחידה כמו הבדיקה המוקדמת על גודל ה-blob
+        limit = self.max_index_size(file_path)
+        if limit is not None:
+            size_bytes = len(content.encode("utf-8", "replace"))
+            if size_bytes > limit:
+                logger.info(f"Skipping large file ({size_bytes} bytes): {file_path}")
+                return None
 
         # זיהוי שפה
         language = self._detect_language(file_path)
@@ -274,30 +426,158 @@ class CodeIndexer:
         doc: Dict[str, Any] = {
             "repo_name": repo_name,
             "path": file_path,
+            # התיקייה המכילה - רמה בעץ היא שאילתה אחת על (repo_name, parent_dir)
+            "parent_dir": parent_dir(file_path),
             "language": language,
             "size": len(content),
             # splitlines() סופר שורות בצורה מדויקת:
             # - קובץ ריק "" -> 0
             # - קובץ שמסתיים ב-\n (ברוב המקרים) לא מוסיף שורה "ריקה" בסוף
             "lines": len(content.splitlines()) if content else 0,
+            # commit_sha = הקומיט שבו התוכן הזה אונדקס לאחרונה (קבצים שלא השתנו לא נכתבים מחדש)
             "commit_sha": commit_sha,
+            "content_hash": content_hash(content),
             "last_indexed": datetime.utcnow(),
             "imports": imports,
             "functions": functions,
             "classes": classes,
             "search_text": search_text,
         }
+        if blob_sha:
+            doc["blob_sha"] = blob_sha
+        doc[SYMBOLS_KEY] = _symbol_records(repo_name, file_path, language, content)
+        return doc
+
+    def reuse_document(
+        self,
+        existing: Dict[str, Any],
+        repo_name: str,
+        file_path: str,
+        content: str,
+        commit_sha: str = "HEAD",
+        blob_sha: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        מסמך לנתיב חדש מתוך מסמך קיים עם אותו תוכן (למשל rename) - בלי לפרק שוב
+
+        Returns:
+            המסמך, או None אם אי אפשר להשתמש בקיים (שפה שונה / תוכן שונה)
+        """
+        language = self._detect_language(file_path)
+        if existing.get("language") != language or existing.get("content_hash") != content_hash(content):
+            return None
+        imports = list(existing.get("imports") or [])
+        functions = list(existing.get("functions") or [])
+        classes = list(existing.get("classes") or [])
+        doc = dict(existing)
+        doc.pop("_id", None)
+        # רשומות הסמלים של הנתיב הישן נמחקות יחד איתו - בונים מחדש (סריקת שורות בלבד)
+        doc[SYMBOLS_KEY] = _symbol_records(repo_name, file_path, language, content)
+        doc.update(
+            {
+                "repo_name": repo_name,
+                "path": file_path,
+                "parent_dir": parent_dir(file_path),
+                "commit_sha": commit_sha,
+                "last_indexed": datetime.utcnow(),
+                "search_text": self._create_search_text(file_path, imports, functions, classes),
+            }
+        )
+        if blob_sha:
+            doc["blob_sha"] = blob_sha
+        return doc
+
+    def get_index_fingerprints(
+        self, repo_name: str, file_paths: List[str], *, full: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        טביעות התוכן (blob_sha/content_hash) של קבצים שכבר באינדקס, לפי נתיב
+
+        Args:
+            full: להחזיר את המסמך המלא (לשימוש חוזר ב-reuse_document)
+        """
+        if self.db is None or not file_paths:
+            return {}
+        projection = None if full else {"_id": 0, "path": 1, "blob_sha": 1, "content_hash": 1}
+        result: Dict[str, Dict[str, Any]] = {}
+        try:
+            for offset in range(0, len(file_paths), 1000):
+                chunk = list(file_paths[offset:offset + 1000])
+                for doc in self.db.repo_files.find({"repo_name": repo_name, "path": {"$in": chunk}}, projection):
+                    result[str(doc.get("path"))] = doc
+        except Exception as e:
+            logger.warning(f"Failed to load index fingerprints for {repo_name}: {e}")
+            return {}
+        return result
 
+    def index_documents(self, docs: List[Dict[str, Any]]) -> List[str]:
+        """
+        שמירת מסמכים מוכנים (מ-build_document) ב-bulk_write אחד
+
+        Returns:
+            נתיבי הקבצים שנשמרו בהצלחה
+        """
+        if self.db is None or not docs:
+            return []
+        symbols: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for doc in docs:
+            records = doc.pop(SYMBOLS_KEY, None)
+            if records is not None:
+                symbols[(str(doc["repo_name"]), str(doc["path"]))] = records
+        written = self._write_file_docs(docs)
+        if symbols:
+            done = set(written)
+            by_repo: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+            for (repo_name, path), records in symbols.items():
+                if path in done:
+                    by_repo.setdefault(repo_name, {})[path] = records
+            for repo_name, per_path in by_repo.items():
+                self._write_symbols(repo_name, per_path)
+        return written
+
+    def _write_symbols(self, repo_name: str, per_path: Dict[str, List[Dict[str, Any]]]) -> None:
+        """החלפת רשומות repo_symbols של הנתיבים הנתונים (מחיקה + insert_many). best-effort."""
+        if self.db is None or not per_path:
+            return
+        try:
+            self.db.repo_symbols.delete_many({"repo_name": repo_name, "path": {"$in": list(per_path)}})
+            records = [r for recs in per_path.values() for r in recs]
+            if records:
+                self.db.repo_symbols.insert_many(records, ordered=False)
+        except Exception as e:
+            self.symbol_errors += 1
+            logger.warning(f"Failed to write symbols for {repo_name}: {e}")
+
+    def _write_file_docs(self, docs: List[Dict[str, Any]]) -> List[str]:
+        paths = [str(doc.get("path")) for doc in docs]
+        if UpdateOne is None:
+            return [doc["path"] for doc in docs if self._upsert_one(doc)]
+
+        operations = [
+            UpdateOne({"repo_name": doc["repo_name"], "path": doc["path"]}, {"$set": doc}, upsert=True)
+            for doc in docs
+        ]
+        try:
+            self.db.repo_files.bulk_write(operations, ordered=False)
+            return paths
+        except BulkWriteError as e:
+            failed = {int(err.get("index", -1)) for err in (e.details or {}).get("writeErrors", [])}
+            logger.error(f"Bulk index had {len(failed)} write errors out of {len(docs)}")
+            return [path for i, path in enumerate(paths) if i not in failed]
+        except Exception as e:
+            logger.exception(f"Bulk index failed ({len(docs)} files): {e}")
+            return []
+
+    def _upsert_one(self, doc: Dict[str, Any]) -> bool:
         try:
             self.db.repo_files.update_one(
-                {"repo_name": repo_name, "path": file_path},
+                {"repo_name": doc["repo_name"], "path": doc["path"]},
                 {"$set": doc},
                 upsert=True,
             )
             return True
-
         except Exception as e:
-            logger.exception(f"Failed to index {file_path}: {e}")
+            logger.exception(f"Failed to index {doc.get('path')}: {e}")
             return False
 
     def remove_file(self, repo_name: str, file_path: str) -> bool:
@@ -307,6 +587,7 @@ class CodeIndexer:
 
         try:
             result = self.db.repo_files.delete_one({"repo_name": repo_name, "path": file_path})
+            self._remove_symbols(repo_name, [file_path])
             return bool(getattr(result, "deleted_count", 0) > 0)
 
         except Exception as e:
@@ -320,12 +601,216 @@ class CodeIndexer:
 
         try:
             result = self.db.repo_files.delete_many({"repo_name": repo_name, "path": {"$in": file_paths}})
+            self._remove_symbols(repo_name, file_paths)
             return int(getattr(result, "deleted_count", 0) or 0)
 
         except Exception as e:
             logger.exception(f"Failed to remove files: {e}")
             return 0
 
+    def _remove_symbols(self, repo_name: str, file_paths: List[str]) -> None:
+        try:
+            self.db.repo_symbols.delete_many({"repo_name": repo_name, "path": {"$in": list(file_paths)}})
+        except Exception as e:
+            logger.warning(f"Failed to remove symbols for {repo_name}: {e}")
+
+    def rebuild_dir_tree(self, repo_name: str, changed_paths: Optional[Iterable[str]] = None) -> int:
+        """
+        בנייה מחדש של עץ התיקיות המוחשב (repo_dirs) מתוך repo_files
+
+        מעבר אחד (projection קל) על קבצי הריפו; לכל תיקייה: מספר קבצים (רקורסיבי),
+        גודל כולל והיסטוגרמת שפות. נכתבות רק תיקיות שהשתנו, ותיקיות שנעלמו נמחקות.
+        בדרך מושלם parent_dir למסמכי קבצים ישנים שנוצרו לפני שהשדה היה קיים.
+
+        Args:
+            repo_name: שם הריפו
+            changed_paths: נתיבי קבצים שנוספו/השתנו/נמחקו. כשניתן ויש כבר עץ לריפו,
+                מחושבות מחדש רק תיקיות האב שלהם (ראו ``_update_dir_ancestors``)
+                במקום מעבר על כל repo_files.
+
+        Returns:
+            מספר מסמכי התיקיות שנכתבו/נמחקו
+        """
+        if self.db is None:
+            return 0
+        if changed_paths is not None:
+            updated = self._update_dir_ancestors(repo_name, changed_paths)
+            if updated is not None:
+                return updated
+        dirs: Dict[str, Dict[str, Any]] = {}
+        backfill: List[Tuple[str, str]] = []
+
+        def _entry(dir_path: str) -> Dict[str, Any]:
+            entry = dirs.get(dir_path)
+            if entry is None:
+                entry = _new_dir_entry(repo_name, dir_path)
+                dirs[dir_path] = entry
+            return entry
+
+        try:
+            cursor = self.db.repo_files.find(
+                {"repo_name": repo_name},
+                {"_id": 0, "path": 1, "size": 1, "language": 1, "parent_dir": 1},
+            )
+            for doc in cursor:
+                path = str(doc.get("path") or "")
+                if not path:
+                    continue
+                parent = parent_dir(path)
+                if doc.get("parent_dir") != parent:
+                    backfill.append((path, parent))
+                size = int(doc.get("size") or 0)
+                language = str(doc.get("language") or "text")
+                current: Optional[str] = parent
+                while current is not None:
+                    entry = _entry(current)
+                    entry["file_count"] += 1
+                    entry["total_size"] += size
+                    entry["languages"][language] = entry["languages"].get(language, 0) + 1
+                    current = parent_dir(current) if current else None
+        except Exception as e:
+            logger.warning(f"Failed to read repo_files for dir tree of {repo_name}: {e}")
+            return 0
+
+        try:
+            existing = {
+                str(d.get("path")): d
+                for d in self.db.repo_dirs.find({"repo_name": repo_name}, {"_id": 0})
+            }
+        except Exception:
+            existing = {}
+
+        now = datetime.utcnow()
+        writes = 0
+        upserts: List[Dict[str, Any]] = []
+        for dir_path, entry in dirs.items():
+            old = existing.get(dir_path)
+            if old and all(old.get(k) == entry[k] for k in ("file_count", "total_size", "languages", "parent_dir")):
+                continue
+            upserts.append(dict(entry, updated_at=now))
+        stale = [p for p in existing if p not in dirs]
+        try:
+            if UpdateOne is not None:
+                ops = [
+                    UpdateOne({"repo_name": repo_name, "path": d["path"]}, {"$set": d}, upsert=True)
+                    for d in upserts
+                ]
+                if ops:
+                    self.db.repo_dirs.bulk_write(ops, ordered=False)
+                if backfill:
+                    self.db.repo_files.bulk_write(
+                        [
+                            UpdateOne({"repo_name": repo_name, "path": path}, {"$set": {"parent_dir": parent}})
+                            for path, parent in backfill
+                        ],
+                        ordered=False,
+                    )
+            else:
+                for d in upserts:
+                    self.db.repo_dirs.update_one({"repo_name": repo_name, "path": d["path"]}, {"$set": d}, upsert=True)
+                for path, parent in backfill:
+                    self.db.repo_files.update_one({"repo_name": repo_name, "path": path}, {"$set": {"parent_dir": parent}})
+            writes += len(upserts)
+            if stale:
+                result = self.db.repo_dirs.delete_many({"repo_name": repo_name, "path": {"$in": stale}})
+                writes += int(getattr(result, "deleted_count", 0) or 0)
+        except Exception as e:
+            logger.warning(f"Failed to write dir tree for {repo_name}: {e}")
+        return writes
+
+    def _update_dir_ancestors(self, repo_name: str, changed_paths: Iterable[str]) -> Optional[int]:
+        """
+        עדכון repo_dirs רק לתיקיות האב של הנתיבים שהשתנו.
+
+        תיקייה = הקבצים שישירות בה (שאילתה על (repo_name, parent_dir)) + סיכומי תתי-התיקיות
+        (מ-repo_dirs, או מהחישוב הנוכחי כשגם הן הושפעו). מחשבים מהעמוקה לרדודה, כך
+        שגם השורש עולה רק כמספר הקבצים שבשורש + תיקיות הרמה הראשונה.
+
+        Returns:
+            מספר הכתיבות/מחיקות, או None כשצריך בנייה מלאה (אין עדיין עץ לריפו -
+            ואז גם parent_dir של קבצים ישנים אולי לא הושלם - או שקריאה נכשלה)
+        """
+        affected: Set[str] = set()
+        for path in changed_paths:
+            current: Optional[str] = parent_dir(str(path or ""))
+            while current is not None and current not in affected:
+                affected.add(current)
+                current = parent_dir(current) if current else None
+        if not affected:
+            return 0
+
+        try:
+            if self.db.repo_dirs.find_one({"repo_name": repo_name, "path": ""}, {"_id": 1}) is None:
+                return None
+            existing = {
+                str(d.get("path")): d
+                for d in self.db.repo_dirs.find({"repo_name": repo_name, "path": {"$in": sorted(affected)}}, {"_id": 0})
+            }
+            computed: Dict[str, Optional[Dict[str, Any]]] = {}
+            for dir_path in sorted(affected, key=lambda p: p.count("/") + 1 if p else 0, reverse=True):
+                entry = _new_dir_entry(repo_name, dir_path)
+                for doc in self.db.repo_files.find(
+                    {"repo_name": repo_name, "parent_dir": dir_path},
+                    {"_id": 0, "size": 1, "language": 1},
+                ):
+                    language = str(doc.get("language") or "text")
+                    entry["file_count"] += 1
+                    entry["total_size"] += int(doc.get("size") or 0)
+                    entry["languages"][language] = entry["languages"].get(language, 0) + 1
+                children: Dict[str, Optional[Dict[str, Any]]] = {
+                    str(d.get("path")): d
+                    for d in self.db.repo_dirs.find(
+                        {"repo_name": repo_name, "parent_dir": dir_path},
+                        {"_id": 0, "path": 1, "file_count": 1, "total_size": 1, "languages": 1},
+                    )
+                }
+                for child_path, child in computed.items():
+                    if child_path and parent_dir(child_path) == dir_path:
+                        children[child_path] = child
+                for child in children.values():
+                    if not child:
+                        continue
+                    entry["file_count"] += int(child.get("file_count") or 0)
+                    entry["total_size"] += int(child.get("total_size") or 0)
+                    for language, count in (child.get("languages") or {}).items():
+                        entry["languages"][language] = entry["languages"].get(language, 0) + int(count or 0)
+                computed[dir_path] = entry if entry["file_count"] > 0 else None
+        except Exception as e:
+            logger.warning(f"Incremental dir tree update failed for {repo_name}, rebuilding: {e}")
+            return None
+
+        now = datetime.utcnow()
+        upserts: List[Dict[str, Any]] = []
+        stale: List[str] = []
+        for dir_path, summary in computed.items():
+            old = existing.get(dir_path)
+            if summary is None:
+                if old is not None:
+                    stale.append(dir_path)
+                continue
+            if old and all(old.get(k) == summary[k] for k in ("file_count", "total_size", "languages", "parent_dir")):
+                continue
+            upserts.append(dict(summary, updated_at=now))
+        writes = 0
+        try:
+            if UpdateOne is not None:
+                ops = [
+                    UpdateOne({"repo_name": repo_name, "path": d["path"]}, {"$set": d}, upsert=True)
+                    for d in upserts
+                ]
+                if ops:
+                    self.db.repo_dirs.bulk_write(ops, ordered=False)
+            else:
+                for d in upserts:
+                    self.db.repo_dirs.update_one({"repo_name": repo_name, "path": d["path"]}, {"$set": d}, upsert=True)
+            writes += len(upserts)
+            if stale:
+                result = self.db.repo_dirs.delete_many({"repo_name": repo_name, "path": {"$in": stale}})
+                writes += int(getattr(result, "deleted_count", 0) or 0)
+        except Exception as e:
+            logger.warning(f"Failed to write dir tree for {repo_name}: {e}")
+        return writes
+
     def _detect_language(self, file_path: str) -> str:
         """זיהוי שפת התכנות לפי הסיומת"""
         ext = Path(file_path).suffix.lower()
@@ -470,3 +955,44 @@ def create_indexer(db: Any = None) -> CodeIndexer:
     """יצירת instance של CodeIndexer"""
     return CodeIndexer(db)
 
+
+def parent_dir(file_path: str) -> str:
+    """התיקייה המכילה נתיב בריפו ('' לשורש)."""
+    return posixpath.dirname(str(file_path or "").strip("/"))
+
+
+def _new_dir_entry(repo_name: str, dir_path: str) -> Dict[str, Any]:
+    """מסמך repo_dirs ריק לתיקייה (השורש הוא '')."""
+    return {
+        "repo_name": repo_name,
+        "path": dir_path,
+        "parent_dir": parent_dir(dir_path) if dir_path else None,
+        "name": dir_path.rsplit("/", 1)[-1],
+        "depth": dir_path.count("/") + 1 if dir_path else 0,
+        "file_count": 0,
+        "total_size": 0,
+        "languages": {},
+    }
+
+
+def content_hash(content: str) -> str:
+    """טביעת תוכן יציבה לזיהוי קבצים שלא השתנו (גם כשאין blob SHA של git)."""
+    return hashlib.sha1(content.encode("utf-8", "replace")).hexdigest()
+
+
+def build_repo_file_document(
+    task: Tuple[str, str, str, str, Optional[str]],
+) -> Tuple[str, Optional[Dict[str, Any]], float]:
+    """
+    בניית מסמך אינדקס בתהליך עובד (ProcessPoolExecutor) - פונקציה ברמת המודול כדי שתהיה picklable.
+
+    Args:
+        task: (repo_name, file_path, content, commit_sha, blob_sha)
+
+    Returns:
+        (file_path, המסמך או None, זמן CPU בשניות)
+    """
+    repo_name, file_path, content, commit_sha, blob_sha = task
+    started = time.process_time()
+    doc = CodeIndexer().build_document(repo_name, file_path, content, commit_sha, blob_sha)
+    return file_path, doc, time.process_time() - started
@@ -0,0 +1,208 @@
+"""
+Cache לאגרגציות של דשבורד ה-Observability.
+
+- LRU חסום לכל kind (``OBS_DASHBOARD_CACHE_MAX_ENTRIES``), במקום dict שגדל לעולם.
+- שכבת Redis אופציונלית (דרך ``cache_manager.cache``) ל-kinds שמסומנים shared,
+  כך שכל ה-workers של gunicorn חולקים תוצאה "חמה" אחת.
+- single-flight: בקשות מקבילות לאותו מפתח מחכות לחישוב אחד במקום להריץ N אגרגציות.
+- stale-while-revalidate: ערך שפג תוקפו אבל עדיין בחלון ה-stale מוחזר מיד,
+  וחישוב מחדש רץ ברקע (פעם אחת למפתח).
+
+כשל ב-Redis הוא fail-open: ממשיכים עם השכבה המקומית.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_REDIS_PREFIX = "obs_dash"
+DEFAULT_MAX_ENTRIES = 256
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)) or default)
+    except Exception:
+        return float(default)
+
+
+def record_cache_result(kind: str, result: str) -> None:
+    """dashboard_cache_requests_total{kind,result} - best-effort (בלי metrics לא נכשלים)."""
+    try:
+        from metrics import record_dashboard_cache
+
+        record_dashboard_cache(kind, result)
+    except Exception:
+        return
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class DashboardCache:
+    """LRU לכל kind + Redis משותף אופציונלי + single-flight + stale-while-revalidate."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: Optional[int] = None,
+        stale_seconds: Optional[float] = None,
+        shared_kinds: Iterable[str] = (),
+    ):
+        if max_entries is None:
+            max_entries = int(_env_float("OBS_DASHBOARD_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_entries = max(1, int(max_entries))
+        self.stale_seconds = max(
+            0.0, stale_seconds if stale_seconds is not None else _env_float("OBS_DASHBOARD_CACHE_STALE_SECONDS", 300.0)
+        )
+        self.shared_kinds = frozenset(shared_kinds)
+        self._buckets: Dict[str, "OrderedDict[Any, Tuple[float, Any]]"] = {}
+        self._flights: Dict[Tuple[str, Any], _Flight] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    # -- tiers -------------------------------------------------------------
+    def _redis(self, kind: str):
+        if kind not in self.shared_kinds:
+            return None
+        if str(os.getenv("OBS_DASHBOARD_CACHE_REDIS", "true")).strip().lower() not in {"1", "true", "yes", "on"}:
+            return None
+        try:
+            from cache_manager import cache
+
+            return cache if getattr(cache, "is_enabled", False) else None
+        except Exception:
+            return None
+
+    @staticmethod
+    def _redis_key(kind: str, key: Any) -> str:
+        digest = hashlib.sha1(json.dumps(key, default=str, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{_REDIS_PREFIX}:{kind}:{digest}"
+
+    def _local_put(self, kind: str, key: Any, stored_at: float, value: Any) -> None:
+        with self._lock:
+            bucket = self._buckets.setdefault(kind, OrderedDict())
+            bucket[key] = (stored_at, value)
+            bucket.move_to_end(key)
+            while len(bucket) > self.max_entries:
+                bucket.popitem(last=False)
+
+    def lookup(self, kind: str, key: Any) -> Optional[Tuple[float, Any]]:
+        """(stored_at, value) מהשכבה המקומית, ואם אין - מ-Redis (ומעתיק מקומית)."""
+        with self._lock:
+            bucket = self._buckets.get(kind)
+            entry = bucket.get(key) if bucket is not None else None
+            if entry is not None:
+                bucket.move_to_end(key)  # type: ignore[union-attr]
+                return entry
+        redis = self._redis(kind)
+        if redis is None:
+            return None
+        try:
+            raw = redis.get(self._redis_key(kind, key))
+            if isinstance(raw, dict) and "ts" in raw:
+                entry = (float(raw["ts"]), raw.get("value"))
+                self._local_put(kind, key, *entry)
+                return entry
+        except Exception as e:
+            logger.debug(f"dashboard cache redis read failed: {e}")
+        return None
+
+    def store(self, kind: str, key: Any, value: Any, ttl: float) -> None:
+        stored_at = time.time()
+        self._local_put(kind, key, stored_at, value)
+        redis = self._redis(kind)
+        if redis is None:
+            return
+        try:
+            expire = max(1, int(ttl + self.stale_seconds))
+            redis.set(self._redis_key(kind, key), {"ts": stored_at, "value": value}, expire)
+        except Exception as e:
+            logger.debug(f"dashboard cache redis write failed: {e}")
+
+    def get(self, kind: str, key: Any, ttl: float, *, allow_stale: bool = False) -> Optional[Tuple[Any, bool]]:
+        """(value, is_stale) או None. stale מוחזר רק עם allow_stale ובתוך חלון ה-stale."""
+        entry = self.lookup(kind, key)
+        if entry is None:
+            return None
+        age = time.time() - entry[0]
+        if age < ttl:
+            return entry[1], False
+        if allow_stale and age < ttl + self.stale_seconds:
+            return entry[1], True
+        return None
+
+    def invalidate(self, kind: str) -> None:
+        """ניקוי מקומי של kind (kinds משותפים פגים לפי TTL ב-Redis)."""
+        with self._lock:
+            self._buckets.pop(kind, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    # -- coalescing ----------------------------------------------------------
+    def single_flight(self, kind: str, key: Any, fn: Callable[[], Any]) -> Any:
+        """הרצת fn פעם אחת לכל (kind, key) בו-זמנית; השאר מקבלים את אותה תוצאה/חריגה."""
+        flight_key = (kind, key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+        assert flight is not None
+        if not leader:
+            record_cache_result(kind, "coalesced")
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+            flight.event.set()
+
+    def refresh_async(self, kind: str, key: Any, fn: Callable[[], Any]) -> bool:
+        """רענון ברקע של ערך stale (לכל היותר אחד למפתח)."""
+        flight_key = (kind, key)
+        with self._lock:
+            if flight_key in self._refreshing:
+                return False
+            self._refreshing.add(flight_key)
+
+        def _run() -> None:
+            try:
+                self.single_flight(kind, key, fn)
+            except Exception as e:
+                logger.warning(f"dashboard cache background refresh failed ({kind}): {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(flight_key)
+
+        try:
+            threading.Thread(target=_run, name=f"obs-cache-refresh-{kind}", daemon=True).start()
+            return True
+        except Exception:
+            with self._lock:
+                self._refreshing.discard(flight_key)
+            return False
@@ -0,0 +1,169 @@
+"""
+גיבויי Drive אינקרמנטליים (content-addressed): מעלים רק את מה שהשתנה.
+
+לכל קטגוריה מתוזמנת נשמר ב-``drive_prefs.incremental_state`` ה-sha256 של כל קובץ
+בגיבוי המוצלח האחרון. בריצה הבאה:
+
+- אין שינוי (אותם שמות, אותם hashes) -> אין העלאה בכלל.
+- יש שינוי -> ארכיון delta: רק קבצים חדשים/ששונו + ``manifest.json`` עם רשימת
+  הקבצים שנמחקו ומפת ה-hashes המלאה של ה-snapshot.
+- קבצי המשתמש נשמרים תחת ``files/`` בארכיון, כך שקובץ בשם ``manifest.json``
+  (או ``metadata.json``) לא מתנגש בקבצי הבקרה שבשורש.
+- אין base, השרשרת ארוכה מ-``DRIVE_INCREMENTAL_MAX_CHAIN``, או שה-delta גדול כמעט
+  כמו גיבוי מלא -> ארכיון מלא חדש (base) עם manifest.
+
+``reconstruct_snapshot`` בונה snapshot מלא מ-base + deltas (בסדר) ומאמת מול ה-hashes.
+ה-state מתעדכן רק אחרי העלאה מוצלחת, כך שכשל פשוט נשלח שוב בריצה הבאה.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = "codebot-drive-incremental/2"
+# פורמט 1 שמר את קבצי המשתמש בשורש הארכיון - נתמך בקריאה (שרשראות קיימות)
+_LEGACY_FORMATS = ("codebot-drive-incremental/1",)
+FILES_PREFIX = "files/"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(frozen=True)
+class BackupPlan:
+    """מה להעלות בריצה הנוכחית: skip / full / delta."""
+    kind: str
+    hashes: Dict[str, str]
+    changed: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+
+def state_hashes(state: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    # נשמר כרשימת זוגות: שמות קבצים כוללים נקודות, שאסורות/בעייתיות כמפתחות ב-MongoDB
+    out: Dict[str, str] = {}
+    for pair in (state or {}).get("files") or []:
+        try:
+            name, digest = pair
+            out[str(name)] = str(digest)
+        except Exception:
+            continue
+    return out
+
+
+def plan_backup(entries: Sequence[Tuple[str, bytes]], state: Optional[Dict[str, Any]], *, max_chain: int) -> BackupPlan:
+    """השוואת הקבצים הנוכחיים מול ה-state של הגיבוי המוצלח האחרון."""
+    hashes = {name: content_hash(data) for name, data in entries}
+    previous = state_hashes(state)
+    if not state or not state.get("base_id"):
+        return BackupPlan("full", hashes, changed=sorted(hashes))
+    changed = sorted(name for name, digest in hashes.items() if previous.get(name) != digest)
+    deleted = sorted(name for name in previous if name not in hashes)
+    if not changed and not deleted:
+        return BackupPlan("skip", hashes)
+    if int(state.get("seq") or 0) >= max(1, int(max_chain)):
+        return BackupPlan("full", hashes, changed=sorted(hashes))
+    # delta שגדול כמו חצי מהגיבוי המלא לא חוסך הרבה - עדיף base חדש שמקצר את השרשרת
+    sizes = {name: len(data) for name, data in entries}
+    if changed and sum(sizes[n] for n in changed) * 2 >= max(1, sum(sizes.values())):
+        return BackupPlan("full", hashes, changed=sorted(hashes))
+    return BackupPlan("delta", hashes, changed=changed, deleted=deleted)
+
+
+def build_archive(
+    entries: Sequence[Tuple[str, bytes]],
+    plan: BackupPlan,
+    *,
+    backup_id: str,
+    state: Optional[Dict[str, Any]],
+    created_at: str,
+    extra_files: Optional[Dict[str, str]] = None,
+) -> bytes:
+    """ZIP של התוכנית: כל הקבצים (full) או רק השינויים (delta) תחת ``files/``, יחד עם ``manifest.json``."""
+    include = set(plan.changed)
+    prev = state or {}
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "kind": plan.kind,
+        "backup_id": backup_id,
+        "base_id": backup_id if plan.kind == "full" else prev.get("base_id"),
+        "parent_id": None if plan.kind == "full" else prev.get("last_id"),
+        "seq": 0 if plan.kind == "full" else int(prev.get("seq") or 0) + 1,
+        "created_at": created_at,
+        "files": plan.hashes,
+        "changed": plan.changed,
+        "deleted": plan.deleted,
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for name, data in entries:
+            if name in include:
+                zf.writestr(FILES_PREFIX + name, data)
+        for name, text in (extra_files or {}).items():
+            zf.writestr(name, text)
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return buf.getvalue()
+
+
+def next_state(plan: BackupPlan, state: Optional[Dict[str, Any]], *, backup_id: str, created_at: str) -> Dict[str, Any]:
+    """ה-state אחרי העלאה מוצלחת של הארכיון של ``plan``."""
+    prev = state or {}
+    full = plan.kind == "full"
+    return {
+        "base_id": backup_id if full else prev.get("base_id"),
+        "last_id": backup_id,
+        "seq": 0 if full else int(prev.get("seq") or 0) + 1,
+        "files": [[name, digest] for name, digest in sorted(plan.hashes.items())],
+        "updated_at": created_at,
+    }
+
+
+def reconstruct_snapshot(archives: Iterable[bytes]) -> Dict[str, bytes]:
+    """בניית snapshot מלא מ-base ואחריו deltas (בסדר כרונולוגי).
+
+    זורק ValueError אם השרשרת שבורה (delta בלי base, parent לא תואם) או אם התוכן
+    שהתקבל לא תואם ל-hashes שב-manifest האחרון.
+    """
+    files: Dict[str, bytes] = {}
+    base_id: Optional[str] = None
+    last_id: Optional[str] = None
+    expected: Dict[str, str] = {}
+    for data in archives:
+        with zipfile.ZipFile(io.BytesIO(data), "r") as zf:
+            try:
+                manifest = json.loads(zf.read(MANIFEST_NAME))
+            except KeyError:
+                raise ValueError("archive has no manifest.json")
+            if manifest.get("format") != MANIFEST_FORMAT and manifest.get("format") not in _LEGACY_FORMATS:
+                raise ValueError(f"unsupported manifest format: {manifest.get('format')}")
+            prefix = FILES_PREFIX if manifest.get("format") == MANIFEST_FORMAT else ""
+            if manifest.get("kind") == "full":
+                files = {}
+                base_id = manifest.get("backup_id")
+            elif base_id is None or manifest.get("base_id") != base_id or manifest.get("parent_id") != last_id:
+                raise ValueError(f"delta {manifest.get('backup_id')} does not continue the chain")
+            for name in manifest.get("deleted") or []:
+                files.pop(name, None)
+            for name in manifest.get("changed") or []:
+                files[name] = zf.read(prefix + name)
+            last_id = manifest.get("backup_id")
+            expected = dict(manifest.get("files") or {})
+    if base_id is None:
+        raise ValueError("no full base archive")
+    if set(files) != set(expected) or any(content_hash(files[n]) != d for n, d in expected.items()):
+        raise ValueError("reconstructed snapshot does not match manifest hashes")
+    return files
+
+
+def snapshot_zip(files: Dict[str, bytes]) -> bytes:
+    """ZIP רגיל (בלי manifest) מתוצאת ``reconstruct_snapshot``."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for name in sorted(files):
+            zf.writestr(name, files[name])
+    return buf.getvalue()
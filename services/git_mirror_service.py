@@ -16,11 +16,15 @@ import logging
 import os
 import re
 import subprocess
+import select
 import shutil
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from services.git_object_cache import GitObjectCache
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +53,123 @@ class FileChange:
     old_path: Optional[str] = None  # למקרה של rename
 
 
+@dataclass
+class BlobContent:
+    """תוכן קובץ שנקרא ב-batch (content=None כשלא נקרא; skipped מסביר למה)"""
+
+    path: str
+    content: Optional[str]
+    size: Optional[int] = None
+    skipped: Optional[str] = None  # invalid_path / missing / not_blob / too_large / unchanged / decode_error / error
+    sha: Optional[str] = None  # git blob SHA (כשנקרא דרך cat-file)
+
+
+class GitBlobReader:
+    """
+    קריאת blobs רבים דרך תהליכי ``git cat-file`` ארוכי-חיים (במקום subprocess לכל קובץ).
+
+    ``--batch-check`` מחזיר גודל בלי לקרוא את התוכן (לדילוג מוקדם על קבצים גדולים),
+    ו-``--batch`` מחזיר את התוכן לפי ה-SHA שנפתר. כל בקשה נכתבת ונקראת בתורה,
+    כך שה-pipes לא מתמלאים. הקריאה מה-pipe עוברת דרך ``select`` עם deadline לבקשה
+    (בלי thread לכל בקשה); תהליך שלא עונה עד ה-deadline נהרג והבקשה נכשלת.
+
+    שימוש:
+        with service.blob_reader("repo") as reader:
+            size = reader.object_info("HEAD:src/main.py")
+    """
+
+    def __init__(self, repo_path: Path, timeout: float = 30.0):
+        self.repo_path = repo_path
+        self.timeout = timeout
+        self._procs: Dict[str, subprocess.Popen] = {}
+        self._buffers: Dict[str, bytearray] = {}
+
+    def __enter__(self) -> "GitBlobReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _proc(self, mode: str) -> subprocess.Popen:
+        proc = self._procs.get(mode)
+        if proc is None or proc.poll() is not None:
+            proc = subprocess.Popen(
+                ["git", "cat-file", f"--{mode}"],
+                cwd=str(self.repo_path),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            self._procs[mode] = proc
+            self._buffers[mode] = bytearray()
+        return proc
+
+    def _fill(self, mode: str, proc: subprocess.Popen, deadline: float) -> None:
+        """קריאת chunk נוסף מה-stdout של התהליך לתוך ה-buffer, עד ה-deadline."""
+        assert proc.stdout is not None
+        fd = proc.stdout.fileno()
+        remaining = deadline - time.monotonic()
+        ready = select.select([fd], [], [], remaining)[0] if remaining > 0 else []
+        if not ready:
+            proc.kill()
+            raise RuntimeError(f"git cat-file timed out after {self.timeout:.0f}s")
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise RuntimeError("git cat-file exited unexpectedly")
+        self._buffers[mode] += chunk
+
+    def _request(self, mode: str, spec: str) -> Tuple[List[str], Optional[bytes]]:
+        proc = self._proc(mode)
+        assert proc.stdin is not None
+        buf = self._buffers[mode]
+        deadline = time.monotonic() + self.timeout
+        proc.stdin.write(spec.encode("utf-8") + b"\n")
+        proc.stdin.flush()
+        while b"\n" not in buf:
+            self._fill(mode, proc, deadline)
+        end = buf.index(b"\n")
+        header = bytes(buf[:end])
+        del buf[:end + 1]
+        parts = header.decode("utf-8", "replace").split(" ")
+        body = None
+        if mode == "batch" and len(parts) == 3 and parts[2].isdigit():
+            size = int(parts[2])
+            # התוכן ואחריו newline
+            while len(buf) < size + 1:
+                self._fill(mode, proc, deadline)
+            body = bytes(buf[:size])
+            del buf[:size + 1]
+        return parts, body
+
+    def object_info(self, spec: str) -> Optional[Tuple[str, str, int]]:
+        """(sha, type, size) של אובייקט, או None כשהוא לא קיים."""
+        parts, _ = self._request("batch-check", spec)
+        if len(parts) != 3 or not parts[2].isdigit():
+            return None
+        return parts[0], parts[1], int(parts[2])
+
+    def read_object(self, sha: str) -> Optional[bytes]:
+        """התוכן הגולמי של אובייקט לפי SHA."""
+        parts, body = self._request("batch", sha)
+        if len(parts) != 3:
+            return None
+        return body
+
+    def close(self) -> None:
+        for proc in self._procs.values():
+            try:
+                if proc.stdin is not None:
+                    proc.stdin.close()
+                proc.wait(timeout=5)
+            except Exception:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+        self._procs.clear()
+        self._buffers.clear()
+
+
 class GitMirrorService:
     """
     שירות לניהול Git Mirror על Render Disk
@@ -99,6 +220,10 @@ class GitMirrorService:
     _OWNER_HTTPS_RE = re.compile(r"^https://github\.com/([^/\s]+)/", re.IGNORECASE)
     _OWNER_SSH_RE = re.compile(r"^git@github\.com:([^/\s]+)/", re.IGNORECASE)
 
+    # SHA מלא: אימות שהוא commit לא משתנה, ולכן נשמר בזיכרון אחרי הצלחה
+    _FULL_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+    _VERIFIED_SHAS_MAX = 4096
+
     def __init__(
         self,
         base_path: Optional[str] = None,
@@ -115,10 +240,16 @@ class GitMirrorService:
         self.logger = logger
         self._ensure_base_path()
 
+        # תוצאות history/show/diff/commit לפי SHA פתור - לא משתנות, לא צריך git שוב
+        cache_dir = os.getenv("GIT_OBJECT_CACHE_DIR") or str(self.base_path / ".object_cache")
+        self.object_cache = GitObjectCache(Path(cache_dir))
+        self._verified_shas: Dict[Tuple[str, str], bool] = {}
+
         # הגבלות best-effort כדי להקשיח הרצת subprocess מול קלט משתמש
         self._allowed_git_subcommands: Set[str] = {
             "clone",
             "fetch",
+            "ls-remote",
             "rev-parse",
             "diff-tree",
             "show",
@@ -126,6 +257,7 @@ class GitMirrorService:
             "grep",
             "log",
             "rev-list",
+            "cat-file",
         }
 
     def _validate_repo_name(self, name: str) -> bool:
@@ -556,6 +688,32 @@ class GitMirrorService:
                 "retry_recommended": error_type == "network_error",
             }
 
+    def get_remote_sha(self, repo_name: str, branch: str = "main", timeout: int = 30) -> Optional[str]:
+        """
+        SHA של branch בצד ה-remote (``git ls-remote``) - בלי להוריד אובייקטים.
+
+        בדיקה זולה לפני fetch: אם ה-SHA המרוחק זהה למקומי, אין מה להביא.
+
+        Returns:
+            SHA string, או None אם לא ניתן לקבוע (שגיאת רשת/הרשאה, branch לא קיים)
+        """
+        repo_name = str(repo_name or "").strip()
+        if not self._validate_repo_name(repo_name) or not self._validate_basic_ref(branch):
+            return None
+        repo_path = self._get_repo_path(repo_name)
+        if not repo_path.exists():
+            return None
+        result = self._run_git_command(
+            ["git", "ls-remote", "origin", f"refs/heads/{branch}"], cwd=repo_path, timeout=timeout
+        )
+        if not result.success:
+            return None
+        for line in (result.stdout or "").splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] == f"refs/heads/{branch}":
+                return parts[0]
+        return None
+
     def _classify_git_error(self, stderr: str) -> str:
         """סיווג סוג שגיאת Git"""
         stderr_lower = stderr.lower()
@@ -607,6 +765,8 @@ class GitMirrorService:
                 "message": "Failed to delete mirror directory",
             }
 
+        self.object_cache.invalidate_repo(repo_name)
+        self._verified_shas.clear()
         logger.info(f"Mirror deleted: {repo_path}")
         return {
             "success": True,
@@ -839,6 +999,96 @@ class GitMirrorService:
 
         return None
 
+    def blob_reader(self, repo_name: str) -> GitBlobReader:
+        """קורא batch ל-mirror (לשימוש כ-context manager)."""
+        return GitBlobReader(self._get_repo_path(repo_name))
+
+    def iter_file_contents(
+        self,
+        repo_name: str,
+        file_paths: Iterable[str],
+        ref: str = "HEAD",
+        max_size_for: Optional[Callable[[str], Optional[int]]] = None,
+        skip_sha: Optional[Callable[[str, str], bool]] = None,
+    ) -> Iterator[BlobContent]:
+        """
+        קריאת תוכן קבצים רבים דרך ``git cat-file --batch`` יחיד (לכל הקריאה).
+
+        Args:
+            repo_name: שם הריפו
+            file_paths: נתיבי הקבצים בריפו
+            ref: commit SHA או branch
+            max_size_for: נתיב → גודל מקסימלי בבתים (None = ללא הגבלה); קבצים גדולים
+                          יותר מדולגים לפי ``--batch-check`` בלי לקרוא את התוכן
+            skip_sha: (נתיב, blob SHA) → True כשהתוכן כבר ידוע לקורא (skipped="unchanged");
+                      גם כאן התוכן לא נקרא
+
+        Yields:
+            BlobContent לכל נתיב, באותו סדר. התוכן זהה ל-get_file_content
+            (כולל נרמול שורות וניקוי טוקנים).
+        """
+        ref = ref.strip() if isinstance(ref, str) else ""
+        if not ref:
+            ref = "HEAD"
+        paths = [p.strip() if isinstance(p, str) else "" for p in file_paths]
+        if not self._validate_repo_name(str(repo_name or "")) or not self._validate_repo_ref(ref):
+            logger.warning("Rejected batch read for invalid repo/ref: %r %r", repo_name, ref)
+            for path in paths:
+                yield BlobContent(path=path, content=None, skipped="error")
+            return
+
+        reader = self.blob_reader(repo_name)
+        broken = False
+        try:
+            for path in paths:
+                safe_file_path = self._get_safe_file_path(path)
+                if not safe_file_path:
+                    logger.warning("Rejected invalid repo file path: %r", path)
+                    yield BlobContent(path=path, content=None, skipped="invalid_path")
+                    continue
+                if broken:
+                    # התהליך נפל באמצע - ממשיכים קובץ-קובץ כמו קודם
+                    content = self.get_file_content(repo_name, safe_file_path, ref)
+                    yield BlobContent(path=path, content=content, skipped=None if content is not None else "error")
+                    continue
+                try:
+                    info = reader.object_info(f"{ref}:{safe_file_path}")
+                    if info is None:
+                        yield BlobContent(path=path, content=None, skipped="missing")
+                        continue
+                    sha, obj_type, size = info
+                    if obj_type != "blob":
+                        yield BlobContent(path=path, content=None, size=size, skipped="not_blob")
+                        continue
+                    if skip_sha is not None and skip_sha(path, sha):
+                        yield BlobContent(path=path, content=None, size=size, skipped="unchanged", sha=sha)
+                        continue
+                    limit = max_size_for(safe_file_path) if max_size_for is not None else None
+                    if limit is not None and size > limit:
+                        yield BlobContent(path=path, content=None, size=size, skipped="too_large", sha=sha)
+                        continue
+                    raw = reader.read_object(sha)
+                except Exception as e:
+                    logger.warning(f"git cat-file batch failed for {repo_name}, falling back: {e}")
+                    broken = True
+                    reader.close()
+                    content = self.get_file_content(repo_name, safe_file_path, ref)
+                    yield BlobContent(path=path, content=content, skipped=None if content is not None else "error")
+                    continue
+                if raw is None:
+                    yield BlobContent(path=path, content=None, size=size, skipped="missing", sha=sha)
+                    continue
+                try:
+                    text = raw.decode("utf-8")
+                except UnicodeDecodeError:
+                    yield BlobContent(path=path, content=None, size=size, skipped="decode_error", sha=sha)
+                    continue
+                # תואם ל-subprocess.run(text=True) ב-get_file_content: universal newlines + ניקוי
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+                yield BlobContent(path=path, content=self._sanitize_output(text), size=size, sha=sha)
+        finally:
+            reader.close()
+
     def list_all_files(self, repo_name: str, ref: str = "HEAD") -> Optional[List[str]]:
         """
         רשימת כל הקבצים בריפו
@@ -916,6 +1166,9 @@ class GitMirrorService:
                 "error": "invalid_ref",
                 "message": "Reference לא תקין"
             }
+        sha_key = (repo_name, safe_ref)
+        if self._FULL_SHA_RE.fullmatch(safe_ref) and self._verified_shas.get(sha_key):
+            return {"valid": True, "resolved_sha": safe_ref}
         mirror_path = self._get_mirror_path(repo_name)
 
         try:
@@ -939,9 +1192,14 @@ class GitMirrorService:
                     "message": f"Reference '{safe_ref}' לא נמצא"
                 }
 
+            resolved_sha = result.stdout.strip()
+            if self._FULL_SHA_RE.fullmatch(safe_ref) and resolved_sha == safe_ref:
+                if len(self._verified_shas) >= self._VERIFIED_SHAS_MAX:
+                    self._verified_shas.clear()
+                self._verified_shas[sha_key] = True
             return {
                 "valid": True,
-                "resolved_sha": result.stdout.strip()
+                "resolved_sha": resolved_sha
             }
 
         except subprocess.TimeoutExpired:
@@ -1077,6 +1335,12 @@ class GitMirrorService:
 
         resolved_ref = ref_validation["resolved_sha"]
 
+        cache_parts = (resolved_ref, safe_file_path, limit, skip)
+        cached = self.object_cache.get("history", repo_name, cache_parts)
+        if cached is not None:
+            cached.update({"file_path": file_path, "ref": ref})
+            return cached
+
         try:
             # פורמט מיוחד לפענוח קל
             # %H = hash מלא, %h = hash קצר
@@ -1144,7 +1408,7 @@ class GitMirrorService:
                     "body": parts[6].strip() if len(parts) > 6 else ""
                 })
 
-            return {
+            response = {
                 "success": True,
                 "file_path": file_path,
                 "ref": ref,
@@ -1155,6 +1419,8 @@ class GitMirrorService:
                 "limit": limit,
                 "has_more": len(commits) == limit
             }
+            self.object_cache.put("history", repo_name, cache_parts, response)
+            return response
 
         except subprocess.TimeoutExpired:
             return {"error": "timeout", "message": "הפעולה ארכה יותר מדי זמן"}
@@ -1203,6 +1469,13 @@ class GitMirrorService:
 
         resolved_commit = ref_validation["resolved_sha"]
 
+        cache_parts = (resolved_commit, safe_file_path, max_size)
+        cached = self.object_cache.get("show", repo_name, cache_parts)
+        if cached is not None:
+            if cached.get("success"):
+                cached.update({"file_path": file_path, "commit": commit})
+            return cached
+
         try:
             # שליפת תוכן כ-bytes (לא text) לזיהוי בינארי נכון
             cmd = [
@@ -1238,18 +1511,20 @@ class GitMirrorService:
 
             # בדיקת גודל
             if file_size > max_size:
-                return {
+                response = {
                     "error": "file_too_large",
                     "message": f"הקובץ גדול מדי ({file_size:,} bytes)",
                     "size": file_size,
                     "max_size": max_size
                 }
+                self.object_cache.put("show", repo_name, cache_parts, response)
+                return response
 
             # זיהוי וקידוד
             decode_result = self._try_decode_content(raw_content)
 
             if decode_result["is_binary"]:
-                return {
+                response = {
                     "success": True,
                     "file_path": file_path,
                     "commit": commit,
@@ -1259,10 +1534,12 @@ class GitMirrorService:
                     "size": file_size,
                     "message": "זהו קובץ בינארי"
                 }
+                self.object_cache.put("show", repo_name, cache_parts, response)
+                return response
 
             content = decode_result["content"]
 
-            return {
+            response = {
                 "success": True,
                 "file_path": file_path,
                 "commit": commit,
@@ -1273,6 +1550,8 @@ class GitMirrorService:
                 "size": file_size,
                 "lines": content.count('\n') + 1 if content else 0
             }
+            self.object_cache.put("show", repo_name, cache_parts, response)
+            return response
 
         except subprocess.TimeoutExpired:
             return {"error": "timeout", "message": "הפעולה ארכה יותר מדי זמן"}
@@ -1363,6 +1642,12 @@ class GitMirrorService:
         resolved_commit1 = ref1_validation["resolved_sha"]
         resolved_commit2 = ref2_validation["resolved_sha"]
 
+        cache_parts = (resolved_commit1, resolved_commit2, safe_file_path, context_lines, output_format, max_bytes)
+        cached = self.object_cache.get("diff", repo_name, cache_parts)
+        if cached is not None:
+            cached.update({"commit1": commit1, "commit2": commit2, "file_path": file_path})
+            return cached
+
         try:
             # שימוש ב-commit1..commit2 לסמנטיקה ברורה
             cmd = [
@@ -1431,6 +1716,7 @@ class GitMirrorService:
                     "deletions": sum(f.get("deletions", 0) for f in parsed_diff.get("files", []))
                 }
 
+            self.object_cache.put("diff", repo_name, cache_parts, response)
             return response
 
         except subprocess.TimeoutExpired:
@@ -1666,6 +1952,10 @@ class GitMirrorService:
 
         resolved_commit = ref_validation["resolved_sha"]
 
+        cached = self.object_cache.get("commit", repo_name, (resolved_commit,))
+        if cached is not None:
+            return cached
+
         try:
             # פרטי commit
             format_str = "%H%x00%h%x00%an%x00%ae%x00%at%x00%cn%x00%ce%x00%ct%x00%s%x00%b%x00%P"
@@ -1760,7 +2050,7 @@ class GitMirrorService:
             except ValueError:
                 author_ts = committer_ts = 0
 
-            return {
+            response = {
                 "success": True,
                 "hash": parts[0],
                 "short_hash": parts[1],
@@ -1781,6 +2071,9 @@ class GitMirrorService:
                 "parents": parts[10].split() if parts[10] else [],
                 "changed_files": changed_files
             }
+            if files_result.returncode == 0:
+                self.object_cache.put("commit", repo_name, (resolved_commit,), response)
+            return response
 
         except subprocess.TimeoutExpired:
             return {"error": "timeout", "message": "הפעולה ארכה יותר מדי זמן"}
@@ -0,0 +1,209 @@
+"""
+Cache לתוצאות git שנגזרות מאובייקטים בלתי-משתנים (history / show / diff / commit info).
+
+תוצאה שמפתחה כולל SHA פתור (ולא שם branch) לא משתנה לעולם, ולכן אפשר
+לשמור אותה בלי TTL. שתי שכבות, שתיהן חסומות בגודל (bytes):
+
+- זיכרון: LRU של payloads מקודדים בתוך התהליך.
+- דיסק: קובץ zlib(json) לכל מפתח, תחת תיקייה פר-ריפו (משותף בין workers
+  ושורד restart). כשהתיקייה עוברת את התקציב - נמחקים הקבצים שלא נקראו הכי
+  הרבה זמן (לפי mtime, שמתעדכן בכל hit).
+
+כשל בכל שכבה הוא fail-open: פשוט מריצים git.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# גרסת פורמט - העלאה מבטלת ערכים ישנים (למשל אחרי שינוי בפענוח diff)
+_KEY_VERSION = "v1"
+# אחרי חריגה מהתקציב מפנים עד לשבריר הזה ממנו, כדי לא לסרוק בכל כתיבה
+_DISK_EVICT_TARGET = 0.9
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)) or default)
+    except Exception:
+        return int(default)
+
+
+def _record(op: str, tier: str) -> None:
+    try:
+        from metrics import record_git_object_cache
+
+        record_git_object_cache(op, tier)
+    except Exception:
+        return
+
+
+class GitObjectCache:
+    """Cache דו-שכבתי (זיכרון + דיסק) למפתחות (op, repo, sha..., options)."""
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        memory_bytes: Optional[int] = None,
+        disk_bytes: Optional[int] = None,
+    ):
+        self.directory = Path(directory) if directory is not None else None
+        self.memory_bytes = max(0, memory_bytes if memory_bytes is not None else _env_int("GIT_OBJECT_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+        self.disk_bytes = max(0, disk_bytes if disk_bytes is not None else _env_int("GIT_OBJECT_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory_bytes > 0 or (self.disk_bytes > 0 and self.directory is not None)
+
+    @staticmethod
+    def build_key(op: str, repo_name: str, parts: Iterable[Any]) -> str:
+        raw = json.dumps([_KEY_VERSION, op, repo_name, *parts], ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    def _disk_path(self, repo_name: str, key: str) -> Optional[Path]:
+        if self.directory is None or self.disk_bytes <= 0:
+            return None
+        return self.directory / repo_name / key[:2] / f"{key}.z"
+
+    # -- memory tier -----------------------------------------------------
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+            return payload
+
+    def _memory_put(self, key: str, payload: bytes) -> None:
+        if len(payload) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old)
+            self._memory[key] = payload
+            self._memory_used += len(payload)
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    # -- disk tier -------------------------------------------------------
+    def _scan_disk(self) -> List[Tuple[float, int, Path]]:
+        entries: List[Tuple[float, int, Path]] = []
+        if self.directory is None or not self.directory.exists():
+            return entries
+        for path in self.directory.glob("*/*/*.z"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _disk_put(self, path: Path, payload: bytes) -> None:
+        if len(payload) > self.disk_bytes:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_used += len(payload)
+            over = self._disk_used > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """מחיקת הקבצים הכי פחות "טריים" עד שהתיקייה חוזרת מתחת לתקציב."""
+        entries = sorted(self._scan_disk(), key=lambda e: e[0])
+        used = sum(size for _, size, _ in entries)
+        target = int(self.disk_bytes * _DISK_EVICT_TARGET)
+        for _, size, path in entries:
+            if used <= target:
+                break
+            try:
+                path.unlink()
+                used -= size
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_used = used
+
+    # -- public ------------------------------------------------------------
+    def get(self, op: str, repo_name: str, parts: Iterable[Any]) -> Optional[Dict[str, Any]]:
+        """ערך שמור (עותק חדש בכל קריאה), או None."""
+        if not self.enabled:
+            return None
+        try:
+            key = self.build_key(op, repo_name, parts)
+            payload = self._memory_get(key)
+            tier = "memory"
+            if payload is None:
+                path = self._disk_path(repo_name, key)
+                if path is not None and path.exists():
+                    payload = path.read_bytes()
+                    tier = "disk"
+                    try:
+                        os.utime(path, None)
+                    except OSError:
+                        pass
+                    if self.memory_bytes > 0:
+                        self._memory_put(key, payload)
+            if payload is None:
+                _record(op, "miss")
+                return None
+            value = json.loads(zlib.decompress(payload).decode("utf-8", errors="surrogatepass"))
+            _record(op, tier)
+            return value
+        except Exception as e:
+            logger.debug(f"git object cache read failed: {e}")
+            _record(op, "miss")
+            return None
+
+    def put(self, op: str, repo_name: str, parts: Iterable[Any], value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            key = self.build_key(op, repo_name, parts)
+            raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+            payload = zlib.compress(raw.encode("utf-8", errors="surrogatepass"), 6)
+            if self.memory_bytes > 0:
+                self._memory_put(key, payload)
+            path = self._disk_path(repo_name, key)
+            if path is not None:
+                self._disk_put(path, payload)
+        except Exception as e:
+            logger.debug(f"git object cache store failed: {e}")
+
+    def invalidate_repo(self, repo_name: str) -> None:
+        """ניקוי הדיסק של ריפו (אחרי מחיקת mirror) וכל שכבת הזיכרון."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            self._disk_used = None
+        if self.directory is None:
+            return
+        repo_dir = self.directory / repo_name
+        try:
+            for path in repo_dir.glob("*/*"):
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+        except Exception as e:
+            logger.debug(f"git object cache invalidate failed: {e}")
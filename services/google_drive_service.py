@@ -1076,6 +1076,21 @@ def create_repo_grouped_zip_bytes(user_id: int) -> List[Tuple[str, str, bytes]]:
     return results
 
 
+def _select_backup_files(_db, user_id: int, category: str) -> List[Dict[str, Any]]:
+    """קבצי הקוד (עם code ו-tags) שנכללים בגיבוי של הקטגוריה all / by_repo / other."""
+    # נדרשים code ו-tags להמשך סינון וכתיבה ל־ZIP
+    files = (_db.get_user_files(
+        user_id,
+        limit=1000,
+        projection={"file_name": 1, "tags": 1, "code": 1, "_id": 1},
+    ) if _db else []) or []
+    if category == "by_repo":
+        files = [d for d in files if any((t or '').startswith('repo:') for t in (d.get('tags') or []))]
+    elif category == "other":
+        files = [d for d in files if not any((t or '').startswith('repo:') for t in (d.get('tags') or []))]
+    return files
+
+
 def create_full_backup_zip_bytes(user_id: int, category: str = "all") -> Tuple[str, bytes]:
     """Creates a ZIP of user data by category and returns (filename, bytes)."""
     # Collect content according to category
@@ -1083,16 +1098,8 @@ def create_full_backup_zip_bytes(user_id: int, category: str = "all") -> Tuple[s
     backup_id = f"backup_{user_id}_{int(time.time())}_{category}"
     buf = io.BytesIO()
     with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
-        # נדרשים code ו-tags להמשך סינון וכתיבה ל־ZIP
         _db = _db_runtime()
-        files = (_db.get_user_files(
-            user_id,
-            limit=1000,
-            projection={"file_name": 1, "tags": 1, "code": 1, "_id": 1},
-        ) if _db else []) or []
-        if category == "by_repo":
-            files = [d for d in files if any((t or '').startswith('repo:') for t in (d.get('tags') or []))]
-        elif category == "large":
+        if category == "large":
             try:
                 large_files, _ = _db.get_user_large_files(user_id, page=1, per_page=10000) if _db else ([], None)
             except Exception:
@@ -1112,8 +1119,7 @@ def create_full_backup_zip_bytes(user_id: int, category: str = "all") -> Tuple[s
             zf.writestr('metadata.json', json.dumps(metadata, ensure_ascii=False, indent=2))
             buf.seek(0)
             return f"{backup_id}.zip", buf.getvalue()
-        elif category == "other":
-            files = [d for d in files if not any((t or '').startswith('repo:') for t in (d.get('tags') or []))]
+        files = _select_backup_files(_db, user_id, category)
         # default include files
         for doc in files:
             name = doc.get('file_name') or f"file_{doc.get('_id')}"
@@ -1131,6 +1137,91 @@ def create_full_backup_zip_bytes(user_id: int, category: str = "all") -> Tuple[s
     return f"{backup_id}.zip", buf.getvalue()
 
 
+# קטגוריות שבהן יש את תוכן הקבצים עצמו ולכן ניתן להשוות hashes (large נשלף בלי code)
+_INCREMENTAL_CATEGORIES = {"all", "other"}
+
+
+def _incremental_enabled(prefs: Dict[str, Any]) -> bool:
+    """drive_prefs.incremental (אם הוגדר) גובר על DRIVE_INCREMENTAL_BACKUPS."""
+    pref = prefs.get("incremental")
+    if isinstance(pref, bool):
+        return pref
+    from config import config as _cfg
+    return bool(getattr(_cfg, "DRIVE_INCREMENTAL_BACKUPS", False))
+
+
+def _backup_entries(user_id: int, category: str) -> List[Tuple[str, bytes]]:
+    """(file_name, bytes) לכל קובץ בקטגוריה; שם כפול - המופע האחרון גובר, כמו ב-ZIP."""
+    by_name: Dict[str, bytes] = {}
+    for doc in _select_backup_files(_db_runtime(), user_id, category):
+        name = doc.get('file_name') or f"file_{doc.get('_id')}"
+        by_name[name] = str(doc.get('code') or '').encode('utf-8')
+    return list(by_name.items())
+
+
+def _perform_incremental_backup(user_id: int, category: str, prefs: Dict[str, Any], now_iso: str) -> ScheduledBackupResult:
+    """גיבוי מתוזמן אינקרמנטלי: דילוג כשאין שינוי, delta כשיש, base מלא כשצריך.
+
+    ה-state נשמר ב-drive_prefs.incremental_state[category] רק אחרי העלאה מוצלחת.
+    """
+    from config import config as _cfg
+    from services import drive_incremental as _inc
+
+    states = dict(prefs.get("incremental_state") or {})
+    state = states.get(category) if isinstance(states.get(category), dict) else None
+    entries = _backup_entries(user_id, category)
+    try:
+        max_chain = int(getattr(_cfg, "DRIVE_INCREMENTAL_MAX_CHAIN", 7) or 7)
+    except Exception:
+        max_chain = 7
+    plan = _inc.plan_backup(entries, state, max_chain=max_chain)
+    if plan.kind == "skip":
+        _record_drive_incremental("skip", 0)
+        return ScheduledBackupResult(ok=True, uploaded=0)
+
+    backup_id = f"backup_{user_id}_{int(time.time())}_{category}_{plan.kind}"
+    metadata = {
+        "backup_id": backup_id,
+        "user_id": user_id,
+        "created_at": now_iso,
+        "backup_type": f"drive_{plan.kind}_{category}",
+        "file_count": len(plan.changed),
+    }
+    data = _inc.build_archive(
+        entries,
+        plan,
+        backup_id=backup_id,
+        state=state,
+        created_at=now_iso,
+        extra_files={"metadata.json": json.dumps(metadata, ensure_ascii=False, indent=2)},
+    )
+    label = getattr(_cfg, 'BOT_LABEL', 'CodeBot') or 'CodeBot'
+    if plan.kind == "delta":
+        label = f"{label}_delta"
+    friendly = compute_friendly_name(user_id, category, label, content_sample=data[:1024])
+    fid = upload_bytes(user_id, friendly, data, sub_path=compute_subpath(category))
+    if not fid:
+        return ScheduledBackupResult(ok=False, uploaded=0)
+    _record_drive_incremental(plan.kind, len(data))
+    states[category] = _inc.next_state(plan, state, backup_id=backup_id, created_at=now_iso)
+    update: Dict[str, Any] = {"last_backup_at": now_iso, "incremental_state": states}
+    if category == "all":
+        update["last_full_backup_at"] = now_iso
+    try:
+        db.save_drive_prefs(user_id, update)
+    except Exception:
+        pass
+    return ScheduledBackupResult(ok=True, uploaded=1)
+
+
+def _record_drive_incremental(kind: str, size_bytes: int) -> None:
+    try:
+        from metrics import record_drive_incremental_backup
+        record_drive_incremental_backup(kind, size_bytes)
+    except Exception:
+        pass
+
+
 def perform_scheduled_backup(user_id: int) -> ScheduledBackupResult:
     """Runs a scheduled backup to Drive according to user's selected category.
 
@@ -1141,6 +1232,7 @@ def perform_scheduled_backup(user_id: int) -> ScheduledBackupResult:
 
     Updates last_backup_at on any successful scheduled upload.
     Updates last_full_backup_at only if category == "all".
+    In incremental mode (all/other) uploads only a delta of changed files, or nothing.
 
     Returns ScheduledBackupResult with ok=True/False and uploaded count.
     When there is nothing to back up, ok=True but uploaded=0.
@@ -1192,6 +1284,9 @@ def perform_scheduled_backup(user_id: int) -> ScheduledBackupResult:
                     db.save_drive_prefs(user_id, {"last_backup_at": now_iso})
                 except Exception:
                     pass
+        elif category in _INCREMENTAL_CATEGORIES and _incremental_enabled(prefs):
+            inc_res = _perform_incremental_backup(user_id, category, prefs, now_iso)
+            ok, uploaded = inc_res.ok, inc_res.uploaded
         else:
             # all / large / other -> single ZIP according to category
             fn, data = create_full_backup_zip_bytes(user_id, category=category)
@@ -27,6 +27,7 @@ except Exception:  # pragma: no cover
 
 from monitoring import alerts_storage, metrics_storage, incident_story_storage  # type: ignore
 from monitoring import alert_tags_storage  # type: ignore
+from services.dashboard_cache import DashboardCache, record_cache_result
 from services.observability_http import SecurityError, fetch_graph_securely, fetch_url_securely
 
 try:  # Best-effort fallback for slow endpoint summaries
@@ -36,8 +37,9 @@ except Exception:  # pragma: no cover
         return []
 
 
-_CACHE: Dict[str, Dict[Any, Tuple[float, Any]]] = {}
-_CACHE_LOCK = threading.Lock()
+# אגרגציות (aggregations/timeseries) משותפות בין workers דרך Redis; alerts נשאר מקומי
+# כי הוא מתבטל מקומית אחרי כל שינוי בתגיות/התראות
+_DASHBOARD_CACHE = DashboardCache(shared_kinds=("aggregations", "timeseries"))
 _ALERTS_CACHE_TTL = 120.0
 _AGG_CACHE_TTL = 150.0
 _TS_CACHE_TTL = 150.0
@@ -89,6 +91,7 @@ except ValueError:  # pragma: no cover - env misconfig fallback
     _RUNBOOK_EVENT_CACHE_TTL = 900.0
 _RUNBOOK_STATE: Dict[str, Dict[str, Any]] = {}
 _RUNBOOK_EVENT_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_RUNBOOK_EVENT_CACHE_LOCK = threading.Lock()
 _RUNBOOK_STATE_LOCK = threading.Lock()
 
 logger = logging.getLogger(__name__)
@@ -628,23 +631,38 @@ _GRAPH_SOURCES_MTIME: float = 0.0
 _EXTERNAL_ALLOWED_METRICS: set[str] = set()
 
 
-def _cache_get(kind: str, key: Any, ttl: float) -> Any:
-    now = time.time()
-    with _CACHE_LOCK:
-        bucket = _CACHE.get(kind, {})
-        entry = bucket.get(key)
-        if not entry:
-            return None
-        ts, value = entry
-        if (now - ts) < ttl:
-            return value
-    return None
+def _cache_get(kind: str, key: Any, ttl: float, *, allow_stale: bool = False) -> Any:
+    """ערך טרי מה-cache (או None).
+
+    עם allow_stale=True מחזיר (value, is_stale) - כולל ערך שפג תוקפו ועדיין בחלון ה-stale.
+    """
+    hit = _DASHBOARD_CACHE.get(kind, key, ttl, allow_stale=allow_stale)
+    if hit is None:
+        return None
+    return hit if allow_stale else hit[0]
 
 
-def _cache_set(kind: str, key: Any, value: Any) -> None:
-    with _CACHE_LOCK:
-        bucket = _CACHE.setdefault(kind, {})
-        bucket[key] = (time.time(), value)
+def _cache_set(kind: str, key: Any, value: Any, ttl: float = _AGG_CACHE_TTL) -> None:
+    _DASHBOARD_CACHE.store(kind, key, value, ttl)
+
+
+def _cached_call(kind: str, key: Any, ttl: float, compute: Any) -> Any:
+    """cache + stale-while-revalidate + single-flight סביב חישוב של אגרגציה לדשבורד."""
+    hit = _cache_get(kind, key, ttl, allow_stale=True)
+    if hit is not None:
+        value, stale = hit
+        record_cache_result(kind, "stale" if stale else "fresh")
+        if stale:
+            _DASHBOARD_CACHE.refresh_async(kind, key, lambda: _compute_and_store(kind, key, ttl, compute))
+        return value
+    record_cache_result(kind, "miss")
+    return _DASHBOARD_CACHE.single_flight(kind, key, lambda: _compute_and_store(kind, key, ttl, compute))
+
+
+def _compute_and_store(kind: str, key: Any, ttl: float, compute: Any) -> Any:
+    value = compute()
+    _cache_set(kind, key, value, ttl)
+    return value
 
 
 def _cache_dt_key(dt: Optional[datetime], *, bucket_seconds: int = 60) -> Optional[str]:
@@ -1785,10 +1803,34 @@ def fetch_alerts(
         page,
         per_page,
     )
-    cached = _cache_get("alerts", cache_key, _ALERTS_CACHE_TTL)
-    if cached is not None:
-        return cached
+    return _cached_call(
+        "alerts",
+        cache_key,
+        _ALERTS_CACHE_TTL,
+        lambda: _compute_alerts(
+            start_dt=start_dt,
+            end_dt=end_dt,
+            severity=severity,
+            alert_type=alert_type,
+            endpoint=endpoint,
+            search=search,
+            page=page,
+            per_page=per_page,
+        ),
+    )
+
 
+def _compute_alerts(
+    *,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    severity: Optional[str],
+    alert_type: Optional[str],
+    endpoint: Optional[str],
+    search: Optional[str],
+    page: int,
+    per_page: int,
+) -> Dict[str, Any]:
     alerts, total = alerts_storage.fetch_alerts(
         start_dt=start_dt,
         end_dt=end_dt,
@@ -1855,7 +1897,6 @@ def fetch_alerts(
         "page": page,
         "per_page": per_page,
     }
-    _cache_set("alerts", cache_key, payload)
     return payload
 
 
@@ -2180,10 +2221,24 @@ def fetch_aggregations(
         _cache_dt_key(end_dt, bucket_seconds=60),
         slow_endpoints_limit,
     )
-    cached = _cache_get("aggregations", cache_key, _AGG_CACHE_TTL)
-    if cached is not None:
-        return cached
+    return _cached_call(
+        "aggregations",
+        cache_key,
+        _AGG_CACHE_TTL,
+        lambda: _compute_aggregations(
+            start_dt=start_dt,
+            end_dt=end_dt,
+            slow_endpoints_limit=slow_endpoints_limit,
+        ),
+    )
 
+
+def _compute_aggregations(
+    *,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    slow_endpoints_limit: int,
+) -> Dict[str, Any]:
     summary = alerts_storage.aggregate_alert_summary(start_dt=start_dt, end_dt=end_dt)
     if not any(summary.values()):
         summary = _fallback_summary()
@@ -2299,7 +2354,6 @@ def fetch_aggregations(
         "top_slow_endpoints": top_endpoints,
         "deployment_correlation": correlation,
     }
-    _cache_set("aggregations", cache_key, payload)
     return payload
 
 
@@ -2497,10 +2551,26 @@ def fetch_timeseries(
         granularity_seconds,
         metric,
     )
-    cached = _cache_get("timeseries", cache_key, _TS_CACHE_TTL)
-    if cached is not None:
-        return cached
+    return _cached_call(
+        "timeseries",
+        cache_key,
+        _TS_CACHE_TTL,
+        lambda: _compute_timeseries(
+            start_dt=start_dt,
+            end_dt=end_dt,
+            granularity_seconds=granularity_seconds,
+            metric=metric,
+        ),
+    )
+
 
+def _compute_timeseries(
+    *,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    granularity_seconds: int,
+    metric: str,
+) -> Dict[str, Any]:
     requested_metric = (metric or "alerts_count") or "alerts_count"
     metric_key = str(requested_metric).strip().lower() or "alerts_count"
     normalized_metric = _normalize_metric_name(metric_key) or metric_key
@@ -2636,7 +2706,6 @@ def fetch_timeseries(
 
     payload_metric = metric_key if metric else normalized_metric
     payload = {"metric": payload_metric, "data": data}
-    _cache_set("timeseries", cache_key, payload)
     return payload
 
 
@@ -3241,7 +3310,7 @@ def _seed_replay_event_cache(events: List[Dict[str, Any]]) -> None:
     if not events:
         return
     now = time.time()
-    with _CACHE_LOCK:
+    with _RUNBOOK_EVENT_CACHE_LOCK:
         for event in events:
             event_id = str(event.get("id") or "")
             if not event_id:
@@ -3270,7 +3339,7 @@ def _lookup_replay_event(event_id: str) -> Optional[Dict[str, Any]]:
     if not key:
         return None
     now = time.time()
-    with _CACHE_LOCK:
+    with _RUNBOOK_EVENT_CACHE_LOCK:
         entry = _RUNBOOK_EVENT_CACHE.get(key)
         if not entry:
             return None
@@ -4038,9 +4107,7 @@ def _format_window_label(start_dt: Optional[datetime], end_dt: Optional[datetime
 
 
 def _invalidate_alert_cache() -> None:
-    with _CACHE_LOCK:
-        if "alerts" in _CACHE:
-            _CACHE.pop("alerts", None)
+    _DASHBOARD_CACHE.invalidate("alerts")
 
 
 def build_story_template(
@@ -3,11 +3,14 @@ Personal Backup Service – ייצוא ושחזור גיבוי אישי מלא.
 """
 import json
 import logging
+import os
+import tempfile
 import time
 import zipfile
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from io import BytesIO
-from typing import Any, Callable, Dict, List, Optional
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Protocol
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +39,18 @@ MAX_SINGLE_FILE_SIZE = 50 * 1024 * 1024
 BOOKMARKS_EXPORT_LIMIT = 5000
 STICKY_NOTES_EXPORT_LIMIT = 5000
 
+# ייצוא זורם: כמה מסמכים לכל batch של cursor, וכמה bytes מהארכיון נשמרים בזיכרון
+# (export_user_data) לפני גלישה לקובץ זמני בדיסק
+EXPORT_BATCH_SIZE = int(os.getenv("BACKUP_EXPORT_BATCH_SIZE", "200"))
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv("BACKUP_EXPORT_SPOOL_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# שחזור במנות (bulk): כמה קבצים לכל מנה, וההפוגה בין מנות כיחס מזמן ה-DB שנמדד במנה
+# (0.5 = חצי שנייה מנוחה על כל שנייה של עבודת DB; DB איטי -> הפוגות ארוכות יותר)
+RESTORE_BULK_ENABLED = os.getenv("BACKUP_RESTORE_BULK", "true").strip().lower() not in {"0", "false", "no", "off"}
+RESTORE_CHUNK_SIZE = max(1, int(os.getenv("BACKUP_RESTORE_CHUNK_SIZE", "200")))
+RESTORE_THROTTLE_RATIO = float(os.getenv("BACKUP_RESTORE_THROTTLE_RATIO", "0.5"))
+RESTORE_THROTTLE_MAX_SLEEP = 2.0
+
 # שדות מותריים לשחזור ב-user_preferences (allowlist)
 USER_PREFERENCES_ALLOWLIST = {
     "attention_settings": {
@@ -62,37 +77,86 @@ class PersonalBackupService:
     # ================================================================
     #  ייצוא
     # ================================================================
-    def export_user_data(self, user_id: int) -> BytesIO:
+    def export_user_data(self, user_id: int) -> IO[bytes]:
         """
         יוצר קובץ ZIP עם כל המידע של המשתמש.
 
+        הארכיון נכתב ל-SpooledTemporaryFile: עד ``EXPORT_SPOOL_MAX_BYTES`` בזיכרון ומעבר
+        לזה בקובץ זמני בדיסק. לשליחה ישירה ל-HTTP ראו ``iter_export_chunks``.
+
+        Returns:
+            file object (seekable, ממוקם בתחילתו) מוכן לשליחה כ-response
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+        try:
+            self.export_user_data_to(spool, user_id, target="buffer")
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    def export_user_data_to(self, fileobj: IO[bytes], user_id: int, *, target: str = "file") -> Dict[str, Any]:
+        """
+        כותב את ה-ZIP ישירות ל-``fileobj`` (קובץ בדיסק, spool וכו'), רשומה אחרי רשומה.
+
         Returns:
-            BytesIO buffer מוכן לשליחה כ-response
+            סטטיסטיקות הייצוא: bytes, files_count, large_files_count, duration_seconds
+        """
+        stats: Dict[str, Any] = {}
+        for _ in self._iter_export(fileobj, user_id, stats, target=target):
+            pass
+        return stats
+
+    def iter_export_chunks(self, user_id: int) -> Iterator[bytes]:
         """
-        buffer = BytesIO()
+        ייצוא זורם: מחזיר את ה-ZIP כרצף chunks (ל-Flask ``Response``) בלי לבנות אותו בזיכרון.
 
-        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        כל chunk הוא מה שנכתב מאז הרשומה הקודמת - הזיכרון חסום בגודל הרשומה הגדולה ביותר.
+        """
+        sink = _ChunkSink()
+        for _ in self._iter_export(sink, user_id, {}, target="stream"):
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+
+    def _iter_export(self, fileobj: "_ZipSink", user_id: int, stats: Dict[str, Any], *, target: str) -> Iterator[None]:
+        """גנרטור הייצוא: כותב רשומת ZIP אחת ומחזיר שליטה (yield) אחרי כל רשומה."""
+        started = time.perf_counter()
+        start_pos = _safe_tell(fileobj)
+        # fileobj לא-seekable (למשל _ChunkSink) נתמך ע"י zipfile עם data descriptors
+        with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
             # 1) קבצי קוד רגילים + מטאדאטה
-            files_meta = self._export_regular_files(zf, user_id)
+            files_meta: List[Dict] = []
+            yield from self._iter_regular_files(zf, user_id, files_meta)
 
             # 2) קבצים גדולים + מטאדאטה
-            large_files_meta = self._export_large_files(zf, user_id)
+            large_files_meta: List[Dict] = []
+            yield from self._iter_large_files(zf, user_id, large_files_meta)
 
             # 3) מטאדאטה מלאה של כל הקבצים (כולל tags, favorites, pinned)
             all_meta = {"regular_files": files_meta, "large_files": large_files_meta}
             zf.writestr("metadata/files.json", _to_json(all_meta))
+            del all_meta
+            yield
 
             # 4) אוספים
             collections_data = self._export_collections(user_id)
             zf.writestr("metadata/collections.json", _to_json(collections_data))
+            yield
 
             # 5) סימניות
             bookmarks_data = self._export_bookmarks(user_id)
             zf.writestr("metadata/bookmarks.json", _to_json(bookmarks_data))
+            yield
 
             # 6) פתקיות
             notes_data = self._export_sticky_notes(user_id)
             zf.writestr("metadata/sticky_notes.json", _to_json(notes_data))
+            yield
 
             # 7) העדפות משתמש
             prefs_data = self._export_preferences(user_id)
@@ -114,19 +178,81 @@ class PersonalBackupService:
                 "notes_count": len(notes_data),
             }
             zf.writestr("backup_info.json", _to_json(backup_info))
+            yield
+
+        end_pos = _safe_tell(fileobj)
+        duration = time.perf_counter() - started
+        size = end_pos - start_pos if start_pos is not None and end_pos is not None else 0
+        stats.update(
+            bytes=size,
+            files_count=len(files_meta),
+            large_files_count=len(large_files_meta),
+            duration_seconds=duration,
+        )
+        try:
+            from metrics import record_backup_export
 
-        buffer.seek(0)
+            record_backup_export(target, size, len(files_meta) + len(large_files_meta), duration)
+        except Exception:
+            pass
         emit_event(
             "personal_backup_export",
             user_id=user_id,
             files_count=len(files_meta),
             large_files_count=len(large_files_meta),
+            bytes=size,
+            duration_ms=int(duration * 1000),
+            target=target,
         )
-        return buffer
 
-    def _export_regular_files(self, zf: zipfile.ZipFile, user_id: int) -> List[Dict]:
-        """מייצא את כל קבצי הקוד הרגילים — תוכן + מטאדאטה."""
-        meta_list = []
+    def _iter_regular_file_docs(self, user_id: int, projection: Dict[str, int]) -> Iterator[Dict]:
+        """מסמכי הגרסה האחרונה של כל קובץ, נקראים ב-batches (cursor) ולא כרשימה אחת."""
+        # קריטי לביצועים + נכונות:
+        # - במקום N+1 (get_user_files ואז get_file לכל קובץ)
+        # - וגם כדי לא להסתמך על cache (get_user_files cached ל-120s)
+        # נבצע aggregate ישירות על הקולקשן כדי לקבל את הגרסה האחרונה לכל file_name *כולל code* בשאילתה אחת.
+        try:
+            collection = getattr(self.db, "collection", None)
+        except Exception:
+            collection = None
+
+        # הגנה מול MagicMock בטסטים: getattr על MagicMock "ממציא" attributes,
+        # ולכן נוודא שהשדה collection באמת הוגדר על האובייקט (ולא נוצר דינמית).
+        has_explicit_collection_attr = False
+        try:
+            db_dict = getattr(self.db, "__dict__", None)
+            has_explicit_collection_attr = isinstance(db_dict, dict) and ("collection" in db_dict)
+        except Exception:
+            has_explicit_collection_attr = False
+
+        if has_explicit_collection_attr and collection is not None and hasattr(collection, "aggregate"):
+            from database import latest_index
+
+            pipeline = [
+                *latest_index.latest_stages({"user_id": int(user_id), "is_active": True}),
+                # סדר יציב לדטרמיניזם (לא חובה, אבל נוח לדיבאג)
+                {"$sort": {"file_name": 1}},
+                {"$project": dict(projection)},
+            ]
+            try:
+                cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+            except TypeError:
+                # תאימות למוקים/סטאבים שלא תומכים ב-allowDiskUse/batchSize
+                cursor = collection.aggregate(pipeline)
+            yield from cursor
+            return
+
+        # fallback למצב שבו אין גישה ישירה לקולקשן (למשל בטסטים עם MagicMock): עימוד
+        skip = 0
+        while True:
+            page = self.db.get_user_files(user_id, limit=EXPORT_BATCH_SIZE, skip=skip, projection=projection) or []
+            yield from page
+            if len(page) < EXPORT_BATCH_SIZE:
+                return
+            skip += len(page)
+
+    def _iter_regular_files(self, zf: zipfile.ZipFile, user_id: int, meta_list: List[Dict]) -> Iterator[None]:
+        """מייצא את כל קבצי הקוד הרגילים — תוכן ל-ZIP, מטאדאטה ל-``meta_list``."""
         projection = {
             "_id": 0,
             "file_name": 1,
@@ -141,51 +267,16 @@ class PersonalBackupService:
             "created_at": 1,
             "updated_at": 1,
         }
-        try:
-            # קריטי לביצועים + נכונות:
-            # - במקום N+1 (get_user_files ואז get_file לכל קובץ)
-            # - וגם כדי לא להסתמך על cache (get_user_files cached ל-120s)
-            # נבצע aggregate ישירות על הקולקשן כדי לקבל את הגרסה האחרונה לכל file_name *כולל code* בשאילתה אחת.
-            files = None
-            try:
-                collection = getattr(self.db, "collection", None)
-            except Exception:
-                collection = None
-
-            # הגנה מול MagicMock בטסטים: getattr על MagicMock "ממציא" attributes,
-            # ולכן נוודא שהשדה collection באמת הוגדר על האובייקט (ולא נוצר דינמית).
-            has_explicit_collection_attr = False
+        files = self._iter_regular_file_docs(user_id, projection)
+        while True:
             try:
-                db_dict = getattr(self.db, "__dict__", None)
-                has_explicit_collection_attr = isinstance(db_dict, dict) and ("collection" in db_dict)
-            except Exception:
-                has_explicit_collection_attr = False
-
-            if has_explicit_collection_attr and collection is not None and hasattr(collection, "aggregate"):
-                pipeline = [
-                    {"$match": {"user_id": int(user_id), "is_active": True}},
-                    {"$sort": {"file_name": 1, "version": -1}},
-                    {"$group": {"_id": "$file_name", "latest": {"$first": "$$ROOT"}}},
-                    {"$replaceRoot": {"newRoot": "$latest"}},
-                    # סדר יציב לדטרמיניזם (לא חובה, אבל נוח לדיבאג)
-                    {"$sort": {"file_name": 1}},
-                    {"$project": dict(projection)},
-                    {"$limit": 10000},
-                ]
-                try:
-                    files = list(collection.aggregate(pipeline, allowDiskUse=True))
-                except TypeError:
-                    # תאימות למוקים/סטאבים שלא תומכים ב-allowDiskUse
-                    files = list(collection.aggregate(pipeline))
-
-            if files is None:
-                # fallback למצב שבו אין גישה ישירה לקולקשן (למשל בטסטים עם MagicMock)
-                files = self.db.get_user_files(user_id, limit=10000, projection=projection)
-        except Exception as e:
-            logger.error(f"שגיאה בשליפת קבצים לייצוא: {e}")
-            return meta_list
+                file_doc = next(files)
+            except StopIteration:
+                return
+            except Exception as e:
+                logger.error(f"שגיאה בשליפת קבצים לייצוא: {e}")
+                return
 
-        for file_doc in files:
             file_name = file_doc.get("file_name", "")
             if not file_name:
                 continue
@@ -229,33 +320,62 @@ class PersonalBackupService:
                 "updated_at": _dt_to_str(file_doc.get("updated_at")),
             }
             meta_list.append(meta)
+            yield
 
-        return meta_list
-
-    def _export_large_files(self, zf: zipfile.ZipFile, user_id: int) -> List[Dict]:
-        """מייצא את כל הקבצים הגדולים — תוכן + מטאדאטה."""
-        meta_list = []
+    def _iter_large_file_docs(self, user_id: int) -> Iterator[Dict]:
+        """מסמכי הקבצים הגדולים כולל content - cursor ישיר כשאפשר, אחרת עימוד + get_large_file."""
+        coll = None
         try:
-            large_files, _ = self.db.get_user_large_files(user_id, page=1, per_page=10000)
-        except Exception as e:
-            logger.error(f"שגיאה בשליפת קבצים גדולים לייצוא: {e}")
-            return meta_list
-
-        for file_doc in large_files:
-            file_name = file_doc.get("file_name", "")
-            if not file_name:
-                continue
+            db_dict = getattr(self.db, "__dict__", None)
+            if isinstance(db_dict, dict) and "large_files_collection" in db_dict:
+                coll = db_dict.get("large_files_collection")
+        except Exception:
+            coll = None
 
-            # שליפת תוכן מלא
+        if coll is not None and hasattr(coll, "find"):
+            cursor = coll.find({"user_id": user_id, "is_active": True}, sort=[("created_at", -1)])
             try:
-                full_doc = self.db.get_large_file(user_id, file_name)
+                cursor = cursor.batch_size(EXPORT_BATCH_SIZE)
             except Exception:
-                full_doc = None
+                pass
+            yield from cursor
+            return
+
+        page = 1
+        while True:
+            large_files, total = self.db.get_user_large_files(user_id, page=page, per_page=EXPORT_BATCH_SIZE)
+            for file_doc in large_files or []:
+                file_name = file_doc.get("file_name", "")
+                if not file_name:
+                    continue
+                # שליפת תוכן מלא (רשימת הקבצים מגיעה בלי content)
+                try:
+                    full_doc = self.db.get_large_file(user_id, file_name)
+                except Exception:
+                    full_doc = None
+                content = full_doc.get("content", "") if full_doc and isinstance(full_doc, dict) else ""
+                yield {**file_doc, "content": content}
+            if not large_files or page * EXPORT_BATCH_SIZE >= int(total or 0):
+                return
+            page += 1
+
+    def _iter_large_files(self, zf: zipfile.ZipFile, user_id: int, meta_list: List[Dict]) -> Iterator[None]:
+        """מייצא את כל הקבצים הגדולים — תוכן ל-ZIP, מטאדאטה ל-``meta_list``."""
+        files = self._iter_large_file_docs(user_id)
+        while True:
+            try:
+                file_doc = next(files)
+            except StopIteration:
+                return
+            except Exception as e:
+                logger.error(f"שגיאה בשליפת קבצים גדולים לייצוא: {e}")
+                return
 
-            content = ""
-            if full_doc and isinstance(full_doc, dict):
-                content = full_doc.get("content", "") or ""
+            file_name = file_doc.get("file_name", "")
+            if not file_name:
+                continue
 
+            content = file_doc.get("content", "") or ""
             safe_name = _safe_zip_path(f"large_files/{file_name}")
             try:
                 zf.writestr(safe_name, content)
@@ -274,8 +394,7 @@ class PersonalBackupService:
                 "updated_at": _dt_to_str(file_doc.get("updated_at")),
             }
             meta_list.append(meta)
-
-        return meta_list
+            yield
 
     def _export_collections(self, user_id: int) -> Dict[str, Any]:
         """מייצא אוספים + הפריטים שלהם."""
@@ -499,6 +618,7 @@ class PersonalBackupService:
         *,
         overwrite: bool = False,
         progress_cb: Optional[Callable[[int, str], None]] = None,
+        bulk: Optional[bool] = None,
     ) -> Dict[str, Any]:
         """
         משחזר נתוני משתמש מקובץ ZIP.
@@ -508,6 +628,7 @@ class PersonalBackupService:
             zip_bytes: תוכן קובץ ה-ZIP
             overwrite: אם True, יוצר גרסה חדשה לקבצים קיימים (ההיסטוריה נשמרת)
             progress_cb: callback אופציונלי (percent: int, step: str) לדיווח התקדמות
+            bulk: שחזור קבצים רגילים במנות (ברירת מחדל: BACKUP_RESTORE_BULK, אם ה-DB תומך)
 
         Returns:
             dict עם סיכום: {"ok": bool, "restored": {...}, "errors": [...]}
@@ -600,7 +721,9 @@ class PersonalBackupService:
                 files_meta.get("regular_files", []) if isinstance(files_meta, dict) else []
             )
             _report(10, f"משחזר קבצים (0/{len(regular_meta)})...")
-            restored["files"] = self._restore_regular_files(
+            use_bulk = (RESTORE_BULK_ENABLED if bulk is None else bool(bulk)) and self._supports_bulk_restore()
+            restore_files = self._restore_regular_files_bulk if use_bulk else self._restore_regular_files
+            restored["files"] = restore_files(
                 zf, user_id, regular_meta, overwrite, errors, budget=budget,
                 progress_cb=lambda done, total: _report(
                     10 + int(40 * done / max(total, 1)),
@@ -669,6 +792,7 @@ class PersonalBackupService:
             restored_files=restored["files"],
             restored_large=restored["large_files"],
             errors_count=len(errors),
+            mode=("bulk" if use_bulk else "per_file"),
         )
 
         return {"ok": True, "restored": restored, "errors": errors}
@@ -723,21 +847,8 @@ class PersonalBackupService:
                 desired_pin_order = 0
 
             # קריאת תוכן מה-ZIP *לפני* פעולות כתיבה, כדי למנוע partial-update אם הקריאה נכשלת
-            zip_path = _safe_zip_path(f"files/{file_name}")
-            try:
-                code_bytes = _read_zip_member_bytes_limited(
-                    zf, zip_path, max_bytes=MAX_SINGLE_FILE_SIZE, budget=budget
-                )
-                code = code_bytes.decode("utf-8", errors="replace")
-            except KeyError:
-                errors.append(f"קובץ חסר ב-ZIP: {zip_path}")
-                continue
-            except Exception as e:
-                try:
-                    logger.exception("שגיאה בקריאת קובץ מהגיבוי: %s", zip_path, exc_info=True)
-                except Exception:
-                    pass
-                errors.append(f"שגיאה בקריאת קובץ מהגיבוי: {zip_path}")
+            code = self._read_restore_code(zf, file_name, errors, budget=budget)
+            if code is None:
                 continue
 
             # חשוב: כש-overwrite=True, ניישר מועדפים/נעיצה רק אחרי שהצלחנו לקרוא מה-ZIP
@@ -759,32 +870,8 @@ class PersonalBackupService:
                         pass
                     errors.append(f"שגיאה בעדכון מצב מועדפים עבור {file_name}")
 
-                # Pinned: set desired state using toggle (updates all versions)
-                try:
-                    current_pinned = bool(self.db.is_pinned(user_id, file_name))
-                    if current_pinned != desired_is_pinned:
-                        out = self.db.toggle_pin(user_id, file_name)
-                        if not isinstance(out, dict) or not bool(out.get("success", False)):
-                            errors.append(f"לא ניתן לעדכן מצב נעיצה עבור {file_name}")
-                except Exception:
-                    try:
-                        logger.exception("שגיאה בעדכון מצב נעיצה בשחזור: %s", file_name, exc_info=True)
-                    except Exception:
-                        pass
-                    errors.append(f"שגיאה בעדכון מצב נעיצה עבור {file_name}")
-
-                # Enforce pin order when pinned (even if content is identical and we skip saving)
-                if desired_is_pinned:
-                    try:
-                        ok = self.db.reorder_pinned(user_id, file_name, desired_pin_order)
-                        if ok is False:
-                            errors.append(f"לא ניתן לעדכן סדר נעיצה עבור {file_name}")
-                    except Exception:
-                        try:
-                            logger.exception("שגיאה בעדכון סדר נעיצה בשחזור: %s", file_name, exc_info=True)
-                        except Exception:
-                            pass
-                        errors.append(f"שגיאה בעדכון סדר נעיצה עבור {file_name}")
+                # Pinned: set desired state using toggle (updates all versions) + pin order
+                self._align_pin_state(user_id, file_name, desired_is_pinned, desired_pin_order, errors)
 
             # דלג אם התוכן זהה לגרסה הקיימת (מונע גרסאות כפולות מיותרות)
             if existing and overwrite:
@@ -819,6 +906,173 @@ class PersonalBackupService:
 
         return count
 
+    def _supports_bulk_restore(self) -> bool:
+        # מתודות שמוגדרות על המחלקה עצמה (MagicMock "ממציא" attributes רק על המופע)
+        cls = type(self.db)
+        return all(
+            callable(getattr(cls, name, None))
+            for name in ("get_files_state_by_names", "bulk_save_code_snippets", "set_favorite_state")
+        )
+
+    def _restore_regular_files_bulk(
+        self,
+        zf: zipfile.ZipFile,
+        user_id: int,
+        meta_list: List[Dict],
+        overwrite: bool,
+        errors: List[str],
+        *,
+        budget: "_ZipReadBudget",
+        progress_cb: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """כמו ``_restore_regular_files`` אבל במנות: שאילתת מצב אחת + ``insert_many`` אחד לכל מנה.
+
+        מספרי הגרסאות מחושבים בזיכרון ממצב הקבצים הקיים; מועדפים מיושרים ב-update אחד
+        לכל מצב; נעיצה (עד MAX_PINNED_FILES קבצים) נשארת פר-קובץ. ההפוגה בין מנות
+        נגזרת מזמן ה-DB שנמדד (``_LatencyThrottle``) ולא מ-sleep קבוע.
+        """
+        from database.models import CodeSnippet
+
+        # שם שמופיע פעמיים בגיבוי: המופע האחרון קובע (כמו בשחזור הרגיל)
+        by_name: Dict[str, Dict] = {}
+        for meta in meta_list:
+            file_name = meta.get("file_name", "") if isinstance(meta, dict) else ""
+            if file_name:
+                by_name.pop(file_name, None)
+                by_name[file_name] = meta
+        metas = list(by_name.values())
+
+        throttle = _LatencyThrottle(RESTORE_THROTTLE_RATIO, RESTORE_THROTTLE_MAX_SLEEP)
+        count = 0
+        total = len(metas)
+        for start in range(0, total, RESTORE_CHUNK_SIZE):
+            chunk = metas[start:start + RESTORE_CHUNK_SIZE]
+            if progress_cb:
+                try:
+                    progress_cb(start, total)
+                except Exception:
+                    pass
+            try:
+                with throttle.measure():
+                    state = self.db.get_files_state_by_names(user_id, [m["file_name"] for m in chunk])
+            except Exception:
+                logger.exception("שגיאה בשליפת מצב קבצים לשחזור", exc_info=True)
+                errors.extend(f"שגיאה בשמירת {m['file_name']}" for m in chunk)
+                continue
+
+            snippets: List[Any] = []
+            favorite_changes: Dict[bool, List[str]] = {True: [], False: []}
+            pin_changes: List[tuple] = []
+            for meta in chunk:
+                file_name = meta["file_name"]
+                existing = state.get(file_name)
+                if existing and not overwrite:
+                    continue
+
+                desired_is_favorite = bool(meta.get("is_favorite", False))
+                desired_is_pinned = bool(meta.get("is_pinned", False))
+                try:
+                    desired_pin_order = int(meta.get("pin_order", 0) or 0)
+                except Exception:
+                    desired_pin_order = 0
+
+                code = self._read_restore_code(zf, file_name, errors, budget=budget)
+                if code is None:
+                    continue
+
+                if existing and overwrite:
+                    if bool(existing.get("is_favorite")) != desired_is_favorite:
+                        favorite_changes[desired_is_favorite].append(file_name)
+                    pin_changes.append((file_name, bool(existing.get("is_pinned")), desired_is_pinned, desired_pin_order))
+                    if existing.get("code", "") == code and _metadata_equivalent(existing, meta, default_lang="text"):
+                        continue
+
+                snippets.append(CodeSnippet(
+                    user_id=user_id,
+                    file_name=file_name,
+                    code=code,
+                    programming_language=_restore_programming_language(meta, default_lang="text"),
+                    description=str(meta.get("description", "") or ""),
+                    tags=list(meta.get("tags") or []),
+                    is_favorite=desired_is_favorite,
+                    is_pinned=desired_is_pinned,
+                    pin_order=desired_pin_order,
+                ))
+
+            with throttle.measure():
+                for state_value, names in favorite_changes.items():
+                    if names:
+                        self.db.set_favorite_state(user_id, names, state_value)
+                for file_name, current_pinned, desired_is_pinned, desired_pin_order in pin_changes:
+                    self._align_pin_state(
+                        user_id, file_name, desired_is_pinned, desired_pin_order, errors,
+                        current_pinned=current_pinned,
+                    )
+                saved = int(self.db.bulk_save_code_snippets(snippets, state) or 0) if snippets else 0
+            count += saved
+            errors.extend(f"שגיאה בשמירת {s.file_name}" for s in snippets[saved:])
+            throttle.pause()
+
+        return count
+
+    def _read_restore_code(
+        self, zf: zipfile.ZipFile, file_name: str, errors: List[str], *, budget: "_ZipReadBudget"
+    ) -> Optional[str]:
+        """קריאת תוכן קובץ רגיל מה-ZIP; None (והודעה ב-errors) אם חסר או לא קריא."""
+        zip_path = _safe_zip_path(f"files/{file_name}")
+        try:
+            code_bytes = _read_zip_member_bytes_limited(
+                zf, zip_path, max_bytes=MAX_SINGLE_FILE_SIZE, budget=budget
+            )
+            return code_bytes.decode("utf-8", errors="replace")
+        except KeyError:
+            errors.append(f"קובץ חסר ב-ZIP: {zip_path}")
+            return None
+        except Exception:
+            try:
+                logger.exception("שגיאה בקריאת קובץ מהגיבוי: %s", zip_path, exc_info=True)
+            except Exception:
+                pass
+            errors.append(f"שגיאה בקריאת קובץ מהגיבוי: {zip_path}")
+            return None
+
+    def _align_pin_state(
+        self,
+        user_id: int,
+        file_name: str,
+        desired_is_pinned: bool,
+        desired_pin_order: int,
+        errors: List[str],
+        *,
+        current_pinned: Optional[bool] = None,
+    ) -> None:
+        """יישור נעיצה לפי הגיבוי: toggle אם המצב שונה, ואז סדר הנעיצה (גם כשהתוכן זהה)."""
+        try:
+            if current_pinned is None:
+                current_pinned = bool(self.db.is_pinned(user_id, file_name))
+            if current_pinned != desired_is_pinned:
+                out = self.db.toggle_pin(user_id, file_name)
+                if not isinstance(out, dict) or not bool(out.get("success", False)):
+                    errors.append(f"לא ניתן לעדכן מצב נעיצה עבור {file_name}")
+        except Exception:
+            try:
+                logger.exception("שגיאה בעדכון מצב נעיצה בשחזור: %s", file_name, exc_info=True)
+            except Exception:
+                pass
+            errors.append(f"שגיאה בעדכון מצב נעיצה עבור {file_name}")
+
+        if desired_is_pinned:
+            try:
+                ok = self.db.reorder_pinned(user_id, file_name, desired_pin_order)
+                if ok is False:
+                    errors.append(f"לא ניתן לעדכן סדר נעיצה עבור {file_name}")
+            except Exception:
+                try:
+                    logger.exception("שגיאה בעדכון סדר נעיצה בשחזור: %s", file_name, exc_info=True)
+                except Exception:
+                    pass
+                errors.append(f"שגיאה בעדכון סדר נעיצה עבור {file_name}")
+
     def _restore_large_files(
         self,
         zf: zipfile.ZipFile,
@@ -1414,6 +1668,87 @@ def _dt_to_str(dt) -> Optional[str]:
     return str(dt)
 
 
+class _LatencyThrottle:
+    """הפוגה בין מנות שחזור לפי זמן ה-DB שנמדד בפועל (במקום sleep קבוע).
+
+    אחרי כל מנה ישנים ``ratio`` מהזמן שה-DB עבד עליה: DB מהיר כמעט לא מאט את
+    השחזור, DB עמוס (תשובות איטיות) מקבל יותר אוויר - עד ``max_sleep`` למנה.
+    """
+
+    def __init__(self, ratio: float, max_sleep: float) -> None:
+        self.ratio = max(0.0, float(ratio or 0.0))
+        self.max_sleep = max(0.0, float(max_sleep or 0.0))
+        self._db_seconds = 0.0
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._db_seconds += time.perf_counter() - started
+
+    def pause(self) -> float:
+        delay = min(self.max_sleep, self._db_seconds * self.ratio)
+        self._db_seconds = 0.0
+        if delay > 0.001:
+            time.sleep(delay)
+        return delay
+
+
+def _safe_tell(fileobj: Any) -> Optional[int]:
+    try:
+        return int(fileobj.tell())
+    except Exception:
+        return None
+
+
+class _ZipSink(Protocol):
+    """מה ש-``_iter_export`` צריך מהיעד: write/flush/close (zipfile), ו-tell לסטטיסטיקת הגודל.
+
+    seek לא חובה - בלעדיו zipfile כותב data descriptors.
+    """
+
+    def write(self, data: bytes, /) -> int: ...
+
+    def tell(self) -> int: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class _ChunkSink:
+    """יעד כתיבה ל-zipfile שאוגר bytes עד ש-``drain`` שולף אותם (לייצוא זורם).
+
+    יש ``tell`` אבל אין ``seek``: zipfile מזהה יעד לא-seekable וכותב data descriptors.
+    """
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._written = 0
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self._parts.append(b)
+        self._written += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._written
+
+    def flush(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
 def _safe_zip_path(path: str) -> str:
     """מנקה נתיב ZIP מתווים מסוכנים."""
     # מנע path traversal
@@ -0,0 +1,378 @@
+"""
+סטטיסטיקות מצטברות לפי "צורת שאילתה" (בסגנון pg_stat_statements).
+
+הפרופיילר הרגיל (``PersistentQueryProfilerService``) רושם רק שאילתות שחצו סף,
+ולכן שאילתה של 3ms שרצה 50,000 פעם בשעה לא נראית בכלל. כאן כל פקודה שנדגמה
+ב-``_SlowMongoListener`` מצטברת בזיכרון לפי טביעת אצבע של הצורה המנורמלת
+(``QueryProfilerService._normalize_query_shape``):
+
+- count / total_ms / max_ms, והיסטוגרמה של מספר המסמכים שחזרו (לפי ה-reply).
+- דגימה זולה: ההחלטה נעשית ב-``started`` (random אחד), והנרמול + hash רק
+  לפקודות שנדגמו. count/total_ms מוכפלים ב-1/rate כדי להעריך את הסך האמיתי.
+- flush תקופתי (thread רקע קצר) ל-``query_shape_stats`` כ-$inc upserts לפי
+  shape + שעה, עם TTL דרך ``expire_at``.
+
+הכל fail-open: כשל בנרמול/כתיבה לא נוגע בפקודת ה-Mongo עצמה.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "query_shape_stats"
+# גבולות עליונים של היסטוגרמת docs_returned; מה שמעליהם נספר ב-"inf"
+DOCS_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+DOCS_BUCKET_LABELS = tuple(str(b) for b in DOCS_BUCKETS) + ("inf",)
+# קולקציות שלא נספרות: לוגים של הפרופיילר עצמו (מניעת רקורסיה מה-flush)
+SKIP_COLLECTIONS = frozenset({"slow_queries_log", "system.profile", COLLECTION_NAME})
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return str(raw).strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or str(raw).strip() == "":
+        return default
+    try:
+        return float(raw)
+    except Exception:
+        return default
+
+
+def docs_bucket(n: int) -> str:
+    for bound in DOCS_BUCKETS:
+        if n <= bound:
+            return str(bound)
+    return "inf"
+
+
+def docs_returned(command_name: str, reply: Any) -> Optional[int]:
+    """מספר המסמכים שחזרו לפי ה-reply של הפקודה (None אם לא ידוע).
+
+    ב-find/aggregate זה ה-firstBatch בלבד (getMore לא משויך לצורה).
+    docs examined לא זמין ב-command monitoring - רק ב-explain/system.profile.
+    """
+    if not isinstance(reply, dict):
+        return None
+    try:
+        cursor = reply.get("cursor")
+        if isinstance(cursor, dict):
+            batch = cursor.get("firstBatch")
+            return len(batch) if isinstance(batch, list) else None
+        if command_name == "distinct" and isinstance(reply.get("values"), list):
+            return len(reply["values"])
+        if command_name == "findAndModify":
+            return 0 if reply.get("value") is None else 1
+        n = reply.get("n")
+        return int(n) if n is not None else None
+    except Exception:
+        return None
+
+
+def _hour_start(epoch: float) -> datetime:
+    e = int(epoch)
+    return datetime.fromtimestamp(e - e % 3600, tz=timezone.utc)
+
+
+class QueryShapeStats:
+    """צבירה בזיכרון לפי shape_id, עם דגימה ו-flush תקופתי."""
+
+    def __init__(
+        self,
+        *,
+        enabled: Optional[bool] = None,
+        sample_rate: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        max_shapes: Optional[int] = None,
+        retention_days: Optional[float] = None,
+    ):
+        self.enabled = _env_bool("PROFILER_SHAPE_STATS_ENABLED", True) if enabled is None else bool(enabled)
+        rate = _env_float("PROFILER_SHAPE_STATS_SAMPLE_RATE", 0.1) if sample_rate is None else float(sample_rate)
+        self.sample_rate = min(1.0, max(0.0, rate))
+        self.flush_interval = max(
+            1.0, _env_float("PROFILER_SHAPE_STATS_FLUSH_SECONDS", 60.0) if flush_interval is None else float(flush_interval)
+        )
+        self.max_shapes = max(
+            1, int(_env_float("PROFILER_SHAPE_STATS_MAX_SHAPES", 2000) if max_shapes is None else max_shapes)
+        )
+        self.retention_days = max(
+            1.0, _env_float("PROFILER_SHAPE_STATS_RETENTION_DAYS", 14) if retention_days is None else float(retention_days)
+        )
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flushing = False
+        self._indexes_ensured = False
+        self._fingerprinter: Any = None
+
+    # -- hot path ----------------------------------------------------------
+    def should_sample(self) -> bool:
+        """נקרא לכל פקודה: בדיקה זולה אחת, בלי נרמול."""
+        if not self.enabled or self.sample_rate <= 0.0:
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def _fingerprint(self, collection: str, operation: str, query: Dict[str, Any]):
+        fp = self._fingerprinter
+        if fp is None:
+            from services.query_profiler_service import QueryProfilerService
+
+            fp = self._fingerprinter = QueryProfilerService(db_manager=None)
+        shape = fp._normalize_query_shape(query or {})
+        return fp._generate_query_id(f"{collection}:{operation}", shape), shape
+
+    def record(
+        self,
+        *,
+        collection: str,
+        operation: str,
+        query: Dict[str, Any],
+        duration_ms: float,
+        docs: Optional[int] = None,
+    ) -> bool:
+        """צבירת פקודה שנדגמה. count/total_ms משוקללים ב-1/sample_rate."""
+        if not self.enabled or not collection or collection in SKIP_COLLECTIONS:
+            return False
+        try:
+            shape_id, shape = self._fingerprint(collection, operation, query)
+        except Exception as e:
+            logger.debug(f"query shape fingerprint failed: {e}")
+            return False
+        weight = 1.0 / self.sample_rate if 0.0 < self.sample_rate < 1.0 else 1.0
+        duration_ms = float(duration_ms)
+        with self._lock:
+            entry = self._pending.get(shape_id)
+            if entry is None:
+                if len(self._pending) >= self.max_shapes:
+                    self._dropped += 1
+                    return False
+                entry = self._pending[shape_id] = {
+                    "shape_id": shape_id,
+                    "collection": collection,
+                    "operation": operation,
+                    "query_shape": shape,
+                    "count": 0.0,
+                    "sampled": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "docs_returned": {},
+                }
+            entry["count"] += weight
+            entry["sampled"] += 1
+            entry["total_ms"] += duration_ms * weight
+            if duration_ms > entry["max_ms"]:
+                entry["max_ms"] = duration_ms
+            if docs is not None:
+                label = docs_bucket(int(docs))
+                hist = entry["docs_returned"]
+                hist[label] = hist.get(label, 0.0) + weight
+        return True
+
+    # -- flush -------------------------------------------------------------
+    def drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            logger.warning(f"query shape stats: {dropped} samples dropped (max_shapes={self.max_shapes})")
+        return list(pending.values())
+
+    def requeue(self, entries: List[Dict[str, Any]]) -> None:
+        """החזרת צבירות שלא נכתבו ל-_pending (ממוזגות עם מה שנצבר בינתיים)."""
+        with self._lock:
+            for e in entries:
+                entry = self._pending.get(e["shape_id"])
+                if entry is None:
+                    if len(self._pending) >= self.max_shapes:
+                        self._dropped += int(e["sampled"])
+                        continue
+                    self._pending[e["shape_id"]] = e
+                    continue
+                entry["count"] += e["count"]
+                entry["sampled"] += e["sampled"]
+                entry["total_ms"] += e["total_ms"]
+                entry["max_ms"] = max(entry["max_ms"], e["max_ms"])
+                hist = entry["docs_returned"]
+                for label, value in e["docs_returned"].items():
+                    hist[label] = hist.get(label, 0.0) + value
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """עותק של מה שעוד לא נכתב (לתצוגה מקומית כשאין DB)."""
+        with self._lock:
+            return [dict(e, docs_returned=dict(e["docs_returned"])) for e in self._pending.values()]
+
+    def flush(self, coll: Any, *, now: Optional[float] = None) -> int:
+        """כתיבת הצבירה כ-$inc upserts (shape + שעה). מחזיר מספר מסמכים שנכתבו.
+
+        מה שלא נכתב (כשל בכתיבה) חוזר ל-_pending ונכתב ב-flush הבא.
+        """
+        entries = self.drain()
+        if not entries or coll is None:
+            return 0
+        hour = _hour_start(time.time() if now is None else now)
+        expire_at = hour + timedelta(days=self.retention_days)
+        ops = []
+        for e in entries:
+            inc: Dict[str, Any] = {"count": e["count"], "sampled": e["sampled"], "total_ms": e["total_ms"]}
+            for label, value in e["docs_returned"].items():
+                inc[f"docs_returned.{label}"] = value
+            ops.append((
+                {"_id": f"{e['shape_id']}|{int(hour.timestamp())}"},
+                {
+                    "$setOnInsert": {
+                        "shape_id": e["shape_id"],
+                        "collection": e["collection"],
+                        "operation": e["operation"],
+                        "query_shape": e["query_shape"],
+                        "ts": hour,
+                        "expire_at": expire_at,
+                    },
+                    "$inc": inc,
+                    "$max": {"max_ms": e["max_ms"]},
+                },
+            ))
+        try:
+            from pymongo import UpdateOne
+
+            bulk = callable(getattr(coll, "bulk_write", None))
+        except Exception:
+            bulk = False
+        if bulk:
+            try:
+                result = coll.bulk_write([UpdateOne(f, u, upsert=True) for f, u in ops], ordered=False)
+                return int(getattr(result, "upserted_count", 0) or 0) + int(getattr(result, "matched_count", 0) or 0)
+            except Exception as e:
+                # BulkWriteError מפרט אילו פעולות נכשלו (השאר כבר הוחלו - לא לכתוב שוב, $inc);
+                # בכל כשל אחר לא ידוע מה נכתב, ולכן הכל חוזר לתור
+                details = getattr(e, "details", None)
+                errors = details.get("writeErrors") if isinstance(details, dict) else None
+                failed = sorted({int(err["index"]) for err in errors}) if errors else list(range(len(ops)))
+                logger.warning(f"query shape stats bulk_write failed ({len(failed)}/{len(ops)} requeued): {e}")
+                self.requeue([entries[i] for i in failed])
+                return len(ops) - len(failed)
+        written = 0
+        for flt, update in ops:
+            try:
+                coll.update_one(flt, update, upsert=True)
+                written += 1
+            except Exception as e:
+                logger.warning(f"query shape stats flush failed: {e}")
+                self.requeue(entries[written:])
+                break
+        return written
+
+    def maybe_flush(self, coll_getter: Callable[[], Any]) -> bool:
+        """flush ב-thread רקע אם עבר flush_interval (לכל היותר אחד בו-זמנית)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._flushing or now - self._last_flush < self.flush_interval or not self._pending:
+                return False
+            self._flushing = True
+            self._last_flush = now
+
+        def _run() -> None:
+            try:
+                coll = coll_getter()
+                if coll is not None and not self._indexes_ensured:
+                    self._indexes_ensured = True
+                    ensure_indexes(coll)
+                self.flush(coll)
+            except Exception as e:
+                logger.warning(f"query shape stats flush failed: {e}")
+            finally:
+                with self._lock:
+                    self._flushing = False
+
+        try:
+            threading.Thread(target=_run, name="query-shape-stats-flush", daemon=True).start()
+            return True
+        except Exception:
+            with self._lock:
+                self._flushing = False
+            return False
+
+
+def ensure_indexes(coll: Any) -> None:
+    try:
+        coll.create_index([("ts", -1), ("total_ms", -1)], name="ts_total_ms")
+        coll.create_index("expire_at", name="ttl_expire_at", expireAfterSeconds=0)
+    except Exception as e:
+        logger.debug(f"query shape stats ensure_indexes failed: {e}")
+
+
+def _finalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    count = float(row.get("count") or 0.0)
+    total = float(row.get("total_ms") or 0.0)
+    hist = row.get("docs_returned") or {}
+    return {
+        "shape_id": row.get("shape_id"),
+        "collection": row.get("collection"),
+        "operation": row.get("operation"),
+        "query_shape": row.get("query_shape") or {},
+        "count": int(round(count)),
+        "sampled": int(row.get("sampled") or 0),
+        "total_ms": round(total, 2),
+        "avg_ms": round(total / count, 3) if count else 0.0,
+        "max_ms": round(float(row.get("max_ms") or 0.0), 2),
+        "docs_returned": {label: int(round(float(hist.get(label) or 0))) for label in DOCS_BUCKET_LABELS},
+    }
+
+
+def top_shapes(coll: Any, *, hours: float = 24, limit: int = 20) -> List[Dict[str, Any]]:
+    """צורות השאילתה עם זמן מצטבר הגבוה ביותר בחלון (sum על ה-buckets השעתיים)."""
+    since = _hour_start(time.time() - max(1.0, float(hours)) * 3600)
+    group: Dict[str, Any] = {
+        "_id": "$shape_id",
+        "shape_id": {"$first": "$shape_id"},
+        "collection": {"$first": "$collection"},
+        "operation": {"$first": "$operation"},
+        "query_shape": {"$first": "$query_shape"},
+        "count": {"$sum": "$count"},
+        "sampled": {"$sum": "$sampled"},
+        "total_ms": {"$sum": "$total_ms"},
+        "max_ms": {"$max": "$max_ms"},
+    }
+    for label in DOCS_BUCKET_LABELS:
+        group[f"docs_{label}"] = {"$sum": f"$docs_returned.{label}"}
+    pipeline = [
+        {"$match": {"ts": {"$gte": since}}},
+        {"$group": group},
+        {"$sort": {"total_ms": -1}},
+        {"$limit": max(1, int(limit))},
+    ]
+    rows = []
+    for row in coll.aggregate(pipeline):
+        row["docs_returned"] = {label: row.pop(f"docs_{label}", 0) for label in DOCS_BUCKET_LABELS}
+        rows.append(_finalize(row))
+    return rows
+
+
+def top_pending(stats: QueryShapeStats, *, limit: int = 20) -> List[Dict[str, Any]]:
+    rows = sorted(stats.snapshot(), key=lambda r: r["total_ms"], reverse=True)
+    return [_finalize(r) for r in rows[: max(1, int(limit))]]
+
+
+_STATS: Optional[QueryShapeStats] = None
+_STATS_LOCK = threading.Lock()
+
+
+def get_shape_stats() -> QueryShapeStats:
+    global _STATS
+    if _STATS is None:
+        with _STATS_LOCK:
+            if _STATS is None:
+                _STATS = QueryShapeStats()
+    return _STATS
@@ -145,6 +145,18 @@ def register_all_jobs():
     )
 
     # === Reminders ===
+    register_job(
+        job_id="reminders_dispatch_tick",
+        name="שליחת תזכורות",
+        description="שליחת תזכורות שהגיע זמנן מתוך החלון הקרוב בזיכרון",
+        category=JobCategory.OTHER,
+        job_type=JobType.REPEATING,
+        interval_seconds=10,
+        enabled=True,
+        callback_name="_tick_job",
+        source_file="reminders/scheduler.py",
+    )
+
     register_job(
         job_id="recurring_reminders_check",
         name="בדיקת תזכורות",
@@ -11,6 +11,7 @@ import re  # חשוב! לצורך re.escape בחיפושי MongoDB
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
+from services.code_indexer import symbol_ngrams
 from services.git_mirror_service import get_mirror_service
 
 logger = logging.getLogger(__name__)
@@ -209,6 +210,15 @@ class RepoSearchService:
         if self.db is None:
             return {"error": "Database required for function search", "results": []}
 
+        symbols = self._search_symbols(repo_name, query, language, ("function", "method"))
+        if symbols is not None:
+            return {
+                "results": [dict(r, function=r.pop("name")) for r in symbols[:max_results]],
+                "total": len(symbols),
+                "search_type": "function",
+                "query": query,
+            }
+
         try:
             # תיקון Regex Injection
             safe_query = re.escape(query)
@@ -250,6 +260,15 @@ class RepoSearchService:
         if self.db is None:
             return {"error": "Database required for class search", "results": []}
 
+        symbols = self._search_symbols(repo_name, query, language, ("class",))
+        if symbols is not None:
+            return {
+                "results": [dict(r, **{"class": r.pop("name")}) for r in symbols[:max_results]],
+                "total": len(symbols),
+                "search_type": "class",
+                "query": query,
+            }
+
         try:
             # תיקון Regex Injection
             safe_query = re.escape(query)
@@ -281,6 +300,63 @@ class RepoSearchService:
             logger.exception(f"Class search failed: {e}")
             return {"error": "Internal class search error", "results": []}
 
+    def _search_symbols(
+        self, repo_name: str, query: str, language: Optional[str], kinds: tuple
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        חיפוש בטבלת הסמלים (repo_symbols) - בלי סריקת regex על repo_files
+
+        שאילתה קצרה (עד 2 תווים) = טווח prefix על name_lower; ארוכה יותר = כל
+        ה-trigrams שלה ב-ngrams (אינדקס multikey) ואז אימות תת-מחרוזת.
+        דירוג: התאמה מדויקת, אחר כך prefix, אחר כך תת-מחרוזת - על כל ההתאמות,
+        לפני החיתוך ל-max_results אצל הקורא.
+
+        Returns:
+            כל ההתאמות מדורגות, או None אם טבלת הסמלים של הריפו עוד לא שלמה
+            (repo_metadata.symbols_complete) - חוזרים לחיפוש הישן
+        """
+        query_lower = (query or "").strip().lower()
+        if not query_lower:
+            return None
+        try:
+            # רשומות חלקיות (למשל קבצים שדולגו כ-unchanged לפני שהייתה טבלה) לא מספיקות
+            if self.db.repo_metadata.find_one({"repo_name": repo_name, "symbols_complete": True}, {"_id": 1}) is None:
+                return None
+            filter_query: Dict[str, Any] = {"repo_name": repo_name, "kind": {"$in": list(kinds)}}
+            if len(query_lower) < 3:
+                filter_query["name_lower"] = {"$gte": query_lower, "$lt": query_lower + "\uffff"}
+            else:
+                filter_query["ngrams"] = {"$all": symbol_ngrams(query_lower)}
+            if language:
+                filter_query["language"] = language
+            cursor = self.db.repo_symbols.find(
+                filter_query,
+                {"_id": 0, "name": 1, "name_lower": 1, "kind": 1, "path": 1, "line": 1, "parent": 1, "language": 1},
+            )
+
+            ranked = []
+            for doc in cursor:
+                name_lower = doc.get("name_lower") or str(doc.get("name", "")).lower()
+                if query_lower not in name_lower:
+                    continue
+                rank = 0 if name_lower == query_lower else 1 if name_lower.startswith(query_lower) else 2
+                ranked.append((rank, len(name_lower), doc.get("path", ""), int(doc.get("line") or 0), doc))
+            ranked.sort(key=lambda item: item[:4])
+            return [
+                {
+                    "path": doc.get("path"),
+                    "name": doc.get("name"),
+                    "language": doc.get("language", "unknown"),
+                    "line": doc.get("line"),
+                    "kind": doc.get("kind"),
+                    "parent": doc.get("parent"),
+                }
+                for *_, doc in ranked
+            ]
+        except Exception as e:
+            logger.warning(f"Symbol search failed, falling back to repo_files: {e}")
+            return None
+
 
 def create_search_service(db: Any = None) -> RepoSearchService:
     """Factory function"""
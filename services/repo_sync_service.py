@@ -25,11 +25,15 @@ Repository Sync Service
 from __future__ import annotations
 
 import logging
+import multiprocessing
+import os
 import threading
 import time
 import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 # חשוב! ReturnDocument הוא Enum, לא בוליאני
 from pymongo import ReturnDocument
@@ -54,7 +58,7 @@ from tenacity import (  # type: ignore
     wait_exponential_jitter,
 )
 
-from services.code_indexer import CodeIndexer
+from services.code_indexer import CodeIndexer, build_repo_file_document, content_hash
 from services.git_mirror_service import get_mirror_service
 
 logger = logging.getLogger(__name__)
@@ -280,6 +284,298 @@ def _run_sync_from_doc(job_doc: Dict[str, Any], db: Any) -> Dict[str, Any]:
     return _run_sync_logic(git_service, indexer, db, repo_name, new_sha, old_sha)
 
 
+def _iter_contents(
+    git_service: Any,
+    indexer: CodeIndexer,
+    repo_name: str,
+    file_paths: List[str],
+    ref: str,
+    skip_sha: Optional[Callable[[str, str], bool]] = None,
+) -> Iterator[Tuple[str, Optional[str], Optional[str], Optional[str]]]:
+    """
+    (path, content, skipped, blob_sha) לכל קובץ - דרך cat-file --batch יחיד כשהשירות תומך בזה.
+
+    skipped="too_large"/"unchanged" = דולג לפי ה-blob בלי לקרוא אותו; סיבה מ-_UNREADABLE_SKIPS
+    = הקובץ לא קריא לצמיתות; content=None בלי skipped (או עם "error") = הקריאה נכשלה.
+    """
+    batch = getattr(git_service, "iter_file_contents", None)
+    if callable(batch):
+        max_size_for = getattr(indexer, "max_index_size", None)
+        kwargs: Dict[str, Any] = {"max_size_for": max_size_for if callable(max_size_for) else None}
+        if skip_sha is not None:
+            kwargs["skip_sha"] = skip_sha
+        for blob in batch(repo_name, file_paths, ref, **kwargs):
+            yield blob.path, blob.content, blob.skipped, getattr(blob, "sha", None)
+        return
+    for file_path in file_paths:
+        yield file_path, git_service.get_file_content(repo_name, file_path, ref), None, None
+
+
+# סיבות דילוג קבועות של iter_file_contents: הקובץ לא ייקרא גם בניסיון הבא
+_UNREADABLE_SKIPS = frozenset({"decode_error", "missing", "not_blob", "invalid_path"})
+
+# מתחת לסף הזה עלות הרמת תהליכי עבודה (spawn) גבוהה מהחיסכון
+_PARALLEL_MIN_FILES = 200
+
+
+def _index_workers() -> int:
+    """מספר תהליכי פירוק (REPO_INDEX_WORKERS; 0 = אוטומטי, עד 4 לפי ליבות זמינות)."""
+    try:
+        configured = int(os.getenv("REPO_INDEX_WORKERS", "0") or 0)
+    except ValueError:
+        configured = 0
+    if configured > 0:
+        return configured
+    try:
+        cores = len(os.sched_getaffinity(0))  # type: ignore[attr-defined]
+    except Exception:
+        cores = os.cpu_count() or 1
+    return max(1, min(4, cores))
+
+
+def _index_bulk_size() -> int:
+    """מספר מסמכים לכל bulk_write (REPO_INDEX_BULK_SIZE)."""
+    try:
+        return max(1, int(os.getenv("REPO_INDEX_BULK_SIZE", "200") or 200))
+    except ValueError:
+        return 200
+
+
+def _index_pipeline(
+    git_service: Any,
+    indexer: CodeIndexer,
+    repo_name: str,
+    file_paths: List[str],
+    ref: str,
+    commit_sha: str,
+    reusable: Optional[Dict[str, Dict[str, Any]]] = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """
+    אינדוקס קבצים ב-pipeline: קריאת blobs → פירוק במקביל (process pool) → bulk_write במנות.
+
+    - קבצים שה-blob SHA (או hash התוכן) שלהם זהה למה שכבר באינדקס לא נקראים/מפורקים/נכתבים
+      (unchanged). reusable (content_hash → מסמך קיים, למשל מ-rename) חוסך פירוק לתוכן מוכר.
+      force=True מבטל את הדילוג (backfill של שדות נגזרים חדשים, למשל repo_symbols).
+
+    - פירוק (imports/functions/classes) הוא CPU-bound ולכן רץ בתהליכים נפרדים
+      כשיש מספיק קבצים; אחרת באותו thread.
+    - back-pressure: לכל היותר workers*4 קבצים בפירוק בו-זמנית; הקריאה מחכה לתוצאה
+      הוותיקה ביותר לפני שממשיכה (וכך גם סדר הכתיבה נשמר).
+    - אינדקסר בלי build_document/index_documents (למשל stub) עובד קובץ-קובץ כמו קודם.
+
+    Returns:
+        dict עם indexed (נתיבים), skipped, unchanged, errors ו-timings (שניות לכל שלב)
+    """
+    started = time.perf_counter()
+    timings = {"read": 0.0, "parse_cpu": 0.0, "parse_wait": 0.0, "write": 0.0}
+    indexed: List[str] = []
+    skipped = 0
+    unchanged = 0
+    errors = 0
+
+    build = getattr(indexer, "build_document", None)
+    write = getattr(indexer, "index_documents", None)
+    batched = callable(build) and callable(write)
+    workers = _index_workers() if batched and len(file_paths) >= _PARALLEL_MIN_FILES else 1
+    bulk_size = _index_bulk_size()
+
+    fingerprints: Dict[str, Dict[str, Any]] = {}
+    get_fingerprints = getattr(indexer, "get_index_fingerprints", None)
+    if batched and callable(get_fingerprints) and not force:
+        fingerprints = get_fingerprints(repo_name, file_paths)
+
+    def _same_blob(path: str, sha: str) -> bool:
+        return bool(sha) and (fingerprints.get(path) or {}).get("blob_sha") == sha
+
+    executor: Optional[ProcessPoolExecutor] = None
+    if workers > 1:
+        try:
+            # spawn ולא fork: התהליך הנוכחי מריץ threads (worker/gunicorn)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except Exception:
+            logger.warning("Failed to start index process pool; parsing in-process", exc_info=True)
+            executor = None
+            workers = 1
+
+    inflight: Deque[
+        Tuple[Tuple[str, str, str, str, Optional[str]], Union[Future, Tuple[str, Optional[Dict[str, Any]], float]]]
+    ] = deque()
+    buffer: List[Dict[str, Any]] = []
+
+    def _flush() -> None:
+        nonlocal errors
+        if not buffer:
+            return
+        t0 = time.perf_counter()
+        written = write(list(buffer))  # type: ignore[misc]
+        timings["write"] += time.perf_counter() - t0
+        indexed.extend(written)
+        errors += len(buffer) - len(written)
+        buffer.clear()
+
+    def _collect_oldest() -> None:
+        nonlocal errors
+        task, pending = inflight.popleft()
+        t0 = time.perf_counter()
+        if isinstance(pending, Future):
+            try:
+                result = pending.result()
+            except Exception:
+                # תהליך עובד נפל (למשל BrokenProcessPool) - ממשיכים בתהליך הנוכחי
+                logger.warning("Index worker failed; parsing in-process", exc_info=True)
+                result = build_repo_file_document(task)
+        else:
+            result = pending
+        timings["parse_wait"] += time.perf_counter() - t0
+        _path, doc, cpu = result
+        timings["parse_cpu"] += cpu
+        if doc is None:
+            errors += 1
+            return
+        buffer.append(doc)
+        if len(buffer) >= bulk_size:
+            _flush()
+
+    processed = 0
+    unchanged_before = int(getattr(indexer, "unchanged_count", 0) or 0)
+    try:
+        contents = _iter_contents(
+            git_service, indexer, repo_name, file_paths, ref, skip_sha=_same_blob if fingerprints else None
+        )
+        while True:
+            t0 = time.perf_counter()
+            item = next(contents, None)
+            timings["read"] += time.perf_counter() - t0
+            if item is None:
+                break
+            file_path, content, skip_reason, blob_sha = item
+            processed += 1
+            if processed % 100 == 0:
+                logger.info(f"Indexing progress: {processed}/{len(file_paths)}")
+            if skip_reason == "too_large":
+                skipped += 1
+                continue
+            if skip_reason == "unchanged":
+                unchanged += 1
+                continue
+            if skip_reason in _UNREADABLE_SKIPS:
+                # קובץ שלעולם לא ייקרא (למשל לא UTF-8) אינו שגיאה - אחרת ה-backfill לא יושלם לעולם
+                skipped += 1
+                logger.info(f"Skipping {file_path} ({skip_reason})")
+                continue
+            # תוכן ריק "" הוא תקין; רק None אומר שהקריאה נכשלה/אין קובץ
+            if content is None:
+                errors += 1
+                logger.warning(f"Skipping file content for {file_path} (unable to read)")
+                continue
+            if batched and (fingerprints or reusable):
+                digest = content_hash(content)
+                known = fingerprints.get(file_path) or {}
+                # עם blob SHA, התאמה כבר נבדקה לפני הקריאה; כאן נכתוב כדי לשמור את ה-SHA החדש
+                if not blob_sha and known.get("content_hash") == digest:
+                    unchanged += 1
+                    continue
+                existing = (reusable or {}).get(digest)
+                if existing is not None:
+                    doc = indexer.reuse_document(existing, repo_name, file_path, content, commit_sha, blob_sha)
+                    if doc is not None:
+                        inflight.append(((repo_name, file_path, content, commit_sha, blob_sha), (file_path, doc, 0.0)))
+                        continue
+            if not batched:
+                if indexer.index_file(repo_name, file_path, content, commit_sha):
+                    indexed.append(file_path)
+                else:
+                    errors += 1
+                continue
+
+            task = (repo_name, file_path, content, commit_sha, blob_sha)
+            if executor is not None:
+                try:
+                    inflight.append((task, executor.submit(build_repo_file_document, task)))
+                except Exception:
+                    logger.warning("Index process pool unavailable; parsing in-process", exc_info=True)
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = None
+                    inflight.append((task, build_repo_file_document(task)))
+            else:
+                inflight.append((task, build_repo_file_document(task)))
+            while len(inflight) >= workers * 4:
+                _collect_oldest()
+
+        while inflight:
+            _collect_oldest()
+        if batched:
+            _flush()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    if not batched:
+        unchanged += int(getattr(indexer, "unchanged_count", 0) or 0) - unchanged_before
+    stage_timings = {f"{k}_seconds": round(v, 3) for k, v in timings.items()}
+    stage_timings["total_seconds"] = round(time.perf_counter() - started, 3)
+    stage_timings["workers"] = workers
+    logger.info(
+        f"Index pipeline for {repo_name}: {len(indexed)} indexed, {unchanged} unchanged, "
+        f"{errors} errors, timings={stage_timings}"
+    )
+    return {
+        "indexed": indexed,
+        "skipped": skipped,
+        "unchanged": unchanged,
+        "errors": errors,
+        "timings": stage_timings,
+    }
+
+
+def _refresh_dir_tree(indexer: Any, repo_name: str, changed_paths: Optional[Iterable[str]] = None) -> None:
+    """עדכון עץ התיקיות המוחשב (repo_dirs) אחרי שינוי באינדקס - best-effort.
+
+    עם ``changed_paths`` מתעדכנות רק תיקיות האב של הנתיבים (סנכרון אינקרמנטלי).
+    """
+    rebuild = getattr(indexer, "rebuild_dir_tree", None)
+    if not callable(rebuild):
+        return
+    try:
+        if changed_paths is None:
+            rebuild(repo_name)
+        else:
+            rebuild(repo_name, changed_paths=list(changed_paths))
+    except Exception:
+        logger.warning(f"Failed to rebuild dir tree for {repo_name}", exc_info=True)
+
+
+def _symbols_incomplete(metadata: Optional[Dict[str, Any]]) -> bool:
+    """טבלת הסמלים נחשבת שלמה רק אחרי backfill מלא (ראו repo_search_service._search_symbols)."""
+    return not (metadata or {}).get("symbols_complete")
+
+
+def _backfill_index(
+    git_service: Any,
+    indexer: CodeIndexer,
+    repo_name: str,
+    file_paths: List[str],
+    ref: str,
+    commit_sha: str,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    אינדוקס מלא בלי דילוג unchanged - כדי שגם קבצים שלא השתנו יקבלו רשומות repo_symbols.
+
+    Returns:
+        (outcome של _index_pipeline, האם אפשר לסמן symbols_complete)
+    """
+    symbol_errors_before = int(getattr(indexer, "symbol_errors", 0) or 0)
+    outcome = _index_pipeline(git_service, indexer, repo_name, file_paths, ref, commit_sha, force=True)
+    complete = (
+        not outcome["errors"]
+        and int(getattr(indexer, "symbol_errors", 0) or 0) == symbol_errors_before
+    )
+    if not complete:
+        logger.warning(f"Symbol backfill for {repo_name} incomplete; will retry on next sync")
+    return outcome, complete
+
+
 def _run_sync_logic(
     git_service: Any,
     indexer: CodeIndexer,
@@ -299,9 +595,9 @@ def _run_sync_logic(
     if not fetch_result["success"]:
         return {"error": "Fetch failed", "details": fetch_result}
 
+    metadata = db.repo_metadata.find_one({"repo_name": repo_name})
     # אם אין old_sha, נשלוף מה-DB
     if not old_sha:
-        metadata = db.repo_metadata.find_one({"repo_name": repo_name})
         old_sha = metadata.get("last_synced_sha") if metadata else None
 
     if not old_sha:
@@ -317,7 +613,16 @@ def _run_sync_logic(
     if changes is None:
         return {"error": "Failed to get changed files"}
 
-    stats = {"added": 0, "modified": 0, "removed": 0, "renamed": 0, "indexed": 0, "skipped": 0, "errors": 0}
+    stats = {
+        "added": 0,
+        "modified": 0,
+        "removed": 0,
+        "renamed": 0,
+        "indexed": 0,
+        "skipped": 0,
+        "unchanged": 0,
+        "errors": 0,
+    }
 
     # מחיקת קבצים שנמחקו
     if changes["removed"]:
@@ -329,6 +634,13 @@ def _run_sync_logic(
     # git diff-tree עם -M מחזיר סטטוס R לקבצים ששונו שם
     files_to_process = changes["added"] + changes["modified"]
 
+    # מסמכי הנתיבים הישנים נשמרים לפני המחיקה: rename בלי שינוי תוכן לא מפורק מחדש
+    reusable: Dict[str, Dict[str, Any]] = {}
+    get_fingerprints = getattr(indexer, "get_index_fingerprints", None)
+    if changes.get("renamed") and callable(get_fingerprints):
+        old_docs = get_fingerprints(repo_name, [r["old"] for r in changes["renamed"]], full=True)
+        reusable = {str(d["content_hash"]): d for d in old_docs.values() if d.get("content_hash")}
+
     if changes.get("renamed"):
         for rename_info in changes["renamed"]:
             old_path = rename_info["old"]
@@ -345,38 +657,55 @@ def _run_sync_logic(
             logger.debug(f"Renamed: {old_path} -> {new_path}")
 
     # עדכון/הוספת קבצים
+    paths_to_read = []
     for file_path in files_to_process:
         if not indexer.should_index(file_path):
             stats["skipped"] += 1
             continue
+        paths_to_read.append(file_path)
+
+    outcome = _index_pipeline(git_service, indexer, repo_name, paths_to_read, new_sha, new_sha, reusable=reusable)
+    added: Set[str] = set(changes["added"])
+    modified: Set[str] = set(changes["modified"])
+    for file_path in outcome["indexed"]:
+        stats["indexed"] += 1
+        if file_path in added:
+            stats["added"] += 1
+        elif file_path in modified:
+            stats["modified"] += 1
+    stats["skipped"] += outcome["skipped"]
+    stats["unchanged"] += outcome["unchanged"]
+    stats["errors"] += outcome["errors"]
+    stats["timings"] = outcome["timings"]
+
+    if stats["removed"] or changes.get("renamed") or outcome["indexed"]:
+        touched = set(changes["removed"]) | set(outcome["indexed"])
+        for rename_info in changes.get("renamed") or []:
+            touched.update((rename_info["old"], rename_info["new"]))
+        _refresh_dir_tree(indexer, repo_name, changed_paths=sorted(touched))
+
+    metadata_update: Dict[str, Any] = {
+        "last_synced_sha": new_sha,
+        "last_sync_time": datetime.utcnow(),
+        "sync_status": "completed",
+        "last_sync_stats": stats,
+    }
 
-        content = git_service.get_file_content(repo_name, file_path, new_sha)
-
-        # תוכן ריק "" הוא תקין; רק None אומר שהקריאה נכשלה/אין קובץ
-        if content is not None:
-            if indexer.index_file(repo_name, file_path, content, new_sha):
-                stats["indexed"] += 1
-                if file_path in changes["added"]:
-                    stats["added"] += 1
-                elif file_path in changes["modified"]:
-                    stats["modified"] += 1
-            else:
-                stats["errors"] += 1
-        else:
-            stats["errors"] += 1
-            logger.warning(f"Skipping file content for {file_path} (unable to read)")
+    # ריפו שאונדקס לפני טבלת הסמלים: backfill חד-פעמי של כל העץ (הקבצים שלא השתנו
+    # דולגו כ-unchanged ולכן אין להם רשומות repo_symbols)
+    if _symbols_incomplete(metadata):
+        all_files = git_service.list_all_files(repo_name, ref=new_sha)
+        if all_files is not None:
+            code_files = [f for f in all_files if indexer.should_index(f)]
+            backfill, complete = _backfill_index(git_service, indexer, repo_name, code_files, new_sha, new_sha)
+            stats["symbols_backfilled"] = len(backfill["indexed"])
+            if complete:
+                metadata_update["symbols_complete"] = True
 
     # עדכון metadata
     db.repo_metadata.update_one(
         {"repo_name": repo_name},
-        {
-            "$set": {
-                "last_synced_sha": new_sha,
-                "last_sync_time": datetime.utcnow(),
-                "sync_status": "completed",
-                "last_sync_stats": stats,
-            }
-        },
+        {"$set": metadata_update},
         upsert=True,
     )
 
@@ -393,7 +722,7 @@ def unmirror_repo(repo_name: str, db: Any) -> Dict[str, Any]:
     1. בדיקה שאין sync job ב-running (אחרת ה-worker יחזור לכתוב אינדקס).
     2. מחיקת ה-bare mirror מהדיסק — הפעולה הכי שברירית, חייבת להצליח לפני
        שנוגעים ב-DB.
-    3. ניקוי DB: `repo_files`, `repo_metadata`, `sync_jobs` ממתינים,
+    3. ניקוי DB: `repo_files`, `repo_dirs`, `repo_symbols`, `repo_metadata`, `sync_jobs` ממתינים,
        ו-`selected_repo` ממשתמשים שבחרו דווקא בריפו הזה.
 
     Args:
@@ -484,6 +813,20 @@ def unmirror_repo(repo_name: str, db: Any) -> Dict[str, Any]:
             "stats": stats,
         }
 
+    try:
+        result = db.repo_dirs.delete_many({"repo_name": repo_name})
+        stats["dirs_removed"] = int(getattr(result, "deleted_count", 0) or 0)
+    except Exception:
+        # עץ התיקיות נגזר מ-repo_files - שארית שלו לא מזיקה ותיבנה מחדש ב-import
+        logger.warning(f"Failed to delete repo_dirs for {repo_name}", exc_info=True)
+
+    try:
+        result = db.repo_symbols.delete_many({"repo_name": repo_name})
+        stats["symbols_removed"] = int(getattr(result, "deleted_count", 0) or 0)
+    except Exception:
+        # כמו repo_dirs - נגזר מהאינדקס ונבנה מחדש
+        logger.warning(f"Failed to delete repo_symbols for {repo_name}", exc_info=True)
+
     # 5) מחיקת מטא-דאטה של הריפו
     try:
         result = db.repo_metadata.delete_many({"repo_name": repo_name})
@@ -651,9 +994,6 @@ def initial_import(repo_url: str, repo_name: str, db: Any) -> Dict[str, Any]:
     logger.info(f"Found {len(code_files)} code files out of {len(all_files)} total")
 
     # 4. אינדוקס
-    indexed_count = 0
-    error_count = 0
-
     # שימוש ב-default_branch שזיהינו — חייב להיות SHA סטטי (לא "HEAD" סמלי)
     current_sha = git_service.get_current_sha(repo_name, branch=default_branch)
     if not current_sha:
@@ -681,22 +1021,21 @@ def initial_import(repo_url: str, repo_name: str, db: Any) -> Dict[str, Any]:
     # אחרת נשלוף תוכן מ-HEAD שיכול להיות שונה
     content_ref = tree_ref
 
-    for i, file_path in enumerate(code_files):
-        if i % 100 == 0:
-            logger.info(f"Indexing progress: {i}/{len(code_files)}")
-
-        # התיקון: מעבירים ref במפורש (לא HEAD!)
-        content = git_service.get_file_content(repo_name, file_path, ref=content_ref)
-
-        # תוכן ריק "" הוא תקין; רק None אומר שהקריאה נכשלה/אין קובץ
-        if content is not None:
-            if indexer.index_file(repo_name, file_path, content, current_sha):
-                indexed_count += 1
-            else:
-                error_count += 1
-        else:
-            error_count += 1
-            logger.warning(f"Skipping file content for {file_path} (unable to read)")
+    # התיקון: מעבירים ref במפורש (לא HEAD!)
+    # import חוזר לריפו בלי טבלת סמלים שלמה = backfill מלא (בלי דילוג unchanged)
+    existing_metadata = db.repo_metadata.find_one({"repo_name": repo_name})
+    if _symbols_incomplete(existing_metadata):
+        outcome, symbols_complete = _backfill_index(
+            git_service, indexer, repo_name, code_files, content_ref, current_sha
+        )
+    else:
+        outcome = _index_pipeline(git_service, indexer, repo_name, code_files, content_ref, current_sha)
+        symbols_complete = True
+    indexed_count = len(outcome["indexed"])
+    error_count = outcome["errors"]
+    skipped_count = outcome["skipped"]
+    unchanged_count = outcome["unchanged"]
+    _refresh_dir_tree(indexer, repo_name)
 
     # 5. שמירת metadata (כולל default_branch לשימוש בחיפוש ובסנכרון)
     db.repo_metadata.update_one(
@@ -710,6 +1049,14 @@ def initial_import(repo_url: str, repo_name: str, db: Any) -> Dict[str, Any]:
                 "total_files": len(code_files),
                 "sync_status": "completed",
                 "initial_import": True,
+                "symbols_complete": symbols_complete,
+                "last_sync_stats": {
+                    "indexed": indexed_count,
+                    "skipped": skipped_count,
+                    "unchanged": unchanged_count,
+                    "errors": error_count,
+                    "timings": outcome["timings"],
+                },
             }
         },
         upsert=True,
@@ -725,7 +1072,10 @@ def initial_import(repo_url: str, repo_name: str, db: Any) -> Dict[str, Any]:
         "total_git_files": len(all_files),
         "code_files": len(code_files),
         "indexed": indexed_count,
+        "skipped": skipped_count,
+        "unchanged": unchanged_count,
         "errors": error_count,
+        "timings": outcome["timings"],
         "sha": current_sha[:7],
     }
 
@@ -314,3 +314,35 @@ def test_queue_delay_p95_uses_nearest_rank_for_small_samples(tmp_path, monkeypat
     stats = am._queue_delay_stats(base_ts + 100, window_sec=10_000, source="internal")  # type: ignore[attr-defined]
     assert stats["queue_delay_samples"] == 10
     assert stats["queue_delay_ms_p95"] == 10
+
+
+def test_minute_buckets_match_raw_window_and_thresholds(tmp_path, monkeypatch):
+    am = _load_alert_manager(tmp_path, monkeypatch)
+    now = 1_700_000_000.5
+    monkeypatch.setattr(am, "_now", lambda: now)
+
+    am.note_request(500, 9.0, ts=now - 400, source="internal")  # מחוץ לחלון 5 דקות
+    am.note_request(500, 1.0, ts=now - 299, source="internal")  # בדקת הגבול
+    for i in range(10):
+        am.note_request(200, 0.5, ts=now - 100 + i, source="internal")
+    am.note_request(502, 0.1, ts=now - 10, source="external")
+
+    assert am._collect_recent_samples(300, source_filter="internal") == (11, 1, pytest.approx(6.0))
+    assert am._collect_recent_samples(300)[0] == 12
+    assert am.get_current_error_rate_percent(300, source="external") == pytest.approx(100.0)
+
+    # הספים מחושבים ממוצע/סטיית תקן של ערכי הדקות (דגימות פנימיות בלבד)
+    am._recompute_thresholds(now)
+    per_minute = {}
+    for ts, is_err, lat, src in am._samples:
+        if src == "internal":
+            b = per_minute.setdefault(int(ts // 60), [0, 0, 0.0])
+            b[0] += 1
+            b[1] += int(is_err)
+            b[2] += lat
+    lats = [b[2] / b[0] for b in per_minute.values()]
+    mean = sum(lats) / len(lats)
+    std = (sum((v - mean) ** 2 for v in lats) / len(lats)) ** 0.5
+    snap = am._thresholds["latency_seconds"]
+    assert snap.mean == pytest.approx(mean)
+    assert snap.std == pytest.approx(std)
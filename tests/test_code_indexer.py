@@ -141,3 +141,12 @@ def test_index_file_allows_roadmap_md_even_if_large():
     # קובץ md גדול אחר (שם שונה) עדיין ידולג
     assert idx.index_file("Repo", "docs/HUGE_NOTES.md", large_content, commit_sha="c" * 40) is False
 
+
+
+def test_size_limit_is_in_utf8_bytes_like_the_blob_precheck():
+    idx = CodeIndexer(db=None)
+    # פחות תווים מהמגבלה, אבל יותר בתים - כמו שהבדיקה המוקדמת על ה-blob רואה אותו
+    hebrew = "ש" * (idx.MAX_FILE_SIZE // 2 + 1)
+    assert len(hebrew) < idx.MAX_FILE_SIZE
+    assert idx.build_document("Repo", "notes.md", hebrew) is None
+    assert idx.build_document("Repo", "notes.md", "ש" * (idx.MAX_FILE_SIZE // 2)) is not None
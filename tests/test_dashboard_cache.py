@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from services import dashboard_cache as dc
+
+
+class _FakeRedis:
+    is_enabled = True
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, expire_seconds=300):
+        self.store[key] = value
+        return True
+
+
+def test_lru_is_bounded_per_kind():
+    cache = dc.DashboardCache(max_entries=2, stale_seconds=0)
+    for i in range(3):
+        cache.store("timeseries", i, {"i": i}, ttl=60)
+    cache.store("alerts", "a", 1, ttl=60)
+    assert cache.get("timeseries", 0, 60) is None
+    assert cache.get("timeseries", 2, 60) == ({"i": 2}, False)
+    assert cache.get("alerts", "a", 60) == (1, False)
+
+
+def test_stale_entries_only_served_inside_window(monkeypatch):
+    cache = dc.DashboardCache(stale_seconds=30)
+    cache.store("aggregations", "k", "v", ttl=10)
+    now = time.time()
+    monkeypatch.setattr(dc.time, "time", lambda: now + 20)
+    assert cache.get("aggregations", "k", 10) is None
+    assert cache.get("aggregations", "k", 10, allow_stale=True) == ("v", True)
+    monkeypatch.setattr(dc.time, "time", lambda: now + 45)
+    assert cache.get("aggregations", "k", 10, allow_stale=True) is None
+
+
+def test_shared_kinds_go_through_redis(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr("cache_manager.cache", redis, raising=False)
+    monkeypatch.delenv("OBS_DASHBOARD_CACHE_REDIS", raising=False)
+    writer = dc.DashboardCache(shared_kinds=("aggregations",))
+    writer.store("aggregations", ("a", 1), {"total": 3}, ttl=60)
+    writer.store("alerts", "local-only", 1, ttl=60)
+    assert len(redis.store) == 1
+
+    # worker אחר: אין לו עותק מקומי, מקבל את התוצאה מ-Redis
+    reader = dc.DashboardCache(shared_kinds=("aggregations",))
+    assert reader.get("aggregations", ("a", 1), 60) == ({"total": 3}, False)
+    assert reader.get("alerts", "local-only", 60) is None
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    cache = dc.DashboardCache()
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(2)
+        return {"ok": True}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.single_flight("t", "k", compute))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(2)
+    assert len(calls) == 1
+    assert results == [{"ok": True}] * 5
+
+
+def test_single_flight_propagates_errors_and_recovers():
+    cache = dc.DashboardCache()
+
+    def boom():
+        raise ValueError("invalid_metric")
+
+    with pytest.raises(ValueError):
+        cache.single_flight("t", "k", boom)
+    assert cache.single_flight("t", "k", lambda: 7) == 7
+
+
+def test_dashboard_serves_stale_and_refreshes_in_background(monkeypatch):
+    from services import observability_dashboard as obs
+
+    monkeypatch.setattr(obs, "_DASHBOARD_CACHE", dc.DashboardCache(stale_seconds=60))
+    calls = []
+    refreshed = threading.Event()
+
+    def compute():
+        calls.append(1)
+        if len(calls) > 1:
+            refreshed.set()
+        return len(calls)
+
+    assert obs._cached_call("timeseries", "k", 10, compute) == 1
+    assert obs._cached_call("timeseries", "k", 10, compute) == 1
+    now = time.time()
+    monkeypatch.setattr(dc.time, "time", lambda: now + 15)
+    # פג תוקף: מקבלים מיד את הערך הישן, והחישוב רץ ברקע
+    assert obs._cached_call("timeseries", "k", 10, compute) == 1
+    assert refreshed.wait(2)
+    for _ in range(50):
+        if obs._cache_get("timeseries", "k", 10) == 2:
+            break
+        time.sleep(0.01)
+    assert obs._cache_get("timeseries", "k", 10) == 2
+    assert len(calls) == 2
@@ -0,0 +1,132 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from services import drive_incremental as inc
+
+
+def _entries(**files):
+    return [(name.replace("_", "."), content.encode("utf-8")) for name, content in files.items()]
+
+
+def _run(entries, state, backup_id, max_chain=5):
+    plan = inc.plan_backup(entries, state, max_chain=max_chain)
+    if plan.kind == "skip":
+        return plan, None, state
+    data = inc.build_archive(entries, plan, backup_id=backup_id, state=state, created_at="t")
+    return plan, data, inc.next_state(plan, state, backup_id=backup_id, created_at="t")
+
+
+def test_full_then_skip_then_delta_reconstructs():
+    big = "x" * 500
+    plan, base, state = _run(_entries(a_py=big, b_py=big, c_py="c"), None, "b1")
+    assert plan.kind == "full"
+
+    plan, data, same_state = _run(_entries(a_py=big, b_py=big, c_py="c"), state, "b2")
+    assert plan.kind == "skip" and data is None and same_state is state
+
+    plan, delta1, state = _run(_entries(a_py=big, b_py=big, c_py="c2", d_py="d"), state, "d1")
+    assert (plan.kind, plan.changed, plan.deleted) == ("delta", ["c.py", "d.py"], [])
+    with zipfile.ZipFile(io.BytesIO(delta1)) as zf:
+        assert sorted(zf.namelist()) == ["files/c.py", "files/d.py", inc.MANIFEST_NAME]
+
+    plan, delta2, state = _run(_entries(a_py=big, b_py=big, d_py="d"), state, "d2")
+    assert (plan.kind, plan.deleted) == ("delta", ["c.py"])
+    assert state["seq"] == 2 and state["base_id"] == "b1"
+
+    files = inc.reconstruct_snapshot([base, delta1, delta2])
+    assert files == {"a.py": big.encode(), "b.py": big.encode(), "d.py": b"d"}
+    with zipfile.ZipFile(io.BytesIO(inc.snapshot_zip(files))) as zf:
+        assert zf.read("d.py") == b"d"
+
+
+def test_user_file_named_manifest_does_not_shadow_control_files():
+    entries = [("manifest.json", b'{"mine": true}'), ("metadata.json", b"user"), ("a.py", b"a")]
+    plan, data, _ = _run(entries, None, "b1")
+    assert plan.kind == "full"
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = zf.namelist()
+        assert len(names) == len(set(names))
+        assert zf.read("files/manifest.json") == b'{"mine": true}'
+    assert inc.reconstruct_snapshot([data]) == dict(entries)
+
+
+def test_legacy_root_layout_base_continues_with_new_deltas():
+    big = b"x" * 500
+    legacy = {
+        "format": "codebot-drive-incremental/1", "kind": "full", "backup_id": "b0", "base_id": "b0",
+        "parent_id": None, "seq": 0, "created_at": "t", "files": {"a.py": inc.content_hash(big)},
+        "changed": ["a.py"], "deleted": [],
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("a.py", big)
+        zf.writestr(inc.MANIFEST_NAME, json.dumps(legacy))
+    state = {"base_id": "b0", "last_id": "b0", "seq": 0, "files": [["a.py", inc.content_hash(big)]]}
+
+    plan, delta, _ = _run([("a.py", big), ("b.py", b"b")], state, "d1")
+    assert plan.kind == "delta"
+    assert inc.reconstruct_snapshot([buf.getvalue(), delta]) == {"a.py": big, "b.py": b"b"}
+
+
+def test_long_chain_or_large_delta_rebases():
+    big = "x" * 500
+    _, _, state = _run(_entries(a_py=big, b_py="b"), None, "b1")
+    # רוב התוכן השתנה: delta לא משתלם
+    plan, _, _ = _run(_entries(a_py="y" * 500, b_py="b"), state, "b2")
+    assert plan.kind == "full"
+    # שרשרת באורך המקסימלי: base חדש
+    plan, _, _ = _run(_entries(a_py=big, b_py="b2"), dict(state, seq=3), "b3", max_chain=3)
+    assert plan.kind == "full"
+
+
+def test_broken_chain_is_rejected():
+    big = "x" * 500
+    _, base, state = _run(_entries(a_py=big, b_py="b"), None, "b1")
+    _, delta1, state = _run(_entries(a_py=big, b_py="b2"), state, "d1")
+    _, delta2, _ = _run(_entries(a_py=big, b_py="b3"), state, "d2")
+
+    with pytest.raises(ValueError):
+        inc.reconstruct_snapshot([base, delta2])
+    with pytest.raises(ValueError):
+        inc.reconstruct_snapshot([delta1])
+
+
+def test_scheduled_incremental_backup_uploads_only_changes(monkeypatch):
+    import services.google_drive_service as gds
+
+    code = {"a.py": "x" * 500, "b.py": "b"}
+
+    class _DB:
+        prefs = {"schedule_category": "all", "incremental": True}
+
+        def get_drive_prefs(self, user_id):
+            return dict(self.prefs)
+
+        def save_drive_prefs(self, user_id, prefs):
+            self.prefs.update(prefs)
+            return True
+
+        def get_user_files(self, user_id, limit=50, projection=None):
+            return [{"file_name": n, "code": c, "tags": []} for n, c in code.items()]
+
+    db = _DB()
+    uploads = []
+    monkeypatch.setattr(gds, "db", db, raising=True)
+    monkeypatch.setattr(gds, "_db_runtime", lambda: db, raising=True)
+    monkeypatch.setattr(gds, "compute_friendly_name", lambda uid, cat, label, content_sample=None: f"{label}.zip", raising=True)
+    monkeypatch.setattr(gds, "upload_bytes", lambda uid, name, data, folder_id=None, sub_path=None: uploads.append((name, data)) or "fid", raising=True)
+
+    assert gds.perform_scheduled_backup(9) == gds.ScheduledBackupResult(ok=True, uploaded=1)
+    assert gds.perform_scheduled_backup(9) == gds.ScheduledBackupResult(ok=True, uploaded=0)
+    code["b.py"] = "b2"
+    assert gds.perform_scheduled_backup(9) == gds.ScheduledBackupResult(ok=True, uploaded=1)
+
+    assert [name for name, _ in uploads] == ["CodeBot.zip", "CodeBot_delta.zip"]
+    with zipfile.ZipFile(io.BytesIO(uploads[1][1])) as zf:
+        assert "files/a.py" not in zf.namelist() and zf.read("files/b.py") == b"b2"
+    files = inc.reconstruct_snapshot([data for _, data in uploads])
+    assert files == {"a.py": code["a.py"].encode(), "b.py": b"b2"}
+    assert db.prefs["incremental_state"]["all"]["seq"] == 1
@@ -199,3 +199,139 @@ def test_constructor_token_overrides_map(tmp_path, monkeypatch):
     svc = GitMirrorService(base_path=str(tmp_path), github_token="ghp_EXPLICIT")
     # טוקן שהוזרק במפורש ל-constructor גובר על הכל
     assert svc._token_for_url("https://github.com/Campaign-AI4U/campaign-ai.git") == "ghp_EXPLICIT"
+
+
+def _make_bare_repo(tmp_path, name, files):
+    import subprocess
+
+    work = tmp_path / "work"
+    work.mkdir()
+    for rel, data in files.items():
+        target = work / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    subprocess.run(git + ["init", "-q"], cwd=work, check=True)
+    subprocess.run(git + ["add", "-A"], cwd=work, check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=work, check=True)
+    subprocess.run(["git", "clone", "-q", "--bare", str(work), str(tmp_path / f"{name}.git")], check=True)
+
+
+def test_iter_file_contents_uses_single_batch_process(service, tmp_path, monkeypatch):
+    _make_bare_repo(
+        tmp_path,
+        "test-repo",
+        {
+            "a.py": b"print('a')\r\n",
+            "src/b.py": b"x = 1\n",
+            "big.txt": b"z" * 50,
+            "bin.dat": b"\xff\xfe\x00",
+        },
+    )
+    import services.git_mirror_service as gms
+
+    spawned = []
+    real_popen = gms.subprocess.Popen
+
+    def _popen(cmd, *a, **kw):
+        spawned.append(cmd)
+        return real_popen(cmd, *a, **kw)
+
+    monkeypatch.setattr(gms.subprocess, "Popen", _popen)
+
+    blobs = list(
+        service.iter_file_contents(
+            "test-repo",
+            ["a.py", "src/b.py", "missing.py", "big.txt", "bin.dat", "../etc/passwd"],
+            ref="HEAD",
+            max_size_for=lambda path: 10 if path == "big.txt" else None,
+        )
+    )
+
+    by_path = {b.path: b for b in blobs}
+    assert [b.path for b in blobs][0] == "a.py"
+    assert by_path["a.py"].content == "print('a')\n"
+    assert by_path["src/b.py"].content == "x = 1\n"
+    assert by_path["missing.py"].skipped == "missing"
+    assert by_path["big.txt"].skipped == "too_large" and by_path["big.txt"].size == 50
+    assert by_path["bin.dat"].skipped == "decode_error"
+    assert by_path["../etc/passwd"].skipped == "invalid_path"
+    assert sorted(cmd[2] for cmd in spawned) == ["--batch", "--batch-check"]
+
+
+def test_blob_reader_reads_large_blobs_and_times_out_without_threads(service, tmp_path, monkeypatch):
+    import threading
+
+    big = ("שלום " * 40000).encode("utf-8")
+    _make_bare_repo(tmp_path, "test-repo", {"big.txt": big, "a.py": b"x = 1\n"})
+    import services.git_mirror_service as gms
+
+    threads_before = threading.active_count()
+    with service.blob_reader("test-repo") as reader:
+        sha, _, size = reader.object_info("HEAD:big.txt")
+        assert size == len(big) and reader.read_object(sha) == big
+        sha_a, _, _ = reader.object_info("HEAD:a.py")
+        assert reader.read_object(sha_a) == b"x = 1\n"
+        assert threading.active_count() == threads_before
+
+    # תהליך שלא עונה: הבקשה נכשלת ב-deadline והתהליך נהרג
+    real_popen = gms.subprocess.Popen
+    monkeypatch.setattr(gms.subprocess, "Popen", lambda cmd, *a, **kw: real_popen(["sleep", "30"], *a, **kw))
+    reader = gms.GitBlobReader(tmp_path, timeout=0.2)
+    with pytest.raises(RuntimeError):
+        reader.object_info("HEAD:a.py")
+    assert reader._procs["batch-check"].wait(timeout=5) is not None
+    reader.close()
+
+
+def test_object_cache_skips_git_for_resolved_sha(service, tmp_path, monkeypatch):
+    _make_bare_repo(tmp_path, "test-repo", {"a.py": b"print('a')\n", "b.py": b"x = 1\n"})
+    import services.git_mirror_service as gms
+
+    calls = []
+    real_run = gms.subprocess.run
+
+    def _run(cmd, *a, **kw):
+        calls.append(cmd)
+        return real_run(cmd, *a, **kw)
+
+    monkeypatch.setattr(gms.subprocess, "run", _run)
+
+    first = service.get_file_at_commit("test-repo", "a.py", "HEAD")
+    sha = first["resolved_commit"]
+    assert first["content"] == "print('a')\n"
+    assert service.get_commit_info("test-repo", sha)["hash"] == sha
+
+    calls.clear()
+    again = service.get_file_at_commit("test-repo", "a.py", sha)
+    info = service.get_commit_info("test-repo", sha)
+    assert again["content"] == "print('a')\n" and again["commit"] == sha
+    assert info["hash"] == sha
+    # SHA מלא שכבר אומת + תוצאות שמורות -> אין שום תהליך git
+    assert calls == []
+
+    # ref סימבולי עדיין נפתר מול git (rev-parse בלבד), התוכן מה-cache
+    service.get_file_at_commit("test-repo", "a.py", "HEAD")
+    assert [c[3] for c in calls] == ["rev-parse"]
+
+    # שכבת הדיסק משותפת: מופע חדש (worker אחר) לא מריץ git show
+    other = GitMirrorService(base_path=str(tmp_path))
+    calls.clear()
+    assert other.get_file_at_commit("test-repo", "a.py", sha)["content"] == "print('a')\n"
+    assert [c[3] for c in calls] == ["rev-parse"]
+
+
+def test_object_cache_evicts_by_size(tmp_path):
+    from services.git_object_cache import GitObjectCache
+
+    cache = GitObjectCache(tmp_path / "c", memory_bytes=300, disk_bytes=600)
+    for i in range(20):
+        cache.put("show", "r", (f"sha{i}",), {"content": f"{i}-" + "x" * 200 + str(i * 7919)})
+    assert cache._memory_used <= 300
+    on_disk = sum(p.stat().st_size for p in (tmp_path / "c").glob("*/*/*.z"))
+    assert 0 < on_disk <= 600
+    assert cache.get("show", "r", ("sha19",))["content"].startswith("19-")
+    assert cache.get("show", "r", ("sha0",)) is None
+
+    cache.invalidate_repo("r")
+    assert cache.get("show", "r", ("sha19",)) is None
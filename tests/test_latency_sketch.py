@@ -0,0 +1,51 @@
+import random
+
+from monitoring.latency_sketch import LatencySketch, merge_sketch_docs
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    import math
+
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def test_quantiles_within_relative_error():
+    rnd = random.Random(3)
+    values = [rnd.lognormvariate(-3, 1.2) for _ in range(20000)]
+    sketch = LatencySketch(alpha=0.01)
+    for v in values:
+        sketch.add(v)
+
+    for q in (0.5, 0.95, 0.99):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.011
+
+
+def test_merged_docs_equal_single_sketch():
+    rnd = random.Random(5)
+    parts = [[rnd.expovariate(20) for _ in range(500)] for _ in range(6)]
+    whole = LatencySketch()
+    docs = []
+    for part in parts:
+        s = LatencySketch()
+        for v in part:
+            s.add(v)
+            whole.add(v)
+        docs.append(s.to_doc())
+
+    merged = merge_sketch_docs(docs + [{"v": 99}, None])
+
+    assert merged.count == whole.count == 3000
+    for q in (0.5, 0.99):
+        assert merged.quantile(q) == whole.quantile(q)
+
+
+def test_zero_values_and_empty():
+    sketch = LatencySketch()
+    assert sketch.quantile(0.5) is None
+    sketch.add(0.0, count=3)
+    sketch.add(1.0)
+    restored = LatencySketch.from_doc(sketch.to_doc())
+    assert restored.quantile(0.5) == 0.0
+    assert abs(restored.quantile(1.0) - 1.0) <= 0.01
@@ -0,0 +1,133 @@
+import itertools
+
+from database import latest_index as li
+
+
+class _Coll:
+    """אוסף בזיכרון: שוויון, $ne/$in ו-aggregate של בודק העקביות (group לפי קובץ)."""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(d) for d in docs]
+        self._ids = itertools.count(100)
+        self.pipelines = []
+
+    @staticmethod
+    def _match(doc, query):
+        for key, cond in query.items():
+            value = doc.get(key)
+            if isinstance(cond, dict):
+                if "$ne" in cond and value == cond["$ne"]:
+                    return False
+                if "$in" in cond and value not in cond["$in"]:
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", next(self._ids))
+        self.docs.append(doc)
+        return type("R", (), {"inserted_id": doc["_id"]})
+
+    def find(self, query, projection=None, sort=None):
+        found = [dict(d) for d in self.docs if self._match(d, query)]
+        if sort:
+            key, direction = sort[0]
+            found.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return found
+
+    def find_one(self, query, projection=None, sort=None):
+        found = self.find(query, sort=sort)
+        return found[0] if found else None
+
+    def update_one(self, query, update):
+        for d in self.docs:
+            if self._match(d, query):
+                d.update(update.get("$set", {}))
+                return type("R", (), {"modified_count": 1})
+        return type("R", (), {"modified_count": 0})
+
+    def update_many(self, query, update):
+        n = 0
+        for d in self.docs:
+            if self._match(d, query):
+                d.update(update.get("$set", {}))
+                n += 1
+        return type("R", (), {"modified_count": n})
+
+    def count_documents(self, query):
+        return len(self.find(query))
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.pipelines.append(pipeline)
+        groups = {}
+        for d in sorted(self.find(pipeline[0]["$match"]), key=lambda d: -d["version"]):
+            key = (d["user_id"], d["file_name"])
+            g = groups.setdefault(key, {"_id": {"user_id": key[0], "file_name": key[1]}, "top": d["_id"],
+                                        "top_flagged": d.get(li.FIELD) is True, "flagged": 0})
+            g["flagged"] += 1 if d.get(li.FIELD) is True else 0
+        return list(groups.values())
+
+
+def _flags(coll):
+    return {d["_id"]: d.get(li.FIELD) for d in coll.docs}
+
+
+def test_latest_stages_switch_on_flag(monkeypatch):
+    match = {"user_id": 1, "is_active": True}
+    monkeypatch.setattr(li, "reads_enabled", lambda: False)
+    assert [list(s)[0] for s in li.latest_stages(match)] == ["$match", "$sort", "$group", "$replaceRoot"]
+    monkeypatch.setattr(li, "reads_enabled", lambda: True)
+    assert li.latest_stages(match) == [{"$match": {"user_id": 1, "is_active": True, "is_latest": True}}]
+
+
+def test_repository_maintains_flag_across_save_delete_restore(monkeypatch):
+    import database.repository as repo_mod
+
+    coll = _Coll()
+    mgr = type("M", (), {"collection": coll, "large_files_collection": _Coll()})()
+    monkeypatch.setattr(repo_mod.config, "NORMALIZE_CODE_ON_SAVE", False, raising=False)
+    monkeypatch.setattr(repo_mod.config, "CODE_HISTORY_DELTA_ENABLED", False, raising=False)
+    monkeypatch.setattr(repo_mod, "ObjectId", lambda v: v)
+    repo = repo_mod.Repository(mgr)
+    for code in ("v1", "v2", "v3"):
+        assert repo.save_file(7, "a.py", code, "python") is True
+    assert repo.save_file(7, "b.py", "other", "python") is True
+    v1, v2, v3, b1 = (d["_id"] for d in coll.docs)
+    assert _flags(coll) == {v1: False, v2: False, v3: True, b1: True}
+
+    # מחיקת הגרסה האחרונה בלבד: הקודמת הופכת לאחרונה
+    assert repo.delete_file_by_id(v3) is True
+    assert _flags(coll)[v2] is True and _flags(coll)[v3] is False
+    assert repo.restore_file_by_id(7, v3) is True
+    assert _flags(coll)[v3] is True and _flags(coll)[v2] is False
+
+    # מחיקה רכה של כל הקובץ: אף גרסה לא נשארת מסומנת
+    assert repo.delete_file(7, "a.py") is True
+    assert [d.get(li.FIELD) for d in coll.docs if d["file_name"] == "a.py"] == [False, False, False]
+    assert _flags(coll)[b1] is True
+
+
+def test_check_and_repair_fixes_drift():
+    docs = [
+        # קובץ ישן מלפני התכונה: אין דגל בכלל
+        {"_id": 1, "user_id": 1, "file_name": "old.py", "version": 1, "is_active": True},
+        {"_id": 2, "user_id": 1, "file_name": "old.py", "version": 2, "is_active": True},
+        # דגל על גרסה ישנה (כתיבה ישירה שלא עדכנה אותו)
+        {"_id": 3, "user_id": 1, "file_name": "x.py", "version": 1, "is_active": True, "is_latest": True},
+        {"_id": 4, "user_id": 1, "file_name": "x.py", "version": 2, "is_active": True},
+        # תקין
+        {"_id": 5, "user_id": 2, "file_name": "ok.py", "version": 1, "is_active": True, "is_latest": True},
+        # בסל המיחזור עם דגל
+        {"_id": 6, "user_id": 2, "file_name": "gone.py", "version": 1, "is_active": False, "is_latest": True},
+    ]
+    coll = _Coll(docs)
+
+    report = li.check_and_repair(coll, repair=False)
+    assert report == {"files": 3, "missing": 2, "extra": 1, "inactive_flagged": 1, "fixed": 0}
+    assert _flags(coll)[2] is None
+
+    report = li.check_and_repair(coll)
+    assert report["fixed"] == 3
+    assert _flags(coll) == {1: None, 2: True, 3: False, 4: True, 5: True, 6: False}
+    assert li.check_and_repair(coll, repair=False) == {"files": 3, "missing": 0, "extra": 0, "inactive_flagged": 0, "fixed": 0}
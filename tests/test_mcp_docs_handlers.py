@@ -139,3 +139,102 @@ def test_path_outside_docs_rejected(bad_path):
     out = docs_handlers.docs_get_section(be, path=bad_path)
     assert out["ok"] is False and out["error"] == "missing_path"
     assert be.calls == []  # נחסם ב-handler לפני ה-backend
+
+
+# ---- cache פרסור + אינדקס חוצה-מסמכים ----
+
+class _TreeBackend(_FsBackend):
+    """כמו _FsBackend, עם list_tree על docs/ האמיתי (לאינדקס חוצה-מסמכים)."""
+
+    def list_tree(self, *, repo, path, ref, page, per_page, byte_budget):
+        self.calls.append(("list_tree", path, ref))
+        paths = sorted(str(p.relative_to(_ROOT)) for p in (_ROOT / "docs").rglob("*.rst"))
+        return {"ok": True, "paths": paths, "total": len(paths), "per_page": len(paths)}
+
+
+def test_parsed_document_cached_by_blob_sha(monkeypatch):
+    from mcp_server import docs_index
+
+    docs_index.clear()
+    parses = []
+    real = docs_index.rst_parser.parse_document
+    monkeypatch.setattr(docs_index.rst_parser, "parse_document", lambda t: parses.append(1) or real(t))
+
+    be = _FsBackend()
+    a = docs_handlers.docs_get_section(be, path="environment-variables", section="טבלה מרכזית")
+    b = docs_handlers.docs_get_section(be, path="environment-variables")
+    assert a["ok"] and b["ok"] and len(parses) == 1
+
+    # תוכן אחר באותו נתיב -> blob SHA אחר -> פרסור מחדש
+    docs_handlers.docs_get_section(_TextBackend("T\n=\n\nx\n"), path="environment-variables")
+    assert len(parses) == 2
+    assert docs_index.blob_sha("x\n") == "587be6b4c3f93f93c489c0111bba5596147a26cb"  # git hash-object
+    docs_index.clear()
+
+
+def test_section_in_other_file_is_located_via_cross_index(monkeypatch):
+    from mcp_server import docs_index
+
+    monkeypatch.setenv("MCP_DOCS_INDEX_WAIT_SECONDS", "30")
+    docs_index.clear()
+    be = _TreeBackend()
+    out = docs_handlers.docs_get_section(be, path="mcp-server", section="טבלה מרכזית")
+    assert out["error"] == "section_not_found"
+    assert {"path": "docs/environment-variables.rst", "title": "טבלה מרכזית"}.items() <= out["found_in"][0].items()
+
+    # האינדקס נבנה פעם אחת ל-commit: קריאה נוספת לא מונה שוב את docs/
+    lists = sum(1 for c in be.calls if c[0] == "list_tree")
+    docs_handlers.docs_get_section(be, path="mcp-server", section="טבלה מרכזית")
+    assert sum(1 for c in be.calls if c[0] == "list_tree") == lists == 1
+    docs_index.clear()
+
+
+class _FlakyTreeBackend(_TreeBackend):
+    """קובץ אחד נכשל זמנית (sync_in_progress) בבנייה הראשונה."""
+
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+
+    def get_file(self, *, repo, path, ref=None):
+        if self.fail and path.endswith("environment-variables.rst"):
+            return {"ok": False, "error": "sync_in_progress"}
+        return super().get_file(repo=repo, path=path, ref=ref)
+
+
+def test_partial_cross_index_is_not_cached():
+    from mcp_server import docs_index
+
+    docs_index.clear()
+    be = _FlakyTreeBackend()
+    assert docs_index.cross_index(be, "CodeBot", "deadbeef", wait=30) is None
+
+    be.fail = False
+    index = docs_index.cross_index(be, "CodeBot", "deadbeef", wait=30)
+    assert index and docs_index.locate(index, "טבלה מרכזית")
+    assert sum(1 for c in be.calls if c[0] == "list_tree") == 2
+    docs_index.clear()
+
+
+def test_cross_index_build_is_deferred_to_background():
+    import threading
+
+    from mcp_server import docs_index
+
+    docs_index.clear()
+    release = threading.Event()
+
+    class _SlowBackend(_TreeBackend):
+        def get_file(self, *, repo, path, ref=None):
+            release.wait(5)
+            return super().get_file(repo=repo, path=path, ref=ref)
+
+    be = _SlowBackend()
+    assert docs_index.cross_index(be, "CodeBot", "deadbeef", wait=0) is None
+    assert docs_index.is_building("CodeBot", "deadbeef")
+    # קריאה מקבילה מצטרפת לבנייה הקיימת ולא מתחילה עוד אחת
+    assert docs_index.cross_index(be, "CodeBot", "deadbeef", wait=0) is None
+    release.set()
+    assert docs_index.cross_index(be, "CodeBot", "deadbeef", wait=30)
+    assert sum(1 for c in be.calls if c[0] == "list_tree") == 1
+    docs_index.clear()
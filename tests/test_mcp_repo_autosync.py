@@ -156,3 +156,94 @@ def test_interval_env_floor(monkeypatch):
     assert repo_autosync._interval_seconds() == 30  # floored to the minimum
     monkeypatch.setenv("MCP_REPO_AUTOSYNC_INTERVAL", "junk")
     assert repo_autosync._interval_seconds() == 300
+
+
+def test_ls_remote_match_skips_fetch():
+    class _Remote(_Mirror):
+        def get_remote_sha(self, name, branch):
+            self.calls.append(("ls-remote", name, branch))
+            return "old"
+
+    # ה-SHA ב-DB לא ידוע, אבל ה-remote זהה למקומי -> אין fetch
+    mirror = _Remote(exists=True, local_sha="old")
+    stats = refresh_once(_DB([_meta(sha="")]), mirror)
+    assert stats["skipped"] == 1 and stats["fetched"] == 0
+    assert ("ls-remote", "alpha", "main") in mirror.calls
+    assert all(c[0] != "fetch" for c in mirror.calls)
+
+
+def test_db_match_still_asks_remote_and_is_not_fresh_without_it():
+    class _Remote(_Mirror):
+        def get_remote_sha(self, name, branch):
+            self.calls.append(("ls-remote", name, branch))
+            return "upstream"
+
+    # המקומי שווה ל-DB, אבל ה-remote זז -> fetch
+    mirror = _Remote(exists=True, local_sha="abc")
+    assert refresh_once(_DB([_meta(sha="abc")]), mirror)["fetched"] == 1
+    assert ("ls-remote", "alpha", "main") in mirror.calls
+
+    # בלי בדיקת remote: אין fetch, אבל גם לא "טרי"
+    assert repo_autosync._refresh_repo(_meta(sha="abc"), _Mirror(exists=True, local_sha="abc")) == "in_sync"
+    repo_autosync._reset_state_for_tests()
+    note = repo_autosync._note_outcome
+    note("alpha", "fetched", "abc", base=60, max_interval=300, now=1000.0)
+    note("alpha", "in_sync", "abc", base=60, max_interval=300, now=1100.0)
+    snap = repo_autosync.staleness_snapshot(now=1100.0)["alpha"]
+    assert snap["staleness_seconds"] == 100 and snap["interval_seconds"] == 120
+    repo_autosync._reset_state_for_tests()
+
+
+def test_adaptive_interval_backs_off_and_resets():
+    repo_autosync._reset_state_for_tests()
+    note = repo_autosync._note_outcome
+    note("alpha", "unchanged", "s1", base=60, max_interval=300, now=1000.0)
+    note("alpha", "unchanged", "s1", base=60, max_interval=300, now=1120.0)
+    note("alpha", "unchanged", "s1", base=60, max_interval=300, now=1360.0)
+    note("alpha", "unchanged", "s1", base=60, max_interval=300, now=1660.0)
+    snap = repo_autosync.staleness_snapshot(now=1660.0)["alpha"]
+    assert snap["interval_seconds"] == 300  # 120 -> 240 -> 300 (capped)
+    assert snap["staleness_seconds"] == 0
+
+    # not due yet — unless the webapp wrote a new SHA
+    assert repo_autosync._is_due(_meta(sha="s1"), 1700.0) is False
+    assert repo_autosync._is_due(_meta(sha="s2"), 1700.0) is True
+
+    note("alpha", "error", "s2", base=60, max_interval=300, now=1700.0)
+    assert repo_autosync.staleness_snapshot(now=1800.0)["alpha"]["staleness_seconds"] == 140
+    note("alpha", "fetched", "s2", base=60, max_interval=300, now=1800.0)
+    assert repo_autosync.staleness_snapshot(now=1800.0)["alpha"]["interval_seconds"] == 60
+    repo_autosync._reset_state_for_tests()
+
+
+def test_scheduler_slow_clone_does_not_block_other_repos():
+    import threading
+
+    repo_autosync._reset_state_for_tests()
+    release = threading.Event()
+    fetched = threading.Event()
+
+    class _Slow(_Mirror):
+        def mirror_exists(self, name):
+            return name != "slow"
+
+        def init_mirror(self, url, name):
+            release.wait(5)
+            return {"success": True}
+
+        def fetch_updates(self, name):
+            fetched.set()
+            return {"success": True}
+
+    db = _DB([_meta(name="slow"), _meta(name="fast", sha="new")])
+    scheduler = repo_autosync.RefreshScheduler(db, lambda: _Slow(local_sha="old"), interval=60, workers=2)
+    try:
+        assert scheduler.tick() == 2
+        assert fetched.wait(5)  # "fast" refreshed while "slow" is still cloning
+        assert is_refreshing("slow") is True
+        assert scheduler.tick() == 0  # in flight / not due -> nothing resubmitted
+    finally:
+        release.set()
+        scheduler.shutdown()
+    assert repo_autosync.staleness_snapshot()["slow"]["last_result"] == "cloned"
+    repo_autosync._reset_state_for_tests()
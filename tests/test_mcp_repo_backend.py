@@ -258,3 +258,17 @@ def test_search_error_maps_to_transient_check():
     )
     out = be.search(repo="alpha", query="xy")
     assert out["error"] == "sync_in_progress" and out["retry_after"] > 0
+
+
+def test_list_tree_includes_dir_summary_from_repo_dirs():
+    db = _repos_db()
+    db["repo_dirs"].docs = [
+        {"repo_name": "alpha", "path": "src", "parent_dir": "", "file_count": 2, "total_size": 30, "languages": {"python": 2}},
+        {"repo_name": "alpha", "path": "credentials", "parent_dir": "", "file_count": 1, "total_size": 1, "languages": {}},
+    ]
+    be = RepoBackend(db=db, mirror=_Mirror(files=["src/a.py", "src/b.py"]), search_service=_Search())
+    out = be.list_tree(repo="alpha")
+    assert [d["path"] for d in out["dirs"]] == ["src"]  # denied dirs omitted
+    assert out["dirs"][0]["file_count"] == 2
+    # an explicit ref isn't what was indexed — no summary
+    assert "dirs" not in be.list_tree(repo="alpha", ref="abc123")
@@ -193,3 +193,40 @@ def test_metrics_storage_caps_buffer_when_unavailable(monkeypatch):
     if buf is not None:
         # Either cleared or capped at most to METRICS_MAX_BUFFER
         assert len(buf) <= 3
+
+
+def test_rollups_carry_sketch_and_percentiles_merge_them(monkeypatch):
+    _set_env(
+        monkeypatch,
+        DISABLE_METRICS_WRITES="false",
+        METRICS_DB_ENABLED="true",
+        MONGODB_URL="mongodb://localhost:27017/codebot",
+        DATABASE_NAME="code_keeper_bot",
+    )
+    _install_observability_stub(monkeypatch, [])
+    calls = _install_fake_pymongo(monkeypatch, fail_insert=False, calls_out=[])
+
+    ms = _import_fresh_metrics_storage(monkeypatch)
+    for i in range(1, 101):
+        ms.enqueue_request_metric(200, i / 100.0, extra={"method": "GET", "path": "/a"})
+    ms.flush(force=True)
+    for i in range(1, 101):
+        ms.enqueue_request_metric(200, i / 100.0, extra={"method": "GET", "path": "/b"})
+    ms.flush(force=True)
+
+    docs = [d for batch in calls for d in batch]
+    assert docs and all(isinstance(d["latency_sketch"]["bins"], bytes) for d in docs)
+
+    class _Coll:
+        def find(self, match, projection=None):
+            assert match["type"] == "request_agg"
+            return [{"latency_sketch": d["latency_sketch"]} for d in docs]
+
+        def aggregate(self, pipeline):  # pragma: no cover - must not be reached
+            raise AssertionError("raw percentile path should not run")
+
+    monkeypatch.setattr(ms, "_get_collection", lambda **_: _Coll())
+    out = ms.aggregate_latency_percentiles(start_dt=None, end_dt=None)
+
+    assert abs(out["p50"] - 0.50) <= 0.01
+    assert abs(out["p99"] - 0.99) <= 0.01
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from monitoring import rollups
+
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+class _RollupColl:
+    """Minimal Mongo stand-in: upsert with $setOnInsert/$inc/$max, find by kind + $or of tier/ts ranges."""
+
+    def __init__(self):
+        self.docs = {}
+        self.finds = []
+
+    def update_one(self, flt, update, upsert=False):
+        doc = self.docs.get(flt["_id"])
+        if doc is None:
+            if "since" in flt or not upsert:
+                return
+            doc = self.docs[flt["_id"]] = {"_id": flt["_id"], **update.get("$setOnInsert", {})}
+        elif "since" in flt and not doc["since"] > flt["since"]["$gt"]:
+            return
+        for field, value in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + value
+        for field, value in update.get("$max", {}).items():
+            doc[field] = max(doc.get(field, value), value)
+        doc.update(update.get("$set", {}))
+
+    def find_one(self, flt):
+        return self.docs.get(flt["_id"])
+
+    def find(self, query):
+        self.finds.append(query)
+        out = []
+        for doc in self.docs.values():
+            if doc.get("kind") != query["kind"]:
+                continue
+            for seg in query["$or"]:
+                if doc["tier"] == seg["tier"] and seg["ts"]["$gte"] <= doc["ts"] < seg["ts"]["$lt"]:
+                    out.append(dict(doc))
+        return out
+
+
+@pytest.fixture(autouse=True)
+def _fresh_coverage(monkeypatch):
+    monkeypatch.setattr(rollups, "_coverage_marked", set())
+    monkeypatch.delenv("OBSERVABILITY_ROLLUPS_ENABLED", raising=False)
+
+
+def _alerts():
+    coll = _RollupColl()
+    rollups.mark_coverage(coll, rollups.KIND_ALERTS, T0 - timedelta(minutes=1))
+    events = [
+        (T0 + timedelta(minutes=5), "critical", "oom"),
+        (T0 + timedelta(hours=1, minutes=30), "warning", "slow"),
+        (T0 + timedelta(hours=1, minutes=31), "warning", "slow"),
+        (T0 + timedelta(days=1, hours=2), "anomaly", None),
+        (T0 + timedelta(days=2, minutes=59), "crit", "deployment_event"),
+    ]
+    for ts, severity, alert_type in events:
+        assert rollups.record_alert(coll, ts=ts, severity=severity, alert_type=alert_type, name="x")
+    return coll, events
+
+
+def test_plan_uses_coarsest_tier_in_the_middle():
+    start = int((T0 + timedelta(hours=22, minutes=30)).timestamp())
+    end = int((T0 + timedelta(days=3, hours=1, minutes=10)).timestamp())
+    segments = rollups.plan(start, end, [86400, 3600, 60])
+    assert [t for t, _, _ in segments] == [60, 3600, 86400, 3600, 60]
+    assert segments[0][1] == start and segments[-1][2] == end
+    # רצף בלי חורים
+    assert all(a[2] == b[1] for a, b in zip(segments, segments[1:]))
+    assert rollups.pick_tiers(300) == [60]
+    assert rollups.pick_tiers(45) == []
+
+
+def test_alert_timeseries_matches_raw_buckets():
+    coll, events = _alerts()
+    end = T0 + timedelta(days=3)
+
+    daily = rollups.alert_timeseries(coll, start_dt=T0, end_dt=end, granularity_seconds=86400)
+    assert [(row["timestamp"][:10], row["total"]) for row in daily] == [
+        ("2026-03-01", 3), ("2026-03-02", 1), ("2026-03-03", 1),
+    ]
+    assert daily[0]["critical"] == 1 and daily[0]["warning"] == 2 and daily[2]["critical"] == 1
+    # חלון של 3 ימים שלמים = מסמכי יום (ודקה אחת בסוף, כי end_dt כולל)
+    assert {seg["tier"] for seg in coll.finds[-1]["$or"]} == {86400, 60}
+
+    # קצוות חלקיים: מתחילים באמצע השעה הראשונה ונגמרים לפני האירוע האחרון
+    hourly = rollups.alert_timeseries(
+        coll, start_dt=T0 + timedelta(minutes=1), end_dt=T0 + timedelta(days=2, minutes=30), granularity_seconds=3600
+    )
+    assert sum(row["total"] for row in hourly) == 4
+    assert {seg["tier"] for seg in coll.finds[-1]["$or"]} == {3600, 60}
+
+    summary = rollups.alert_summary(coll, start_dt=T0, end_dt=end)
+    assert summary == {"total": 5, "critical": 2, "anomaly": 1, "deployment": 1}
+
+
+def test_window_before_coverage_falls_back_to_raw():
+    coll, _ = _alerts()
+    assert rollups.alert_timeseries(coll, start_dt=T0 - timedelta(days=1), end_dt=T0, granularity_seconds=3600) is None
+    assert rollups.alert_timeseries(coll, start_dt=T0, end_dt=T0, granularity_seconds=45) is None
+    assert rollups.alert_timeseries(_RollupColl(), start_dt=T0, end_dt=T0, granularity_seconds=60) is None
+
+
+def test_request_rollups_merge_flushes_of_the_same_bucket():
+    coll = _RollupColl()
+    agg = {"type": "request_agg", "ts": T0 + timedelta(minutes=3), "method": "GET", "path": "/api/x"}
+    batch = [
+        dict(agg, count=3, sum_duration=0.6, max_duration=0.4, error_count=1, status_counts={"2xx": 2, "5xx": 1}),
+        dict(agg, count=1, sum_duration=1.0, max_duration=1.0, error_count=0, status_counts={"2xx": 1}),
+        dict(agg, method="POST", count=2, sum_duration=0.2, max_duration=0.1, error_count=0),
+        {"type": "request", "ts": T0},
+    ]
+    assert rollups.record_request_aggs(coll, batch)
+    minute = next(d for d in coll.docs.values() if d.get("tier") == 60 and d["dims"]["method"] == "GET")
+    assert (minute["count"], minute["error_count"], minute["max_duration"]) == (4, 1, 1.0)
+    assert (minute["status.2xx"], minute["status.5xx"]) == (3, 1)
+
+    series = rollups.request_timeseries(
+        coll, start_dt=T0 + timedelta(minutes=3), end_dt=T0 + timedelta(hours=2), granularity_seconds=3600
+    )
+    assert series is None  # הכיסוי מתחיל בדקה שאחרי הכתיבה הראשונה
+
+    coll.docs["meta|requests"]["since"] = T0
+    series = rollups.request_timeseries(coll, start_dt=T0, end_dt=T0 + timedelta(hours=2), granularity_seconds=3600)
+    assert series == [{
+        "timestamp": T0.isoformat(), "count": 6, "avg_duration": pytest.approx(1.8 / 6),
+        "max_duration": 1.0, "error_count": 1,
+    }]
+    top = rollups.top_endpoints(coll, start_dt=T0, end_dt=T0 + timedelta(days=1), limit=1)
+    assert [(r["endpoint"], r["method"], r["count"]) for r in top] == [("/api/x", "GET", 4)]
+
+
+def test_extend_coverage_only_moves_backwards():
+    coll, _ = _alerts()
+    since = rollups.coverage_since(coll, rollups.KIND_ALERTS)
+    rollups.extend_coverage(coll, rollups.KIND_ALERTS, since + timedelta(days=1))
+    assert rollups.coverage_since(coll, rollups.KIND_ALERTS) == since
+    rollups.extend_coverage(coll, rollups.KIND_ALERTS, since - timedelta(days=7))
+    assert rollups.coverage_since(coll, rollups.KIND_ALERTS) == since - timedelta(days=7)
+
+
+def test_disabled_rollups_are_not_written_or_read(monkeypatch):
+    coll, _ = _alerts()
+    monkeypatch.setenv("OBSERVABILITY_ROLLUPS_ENABLED", "false")
+    assert not rollups.record_alert(coll, ts=T0, severity="info", alert_type="x", name="x")
+    assert rollups.alert_timeseries(coll, start_dt=T0, end_dt=T0, granularity_seconds=60) is None
@@ -171,6 +171,72 @@ class TestExport:
             assert bms[0]["line_text_preview"] == "Heading"
 
 
+class TestStreamingExport:
+    @staticmethod
+    def _files(n):
+        return [{"file_name": f"f{i}.py", "code": f"print({i})", "version": 1} for i in range(n)]
+
+    def test_chunks_form_same_zip_as_buffer(self, backup_service, mock_db):
+        """ייצוא זורם מחזיר כמה chunks שמרכיבים ZIP תקין עם אותו תוכן."""
+        mock_db.get_user_files.return_value = self._files(3)
+
+        chunks = list(backup_service.iter_export_chunks(user_id=12345))
+        assert len(chunks) > 1
+
+        with zipfile.ZipFile(BytesIO(b"".join(chunks)), "r") as streamed, \
+                zipfile.ZipFile(backup_service.export_user_data(user_id=12345), "r") as buffered:
+            assert streamed.namelist() == buffered.namelist()
+            assert streamed.read("files/f2.py") == b"print(2)"
+            assert json.loads(streamed.read("backup_info.json"))["files_count"] == 3
+
+    def test_fallback_paginates_without_file_cap(self, backup_service, mock_db, monkeypatch):
+        """אין תקרת קבצים: ה-fallback עובר על כל העמודים של get_user_files."""
+        import services.personal_backup_service as pbs
+
+        monkeypatch.setattr(pbs, "EXPORT_BATCH_SIZE", 2)
+        files = self._files(5)
+        mock_db.get_user_files.side_effect = lambda uid, limit, skip=0, projection=None: files[skip: skip + limit]
+        mock_db.get_user_large_files.side_effect = [
+            ([{"file_name": "big1.txt"}, {"file_name": "big2.txt"}], 3),
+            ([{"file_name": "big3.txt"}], 3),
+        ]
+        mock_db.get_large_file.side_effect = lambda uid, name: {"content": name.upper()}
+
+        with zipfile.ZipFile(backup_service.export_user_data(user_id=12345), "r") as zf:
+            info = json.loads(zf.read("backup_info.json"))
+            assert info["files_count"] == 5
+            assert info["large_files_count"] == 3
+            assert zf.read("large_files/big3.txt") == b"BIG3.TXT"
+        assert [c.kwargs["skip"] for c in mock_db.get_user_files.call_args_list] == [0, 2, 4]
+
+    def test_aggregate_cursor_has_no_limit(self, mock_db):
+        """הנתיב הישיר קורא cursor ב-batches ולא חותך ב-$limit."""
+        from services.personal_backup_service import PersonalBackupService
+
+        mock_db.collection = MagicMock()
+        mock_db.collection.aggregate.return_value = iter(self._files(4))
+        PersonalBackupService(mock_db).export_user_data(user_id=12345)
+
+        pipeline = mock_db.collection.aggregate.call_args.args[0]
+        assert not any("$limit" in stage for stage in pipeline)
+        assert "batchSize" in mock_db.collection.aggregate.call_args.kwargs
+
+    def test_export_to_file_returns_stats_and_records_metrics(self, backup_service, tmp_path):
+        """export_user_data_to כותב לקובץ ומדווח throughput."""
+        path = tmp_path / "out.zip"
+        with patch("metrics.record_backup_export") as record:
+            with open(path, "wb") as fh:
+                stats = backup_service.export_user_data_to(fh, user_id=12345, target="disk")
+
+        assert stats["bytes"] == path.stat().st_size > 0
+        assert stats["files_count"] == 1
+        record.assert_called_once()
+        target, size, files, _duration = record.call_args.args
+        assert (target, size, files) == ("disk", stats["bytes"], 1)
+        with zipfile.ZipFile(path, "r") as zf:
+            assert zf.read("files/hello.py") == b"print('hello')"
+
+
 class TestRestore:
     def _make_zip(self, files_dict: dict) -> bytes:
         """יוצר ZIP מדומה עם קבצים נתונים."""
@@ -563,3 +629,122 @@ class TestRestore:
         assert result["restored"]["sticky_notes"] == 0
         assert mock_db.db.sticky_notes.insert_one.call_count == 0
 
+
+
+class _BulkDB:
+    """DB מדומה עם מתודות השחזור במנות מוגדרות על המחלקה (כמו DatabaseManager)."""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.state_calls = []
+        self.saved_chunks = []
+        self.favorites = []
+        self.toggled_pins = []
+        self.db = MagicMock()
+        self.db.file_bookmarks.find.return_value = []
+
+    def get_files_state_by_names(self, user_id, names):
+        self.state_calls.append(list(names))
+        return {n: dict(self.existing[n]) for n in names if n in self.existing}
+
+    def bulk_save_code_snippets(self, snippets, existing):
+        self.saved_chunks.append([(s.file_name, s.is_favorite) for s in snippets])
+        return len(snippets)
+
+    def set_favorite_state(self, user_id, names, state):
+        self.favorites.append((list(names), state))
+        return len(names)
+
+    def toggle_pin(self, user_id, file_name):
+        self.toggled_pins.append(file_name)
+        return {"success": True}
+
+    def reorder_pinned(self, user_id, file_name, order):
+        return True
+
+    def get_file(self, user_id, file_name):
+        raise AssertionError("bulk restore must not look files up one by one")
+
+    def get_user_large_files(self, *a, **k):
+        return [], 0
+
+
+class TestBulkRestore:
+    def _zip(self, metas, contents):
+        return TestRestore()._make_zip(
+            {
+                "backup_info.json": {"version": 1},
+                "metadata/files.json": {"regular_files": metas, "large_files": []},
+                **{f"files/{name}": code for name, code in contents.items()},
+            }
+        )
+
+    def test_chunks_prefetch_state_and_insert_once_per_chunk(self, monkeypatch):
+        import services.personal_backup_service as pbs
+
+        monkeypatch.setattr(pbs, "RESTORE_CHUNK_SIZE", 2)
+        monkeypatch.setattr(pbs.time, "sleep", lambda s: None)
+        db = _BulkDB({
+            # קיים עם תוכן זהה - רק המועדף משתנה, בלי גרסה חדשה
+            "f0.py": {"file_name": "f0.py", "code": "c0", "programming_language": "python",
+                      "description": "", "tags": [], "is_favorite": True, "is_pinned": False},
+            # קיים עם תוכן שונה + צריך להינעץ
+            "f1.py": {"file_name": "f1.py", "code": "old", "is_favorite": False, "is_pinned": False},
+        })
+        metas = [{"file_name": f"f{i}.py", "programming_language": "python", "description": "", "tags": []} for i in range(5)]
+        metas[1].update(is_pinned=True, pin_order=1)
+        zip_bytes = self._zip(metas, {f"f{i}.py": f"c{i}" for i in range(5)})
+
+        result = pbs.PersonalBackupService(db).restore_user_data(12345, zip_bytes, overwrite=True)
+
+        assert result["ok"] is True
+        assert result["restored"]["files"] == 4
+        assert db.state_calls == [["f0.py", "f1.py"], ["f2.py", "f3.py"], ["f4.py"]]
+        assert db.saved_chunks == [[("f1.py", False)], [("f2.py", False), ("f3.py", False)], [("f4.py", False)]]
+        assert db.favorites == [(["f0.py"], False)]
+        assert db.toggled_pins == ["f1.py"]
+
+    def test_existing_files_skipped_without_overwrite(self, monkeypatch):
+        import services.personal_backup_service as pbs
+
+        db = _BulkDB({"a.py": {"file_name": "a.py", "code": "old"}})
+        metas = [{"file_name": "a.py"}, {"file_name": "b.py"}, {"file_name": "b.py", "description": "last wins"}]
+        zip_bytes = self._zip(metas, {"a.py": "new", "b.py": "b"})
+
+        result = pbs.PersonalBackupService(db).restore_user_data(12345, zip_bytes, overwrite=False)
+
+        assert result["restored"]["files"] == 1
+        assert db.saved_chunks == [[("b.py", False)]]
+        assert db.favorites == [] and db.toggled_pins == []
+
+    def test_bulk_can_be_disabled(self, monkeypatch):
+        import services.personal_backup_service as pbs
+
+        db = _BulkDB({})
+        monkeypatch.setattr(pbs.PersonalBackupService, "_restore_regular_files", lambda self, *a, **k: 7)
+        zip_bytes = self._zip([{"file_name": "a.py"}], {"a.py": "x"})
+
+        result = pbs.PersonalBackupService(db).restore_user_data(12345, zip_bytes, bulk=False)
+
+        assert result["restored"]["files"] == 7
+        assert db.state_calls == []
+
+
+def test_latency_throttle_sleeps_in_proportion_to_db_time(monkeypatch):
+    import services.personal_backup_service as pbs
+
+    ticks = iter([10.0, 10.8, 20.0, 29.0])
+    monkeypatch.setattr(pbs.time, "perf_counter", lambda: next(ticks))
+    slept = []
+    monkeypatch.setattr(pbs.time, "sleep", slept.append)
+    throttle = pbs._LatencyThrottle(ratio=0.5, max_sleep=2.0)
+
+    with throttle.measure():
+        pass
+    assert throttle.pause() == pytest.approx(0.4)
+    with throttle.measure():
+        pass
+    # DB איטי: ההפוגה גדלה עד התקרה
+    assert throttle.pause() == 2.0
+    assert slept == [pytest.approx(0.4), 2.0]
+    assert throttle.pause() == 0.0
@@ -0,0 +1,161 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from webapp import push_api as push_mod
+
+
+def _match(doc, flt):
+    for key, cond in flt.items():
+        if key == "$or":
+            if not any(_match(doc, c) for c in cond):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$exists" in cond and (key in doc) != cond["$exists"]:
+                return False
+            if "$lte" in cond and not (value is not None and value <= cond["$lte"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Coll:
+    def __init__(self, docs=()):
+        self.docs = [dict(d) for d in docs]
+        self.calls = []
+
+    def find(self, flt, projection=None):
+        self.calls.append(("find", flt))
+        return [dict(d) for d in self.docs if _match(d, flt)]
+
+    def update_many(self, flt, update):
+        self.calls.append(("update_many", flt))
+        for d in self.docs:
+            if _match(d, flt):
+                d.update(update["$set"])
+
+    def update_one(self, flt, update):
+        self.calls.append(("update_one", flt))
+        for d in self.docs:
+            if _match(d, flt):
+                d.update(update["$set"])
+                return type("R", (), {"matched_count": 1})()
+        return type("R", (), {"matched_count": 0})()
+
+    def delete_many(self, flt):
+        self.calls.append(("delete_many", flt))
+        self.docs = [d for d in self.docs if not _match(d, flt)]
+
+
+class _DB:
+    def __init__(self):
+        now = datetime.now(timezone.utc)
+        self.note_reminders = _Coll(
+            {"_id": f"r{i}", "user_id": uid, "note_id": f"n{i}", "ack_at": None, "status": "pending",
+             "remind_at": now - timedelta(seconds=30), "needs_push": True}
+            for i, uid in enumerate([1, 1, 2, 3])
+        )
+        self.sticky_notes = _Coll([{"_id": f"n{i}", "content": f"note number {i}"} for i in range(4)])
+        self.push_subscriptions = _Coll([
+            {"user_id": 1, "endpoint": "https://push/a", "subscription": {"endpoint": "https://push/a", "keys": {}}},
+            {"user_id": "2", "endpoint": "https://push/b", "subscription": {"endpoint": "https://push/b", "keys": {}}},
+            {"user_id": 2, "endpoint": "https://push/dead", "subscription": {"endpoint": "https://push/dead", "keys": {}}},
+        ])
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    import metrics
+
+    calls = []
+    monkeypatch.setattr(metrics, "record_push_delivery", lambda result, latency=None: calls.append((result, latency)))
+    return calls
+
+
+def _remote_sender(monkeypatch, handler):
+    monkeypatch.setattr(push_mod, "_remote_delivery_cfg", lambda: {"enabled": True})
+    sent = []
+
+    def _fake_post(info, payload, **kw):
+        sent.append((info["endpoint"], payload["notification"]["body"], kw.get("idempotency_key")))
+        return handler(info["endpoint"])
+
+    monkeypatch.setattr(push_mod, "_post_to_worker", _fake_post)
+    return sent
+
+
+def test_batch_claims_prefetches_and_marks_sent(monkeypatch, recorded):
+    db = _DB()
+    sent = _remote_sender(monkeypatch, lambda ep: (False, 410, "gone") if ep.endswith("dead") else (True, 200, ""))
+    reminders = db.note_reminders.find({})
+
+    stats = push_mod._deliver_reminders(db, reminders)
+
+    # user 3 has no subscriptions -> not claimed
+    assert stats["claimed"] == 3 and stats["sent"] == 3 and stats["failed"] == 1
+    assert [c[0] for c in db.note_reminders.calls if c[0] != "update_one"] == ["find", "update_many", "find"]
+    assert [c[0] for c in db.sticky_notes.calls] == ["find"]
+    assert [c[0] for c in db.push_subscriptions.calls] == ["find", "delete_many"]
+    assert sorted(sent) == [
+        ("https://push/a", "note number 0", "r0"),
+        ("https://push/a", "note number 1", "r1"),
+        ("https://push/b", "note number 2", "r2"),
+        ("https://push/dead", "note number 2", "r2"),
+    ]
+    needs_push = {d["_id"]: d["needs_push"] for d in db.note_reminders.docs}
+    assert needs_push == {"r0": False, "r1": False, "r2": False, "r3": True}
+    assert [d["endpoint"] for d in db.push_subscriptions.docs] == ["https://push/a", "https://push/b"]
+    latencies = [lat for result, lat in recorded if result == "sent"]
+    assert len(latencies) == 3 and all(25 <= lat < 120 for lat in latencies)
+
+
+def test_reminders_claimed_elsewhere_are_skipped(monkeypatch, recorded):
+    db = _DB()
+    db.note_reminders.docs[0]["push_claimed_until"] = datetime.now(timezone.utc) + timedelta(minutes=1)
+    sent = _remote_sender(monkeypatch, lambda ep: (True, 200, ""))
+    stats = push_mod._deliver_reminders(db, db.note_reminders.find({"user_id": 1}))
+    assert stats["claimed"] == 1
+    assert [s[2] for s in sent] == ["r1"]
+
+
+def test_concurrency_is_bounded(monkeypatch, recorded):
+    monkeypatch.setattr(push_mod, "_PUSH_DELIVERY_CONCURRENCY", 3)
+    db = _DB()
+    many = [
+        {"_id": f"m{i}", "user_id": 1, "note_id": "n0", "ack_at": None, "status": "pending",
+         "remind_at": datetime.now(timezone.utc)}
+        for i in range(12)
+    ]
+    db.note_reminders.docs = [dict(d) for d in many]
+    lock = threading.Lock()
+    state = {"now": 0, "peak": 0}
+
+    def _slow(ep):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.02)
+        with lock:
+            state["now"] -= 1
+        return True, 200, ""
+
+    _remote_sender(monkeypatch, _slow)
+    stats = push_mod._deliver_reminders(db, many)
+    assert stats["sent"] == 12
+    assert 1 < state["peak"] <= 3
+
+
+def test_failed_delivery_keeps_needs_push(monkeypatch, recorded):
+    db = _DB()
+    _remote_sender(monkeypatch, lambda ep: (False, 0, "worker_timeout"))
+    stats = push_mod._deliver_reminders(db, db.note_reminders.find({"user_id": 1}))
+    assert stats["sent"] == 0 and stats["failed"] == 2
+    assert all(d["needs_push"] for d in db.note_reminders.docs)
+    assert [r for r, _ in recorded] == ["failed", "failed"]
@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from services import query_shape_stats as qss
+
+
+class _UpsertColl:
+    """Stand-in ל-collection: update_one עם $setOnInsert/$inc/$max (אין bulk_write -> fallback)."""
+
+    def __init__(self):
+        self.docs = {}
+        self.pipelines = []
+        self.rows = []
+
+    def update_one(self, flt, update, upsert=False):
+        doc = self.docs.setdefault(flt["_id"], {"_id": flt["_id"], **update["$setOnInsert"]})
+        for field, value in update["$inc"].items():
+            target = doc
+            *parents, leaf = field.split(".")
+            for p in parents:
+                target = target.setdefault(p, {})
+            target[leaf] = target.get(leaf, 0) + value
+        for field, value in update["$max"].items():
+            doc[field] = max(doc.get(field, value), value)
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return [dict(r) for r in self.rows]
+
+
+def _stats(**kw):
+    kw.setdefault("enabled", True)
+    kw.setdefault("sample_rate", 1.0)
+    return qss.QueryShapeStats(**kw)
+
+
+def test_same_shape_with_different_values_is_one_entry():
+    stats = _stats(sample_rate=0.25)
+    stats.record(collection="code_snippets", operation="find", query={"user_id": 1}, duration_ms=2.0, docs=5)
+    stats.record(collection="code_snippets", operation="find", query={"user_id": 2}, duration_ms=6.0, docs=0)
+    stats.record(collection="code_snippets", operation="count", query={"user_id": 2}, duration_ms=1.0)
+    entries = {e["operation"]: e for e in stats.snapshot()}
+    assert len(entries) == 2
+    find = entries["find"]
+    assert find["query_shape"] == {"user_id": "<value>"}
+    # דגימה של 25%: כל דגימה שווה 4 פקודות
+    assert (find["sampled"], find["count"], find["total_ms"], find["max_ms"]) == (2, 8.0, 32.0, 6.0)
+    assert find["docs_returned"] == {"10": 4.0, "0": 4.0}
+
+
+def test_profiler_collections_and_overflow_are_skipped():
+    stats = _stats(max_shapes=1)
+    assert not stats.record(collection="slow_queries_log", operation="insert", query={}, duration_ms=1)
+    assert not stats.record(collection=qss.COLLECTION_NAME, operation="update", query={}, duration_ms=1)
+    assert stats.record(collection="a", operation="find", query={"x": 1}, duration_ms=1)
+    assert not stats.record(collection="b", operation="find", query={"x": 1}, duration_ms=1)
+    assert stats.record(collection="a", operation="find", query={"x": 9}, duration_ms=1)
+    assert [e["sampled"] for e in stats.snapshot()] == [2]
+
+
+def test_flush_accumulates_hourly_buckets():
+    stats = _stats()
+    coll = _UpsertColl()
+    now = datetime(2026, 5, 1, 10, 42, tzinfo=timezone.utc).timestamp()
+    for ms in (3.0, 9.0):
+        stats.record(collection="users", operation="find", query={"user_id": 1}, duration_ms=ms, docs=1)
+    assert stats.flush(coll, now=now) == 1
+    stats.record(collection="users", operation="find", query={"user_id": 3}, duration_ms=4.0, docs=250)
+    assert stats.flush(coll, now=now + 60) == 1
+    assert stats.snapshot() == [] and stats.flush(coll, now=now) == 0
+
+    (doc,) = coll.docs.values()
+    assert doc["ts"] == datetime(2026, 5, 1, 10, tzinfo=timezone.utc)
+    assert (doc["count"], doc["total_ms"], doc["max_ms"]) == (3.0, 16.0, 9.0)
+    assert doc["docs_returned"] == {"1": 2.0, "1000": 1.0}
+    assert doc["expire_at"] > doc["ts"]
+
+
+def test_failed_flush_requeues_unwritten_entries():
+    stats = _stats()
+    now = datetime(2026, 5, 1, 10, 42, tzinfo=timezone.utc).timestamp()
+
+    class _Failing(_UpsertColl):
+        fail = True
+
+        def update_one(self, flt, update, upsert=False):
+            if self.fail:
+                raise RuntimeError("db down")
+            super().update_one(flt, update, upsert)
+
+    coll = _Failing()
+    stats.record(collection="users", operation="find", query={"user_id": 1}, duration_ms=3.0, docs=1)
+    assert stats.flush(coll, now=now) == 0
+    # נצבר בינתיים לאותה צורה - ממוזג עם מה שחזר לתור
+    stats.record(collection="users", operation="find", query={"user_id": 2}, duration_ms=5.0, docs=1)
+
+    coll.fail = False
+    assert stats.flush(coll, now=now) == 1
+    (doc,) = coll.docs.values()
+    assert (doc["count"], doc["total_ms"], doc["max_ms"]) == (2.0, 8.0, 5.0)
+    assert doc["docs_returned"] == {"1": 2.0}
+
+
+def test_bulk_write_error_requeues_only_failed_ops():
+    stats = _stats()
+    stats.record(collection="users", operation="find", query={"user_id": 1}, duration_ms=3.0)
+    stats.record(collection="orders", operation="find", query={"order_id": 1}, duration_ms=4.0)
+
+    class _BulkError(Exception):
+        details = {"writeErrors": [{"index": 1}]}
+
+    class _Bulk:
+        def bulk_write(self, ops, ordered=True):
+            raise _BulkError("partial")
+
+    assert stats.flush(_Bulk()) == 1
+    assert [e["collection"] for e in stats.snapshot()] == ["orders"]
+
+
+def test_top_shapes_finalizes_aggregate_rows():
+    coll = _UpsertColl()
+    coll.rows = [{
+        "_id": "abc", "shape_id": "abc", "collection": "users", "operation": "find",
+        "query_shape": {"user_id": "<value>"}, "count": 40.0, "sampled": 4, "total_ms": 120.0,
+        "max_ms": 9.5, "docs_1": 30.0, "docs_10": 10.0,
+    }]
+    (row,) = qss.top_shapes(coll, hours=6, limit=5)
+    assert (row["count"], row["avg_ms"], row["total_ms"]) == (40, 3.0, 120.0)
+    assert row["docs_returned"]["1"] == 30 and row["docs_returned"]["inf"] == 0
+    pipeline = coll.pipelines[-1]
+    assert pipeline[-2:] == [{"$sort": {"total_ms": -1}}, {"$limit": 5}]
+
+
+@pytest.mark.parametrize(
+    "cmd,reply,expected",
+    [
+        ("find", {"cursor": {"firstBatch": [{}, {}]}}, 2),
+        ("count", {"n": 7}, 7),
+        ("distinct", {"values": [1, 2, 3]}, 3),
+        ("findAndModify", {"value": None}, 0),
+        ("find", None, None),
+    ],
+)
+def test_docs_returned_from_reply(cmd, reply, expected):
+    assert qss.docs_returned(cmd, reply) == expected
+
+
+def test_listener_records_sampled_commands(monkeypatch):
+    import database.manager as dm
+
+    stats = _stats()
+    monkeypatch.setattr(qss, "_STATS", stats)
+    monkeypatch.setattr(stats, "maybe_flush", lambda getter: False)
+    monkeypatch.setenv("BOT_TOKEN", "x")
+    monkeypatch.setenv("MONGODB_URL", "mongodb://localhost:27017/db")
+    monkeypatch.setenv("DISABLE_DB", "0")
+    monkeypatch.setenv("SPHINX_MOCK_IMPORTS", "0")
+    monkeypatch.setenv("PROFILER_ENABLED", "false")
+    monkeypatch.setattr(dm, "_PYMONGO_AVAILABLE", True)
+    monkeypatch.setattr(dm, "_MONGO_MONITORING_REGISTERED", False, raising=False)
+    registered = {}
+
+    class _Monitoring:
+        class CommandListener:
+            pass
+
+        def register(self, listener):
+            registered["listener"] = listener
+
+    class _Client:
+        def __init__(self, *a, **k):
+            pass
+
+        def __getitem__(self, name):
+            return None
+
+        @property
+        def admin(self):
+            class _Admin:
+                def command(self, *a, **k):
+                    return {"ok": 1}
+
+            return _Admin()
+
+    monkeypatch.setattr(dm, "_pymongo_monitoring", _Monitoring(), raising=False)
+    monkeypatch.setattr(dm, "MongoClient", _Client)
+    monkeypatch.setattr(dm.DatabaseManager, "_create_indexes", lambda self: None)
+    dm.DatabaseManager()
+    listener = registered["listener"]
+
+    class _Started:
+        request_id = 7
+        command_name = "find"
+        database_name = "db"
+        command = {"find": "users", "filter": {"user_id": 1}}
+
+    class _Succeeded:
+        request_id = 7
+        duration_micros = 2500
+        command_name = "find"
+        database_name = "db"
+        reply = {"cursor": {"firstBatch": [{"_id": 1}]}}
+
+    listener.started(_Started())
+    listener.succeeded(_Succeeded())
+    (entry,) = stats.snapshot()
+    assert (entry["collection"], entry["count"], entry["max_ms"]) == ("users", 1.0, 2.5)
+    assert entry["docs_returned"] == {"1": 1.0}
@@ -0,0 +1,236 @@
+import asyncio
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from reminders import scheduler as sched_mod
+
+
+class _JobQueue:
+    def __init__(self):
+        self.once = []
+        self.repeating = []
+
+    def run_once(self, *a, **k):
+        self.once.append(k.get("name"))
+
+    def run_repeating(self, fn, interval=None, first=None, name=None):  # noqa: ARG002
+        self.repeating.append(name)
+
+    def get_jobs_by_name(self, name):  # noqa: ARG002
+        return []
+
+    def jobs(self):
+        return []
+
+
+class _Bot:
+    def __init__(self):
+        self.sent = []
+        self.active = 0
+        self.peak = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):  # noqa: ARG002
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.sent.append(chat_id)
+
+
+class _DB:
+    """Stand-in ל-RemindersDB: מחזיק תזכורות ומסנן לפי חלון הזמן שהמתזמן מבקש."""
+
+    def __init__(self, reminders):
+        self.reminders = {r["_id"]: dict(r, is_sent=False) for r in reminders}
+        self.windows = []
+        self.claims = []
+
+    def get_pending_reminders(self, batch_size=100, due_before=None):  # noqa: ARG002
+        return []
+
+    def get_future_reminders(self, batch_size=1000, after=None, until=None):
+        self.windows.append((after, until))
+        rows = sorted(
+            (r for r in self.reminders.values() if not r["is_sent"] and after < r["remind_at"] <= until),
+            key=lambda r: r["remind_at"],
+        )
+        return [dict(r) for r in rows[:batch_size]]
+
+    def claim_due_reminders(self, ids, now=None):
+        self.claims.append(list(ids))
+        out = []
+        for _id in ids:
+            r = self.reminders.get(_id)
+            if r and not r["is_sent"] and r["remind_at"] <= now:
+                r["is_sent"] = True
+                out.append(dict(r))
+        return out
+
+    def mark_reminder_sent(self, reminder_id, success=True, error=None):  # noqa: ARG002
+        return None
+
+
+def _reminder(i, when):
+    return {"_id": f"oid{i}", "reminder_id": f"r{i}", "user_id": 100 + i, "title": f"t{i}", "remind_at": when}
+
+
+def _scheduler(monkeypatch, db, **env):
+    for key, value in env.items():
+        monkeypatch.setenv(key, str(value))
+    monkeypatch.setattr(sched_mod.ReminderScheduler, "_send_tracked", lambda self, r: self._send_reminder(r))
+    app = types.SimpleNamespace(job_queue=_JobQueue(), bot=_Bot(), bot_data={})
+    return sched_mod.ReminderScheduler(app, db)
+
+
+@pytest.fixture
+def lateness(monkeypatch):
+    import metrics
+
+    calls = []
+    monkeypatch.setattr(metrics, "record_reminder_dispatch", lambda source, late=None: calls.append((source, late)))
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_only_near_horizon_is_loaded(monkeypatch, lateness):
+    now = datetime.now(timezone.utc)
+    db = _DB([_reminder(1, now + timedelta(minutes=5)), _reminder(2, now + timedelta(days=3))])
+    sched = _scheduler(monkeypatch, db, REMINDER_WINDOW_SECONDS=600)
+
+    await sched.start()
+
+    assert set(sched._entries) == {"r1"}
+    assert sched.job_queue.once == []
+    assert sched_mod.TICK_JOB_NAME in sched.job_queue.repeating
+    assert await sched.tick(now=now + timedelta(minutes=5, seconds=2)) == 1
+    assert sched.application.bot.sent == [101]
+    ((source, late),) = lateness
+    assert source == "window" and late >= 2
+
+
+@pytest.mark.asyncio
+async def test_truncated_window_resumes_from_last_loaded(monkeypatch, lateness):
+    now = datetime.now(timezone.utc)
+    db = _DB([_reminder(i, now + timedelta(seconds=30 + i)) for i in range(5)])
+    sched = _scheduler(monkeypatch, db, REMINDER_WINDOW_SECONDS=600, REMINDER_WINDOW_LIMIT=2)
+
+    sched._refill(now)
+    assert set(sched._entries) == {"r0", "r1"}
+    # כל מילוי ממשיך מהתזכורת האחרונה שנטענה עד שהחלון מתמלא
+    for _ in range(4):
+        sched._refill(now)
+    assert set(sched._entries) == {f"r{i}" for i in range(5)}
+    assert sched._loaded_until == now + timedelta(seconds=600)
+
+
+@pytest.mark.asyncio
+async def test_due_batch_is_claimed_once_and_sent_concurrently(monkeypatch, lateness):
+    now = datetime.now(timezone.utc)
+    db = _DB([_reminder(i, now + timedelta(seconds=10)) for i in range(6)])
+    sched = _scheduler(monkeypatch, db, REMINDER_SEND_CONCURRENCY=2)
+    sched._refill(now)
+    # נמחקה/הושלמה אחרי הטעינה -> לא נתפסת ולא נשלחת
+    db.reminders["oid5"]["is_sent"] = True
+
+    assert await sched.tick(now=now + timedelta(seconds=11)) == 5
+    assert db.claims == [["oid0", "oid1", "oid2", "oid3", "oid4", "oid5"]]
+    assert sorted(sched.application.bot.sent) == [100, 101, 102, 103, 104]
+    assert sched.application.bot.peak == 2
+    assert sched._entries == {}
+
+
+@pytest.mark.asyncio
+async def test_rescheduled_reminder_fires_at_new_time(monkeypatch, lateness):
+    now = datetime.now(timezone.utc)
+    db = _DB([_reminder(1, now + timedelta(seconds=10))])
+    sched = _scheduler(monkeypatch, db)
+    sched._refill(now)
+    moved = dict(db.reminders["oid1"], remind_at=now + timedelta(seconds=40))
+    db.reminders["oid1"]["remind_at"] = moved["remind_at"]
+    await sched.schedule_reminder(moved)
+
+    assert await sched.tick(now=now + timedelta(seconds=20)) == 0
+    assert await sched.tick(now=now + timedelta(seconds=41)) == 1
+    assert sched.application.bot.sent == [101]
+
+
+@pytest.mark.asyncio
+async def test_handlers_schedule_through_window_without_per_reminder_jobs(monkeypatch, lateness):
+    from reminders.handlers import ReminderHandlers
+    from reminders.models import Reminder
+    from reminders.validators import ReminderValidator
+
+    now = datetime.now(timezone.utc)
+    db = _DB([])
+    sched = _scheduler(monkeypatch, db)
+    sched._refill(now)
+
+    class _Coll:
+        def find_one(self, query, projection=None):  # noqa: ARG002
+            return next(({"_id": _id} for _id, r in db.reminders.items() if r["reminder_id"] == query["reminder_id"]), None)
+
+    db.reminders_collection = _Coll()
+    handlers = ReminderHandlers(db, ReminderValidator())
+    ctx = types.SimpleNamespace(job_queue=sched.job_queue, bot_data={"reminder_scheduler": sched})
+
+    # נוצרה בקבוצה (chat_id שונה מה-user_id): to_dict בלי _id, המתזמן משלים אותו מה-DB
+    new = Reminder(reminder_id="r7", user_id=107, title="t7", remind_at=now + timedelta(seconds=30), chat_id=-55).to_dict()
+    db.reminders["oid7"] = dict(new, _id="oid7", is_sent=False)
+    await handlers._schedule(ctx, new, chat_id=-55, user_id=107)
+    # הושלמה לפני הזמן - יוצאת מהחלון
+    db.reminders["oid8"] = dict(_reminder(8, now + timedelta(seconds=30)), is_sent=False)
+    await handlers._schedule(ctx, _reminder(8, now + timedelta(seconds=30)), chat_id=108, user_id=108)
+    handlers._unschedule(ctx, "r8")
+
+    assert sched.job_queue.once == []
+    assert await sched.tick(now=now + timedelta(seconds=31)) == 1
+    assert db.claims == [["oid7"]] and sched.application.bot.sent == [-55]
+
+
+def test_claim_due_reminders_skips_changed_documents():
+    from reminders.database import RemindersDB
+
+    now = datetime.now(timezone.utc)
+
+    class _Coll:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def _match(self, doc, flt):
+            for key, cond in flt.items():
+                value = doc.get(key)
+                if isinstance(cond, dict):
+                    if "$in" in cond and value not in cond["$in"]:
+                        return False
+                    if "$lte" in cond and not value <= cond["$lte"]:
+                        return False
+                elif value != cond:
+                    return False
+            return True
+
+        def update_many(self, flt, update):
+            for doc in self.docs:
+                if self._match(doc, flt):
+                    doc.update(update.get("$set", {}))
+                    for key in update.get("$unset", {}):
+                        doc.pop(key, None)
+
+        def find(self, flt):
+            return [dict(d) for d in self.docs if self._match(d, flt)]
+
+    docs = [
+        {"_id": 1, "status": "pending", "is_sent": False, "remind_at": now - timedelta(seconds=1)},
+        {"_id": 2, "status": "completed", "is_sent": False, "remind_at": now - timedelta(seconds=1)},
+        {"_id": 3, "status": "pending", "is_sent": False, "remind_at": now + timedelta(hours=1)},  # נדחתה
+        {"_id": 4, "status": "pending", "is_sent": True, "remind_at": now - timedelta(seconds=1)},
+    ]
+    db = RemindersDB.__new__(RemindersDB)
+    db.reminders_collection = _Coll(docs)
+
+    claimed = db.claim_due_reminders([1, 2, 3, 4], now=now)
+
+    assert [d["_id"] for d in claimed] == [1]
+    assert docs[0]["is_sent"] is True and "claim_token" not in docs[0]
+    assert db.claim_due_reminders([1], now=now) == []
@@ -132,11 +132,15 @@ async def test_scheduler_reload_schedules_future_and_sends_due(monkeypatch):
             self._future = future_items
             self.sent_status = []
 
-        def get_pending_reminders(self, batch_size=1000):  # noqa: ARG002
-            return list(self._due)
+        def get_pending_reminders(self, batch_size=1000, due_before=None):  # noqa: ARG002
+            due, self._due = list(self._due), []
+            return due
 
-        def get_future_reminders(self, batch_size=1000):  # noqa: ARG002
-            return list(self._future)
+        def get_future_reminders(self, batch_size=1000, after=None, until=None):  # noqa: ARG002
+            return [r for r in self._future if (after is None or r["remind_at"] > after) and (until is None or r["remind_at"] <= until)]
+
+        def claim_due_reminders(self, ids, now=None):
+            return [r for r in self._future if r["_id"] in ids and r["remind_at"] <= now]
 
         def mark_reminder_sent(self, reminder_id, success=True, error=None):  # noqa: ARG002
             self.sent_status.append((reminder_id, success))
@@ -153,6 +157,7 @@ async def test_scheduler_reload_schedules_future_and_sends_due(monkeypatch):
         "remind_at": due_time,
     }
     future_reminder = {
+        "_id": "oid-future-1",
         "reminder_id": "future-1",
         "user_id": 42,
         "title": "Future",
@@ -172,8 +177,12 @@ async def test_scheduler_reload_schedules_future_and_sends_due(monkeypatch):
     assert any(entry[0] == "due-1" and entry[1] is True for entry in db_stub.sent_status)
     assert any(msg["chat_id"] == 42 for msg in sent_messages)
 
-    # Future reminder should be scheduled (not sent yet)
-    assert len(app_stub.job_queue.scheduled) == 1
-    scheduled_entry = app_stub.job_queue.scheduled[0]
-    assert scheduled_entry["name"] == "reminder_future-1"
-    assert scheduled_entry["when"] == future_time
+    # Future reminder is held in the in-memory window (no per-reminder job)
+    assert app_stub.job_queue.scheduled == []
+    assert set(sched._entries) == {"future-1"}
+    assert not any(entry[0] == "future-1" for entry in db_stub.sent_status)
+
+    # A tick after remind_at claims and sends it
+    assert await sched.tick(now=future_time + timedelta(seconds=1)) == 1
+    assert ("future-1", True) in db_stub.sent_status
+    assert sched._entries == {}
@@ -0,0 +1,53 @@
+import render_cache as rc
+
+
+class _Redis:
+    def __init__(self):
+        self.is_enabled = True
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, expire_seconds=300):
+        self.store[key] = value
+        return True
+
+
+def test_local_tier_skips_rerender(monkeypatch):
+    monkeypatch.setattr(rc, "cache", None)
+    rc.clear_local()
+    calls = []
+
+    def _render():
+        calls.append(1)
+        return "<b>x</b>"
+
+    assert rc.get_or_render("t", "code", _render, "python") == "<b>x</b>"
+    assert rc.get_or_render("t", "code", _render, "python") == "<b>x</b>"
+    assert len(calls) == 1
+    # פרמטר רינדור שונה -> מפתח שונה
+    rc.get_or_render("t", "code", _render, "js")
+    assert len(calls) == 2
+
+
+def test_redis_tier_stores_compressed_and_is_shared(monkeypatch):
+    remote = _Redis()
+    monkeypatch.setattr(rc, "cache", remote)
+    rc.clear_local()
+    big = "<span>" + "token " * 500 + "</span>"
+
+    assert rc.get_or_render("t", "src", lambda: big) == big
+    (stored,) = remote.store.values()
+    assert stored.startswith("z:") and len(stored) < len(big)
+
+    # worker אחר (LRU ריק) מקבל מ-Redis בלי לרנדר
+    rc.clear_local()
+    assert rc.get_or_render("t", "src", lambda: "rerendered") == big
+
+
+def test_pair_roundtrip(monkeypatch):
+    monkeypatch.setattr(rc, "cache", None)
+    rc.clear_local()
+    assert rc.get_or_render_pair("p", "c", lambda: ("<pre/>", ".a{}")) == ("<pre/>", ".a{}")
+    assert rc.get_or_render_pair("p", "c", lambda: ("other", "")) == ("<pre/>", ".a{}")
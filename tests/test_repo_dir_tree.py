@@ -0,0 +1,147 @@
+import services.code_indexer as ci
+from webapp.routes import repo_browser
+
+
+def _match(doc, query):
+    for k, v in query.items():
+        if isinstance(v, dict) and "$in" in v:
+            if doc.get(k) not in v["$in"]:
+                return False
+        elif doc.get(k) != v:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+
+    def sort(self, key, direction=1):
+        self._docs.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+class _Coll:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in (docs or [])]
+        self.writes = 0
+
+    def find(self, query, projection=None):
+        return _Cursor(dict(d) for d in self.docs if _match(d, query))
+
+    def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _match(d, query)), None)
+
+    def update_one(self, query, update, upsert=False):
+        self.writes += 1
+        for d in self.docs:
+            if _match(d, query):
+                d.update(update["$set"])
+                return
+        if upsert:
+            self.docs.append(dict(query, **update["$set"]))
+
+    def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not _match(d, query)]
+        return type("R", (), {"deleted_count": before - len(self.docs)})()
+
+
+class _DB:
+    def __init__(self, files):
+        self.repo_files = _Coll(files)
+        self.repo_dirs = _Coll()
+
+
+def _files():
+    return [
+        {"repo_name": "R", "path": "README.md", "size": 10, "language": "markdown"},
+        {"repo_name": "R", "path": "src/app.py", "size": 100, "language": "python"},
+        {"repo_name": "R", "path": "src/web/view.js", "size": 40, "language": "javascript"},
+        {"repo_name": "R", "path": "src/web/util.py", "size": 5, "language": "python"},
+        {"repo_name": "other", "path": "x/y.py", "size": 1, "language": "python"},
+    ]
+
+
+def _indexer(monkeypatch, db):
+    monkeypatch.setattr(ci, "UpdateOne", None)
+    return ci.CodeIndexer(db=db)
+
+
+def test_rebuild_dir_tree_aggregates_and_backfills(monkeypatch):
+    db = _DB(_files())
+    idx = _indexer(monkeypatch, db)
+
+    assert idx.rebuild_dir_tree("R") == 3
+    dirs = {d["path"]: d for d in db.repo_dirs.docs}
+    assert sorted(dirs) == ["", "src", "src/web"]
+    assert dirs[""]["file_count"] == 4 and dirs[""]["total_size"] == 155
+    assert dirs["src"]["languages"] == {"python": 2, "javascript": 1}
+    assert dirs["src/web"]["parent_dir"] == "src" and dirs["src/web"]["depth"] == 2
+    assert dirs["src/web"]["name"] == "web"
+    # parent_dir הושלם למסמכי קבצים ישנים
+    assert {d["path"]: d["parent_dir"] for d in db.repo_files.docs if d["repo_name"] == "R"} == {
+        "README.md": "",
+        "src/app.py": "src",
+        "src/web/view.js": "src/web",
+        "src/web/util.py": "src/web",
+    }
+
+
+def test_rebuild_dir_tree_writes_only_changes_and_drops_stale(monkeypatch):
+    db = _DB(_files())
+    idx = _indexer(monkeypatch, db)
+    idx.rebuild_dir_tree("R")
+    writes = db.repo_dirs.writes
+
+    assert idx.rebuild_dir_tree("R") == 0
+    assert db.repo_dirs.writes == writes
+
+    db.repo_files.docs = [d for d in db.repo_files.docs if not d["path"].startswith("src/web/")]
+    assert idx.rebuild_dir_tree("R") == 3  # "" + src עודכנו, src/web נמחקה
+    assert sorted(d["path"] for d in db.repo_dirs.docs) == ["", "src"]
+
+
+def test_incremental_update_touches_only_ancestors_and_matches_full_rebuild(monkeypatch):
+    db = _DB(_files())
+    idx = _indexer(monkeypatch, db)
+    # בלי עץ קיים -> בנייה מלאה (כולל השלמת parent_dir)
+    idx.rebuild_dir_tree("R", changed_paths=["src/app.py"])
+    assert sorted(d["path"] for d in db.repo_dirs.docs) == ["", "src", "src/web"]
+
+    db.repo_files.docs = [d for d in db.repo_files.docs if not d["path"].startswith("src/web/")]
+    db.repo_files.docs.append(
+        {"repo_name": "R", "path": "lib/deep/x.ts", "parent_dir": "lib/deep", "size": 7, "language": "typescript"}
+    )
+    queries = []
+    real_find = db.repo_files.find
+    monkeypatch.setattr(db.repo_files, "find", lambda q, p=None: queries.append(q) or real_find(q, p))
+
+    idx.rebuild_dir_tree("R", changed_paths=["src/web/view.js", "src/web/util.py", "lib/deep/x.ts"])
+    incremental = {d["path"]: {k: d[k] for k in ("file_count", "total_size", "languages")} for d in db.repo_dirs.docs}
+    assert all("parent_dir" in q for q in queries)
+    assert sorted(q["parent_dir"] for q in queries) == ["", "lib", "lib/deep", "src", "src/web"]
+
+    full_db = _DB(db.repo_files.docs)
+    _indexer(monkeypatch, full_db).rebuild_dir_tree("R")
+    full = {d["path"]: {k: d[k] for k in ("file_count", "total_size", "languages")} for d in full_db.repo_dirs.docs}
+    assert incremental == full
+    assert sorted(full) == ["", "lib", "lib/deep", "src"]
+
+
+def test_tree_level_uses_dirs_with_type_filter(monkeypatch):
+    db = _DB(_files())
+    _indexer(monkeypatch, db).rebuild_dir_tree("R")
+
+    root = repo_browser._tree_level_from_dirs(db, "R", "", [])
+    assert [(e["type"], e["path"]) for e in root] == [("directory", "src"), ("file", "README.md")]
+    assert root[0]["file_count"] == 3 and root[0]["size"] == 145
+
+    src = repo_browser._tree_level_from_dirs(db, "R", "src", ["javascript"])
+    assert [(e["type"], e["path"], e.get("file_count")) for e in src] == [("directory", "src/web", 1)]
+
+    # ריפו שעוד לא נבנה לו עץ -> מסלול הנתיבים הישן
+    assert repo_browser._tree_level_from_dirs(db, "other", "", []) is None
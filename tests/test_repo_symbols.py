@@ -0,0 +1,223 @@
+import services.code_indexer as ci
+from services.repo_search_service import RepoSearchService
+
+
+PY_SOURCE = """\
+import os
+
+
+def top_level():
+    pass
+
+
+class Parser:
+    def parse(self):
+        pass
+
+    async def parse_async(self):
+        pass
+
+    class Inner:
+        def inner_method(self):
+            pass
+
+
+def after_class():
+    pass
+"""
+
+GO_SOURCE = """\
+package main
+
+type Server struct {
+}
+
+func (s *Server) ServeHTTP(w http.ResponseWriter) {
+}
+
+func NewServer() *Server {
+}
+"""
+
+
+def _match(doc, query):
+    for k, v in query.items():
+        value = doc.get(k)
+        if isinstance(v, dict):
+            if "$in" in v and value not in v["$in"]:
+                return False
+            if "$all" in v and not set(v["$all"]) <= set(value or []):
+                return False
+            if "$gte" in v and not (v["$gte"] <= value < v["$lt"]):
+                return False
+        elif value != v:
+            return False
+    return True
+
+
+class _Cursor(list):
+    def limit(self, n):
+        return _Cursor(self[:n])
+
+
+class _Coll:
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in (docs or [])]
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return _Cursor(dict(d) for d in self.docs if _match(d, query))
+
+    def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _match(d, query)), None)
+
+    def update_one(self, query, update, upsert=False):
+        for d in self.docs:
+            if _match(d, query):
+                d.update(update["$set"])
+                return
+        if upsert:
+            self.docs.append(dict(query, **update["$set"]))
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(dict(d) for d in docs)
+
+    def delete_one(self, query):
+        return self.delete_many(query)
+
+    def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not _match(d, query)]
+        return type("R", (), {"deleted_count": before - len(self.docs)})()
+
+
+class _DB:
+    def __init__(self):
+        self.repo_files = _Coll()
+        self.repo_symbols = _Coll()
+        self.repo_metadata = _Coll()
+
+
+def _by_name(symbols):
+    return {s["name"]: (s["kind"], s["line"], s["parent"]) for s in symbols}
+
+
+def test_extract_symbols_python_lines_and_parents():
+    symbols = _by_name(ci.extract_symbols(PY_SOURCE, "python"))
+    assert symbols == {
+        "top_level": ("function", 4, None),
+        "Parser": ("class", 8, None),
+        "parse": ("method", 9, "Parser"),
+        "parse_async": ("method", 12, "Parser"),
+        "Inner": ("class", 15, "Parser"),
+        "inner_method": ("method", 16, "Inner"),
+        "after_class": ("function", 20, None),
+    }
+
+
+def test_extract_symbols_go_receiver_is_parent():
+    symbols = _by_name(ci.extract_symbols(GO_SOURCE, "go"))
+    assert symbols == {
+        "Server": ("class", 3, None),
+        "ServeHTTP": ("method", 6, "Server"),
+        "NewServer": ("function", 9, None),
+    }
+
+
+def test_symbol_ngrams_short_names_kept_whole():
+    assert ci.symbol_ngrams("Go") == ["go"]
+    assert ci.symbol_ngrams("Parse") == ["ars", "par", "rse"]
+    # בלי קיצוץ: ה-trigram האחרון של שם ארוך נשמר
+    long_name = "handle_" + "x" * 80 + "_tail"
+    assert "ail" in ci.symbol_ngrams(long_name)
+
+
+def _indexed_db(monkeypatch):
+    monkeypatch.setattr(ci, "UpdateOne", None)
+    db = _DB()
+    indexer = ci.CodeIndexer(db=db)
+    indexer.index_documents([
+        indexer.build_document("R", "pkg/parser.py", PY_SOURCE, "c1"),
+        indexer.build_document("R", "util.js", "function parseArgs(x) {}\nclass Parsed {}\n", "c1"),
+    ])
+    db.repo_metadata.docs.append({"repo_name": "R", "symbols_complete": True})
+    return db, indexer
+
+
+def test_index_documents_writes_symbols_and_replaces_on_reindex(monkeypatch):
+    db, indexer = _indexed_db(monkeypatch)
+    assert all("_symbols" not in d for d in db.repo_files.docs)
+    assert len([s for s in db.repo_symbols.docs if s["path"] == "pkg/parser.py"]) == 7
+
+    indexer.index_documents([indexer.build_document("R", "pkg/parser.py", "def only():\n    pass\n", "c2")])
+    assert [s["name"] for s in db.repo_symbols.docs if s["path"] == "pkg/parser.py"] == ["only"]
+
+    indexer.remove_files("R", ["util.js"])
+    assert {s["path"] for s in db.repo_symbols.docs} == {"pkg/parser.py"}
+
+
+def test_search_functions_ranks_exact_then_prefix_then_substring(monkeypatch):
+    db, _ = _indexed_db(monkeypatch)
+    service = RepoSearchService(db=db)
+
+    res = service._search_functions("R", "parse", None, 10)
+    assert [r["function"] for r in res["results"]] == ["parse", "parseArgs", "parse_async"]
+    first = res["results"][0]
+    assert (first["path"], first["line"], first["kind"], first["parent"]) == ("pkg/parser.py", 9, "method", "Parser")
+    assert "ngrams" in db.repo_symbols.queries[-1]
+
+    # שאילתה קצרה -> prefix על name_lower
+    assert [r["function"] for r in service._search_functions("R", "to", None, 10)["results"]] == ["top_level"]
+    assert "name_lower" in db.repo_symbols.queries[-1]
+
+    classes = service._search_classes("R", "pars", "python", 10)
+    assert [r["class"] for r in classes["results"]] == ["Parser"]
+
+
+def test_search_falls_back_to_repo_files_without_symbols():
+    db = _DB()
+    db.repo_files.docs = [{"repo_name": "R", "path": "a.py", "language": "python", "functions": ["handler"], "classes": []}]
+
+    class _RegexColl(_Coll):
+        def find(self, query, projection=None):
+            return _Cursor(dict(d) for d in self.docs if d["repo_name"] == query["repo_name"])
+
+    db.repo_files = _RegexColl(db.repo_files.docs)
+    res = RepoSearchService(db=db)._search_functions("R", "hand", None, 10)
+    assert res["results"] == [{"path": "a.py", "function": "handler", "language": "python"}]
+
+
+def test_partial_symbol_table_falls_back_until_marked_complete(monkeypatch):
+    db, _ = _indexed_db(monkeypatch)
+    db.repo_metadata.docs.clear()
+    db.repo_files.docs = [{"repo_name": "R", "path": "a.py", "language": "python", "functions": ["parse"], "classes": []}]
+
+    class _RegexColl(_Coll):
+        def find(self, query, projection=None):
+            return _Cursor(dict(d) for d in self.docs if d["repo_name"] == query["repo_name"])
+
+    db.repo_files = _RegexColl(db.repo_files.docs)
+    res = RepoSearchService(db=db)._search_functions("R", "parse", None, 10)
+    assert res["results"] == [{"path": "a.py", "function": "parse", "language": "python"}]
+    assert db.repo_symbols.queries == []
+
+
+def test_exact_match_ranked_first_among_many_candidates_and_total_counts_all(monkeypatch):
+    monkeypatch.setattr(ci, "UpdateOne", None)
+    db = _DB()
+    indexer = ci.CodeIndexer(db=db)
+    many = "".join(f"def zz_load_item_{i}():\n    pass\n" for i in range(300))
+    long_name = "load_" + "x" * 80 + "_tail"
+    indexer.index_documents([
+        indexer.build_document("R", "a.py", many, "c1"),
+        indexer.build_document("R", "z.py", f"def load_item():\n    pass\ndef {long_name}():\n    pass\n", "c1"),
+    ])
+    db.repo_metadata.docs.append({"repo_name": "R", "symbols_complete": True})
+    service = RepoSearchService(db=db)
+
+    res = service._search_functions("R", "load_item", None, 5)
+    assert res["results"][0]["function"] == "load_item"
+    assert len(res["results"]) == 5 and res["total"] == 301
+
+    assert [r["function"] for r in service._search_functions("R", "x_tail", None, 5)["results"]] == [long_name]
@@ -23,8 +23,12 @@ except Exception:  # pragma: no cover
 
 
 class _FakeRepoMetadataCollection:
-    def __init__(self) -> None:
+    def __init__(self, doc=None) -> None:
         self.last_update = None
+        self.doc = doc
+
+    def find_one(self, filt, projection=None):
+        return dict(self.doc) if self.doc else None
 
     def update_one(self, filt, update, upsert=False):  # noqa: D401 - test stub
         self.last_update = {"filter": filt, "update": update, "upsert": upsert}
@@ -129,3 +133,217 @@ def test_initial_import_counts_read_failures_as_errors(monkeypatch):
     assert out["indexed"] == 0
     assert out["errors"] == 1
 
+
+
+def test_initial_import_reads_through_batch_api_and_skips_large(monkeypatch):
+    from services import repo_sync_service as rss
+    from services.git_mirror_service import BlobContent
+
+    seen = {}
+
+    class _Git(_StubGitService):
+        def get_file_content(self, repo_name: str, file_path: str, ref: str = "HEAD"):
+            raise AssertionError("per-file read should not be used")
+
+        def iter_file_contents(self, repo_name, file_paths, ref="HEAD", max_size_for=None):
+            seen["paths"] = list(file_paths)
+            seen["ref"] = ref
+            yield BlobContent(path="a.py", content="x = 1\n", size=6)
+            yield BlobContent(path="big.py", content=None, size=10**7, skipped="too_large")
+
+    db = _FakeDb()
+    monkeypatch.setattr(rss, "get_mirror_service", lambda: _Git(list_files=["a.py", "big.py"], current_sha="d" * 40))
+    monkeypatch.setattr(rss, "CodeIndexer", _StubIndexer)
+
+    out = rss.initial_import("https://example.com/repo.git", "Repo", db)
+    assert seen["paths"] == ["a.py", "big.py"]
+    assert seen["ref"] == "refs/heads/main"
+    assert out["indexed"] == 1
+    assert out["skipped"] == 1
+    assert out["errors"] == 0
+
+
+class _BulkCollection:
+    def __init__(self) -> None:
+        self.batches = []
+
+    def bulk_write(self, ops, ordered=True):
+        self.batches.append(len(ops))
+        return None
+
+
+class _BulkDb:
+    def __init__(self) -> None:
+        self.repo_files = _BulkCollection()
+
+
+class _ContentGit:
+    def __init__(self, files):
+        self.files = files
+
+    def get_file_content(self, repo_name, file_path, ref="HEAD"):
+        return self.files.get(file_path)
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_index_pipeline_bulk_writes_in_batches(monkeypatch, workers):
+    from services import repo_sync_service as rss
+    from services.code_indexer import CodeIndexer
+
+    monkeypatch.setenv("REPO_INDEX_WORKERS", workers)
+    monkeypatch.setenv("REPO_INDEX_BULK_SIZE", "2")
+    monkeypatch.setattr(rss, "_PARALLEL_MIN_FILES", 1)
+    files = {f"m{i}.py": f"import os\ndef f{i}():\n    pass\n" for i in range(5)}
+    files["gone.py"] = None
+    db = _BulkDb()
+
+    out = rss._index_pipeline(_ContentGit(files), CodeIndexer(db), "Repo", list(files), "sha", "sha")
+
+    assert out["indexed"] == [f"m{i}.py" for i in range(5)]
+    assert out["errors"] == 1
+    assert db.repo_files.batches == [2, 2, 1]
+    assert out["timings"]["workers"] == int(workers)
+    assert {"read_seconds", "parse_cpu_seconds", "write_seconds", "total_seconds"} <= set(out["timings"])
+
+
+class _IndexedCollection(_BulkCollection):
+    def __init__(self, docs) -> None:
+        super().__init__()
+        self.docs = docs
+        self.written = []
+
+    def find(self, query, projection=None):
+        wanted = set(query["path"]["$in"])
+        return [dict(d) for d in self.docs if d["path"] in wanted]
+
+    def bulk_write(self, ops, ordered=True):
+        self.written.extend(op._doc["$set"]["path"] for op in ops)
+        return super().bulk_write(ops, ordered)
+
+
+def test_index_pipeline_skips_unchanged_blobs_and_hashes(monkeypatch):
+    from services import repo_sync_service as rss
+    from services.code_indexer import CodeIndexer, content_hash
+    from services.git_mirror_service import BlobContent
+
+    class _Git:
+        def __init__(self):
+            self.read = []
+
+        def iter_file_contents(self, repo_name, file_paths, ref="HEAD", max_size_for=None, skip_sha=None):
+            for path in file_paths:
+                sha = f"sha-{path}"
+                if skip_sha and skip_sha(path, sha):
+                    yield BlobContent(path=path, content=None, skipped="unchanged", sha=sha)
+                    continue
+                self.read.append(path)
+                yield BlobContent(path=path, content=f"# {path}\n", sha=sha)
+
+    db = _BulkDb()
+    db.repo_files = _IndexedCollection([
+        {"path": "same.py", "blob_sha": "sha-same.py", "content_hash": "x"},
+        {"path": "changed.py", "blob_sha": "old", "content_hash": "y"},
+    ])
+    git = _Git()
+
+    out = rss._index_pipeline(git, CodeIndexer(db), "Repo", ["same.py", "changed.py", "new.py"], "sha", "sha")
+
+    assert out["unchanged"] == 1
+    assert git.read == ["changed.py", "new.py"]
+    assert db.repo_files.written == ["changed.py", "new.py"]
+
+    # בלי blob SHA (קריאה קובץ-קובץ) ההשוואה נעשית לפי hash התוכן
+    db.repo_files = _IndexedCollection([{"path": "a.py", "content_hash": content_hash("x = 1\n")}])
+    out = rss._index_pipeline(_ContentGit({"a.py": "x = 1\n"}), CodeIndexer(db), "Repo", ["a.py"], "sha", "sha")
+    assert out["unchanged"] == 1 and db.repo_files.written == []
+
+
+def test_index_pipeline_reuses_parse_for_renamed_content(monkeypatch):
+    from services import repo_sync_service as rss
+    from services.code_indexer import CodeIndexer, content_hash
+
+    content = "import os\ndef moved():\n    pass\n"
+    old_doc = CodeIndexer().build_document("Repo", "old/a.py", content, "c1")
+    monkeypatch.setattr(CodeIndexer, "build_document", lambda *a, **k: pytest.fail("should reuse parse"))
+    db = _BulkDb()
+    db.repo_files = _IndexedCollection([])
+
+    out = rss._index_pipeline(
+        _ContentGit({"new/a.py": content}), CodeIndexer(db), "Repo", ["new/a.py"], "c2", "c2",
+        reusable={content_hash(content): old_doc},
+    )
+
+    assert out["indexed"] == ["new/a.py"]
+    assert db.repo_files.written == ["new/a.py"]
+
+
+def test_index_pipeline_force_reindexes_unchanged_for_backfill():
+    from services import repo_sync_service as rss
+    from services.code_indexer import CodeIndexer, content_hash
+
+    db = _BulkDb()
+    db.repo_files = _IndexedCollection([{"path": "a.py", "content_hash": content_hash("x = 1\n")}])
+    out = rss._index_pipeline(_ContentGit({"a.py": "x = 1\n"}), CodeIndexer(db), "Repo", ["a.py"], "s", "s", force=True)
+    assert out["unchanged"] == 0 and db.repo_files.written == ["a.py"]
+
+
+class _SyncGit(_ContentGit):
+    def mirror_exists(self, repo_name):
+        return True
+
+    def fetch_updates(self, repo_name):
+        return {"success": True}
+
+    def get_changed_files(self, repo_name, old_sha, new_sha):
+        return {"added": [], "modified": ["b.py"], "removed": [], "renamed": []}
+
+    def list_all_files(self, repo_name, ref="HEAD"):
+        return sorted(self.files)
+
+
+@pytest.mark.parametrize("complete", [False, True])
+def test_sync_backfills_symbols_once_until_marked_complete(complete):
+    from services import repo_sync_service as rss
+    from services.code_indexer import CodeIndexer, content_hash
+
+    db = _BulkDb()
+    db.repo_files = _IndexedCollection([{"path": "a.py", "content_hash": content_hash("x = 1\n")}])
+    db.repo_metadata = _FakeRepoMetadataCollection({"last_synced_sha": "old", "symbols_complete": complete})
+    db.repo_symbols = type("_Symbols", (), {"delete_many": lambda self, q: None, "insert_many": lambda self, d, ordered=True: None})()
+    git = _SyncGit({"a.py": "x = 1\n", "b.py": "y = 2\n"})
+
+    out = rss._run_sync_logic(git, CodeIndexer(db), db, "Repo", "new", None)
+
+    saved = db.repo_metadata.last_update["update"]["$set"]
+    if complete:
+        assert db.repo_files.written == ["b.py"] and "symbols_complete" not in saved
+    else:
+        # backfill מלא: גם a.py שלא השתנה נכתב מחדש (כדי לקבל רשומות repo_symbols)
+        assert sorted(db.repo_files.written) == ["a.py", "b.py", "b.py"]
+        assert saved["symbols_complete"] is True and out["stats"]["symbols_backfilled"] == 2
+
+
+def test_sync_marks_symbols_complete_despite_undecodable_file():
+    from services import repo_sync_service as rss
+    from services.code_indexer import CodeIndexer
+    from services.git_mirror_service import BlobContent
+
+    class _BatchGit(_SyncGit):
+        def iter_file_contents(self, repo_name, file_paths, ref="HEAD", max_size_for=None, skip_sha=None):
+            for path in file_paths:
+                if path == "latin1.py":
+                    # בלוב שאינו UTF-8 - לעולם לא ייקרא
+                    yield BlobContent(path=path, content=None, skipped="decode_error", sha="x")
+                else:
+                    yield BlobContent(path=path, content=self.files[path], sha=f"sha-{path}")
+
+    db = _BulkDb()
+    db.repo_files = _IndexedCollection([])
+    db.repo_metadata = _FakeRepoMetadataCollection({"last_synced_sha": "old"})
+    db.repo_symbols = type("_Symbols", (), {"delete_many": lambda self, q: None, "insert_many": lambda self, d, ordered=True: None})()
+    git = _BatchGit({"a.py": "x = 1\n", "b.py": "y = 2\n", "latin1.py": None})
+
+    out = rss._run_sync_logic(git, CodeIndexer(db), db, "Repo", "new", None)
+
+    assert db.repo_metadata.last_update["update"]["$set"]["symbols_complete"] is True
+    assert out["stats"]["errors"] == 0
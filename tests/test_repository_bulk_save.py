@@ -0,0 +1,87 @@
+import itertools
+import types
+
+from database.models import CodeSnippet
+
+
+class _Coll:
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.inserted = []
+        self.updates = []
+        self.pipelines = []
+        self.fail_after = None
+
+    def insert_many(self, docs, ordered=True):  # noqa: ARG002
+        for i, doc in enumerate(docs):
+            if self.fail_after is not None and i >= self.fail_after:
+                err = Exception("duplicate key")
+                err.details = {"nInserted": i}
+                raise err
+            doc["_id"] = f"new{next(self._ids)}"
+            self.inserted.append(doc)
+
+    def update_many(self, query, update):
+        self.updates.append((query, update))
+        return types.SimpleNamespace(modified_count=1)
+
+    def aggregate(self, pipeline, allowDiskUse=False):  # noqa: ARG002
+        self.pipelines.append(pipeline)
+        return [
+            {"_id": "a.py", "latest": {"_id": "old-a", "file_name": "a.py", "version": 3, "is_favorite": False},
+             "any_favorite": True, "any_pinned": False},
+        ]
+
+
+def _repo(monkeypatch, coll):
+    import database.repository as repo_mod
+
+    monkeypatch.setattr(repo_mod.config, "NORMALIZE_CODE_ON_SAVE", False, raising=False)
+    compacted = []
+    monkeypatch.setattr(repo_mod.Repository, "_compact_previous_version",
+                        lambda self, prev, code, new_id: compacted.append((prev["_id"], new_id)))
+    mgr = types.SimpleNamespace(collection=coll, large_files_collection=coll)
+    return repo_mod.Repository(mgr), compacted
+
+
+def test_files_state_folds_favorite_over_all_versions(monkeypatch):
+    coll = _Coll()
+    repo, _ = _repo(monkeypatch, coll)
+
+    state = repo.get_files_state_by_names(5, ["a.py", "b.py", "a.py"])
+
+    assert state["a.py"]["is_favorite"] is True and state["a.py"]["version"] == 3
+    assert "b.py" not in state
+    assert len(coll.pipelines) == 1
+    assert coll.pipelines[0][0]["$match"]["file_name"] == {"$in": ["a.py", "b.py"]}
+
+
+def test_bulk_save_versions_from_state_in_one_insert(monkeypatch):
+    coll = _Coll()
+    repo, compacted = _repo(monkeypatch, coll)
+    existing = {"a.py": {"_id": "old-a", "file_name": "a.py", "version": 3, "code": "x"}}
+    snippets = [
+        CodeSnippet(user_id=5, file_name="a.py", code="new", programming_language="python", is_pinned=True, pin_order=2),
+        CodeSnippet(user_id=5, file_name="b.py", code="b\nc", programming_language="python"),
+    ]
+
+    assert repo.bulk_save_code_snippets(snippets, existing) == 2
+
+    a, b = coll.inserted
+    assert (a["version"], b["version"]) == (4, 1)
+    assert a["is_latest"] is True and b["lines_count"] == 2
+    flag_query, flag_update = coll.updates[0]
+    assert flag_query["_id"] == {"$nin": ["new1", "new2"]} and flag_update == {"$set": {"is_latest": False}}
+    pin_query, _ = coll.updates[1]
+    assert pin_query["file_name"] == {"$in": ["a.py"]}
+    assert compacted == [("old-a", "new1")]
+
+
+def test_bulk_save_reports_written_prefix_on_failure(monkeypatch):
+    coll = _Coll()
+    coll.fail_after = 1
+    repo, _ = _repo(monkeypatch, coll)
+    snippets = [CodeSnippet(user_id=5, file_name=n, code="x", programming_language="text") for n in ("a.py", "b.py")]
+
+    assert repo.bulk_save_code_snippets(snippets, {}) == 1
+    assert coll.updates[0][0]["file_name"] == {"$in": ["a.py"]}
@@ -0,0 +1,158 @@
+import search_engine as se
+
+
+class _Perf:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+def _doc(name, code):
+    return {
+        "file_name": name,
+        "code": code,
+        "programming_language": "python",
+        "tags": [],
+        "updated_at": se.datetime.now(se.timezone.utc),
+        "is_active": True,
+    }
+
+
+class _SnapshotColl:
+    def __init__(self):
+        self.saved = {}
+
+    def find_one(self, query):
+        return self.saved.get(query["_id"])
+
+    def replace_one(self, query, doc, upsert=False):
+        self.saved[query["_id"]] = doc
+
+
+class _DB:
+    def __init__(self, docs):
+        self.docs = docs
+        self.db = {"search_index_snapshots": _SnapshotColl()}
+        self.scans = 0
+        self.fetched = []
+
+    def get_user_files(self, user_id, limit=50, skip=0, projection=None):
+        self.scans += 1
+        return self.docs[skip: skip + limit]
+
+    def get_latest_files_by_names(self, user_id, file_names, *, projection=None):
+        self.fetched.extend(file_names)
+        return [d for d in self.docs if d["file_name"] in set(file_names)]
+
+
+def _setup(monkeypatch, docs):
+    fake = _DB(docs)
+    monkeypatch.setattr(se, "db", fake, raising=False)
+    monkeypatch.setattr(se, "track_performance", lambda *a, **k: _Perf(), raising=False)
+    return fake
+
+
+def _index(docs):
+    idx = se.SearchIndex()
+    for d in docs:
+        idx.index_file(1, d)
+    return idx
+
+
+def test_trigram_candidates_fetch_only_matching_docs(monkeypatch):
+    docs = [_doc("a.py", "x = needle_here"), _doc("b.py", "nothing"), _doc("c.py", "need le")]
+    fake = _setup(monkeypatch, docs)
+    idx = _index(docs)
+
+    results = se.AdvancedSearchEngine()._content_search("Needle", 1, idx)
+
+    assert [r.file_name for r in results] == ["a.py"]
+    assert fake.scans == 0
+    assert sorted(fake.fetched) == ["a.py"]
+    assert results[0].highlight_ranges
+
+
+def test_missing_trigram_short_circuits_and_short_query_scans(monkeypatch):
+    docs = [_doc("a.py", "abc")]
+    fake = _setup(monkeypatch, docs)
+    idx = _index(docs)
+    engine = se.AdvancedSearchEngine()
+
+    assert engine._content_search("zzz", 1, idx) == []
+    assert fake.fetched == [] and fake.scans == 0
+
+    # שאילתה של פחות מ-3 תווים אינה ניתנת לסינון בטריגרמים -> סריקה
+    assert [r.file_name for r in engine._content_search("ab", 1, idx)] == ["a.py"]
+    assert fake.scans > 0
+
+
+def test_bm25_prefers_denser_match(monkeypatch):
+    docs = [
+        _doc("long.py", "token " + "filler " * 200),
+        _doc("dense.py", "token token token"),
+    ]
+    _setup(monkeypatch, docs)
+    idx = _index(docs)
+
+    results = se.AdvancedSearchEngine()._content_search("token", 1, idx)
+    ranked = sorted(results, key=lambda r: r.relevance_score, reverse=True)
+
+    assert [r.file_name for r in ranked] == ["dense.py", "long.py"]
+
+
+def test_snapshot_roundtrip_restores_trigrams(monkeypatch):
+    docs = [_doc("a.py", "def render_page():\n    pass\n")]
+    fake = _setup(monkeypatch, docs)
+    idx = _index(docs)
+    idx.watermark = se.datetime.now(se.timezone.utc)
+    assert idx.persist(1, force=True) is True
+
+    restored = se.SearchIndex()
+    assert restored.load_snapshot(1) is True
+    assert restored.substring_candidates("render_p") == [restored.doc_ids["a.py"]]
+    assert restored.avg_length == idx.avg_length
+    assert fake.db["search_index_snapshots"].saved[1]
+
+
+def test_regex_required_literals_cnf():
+    assert se._regex_required_literals(r"def\s+render_(page|view)\(") == [["def"], ["render_"], ["page", "view"]]
+    assert se._regex_required_literals(r"(?:import|from)\s+os") == [["from", "import"]]
+    # חלופה בלי ליטרל הכרחי / כמת אופציונלי -> אין סעיף
+    assert se._regex_required_literals(r"(foo|\d+)bar?") == []
+    assert se._regex_required_literals(r"(token)?x") == []
+    assert se._regex_required_literals(r"[") == []
+
+
+def test_regex_search_prunes_with_trigrams(monkeypatch):
+    docs = [
+        _doc("a.py", "def render_page(x):\n    pass\n"),
+        _doc("b.py", "def other():\n    pass\n"),
+        _doc("c.py", "RENDER_VIEW = 1\n"),
+    ]
+    fake = _setup(monkeypatch, docs)
+    recorded = {}
+    import metrics
+
+    monkeypatch.setattr(metrics, "record_search_regex_prefilter", lambda **kw: recorded.update(kw))
+    idx = _index(docs)
+
+    results = se.AdvancedSearchEngine()._regex_search(r"render_\w+", 1, idx)
+
+    assert sorted(r.file_name for r in results) == ["a.py", "c.py"]
+    assert fake.scans == 0
+    assert sorted(fake.fetched) == ["a.py", "c.py"]
+    assert recorded["pruned"] == 1 and recorded["scanned"] == 2
+
+
+def test_regex_search_stops_at_time_budget(monkeypatch):
+    docs = [_doc(f"f{i}.py", "value") for i in range(5)]
+    _setup(monkeypatch, docs)
+    monkeypatch.setattr(se.config, "SEARCH_REGEX_TIME_BUDGET_MS", 1, raising=False)
+    clock = iter(range(0, 1000))
+    monkeypatch.setattr(se.time, "monotonic", lambda: float(next(clock)))
+
+    results = se.AdvancedSearchEngine()._regex_search("val", 1)
+
+    assert len(results) < len(docs)
@@ -0,0 +1,156 @@
+import search_engine as se
+
+
+class _Perf:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+def _doc(name, code, updated_at=None, active=True):
+    return {
+        "file_name": name,
+        "code": code,
+        "programming_language": "python",
+        "tags": ["t1"],
+        "updated_at": updated_at or se.datetime.now(se.timezone.utc),
+        "is_active": active,
+        "version": 1,
+    }
+
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        since = query["updated_at"]["$gt"]
+        return [d for d in self.docs if d["updated_at"] > since]
+
+    def distinct(self, field, query):
+        return sorted({d[field] for d in self.docs if d.get("is_active")})
+
+
+class _SnapshotColl:
+    def __init__(self):
+        self.saved = {}
+
+    def find_one(self, query):
+        return self.saved.get(query["_id"])
+
+    def replace_one(self, query, doc, upsert=False):
+        self.saved[query["_id"]] = doc
+
+
+class _DB:
+    def __init__(self, docs):
+        self.docs = docs
+        self.collection = _Collection(docs)
+        self.db = {"search_index_snapshots": _SnapshotColl()}
+        self.full_reads = 0
+
+    def get_user_files(self, user_id, limit=50, skip=0, projection=None):
+        self.full_reads += 1
+        live = [d for d in self.docs if d["is_active"]]
+        return live[skip: skip + limit]
+
+    def get_file(self, user_id, file_name):
+        for d in self.docs:
+            if d["file_name"] == file_name and d["is_active"]:
+                return d
+        return None
+
+
+def _setup(monkeypatch, docs):
+    fake = _DB(docs)
+    monkeypatch.setattr(se, "db", fake, raising=False)
+    monkeypatch.setattr(se, "track_performance", lambda *a, **k: _Perf(), raising=False)
+    return fake
+
+
+def test_notify_applies_delta_without_rebuild(monkeypatch):
+    docs = [_doc("a.py", "alpha beta")]
+    fake = _setup(monkeypatch, docs)
+    engine = se.AdvancedSearchEngine()
+    monkeypatch.setattr(se, "search_engine", engine, raising=False)
+
+    idx = engine.get_index(1)
+    assert "alpha" in idx.word_index
+    reads = fake.full_reads
+
+    docs[0] = _doc("a.py", "gamma")
+    se.notify_file_changed(1, "a.py")
+    idx = engine.get_index(1)
+
+    assert "gamma" in idx.word_index
+    assert "alpha" not in idx.word_index
+    assert fake.full_reads == reads
+
+
+def test_refresh_picks_up_changes_and_drops_renamed(monkeypatch):
+    old = se.datetime(2020, 1, 1, tzinfo=se.timezone.utc)
+    docs = [_doc("a.py", "alpha", updated_at=old), _doc("b.py", "beta", updated_at=old)]
+    _setup(monkeypatch, docs)
+    idx = se.SearchIndex()
+    idx.rebuild_index(1)
+    idx.watermark = old
+
+    # rename b.py -> c.py (המסמך עצמו משנה שם ו-updated_at)
+    docs[1] = _doc("c.py", "beta")
+    assert idx.refresh(1) is True
+
+    assert "c.py" in idx.doc_ids
+    assert "b.py" not in idx.doc_ids
+    assert idx.file_names(idx.word_index["beta"]) == ["c.py"]
+
+
+def test_snapshot_roundtrip_skips_full_rebuild(monkeypatch):
+    docs = [_doc("a.py", "def hello():\n    return 1\n")]
+    fake = _setup(monkeypatch, docs)
+    idx = se.SearchIndex()
+    idx.ensure_fresh(1)
+    assert fake.db["search_index_snapshots"].saved.get(1)
+
+    reads = fake.full_reads
+    restored = se.SearchIndex()
+    restored.ensure_fresh(1)
+
+    assert fake.full_reads == reads
+    assert restored.file_names(restored.language_index["python"]) == ["a.py"]
+    assert "hello" in restored.function_index
+
+
+def test_postings_use_int_doc_ids_and_reuse_freed_ids(monkeypatch):
+    _setup(monkeypatch, [])
+    idx = se.SearchIndex()
+    idx.index_file(1, _doc("a.py", "shared alpha"))
+    idx.index_file(1, _doc("b.py", "shared beta"))
+
+    assert list(idx.word_index["shared"]) == [0, 1]
+    # לכל קובץ: 2 מילים + שפה + תגית, ועוד טריגרמים (10 ו-9 בהתאמה)
+    assert idx.posting_count == 27
+    idx.remove_file(1, "a.py")
+    assert "alpha" not in idx.word_index
+    idx.index_file(1, _doc("c.py", "gamma"))
+    assert idx.doc_ids["c.py"] == 0
+
+
+def test_engine_cache_evicts_least_recently_used(monkeypatch):
+    fake = _setup(monkeypatch, [_doc("a.py", "alpha")])
+    monkeypatch.setattr(se.config, "SEARCH_INDEX_CACHE_MAX_USERS", 2, raising=False)
+    engine = se.AdvancedSearchEngine()
+
+    engine.get_index(1)
+    engine.get_index(2)
+    engine.get_index(1)  # 1 הופך לטרי ביותר
+    engine.get_index(3)
+
+    assert list(engine.indexes.keys()) == [1, 3]
+    stats = engine.get_cache_stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    # המפונה נשמר כ-snapshot כדי שהחזרה תהיה זולה
+    assert 2 in fake.db["search_index_snapshots"].saved
@@ -59,7 +59,8 @@ def test_function_search_similarity_works(monkeypatch):
 
     eng = se.AdvancedSearchEngine()
     idx = se.SearchIndex()
-    idx.function_index["funcname"].add("1:file.py")
+    idx.index_file(1, {"file_name": "file.py", "code": "def funcname():\n  pass", "programming_language": "python"})
+    assert "funcname" in idx.function_index
     monkeypatch.setattr(eng, "get_index", lambda _uid: idx)
 
     # החזר אובייקט גרסה אחרונה כאשר יידרש
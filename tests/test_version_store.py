@@ -0,0 +1,263 @@
+import itertools
+
+from database import version_store as vs
+
+
+class _Coll:
+    """אוסף בזיכרון: שוויון פשוט, $exists ומפתחות מקוננים (a.b)."""
+
+    def __init__(self):
+        self.docs = []
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def _get(doc, key):
+        for part in key.split("."):
+            if not isinstance(doc, dict) or part not in doc:
+                return None, False
+            doc = doc[part]
+        return doc, True
+
+    def _match(self, doc, query):
+        for key, cond in query.items():
+            value, present = self._get(doc, key)
+            if isinstance(cond, dict) and "$exists" in cond:
+                if present != cond["$exists"]:
+                    return False
+            elif isinstance(cond, dict) and "$in" in cond:
+                if value not in cond["$in"]:
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", next(self._ids))
+        self.docs.append(doc)
+        return type("R", (), {"inserted_id": doc["_id"]})
+
+    def find(self, query, projection=None, sort=None):
+        found = [dict(d) for d in self.docs if self._match(d, query)]
+        if sort:
+            key, direction = sort[0]
+            found.sort(key=lambda d: d.get(key), reverse=direction < 0)
+        return found
+
+    def find_one(self, query, projection=None, sort=None):
+        found = self.find(query, sort=sort)
+        return found[0] if found else None
+
+    def update_one(self, query, update):
+        for d in self.docs:
+            if self._match(d, query):
+                d.update(update.get("$set", {}))
+                for k in update.get("$unset", {}):
+                    d.pop(k, None)
+                return type("R", (), {"modified_count": 1})
+        return type("R", (), {"modified_count": 0})
+
+    def update_many(self, query, update):
+        count = 0
+        for d in self.docs:
+            if self._match(d, query):
+                d.update(update.get("$set", {}))
+                for k in update.get("$unset", {}):
+                    d.pop(k, None)
+                count += 1
+        return type("R", (), {"modified_count": count})
+
+    def delete_many(self, query):
+        keep = [d for d in self.docs if not self._match(d, query)]
+        removed, self.docs = len(self.docs) - len(keep), keep
+        return type("R", (), {"deleted_count": removed})
+
+
+def _versions(n):
+    body = "".join(f"line {i} = compute_value({i})\n" for i in range(80))
+    return [body.replace(f"line {v} ", f"line {v} edited ") + f"# v{v}\n" for v in range(1, n + 1)]
+
+
+def _save_chain(coll, codes, interval=4):
+    prev = None
+    for version, code in enumerate(codes, start=1):
+        res = coll.insert_one({"file_name": "a.py", "version": version, "code": code, "is_active": True})
+        if prev is not None:
+            vs.compact_previous(coll, prev, code, res.inserted_id, keyframe_interval=interval)
+        prev = coll.find_one({"_id": res.inserted_id})
+
+
+def test_delta_roundtrip_and_keyframes():
+    coll = _Coll()
+    codes = _versions(9)
+    _save_chain(coll, codes)
+
+    kinds = {d["version"]: (d.get("code_storage") or {}).get("kind") for d in coll.docs}
+    assert kinds[9] is None and coll.docs[-1]["code"] == codes[-1]
+    assert kinds[4] == "zlib" and kinds[8] == "zlib"
+    assert kinds[3] == "delta"
+    stored = sum(len(d["code_storage"]["data"]) for d in coll.docs if d.get("code_storage"))
+    assert stored < sum(len(c) for c in codes[:-1]) / 10
+
+    docs = vs.materialize_many(coll, coll.find({"file_name": "a.py"}, sort=[("version", -1)]))
+    assert [d["code"] for d in reversed(docs)] == codes
+    # שחזור בודד (ללא memo) הולך בשרשרת עד ה-keyframe / הגרסה המלאה
+    one = vs.materialize(coll, coll.find_one({"version": 2}))
+    assert one["code"] == codes[1] and "code_storage" not in one
+
+
+def test_rehydrate_dependents_before_base_disappears():
+    coll = _Coll()
+    codes = _versions(3)
+    _save_chain(coll, codes, interval=100)
+    latest_id = coll.docs[-1]["_id"]
+
+    assert vs.rehydrate_dependents(coll, latest_id) == 1
+    coll.docs.pop()  # הגרסה האחרונה נמחקת לצמיתות
+    v2 = coll.find_one({"version": 2})
+    assert v2["code"] == codes[1] and "code_storage" not in v2
+    assert vs.materialize(coll, coll.find_one({"version": 1}))["code"] == codes[0]
+
+
+def test_rehydrate_dependents_reports_broken_chain():
+    import pytest
+
+    coll = _Coll()
+    _save_chain(coll, _versions(3), interval=100)
+    latest_id = coll.docs[-1]["_id"]
+    v2_id = coll.find_one({"version": 2})["_id"]
+    coll.docs.pop()  # הבסיס כבר נמחק - אין ממה לשחזר את v2
+
+    with pytest.raises(vs.RehydrateError) as exc:
+        vs.rehydrate_dependents(coll, latest_id)
+    assert exc.value.failed == [v2_id]
+
+
+def test_small_files_are_not_compacted():
+    coll = _Coll()
+    _save_chain(coll, ["x = 1\n", "x = 2\n"])
+    assert all("code_storage" not in d for d in coll.docs)
+
+
+def test_repository_compacts_previous_version_on_save(monkeypatch):
+    import database.repository as repo_mod
+
+    coll = _Coll()
+    mgr = type("M", (), {"collection": coll})()
+    monkeypatch.setattr(repo_mod.config, "NORMALIZE_CODE_ON_SAVE", False, raising=False)
+    repo = repo_mod.Repository(mgr)
+    codes = _versions(3)
+    for code in codes:
+        assert repo.save_file(7, "a.py", code, "python") is True
+
+    assert [bool(d.get("code_storage")) for d in coll.docs] == [True, True, False]
+    assert [d["code"] for d in repo.get_all_versions(7, "a.py")] == list(reversed(codes))
+    assert repo.get_version(7, "a.py", 1)["code"] == codes[0]
+
+
+class _WebColl(_Coll):
+    """code_snippets של ה-webapp: aggregate מחזיר את המסמכים של ה-$match כמו שהם (בלי code)."""
+
+    def aggregate(self, pipeline):
+        match = dict(pipeline[0]["$match"])
+        match.pop("is_active", None)
+        docs = sorted(self.find(match), key=lambda d: d.get("version") or 0, reverse=True)
+        return [{k: v for k, v in d.items() if k not in ("code", vs.STORAGE_FIELD)} for d in docs]
+
+
+def _webapp_with_history(monkeypatch):
+    from bson import ObjectId
+    import webapp.app as app_mod
+
+    old, new = _versions(2)
+    coll = _WebColl()
+    new_id, old_id = ObjectId(), ObjectId()
+    coll.insert_one({"_id": new_id, "user_id": 5, "file_name": "a.py", "version": 2, "code": new, "is_active": True})
+    prev = {"_id": old_id, "user_id": 5, "file_name": "a.py", "version": 1, "code": old, "is_active": True}
+    prev.update(vs.compaction_fields(prev, new, new_id, keyframe_interval=10))
+    coll.insert_one(prev)
+    assert prev["code"] == ""
+
+    shares = _Coll()
+    db = type("DB", (), {"code_snippets": coll, "internal_shares": shares})()
+    monkeypatch.setattr(app_mod, "get_db", lambda: db)
+    client = app_mod.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 5
+        sess["user_data"] = {"id": 5, "first_name": "T"}
+    return client, shares, str(old_id), old, new
+
+
+def test_webapp_share_of_old_version_uses_restored_code(monkeypatch):
+    client, shares, old_id, old, _ = _webapp_with_history(monkeypatch)
+
+    assert client.post(f"/api/share/{old_id}", json={"type": "download"}).get_json()["ok"] is True
+    assert client.post(f"/api/share/{old_id}", json={"type": "preview"}).get_json()["ok"] is True
+
+    download, preview = shares.docs
+    assert download["code"] == old
+    assert preview["snippet_preview"] == old[:2000]
+
+
+def test_webapp_history_rebuilds_code_on_request(monkeypatch):
+    client, _, old_id, old, new = _webapp_with_history(monkeypatch)
+
+    meta = client.get(f"/api/file/{old_id}/history").get_json()
+    assert [v["version"] for v in meta["versions"]] == [2, 1]
+    assert all("code" not in v for v in meta["versions"])
+
+    full = client.get(f"/api/file/{old_id}/history?include_code=1").get_json()
+    assert [v["code"] for v in full["versions"]] == [new, old]
+
+
+def _repo_with_trashed_chain(monkeypatch):
+    from bson import ObjectId
+    import database.repository as repo_mod
+
+    coll = _Coll()
+    coll._ids = (ObjectId() for _ in itertools.count())
+    mgr = type("M", (), {"collection": coll, "large_files_collection": _Coll()})()
+    monkeypatch.setattr(repo_mod.config, "NORMALIZE_CODE_ON_SAVE", False, raising=False)
+    repo = repo_mod.Repository(mgr)
+    codes = _versions(3)
+    for code in codes:
+        assert repo.save_file(7, "a.py", code, "python") is True
+    # delete_file מעביר את כל הגרסאות לסל
+    coll.update_many({"file_name": "a.py"}, {"$set": {"is_active": False}})
+    return repo, coll, codes
+
+
+def test_repository_restore_of_delta_version_survives_base_expiry(monkeypatch):
+    repo, coll, codes = _repo_with_trashed_chain(monkeypatch)
+    v2 = coll.find_one({"version": 2})
+    assert v2.get("code_storage", {}).get("kind") == "delta"
+
+    assert repo.restore_file_by_id(7, str(v2["_id"])) is True
+    coll.delete_many({"version": 3})  # ה-TTL מוחק את הבסיס שנשאר בסל
+    restored = coll.find_one({"version": 2})
+    assert restored["is_active"] is True and restored["code"] == codes[1]
+    assert "code_storage" not in restored
+
+
+def test_repository_purge_aborts_when_dependents_cannot_be_rehydrated(monkeypatch):
+    repo, coll, _ = _repo_with_trashed_chain(monkeypatch)
+    v3 = coll.find_one({"version": 3})
+    v2 = coll.find_one({"version": 2})
+    # שרשרת v2 שבורה: ה-delta שלו לא תואם את ה-hash שנשמר
+    coll.update_one({"_id": v2["_id"]}, {"$set": {"code_hash": "0" * 40}})
+
+    assert repo.purge_file_by_id(7, str(v3["_id"])) is False
+    assert coll.find_one({"version": 3}) is not None
+
+
+def test_webapp_bulk_delete_rehydrates_previous_version(monkeypatch):
+    client, _, old_id, old, _ = _webapp_with_history(monkeypatch)
+    import webapp.app as app_mod
+
+    coll = app_mod.get_db().code_snippets
+    new_id = coll.find_one({"version": 2})["_id"]
+    resp = client.post("/api/files/bulk-delete", json={"file_ids": [str(new_id)]})
+    assert resp.get_json()["deleted"] == 1
+
+    coll.delete_many({"version": 2})  # ה-TTL מוחק את הגרסה שנמחקה
+    prev = coll.find_one({"version": 1})
+    assert prev["code"] == old and vs.STORAGE_FIELD not in prev
@@ -19,7 +19,7 @@ import socket
 from datetime import datetime, timezone
 from functools import wraps, lru_cache
 from types import SimpleNamespace
-from typing import Optional, Dict, Any, List, Tuple, Set, Union
+from typing import Callable, Optional, Dict, Any, List, Tuple, Set, Union
 from concurrent.futures import ThreadPoolExecutor, Future
 
 from flask import Flask, Blueprint, render_template, jsonify, request, session, redirect, url_for, send_file, abort, Response, g, flash, make_response, send_from_directory
@@ -227,6 +227,36 @@ except Exception:  # pragma: no cover - fallback for minimal environments
 
 LIST_EXCLUDE_HEAVY_PROJECTION: Dict[str, int] = dict(_HEAVY_FIELDS_EXCLUDE_PROJECTION)
 
+# גרסאות קודמות של קובץ נשמרות כ-delta דחוס; קריאה לפי _id חייבת לשחזר את הקוד
+try:
+    from database.version_store import (  # type: ignore
+        materialize as _materialize_version,
+        materialize_many as _materialize_versions,
+        rehydrate as _rehydrate_version,
+        rehydrate_dependents as _rehydrate_version_dependents,
+    )
+except Exception:  # pragma: no cover
+    def _materialize_version(
+        collection: Any, doc: Optional[Dict[str, Any]], memo: Optional[Dict[Any, str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        return doc
+
+    def _materialize_versions(collection: Any, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return docs
+
+    def _rehydrate_version(collection: Any, doc: Dict[str, Any]) -> bool:
+        return False
+
+    def _rehydrate_version_dependents(collection: Any, base_id: Any) -> int:
+        return 0
+
+# דגל is_latest (הגרסה האחרונה של כל קובץ) מתוחזק אחרי כל כתיבה ישירה ל-code_snippets
+try:
+    from database.latest_index import refresh_safe as _refresh_latest_flag  # type: ignore
+except Exception:  # pragma: no cover
+    def _refresh_latest_flag(collection: Any, user_id: Any, file_name: Optional[str]) -> None:
+        return None
+
 def _attach_file_size_and_lines(doc: Dict[str, Any], code_value: Any) -> None:
     """מוסיף file_size/lines_count למסמכי CodeSnippet שנכתבים ישירות ל-DB."""
     try:
@@ -436,6 +466,17 @@ except Exception:
         def get_stats(self) -> Dict[str, Any]:  # pragma: no cover - fallback only
             return {"enabled": False}
     cache = _NoCache()
+# Cache רינדור מבוסס-תוכן (Pygments/BeautifulSoup) – fail-open לרינדור ישיר
+try:
+    from render_cache import get_or_render as _render_cached, get_or_render_pair as _render_cached_pair  # noqa: E402
+except Exception:
+    def _render_cached(kind: str, content: str, render: Callable[[], str], *params: Any) -> str:
+        return render()
+
+    def _render_cached_pair(
+        kind: str, content: str, render: Callable[[], Tuple[str, str]], *params: Any
+    ) -> Tuple[str, str]:
+        return render()
 
 # יצירת האפליקציה
 app = Flask(__name__)
@@ -2727,7 +2768,7 @@ def _get_user_any_file_by_id(db_ref, user_id: int, file_id: str) -> Tuple[Option
     try:
         doc = db_ref.code_snippets.find_one({'_id': obj_id, 'user_id': user_id})
         if isinstance(doc, dict):
-            return doc, "regular"
+            return _materialize_version(db_ref.code_snippets, doc), "regular"
     except Exception:
         pass
     try:
@@ -4857,6 +4898,45 @@ def api_profiler_summary():
         return jsonify({"status": "error", "message": "internal_error"}), 500
 
 
+@app.route("/api/profiler/shapes", methods=["GET"])
+def api_profiler_shapes():
+    """Top query shapes לפי זמן מצטבר (סטטיסטיקות דגומות מה-command listener)."""
+    if not _profiler_is_authorized():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if not _profiler_rate_limit_ok():
+        return jsonify({"status": "error", "message": "rate_limited"}), 429
+    try:
+        hours = max(1, min(24 * 14, int(request.args.get("hours", "24"))))
+    except Exception:
+        hours = 24
+    try:
+        limit = max(1, min(100, int(request.args.get("limit", "20"))))
+    except Exception:
+        limit = 20
+    try:
+        from services import query_shape_stats as qss  # type: ignore
+
+        stats = qss.get_shape_stats()
+        source = "db"
+        try:
+            rows = qss.top_shapes(get_db()[qss.COLLECTION_NAME], hours=hours, limit=limit)
+        except Exception:
+            # אין DB זמין - מציגים לפחות את מה שנצבר בזיכרון של התהליך הזה
+            rows = qss.top_pending(stats, limit=limit)
+            source = "memory"
+        return jsonify({
+            "status": "success",
+            "data": rows,
+            "count": len(rows),
+            "source": source,
+            "sample_rate": stats.sample_rate,
+            "hours": hours,
+        })
+    except Exception:
+        logger.exception("api_profiler_shapes_failed")
+        return jsonify({"status": "error", "message": "internal_error"}), 500
+
+
 @app.route("/api/profiler/explain", methods=["POST"])
 def api_profiler_explain():
     if not _profiler_is_authorized():
@@ -12784,7 +12864,8 @@ def _get_user_file_by_id(db_ref, user_id: int, file_id: str) -> Optional[Dict[st
     except (InvalidId, TypeError):
         return None
     try:
-        return db_ref.code_snippets.find_one({'_id': obj_id, 'user_id': user_id})
+        doc = db_ref.code_snippets.find_one({'_id': obj_id, 'user_id': user_id})
+        return _materialize_version(db_ref.code_snippets, doc)
     except Exception:
         return None
 
@@ -13026,6 +13107,11 @@ def _sanitize_preview_html(
 
 
 def _render_markdown_preview(text: str) -> Tuple[str, str]:
+    html = _render_cached("preview_markdown", text or "", lambda: _render_markdown_preview_uncached(text))
+    return html, _PYGMENTS_PREVIEW_CSS
+
+
+def _render_markdown_preview_uncached(text: str) -> str:
     md = Markdown(
         extensions=[
             "extra",
@@ -13049,11 +13135,20 @@ def _render_markdown_preview(text: str) -> Tuple[str, str]:
         except Exception:
             pass
     rendered = md.convert(text or "")
-    sanitized = _sanitize_preview_html(rendered, profile="markdown")
-    return sanitized, _PYGMENTS_PREVIEW_CSS
+    return _sanitize_preview_html(rendered, profile="markdown")
 
 
 def _render_code_preview(text: str, language: str) -> Tuple[str, str]:
+    html = _render_cached(
+        "preview_code",
+        text or "",
+        lambda: _render_code_preview_uncached(text, language),
+        language or "",
+    )
+    return html, _PYGMENTS_PREVIEW_CSS
+
+
+def _render_code_preview_uncached(text: str, language: str) -> str:
     code = text or ""
     lexer = None
     try:
@@ -13067,12 +13162,15 @@ def _render_code_preview(text: str, language: str) -> Tuple[str, str]:
         except Exception:
             lexer = TextLexer()
     highlighted = highlight(code, lexer, _PYGMENTS_PREVIEW_FORMATTER)
-    sanitized = _sanitize_preview_html(highlighted, profile="code")
-    return sanitized, _PYGMENTS_PREVIEW_CSS
+    return _sanitize_preview_html(highlighted, profile="code")
 
 
 def _render_html_preview(text: str) -> str:
-    return _sanitize_preview_html(text or "", profile="html")
+    return _render_cached(
+        "preview_html",
+        text or "",
+        lambda: _sanitize_preview_html(text or "", profile="html"),
+    )
 
 
 def _resolve_preview_mode(language: str, mode_hint: str) -> str:
@@ -13165,6 +13263,40 @@ def api_live_preview():
     })
 
 
+def _render_file_preview_uncached(preview_code: str, language: str, style_name: str) -> Tuple[str, str]:
+    try:
+        lexer = get_lexer_by_name(language, stripall=True)
+    except ClassNotFound:
+        try:
+            lexer = guess_lexer(preview_code)
+        except ClassNotFound:
+            lexer = get_lexer_by_name('text')
+
+    formatter = HtmlFormatter(
+        style=style_name,
+        linenos=False,
+        cssclass='preview-highlight',
+        nowrap=False,
+    )
+    try:
+        highlighted_html = highlight(preview_code, lexer, formatter)
+        css = formatter.get_style_defs('.preview-highlight')
+        import re as _re
+        text_only = _re.sub(r'<[^>]+>', '', highlighted_html or '').strip()
+        if not text_only:
+            raise ValueError('empty highlighted preview')
+    except Exception:
+        formatter = HtmlFormatter(
+            noclasses=True,
+            linenos=False,
+            cssclass='preview-highlight',
+            nowrap=False,
+        )
+        highlighted_html = highlight(preview_code, lexer, formatter)
+        css = ''
+    return highlighted_html, css
+
+
 @app.route('/api/file/<file_id>/preview')
 @login_required
 @traced("file.preview")
@@ -13223,39 +13355,15 @@ def file_preview(file_id):
     preview_lines = min(20, total_lines)
     preview_code = '\n'.join(lines[:preview_lines])
 
-    # הדגשת תחביר
-    try:
-        lexer = get_lexer_by_name(language, stripall=True)
-    except ClassNotFound:
-        try:
-            lexer = guess_lexer(preview_code)
-        except ClassNotFound:
-            lexer = get_lexer_by_name('text')
-
-    _theme = get_current_theme()
-    style_name = get_pygments_style(_theme)
-    formatter = HtmlFormatter(
-        style=style_name,
-        linenos=False,
-        cssclass='preview-highlight',
-        nowrap=False,
+    # הדגשת תחביר (cache לפי hash התוכן + שפה + style של ה-theme)
+    style_name = get_pygments_style(get_current_theme())
+    highlighted_html, css = _render_cached_pair(
+        "file_preview",
+        preview_code,
+        lambda: _render_file_preview_uncached(preview_code, language, style_name),
+        language,
+        style_name,
     )
-    try:
-        highlighted_html = highlight(preview_code, lexer, formatter)
-        css = formatter.get_style_defs('.preview-highlight')
-        import re as _re
-        text_only = _re.sub(r'<[^>]+>', '', highlighted_html or '').strip()
-        if not text_only:
-            raise ValueError('empty highlighted preview')
-    except Exception:
-        formatter = HtmlFormatter(
-            noclasses=True,
-            linenos=False,
-            cssclass='preview-highlight',
-            nowrap=False,
-        )
-        highlighted_html = highlight(preview_code, lexer, formatter)
-        css = ''
 
     return jsonify({
         'ok': True,
@@ -13499,6 +13607,21 @@ def api_file_history(file_id):
     except Exception:
         return jsonify({'ok': False, 'error': 'שגיאה בטעינת היסטוריה'}), 500
 
+    # ?include_code=1: התוכן של כל גרסה, משוחזר מה-deltas (ברירת המחדל - מטא-דאטה בלבד)
+    include_code = str(request.args.get('include_code') or '').strip().lower() in {'1', 'true', 'yes'}
+    code_by_id: Dict[str, str] = {}
+    if include_code:
+        try:
+            ids = [doc.get('_id') for doc in docs if doc.get('_id') is not None]
+            full_docs = list(db.code_snippets.find({'_id': {'$in': ids}, 'user_id': user_id}))
+            full_docs.sort(key=lambda d: int(d.get('version') or 0), reverse=True)
+            for full in _materialize_versions(db.code_snippets, full_docs):
+                code_value = full.get('code')
+                if isinstance(code_value, str) and not isinstance(full.get('code_storage'), dict):
+                    code_by_id[str(full.get('_id'))] = code_value
+        except Exception:
+            return jsonify({'ok': False, 'error': 'שגיאה בטעינת היסטוריה'}), 500
+
     versions: List[Dict[str, Any]] = []
     latest_version = 0
     if docs:
@@ -13530,6 +13653,8 @@ def api_file_history(file_id):
             'lines_count': line_count,
             'description': (doc.get('description') or '').strip(),
         })
+        if include_code:
+            versions[-1]['code'] = code_by_id.get(str(doc.get('_id')))
 
     return jsonify({
         'ok': True,
@@ -13567,6 +13692,7 @@ def api_restore_file_version(file_id):
             'file_name': file_name,
             'version': version_num,
         })
+        version_doc = _materialize_version(db.code_snippets, version_doc)
     except Exception:
         version_doc = None
     if not version_doc:
@@ -13639,6 +13765,7 @@ def api_restore_file_version(file_id):
         return jsonify({'ok': False, 'error': 'שמירת הגרסה נכשלה'}), 500
 
     inserted_id = str(getattr(res, 'inserted_id', '') or '')
+    _refresh_latest_flag(db.code_snippets, user_id, file_name)
     try:
         cache.invalidate_user_cache(int(user_id))
         cache.invalidate_file_related(file_id=file_name, user_id=user_id)
@@ -13699,6 +13826,7 @@ def api_file_move_to_trash(file_id):
     modified_count = int(getattr(res, 'modified_count', 0) or 0)
     if not modified_count:
         return jsonify({'ok': False, 'error': 'לא נמצאה גרסה פעילה'}), 409
+    _refresh_latest_flag(db.code_snippets, user_id, file_name)
 
     try:
         cache.invalidate_user_cache(int(user_id))
@@ -13726,6 +13854,17 @@ def api_recycle_bin_restore(file_id: str):
     except Exception:
         return jsonify({'ok': False, 'error': 'Invalid file id'}), 400
 
+    # הבסיס של גרסה דחוסה עשוי להישאר בסל ולהימחק ב-TTL - הגרסה המשוחזרת נכתבת מלאה
+    try:
+        trashed = db.code_snippets.find_one({'_id': oid, 'user_id': user_id, 'is_active': False})
+    except Exception:
+        trashed = None
+    if isinstance(trashed, dict):
+        try:
+            _rehydrate_version(db.code_snippets, trashed)
+        except Exception:
+            return jsonify({'ok': False, 'error': 'rehydrate_failed'}), 500
+
     now = datetime.now(timezone.utc)
     modified = 0
 
@@ -13736,6 +13875,9 @@ def api_recycle_bin_restore(file_id: str):
              '$unset': {'deleted_at': '', 'deleted_expires_at': ''}},
         )
         modified += int(getattr(res, 'modified_count', 0) or 0)
+        if modified:
+            restored = db.code_snippets.find_one({'_id': oid}, {'file_name': 1}) or {}
+            _refresh_latest_flag(db.code_snippets, user_id, restored.get('file_name'))
     except Exception:
         pass
 
@@ -13776,6 +13918,18 @@ def api_recycle_bin_purge(file_id: str):
     except Exception:
         return jsonify({'ok': False, 'error': 'Invalid file id'}), 400
 
+    # גרסאות ישנות יותר שנשמרו כ-delta מול המסמך הזה הופכות ל-keyframes לפני המחיקה
+    try:
+        trashed = db.code_snippets.find_one({'_id': oid, 'user_id': user_id, 'is_active': False}, {'_id': 1})
+    except Exception:
+        trashed = None
+    if trashed:
+        try:
+            _rehydrate_version_dependents(db.code_snippets, oid)
+        except Exception:
+            # מחיקה בלי שחזור התלויים הייתה משאירה גרסאות שאי אפשר לשחזר
+            return jsonify({'ok': False, 'error': 'rehydrate_failed'}), 500
+
     deleted = 0
     try:
         res = db.code_snippets.delete_many({'_id': oid, 'user_id': user_id, 'is_active': False})
@@ -14492,6 +14646,7 @@ def edit_file_page(file_id):
                     try:
                         res = db.code_snippets.insert_one(new_doc)
                         if res and getattr(res, 'inserted_id', None):
+                            _refresh_latest_flag(db.code_snippets, user_id, file_name)
                             if new_doc.get('is_pinned'):
                                 unpin_errors: List[Dict[str, Any]] = []
                                 try:
@@ -15436,6 +15591,8 @@ def create_public_share(file_id):
                 '_id': ObjectId(file_id),
                 'user_id': user_id
             })
+            compacted = bool(isinstance(file, dict) and isinstance(file.get('code_storage'), dict))
+            file = _materialize_version(db.code_snippets, file)
         except Exception:
             return jsonify({'ok': False, 'error': 'קובץ לא נמצא'}), 404
 
@@ -15513,6 +15670,9 @@ def create_public_share(file_id):
                 meta = {}
             if not meta:
                 return jsonify({'ok': False, 'error': 'קובץ לא נמצא'}), 404
+            if compacted:
+                # גרסה קודמת שנשמרה כ-delta: ב-DB אין code, התצוגה המקדימה מהתוכן המשוחזר
+                meta['snippet_preview'] = str(file.get('code') or '')[:2000]
             doc.update({
                 'file_name': meta.get('file_name') or 'snippet.txt',
                 'language': (meta.get('programming_language') or 'text'),
@@ -15657,6 +15817,7 @@ def api_save_shared_file():
             return jsonify({'ok': False, 'error': 'שמירת המדריך נכשלה'}), 500
 
         inserted_id = str(getattr(res, 'inserted_id', '') or '')
+        _refresh_latest_flag(db.code_snippets, user_id, safe_name)
 
         try:
             cache.invalidate_user_cache(user_id)
@@ -16368,6 +16529,7 @@ def upload_file_web():
                     except Exception as _e:
                         res = None
                     if res and getattr(res, 'inserted_id', None):
+                        _refresh_latest_flag(db.code_snippets, user_id, file_name)
                         if markdown_image_payloads:
                             try:
                                 _save_markdown_images(db, user_id, res.inserted_id, markdown_image_payloads)
@@ -16850,7 +17012,7 @@ def api_files_bulk_delete():
         # אימות בעלות ואיסוף סטטוס is_active לכל קובץ; תוצאה אחת לכל ID ייחודי
         docs = list(db.code_snippets.find(
             {'_id': {'$in': unique_object_ids}, 'user_id': user_id},
-            {'_id': 1, 'is_active': 1}
+            {'_id': 1, 'is_active': 1, 'file_name': 1}
         ))
         found_ids = {doc['_id'] for doc in docs}
         if len(found_ids) != len(unique_object_ids):
@@ -16861,6 +17023,12 @@ def api_files_bulk_delete():
 
         modified_count = 0
         if active_ids:
+            # גרסאות קודמות נחשפות כאחרונות - הן לא יכולות להישאר delta מול מסמך שיימחק ב-TTL
+            try:
+                for active_id in active_ids:
+                    _rehydrate_version_dependents(db.code_snippets, active_id)
+            except Exception:
+                return jsonify({'success': False, 'error': 'rehydrate_failed'}), 500
             q = {
                 '_id': {'$in': active_ids},
                 'user_id': user_id,
@@ -16875,6 +17043,9 @@ def api_files_bulk_delete():
                 }
             })
             modified_count = int(getattr(res, 'modified_count', 0))
+            if modified_count:
+                for deleted_name in dict.fromkeys(doc.get('file_name') for doc in docs if doc['_id'] in active_ids):
+                    _refresh_latest_flag(db.code_snippets, user_id, deleted_name)
         return jsonify({
             'success': True,
             'deleted': modified_count,
@@ -18726,6 +18897,7 @@ def _persist_story_markdown_file(
         )
         raise
     inserted_id = getattr(res, 'inserted_id', None)
+    _refresh_latest_flag(db_ref.code_snippets, user_id, safe_name)
     if not inserted_id:
         raise RuntimeError("file_insert_failed")
     try:
@@ -17,7 +17,7 @@ from functools import wraps
 
 from pymongo.errors import DuplicateKeyError
 
-from flask import Blueprint, jsonify, request, send_file, session
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
 
 logger = logging.getLogger(__name__)
 
@@ -163,26 +163,14 @@ MAX_UPLOAD_SIZE = 100 * 1024 * 1024
 @_require_auth
 @traced("backup.export")
 def export_backup():
-    """ייצוא גיבוי אישי כ-ZIP."""
+    """ייצוא גיבוי אישי כ-ZIP (זורם: הארכיון נבנה תוך כדי שליחה ולא בזיכרון)."""
     user_id = session["user_id"]
 
     try:
         service = _get_backup_service()
-        buffer = service.export_user_data(int(user_id))
-
-        # שם קובץ עם תאריך
-        ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-        filename = f"codebot_backup_{user_id}_{ts}.zip"
-
-        response = send_file(
-            buffer,
-            mimetype="application/zip",
-            as_attachment=True,
-            download_name=filename,
-        )
-        response.headers["Cache-Control"] = "no-store"
-        return response
-
+        chunks = service.iter_export_chunks(int(user_id))
+        # השלב הראשון (קבצים ראשונים) רץ כאן, כדי שכשל מוקדם יחזיר 500 ולא ZIP קטוע
+        first = next(chunks, b"")
     except Exception as e:
         logger.error(f"שגיאה בייצוא גיבוי: {e}")
         emit_event(
@@ -193,6 +181,31 @@ def export_backup():
         )
         return jsonify({"ok": False, "error": "שגיאה ביצירת הגיבוי"}), 500
 
+    def _stream():
+        yield first
+        try:
+            yield from chunks
+        except Exception as e:
+            # הכותרות כבר נשלחו - אפשר רק לקטוע; הלקוח יקבל ZIP לא תקין
+            logger.error(f"שגיאה בייצוא גיבוי (באמצע הזרמה): {e}")
+            emit_event(
+                "personal_backup_export_error",
+                severity="error",
+                user_id=int(user_id),
+                error=str(e),
+                streaming=True,
+            )
+
+    # שם קובץ עם תאריך
+    ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    filename = f"codebot_backup_{user_id}_{ts}.zip"
+
+    response = Response(stream_with_context(_stream()), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 
 @backup_bp.route("/api/backup/restore", methods=["POST"])
 @_require_auth
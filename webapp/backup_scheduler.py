@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import logging
 import os
+import tempfile
 import threading
 import time
 from datetime import datetime, timezone, timedelta
@@ -61,21 +62,24 @@ def _retry_next_at() -> str:
 
 def _perform_drive_backup(user_id: int) -> bool:
     """מבצע גיבוי מלא אישי ל-Drive (קבצים, אוספים, סימניות, הגדרות)."""
+    tmp_path: Optional[str] = None
     try:
         from services.personal_backup_service import PersonalBackupService
-        from services.google_drive_service import upload_bytes
+        from services.google_drive_service import upload_file
         from database import db
 
         service = PersonalBackupService(db)
-        buffer = service.export_user_data(int(user_id))
-        zip_bytes = buffer.getvalue()
+        # הארכיון נכתב ישירות לקובץ זמני ומועלה ממנו ב-chunks - לא נבנה בזיכרון
+        with tempfile.NamedTemporaryFile(prefix=f"codebot_backup_{user_id}_", suffix=".zip", delete=False) as tmp:
+            tmp_path = tmp.name
+            stats = service.export_user_data_to(tmp, int(user_id), target="drive")
 
         ts = _now_utc().strftime("%Y%m%d_%H%M%S")
         filename = f"codebot_full_backup_{user_id}_{ts}.zip"
 
-        file_id = upload_bytes(int(user_id), filename, zip_bytes)
+        file_id = upload_file(int(user_id), filename, tmp_path)
         if file_id:
-            logger.info("Drive full backup uploaded for user %s (%d bytes)", user_id, len(zip_bytes))
+            logger.info("Drive full backup uploaded for user %s (%d bytes)", user_id, int(stats.get("bytes") or 0))
             # עדכון last_backup_at — best-effort, כשל DB לא אמור לגרום לretry ושכפול גיבוי
             try:
                 db.db.users.update_one(
@@ -91,28 +95,38 @@ def _perform_drive_backup(user_id: int) -> bool:
     except Exception:
         logger.exception("Drive backup error for user %s", user_id)
         return False
+    finally:
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
 
 
 def _perform_disk_backup(user_id: int) -> bool:
     """מבצע גיבוי לדיסק עבור משתמש."""
+    partial: Optional[Path] = None
     try:
         from services.personal_backup_service import PersonalBackupService
         from database import db
 
         service = PersonalBackupService(db)
-        buffer = service.export_user_data(int(user_id))
-        zip_bytes = buffer.getvalue()
 
-        # שמירה לדיסק
         backup_dir = Path(DISK_BACKUP_DIR)
         backup_dir.mkdir(parents=True, exist_ok=True)
 
         ts = _now_utc().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"webapp_backup_{user_id}_{ts}.zip"
         filepath = backup_dir / filename
-        filepath.write_bytes(zip_bytes)
 
-        logger.info("Disk backup saved: %s (%d bytes)", filepath, len(zip_bytes))
+        # כתיבה זורמת לקובץ .part ואז rename: גיבוי חלקי לא נראה כגיבוי תקין (ולא נספר ב-retention)
+        partial = backup_dir / f"{filename}.part"
+        with open(partial, "wb") as fh:
+            stats = service.export_user_data_to(fh, int(user_id), target="disk")
+        os.replace(partial, filepath)
+        partial = None
+
+        logger.info("Disk backup saved: %s (%d bytes)", filepath, int(stats.get("bytes") or 0))
 
         # ניקוי גיבויים ישנים
         _cleanup_disk_backups(user_id, backup_dir)
@@ -121,6 +135,12 @@ def _perform_disk_backup(user_id: int) -> bool:
     except Exception:
         logger.exception("Disk backup error for user %s", user_id)
         return False
+    finally:
+        if partial is not None:
+            try:
+                partial.unlink()
+            except OSError:
+                pass
 
 
 def _cleanup_disk_backups(user_id: int, backup_dir: Path):
@@ -1361,6 +1361,12 @@ def _save_shared_document_to_user(db_ref, *, user_id: int, doc: Dict[str, Any])
     try:
         res = db_ref.code_snippets.insert_one(payload)
         inserted_id = str(getattr(res, "inserted_id", "") or "")
+        try:
+            from database.latest_index import refresh_safe as _refresh_latest_flag
+
+            _refresh_latest_flag(db_ref.code_snippets, int(user_id), file_name)
+        except Exception:
+            pass
     except Exception:
         return {"ok": False, "error": "שמירת קובץ נכשלה"}
     return {"ok": True, "action": "inserted", "source": "regular", "file_name": file_name, "inserted_id": inserted_id}
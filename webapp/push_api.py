@@ -66,6 +66,7 @@ def _env_positive_int(name: str, default: int) -> int:
 
 _PUSH_DELIVERY_TTL_SECONDS = _env_positive_int("PUSH_DELIVERY_TTL_SECONDS", 900)
 _PUSH_TEST_TTL_SECONDS = _env_positive_int("PUSH_TEST_TTL_SECONDS", 120)
+_PUSH_DELIVERY_CONCURRENCY = _env_positive_int("PUSH_DELIVERY_CONCURRENCY", 8)
 _PUSH_DELIVERY_URGENCY = (os.getenv("PUSH_DELIVERY_URGENCY") or "high").strip().lower()
 if _PUSH_DELIVERY_URGENCY not in {"very-low", "low", "normal", "high"}:
     _PUSH_DELIVERY_URGENCY = "high"
@@ -241,8 +242,13 @@ def _post_to_worker(
     idempotency_key: str = "",
     ttl: Optional[int] = None,
     urgency: Optional[str] = None,
+    session: Any = None,
 ) -> tuple[bool, int, str]:
-    """POST to external push worker. Returns (ok, status, error)."""
+    """POST to external push worker. Returns (ok, status, error).
+
+    ``session`` (requests.Session) reuses pooled keep-alive connections; without
+    it every call opens a new TLS connection to the worker.
+    """
     try:
         import requests  # type: ignore
         import json as _json
@@ -267,7 +273,8 @@ def _post_to_worker(
         options["urgency"] = urgency
     body = {"subscription": subscription, "payload": payload, "options": options}
     try:
-        r = requests.post(url, data=_json.dumps(body, ensure_ascii=False), headers=headers, timeout=timeout_s)
+        poster = session if session is not None else requests
+        r = poster.post(url, data=_json.dumps(body, ensure_ascii=False), headers=headers, timeout=timeout_s)
         # Worker returns 200 with ok:true/false for known cases; 5xx on internal errors
         status = int(getattr(r, "status_code", 0) or 0)
         try:
@@ -715,8 +722,32 @@ def _send_due_once(max_users: int = 100, max_per_user: int = 10) -> None:
             continue
         key = str(uid)
         by_user.setdefault(key, []).append(r)
-    for uid, items in list(by_user.items())[:max_users]:
-        _send_for_user(uid, items[:max_per_user])
+    batch: list[dict] = []
+    for _uid, items in list(by_user.items())[:max_users]:
+        batch.extend(items[:max_per_user])
+    _deliver_reminders(db, batch)
+
+
+def _claim_owner() -> str:
+    try:
+        import threading
+
+        ident = threading.get_ident()
+    except Exception:
+        ident = 0
+    return f"{os.getenv('HOSTNAME','')}-{os.getpid()}-{ident}"
+
+
+def _claim_filter(now: datetime) -> dict:
+    return {
+        "ack_at": None,
+        "status": {"$in": ["pending", "snoozed"]},
+        # not currently claimed or claim expired
+        "$or": [
+            {"push_claimed_until": {"$exists": False}},
+            {"push_claimed_until": {"$lte": now}},
+        ],
+    }
 
 
 def _claim_reminder(db, reminder_doc: dict, ttl_seconds: int | None = None) -> bool:
@@ -728,29 +759,13 @@ def _claim_reminder(db, reminder_doc: dict, ttl_seconds: int | None = None) -> b
         now = datetime.now(timezone.utc)
         ttl = max(10, int(os.getenv("PUSH_CLAIM_TTL_SECONDS", str(ttl_seconds or 60))))
         until = now + timedelta(seconds=ttl)
-        try:
-            import threading
-
-            ident = threading.get_ident()
-        except Exception:
-            ident = 0
-        owner = f"{os.getenv('HOSTNAME','')}-{os.getpid()}-{ident}"
         r_id = reminder_doc.get("_id")
         if not r_id:
             return False
-        filt = {
-            "_id": r_id,
-            "ack_at": None,
-            "status": {"$in": ["pending", "snoozed"]},
-            # not currently claimed or claim expired
-            "$or": [
-                {"push_claimed_until": {"$exists": False}},
-                {"push_claimed_until": {"$lte": now}},
-            ],
-        }
+        filt = dict(_claim_filter(now), _id=r_id)
         upd = {
             "$set": {
-                "push_claimed_by": owner,
+                "push_claimed_by": _claim_owner(),
                 "push_claimed_at": now,
                 "push_claimed_until": until,
             }
@@ -761,280 +776,411 @@ def _claim_reminder(db, reminder_doc: dict, ttl_seconds: int | None = None) -> b
         return False
 
 
-def _send_for_user(user_id: int | str, reminders: list[dict]) -> None:
-    db = get_db()
-    subs = list(db.push_subscriptions.find({"user_id": {"$in": _user_id_variants(user_id)}}))
-    if not subs:
-        # Telemetry: no subscriptions for user
-        try:
-            from observability import emit_event  # type: ignore
+def _claim_reminders(db, reminder_docs: list[dict], ttl_seconds: int | None = None) -> list[dict]:
+    """Claim a batch of reminders with one update_many + one find.
 
-            emit_event("push_send_no_subscriptions", severity="info", user_id=str(user_id))
-        except Exception:
-            pass
-        return
-    # Decide delivery path
-    remote_cfg = _remote_delivery_cfg()
-    use_remote = bool(remote_cfg.get("enabled"))
-    if not use_remote:
-        # Local pywebpush path requires private key
-        _, vapid_private = _coerce_vapid_pair()
-        vapid_email = (os.getenv("VAPID_SUB_EMAIL") or os.getenv("SUPPORT_EMAIL") or "").strip()
-        if not vapid_private or not subs:
-            try:
-                from observability import emit_event  # type: ignore
+    Each batch gets a unique claim token, so reading back ``push_claimed_by``
+    tells exactly which reminders this call owns (others may have been claimed
+    concurrently by another worker). Falls back to per-reminder claims.
+    """
+    docs = [r for r in reminder_docs if isinstance(r, dict) and r.get("_id")]
+    if not docs:
+        return []
+    try:
+        import uuid
 
-                emit_event("push_send_missing_vapid_private", severity="warning", user_id=int(user_id))
-            except Exception:
-                pass
-            return
-        try:
-            from pywebpush import webpush, WebPushException  # type: ignore
-            import json
-        except Exception:
-            return
+        now = datetime.now(timezone.utc)
+        ttl = max(10, int(os.getenv("PUSH_CLAIM_TTL_SECONDS", str(ttl_seconds or 60))))
+        token = f"{_claim_owner()}-{uuid.uuid4().hex[:8]}"
+        ids = [r.get("_id") for r in docs]
+        db.note_reminders.update_many(
+            dict(_claim_filter(now), _id={"$in": ids}),
+            {"$set": {
+                "push_claimed_by": token,
+                "push_claimed_at": now,
+                "push_claimed_until": now + timedelta(seconds=ttl),
+            }},
+        )
+        owned = {
+            str(d.get("_id"))
+            for d in db.note_reminders.find({"_id": {"$in": ids}, "push_claimed_by": token}, {"_id": 1})
+            if isinstance(d, dict)
+        }
+        return [r for r in docs if str(r.get("_id")) in owned]
+    except Exception:
+        return [r for r in docs if _claim_reminder(db, r, ttl_seconds)]
+
+
+def _reminder_payload(reminder_doc: dict, body_text: str) -> dict:
+    title_text = "🔔 יש פתק ממתין"
+    note_id_str = str(reminder_doc.get("note_id") or "")
+    # Payload format: notification object at top level (FCM standard)
+    # data object for custom handling in SW
+    return {
+        "notification": {
+            "title": title_text,
+            "body": body_text,
+            "icon": "/static/icons/app-icon-512.png",
+            "badge": "/static/icons/app-icon-512.png",
+            "tag": f"reminder-{note_id_str}" if note_id_str else "reminder",
+            "silent": False,
+            "requireInteraction": False,
+            "actions": [
+                {"action": "open_note", "title": "פתח פתק"},
+                {"action": "snooze_10", "title": "דחה 10 דק׳"},
+                {"action": "snooze_60", "title": "דחה שעה"},
+                {"action": "snooze_1440", "title": "דחה 24 שעות"},
+            ],
+        },
+        "data": {
+            "type": "reminder",
+            "note_id": note_id_str,
+            "file_id": str(reminder_doc.get("file_id") or ""),
+            "board_id": str(reminder_doc.get("board_id") or ""),
+            "title": title_text,
+            "body": body_text,
+        },
+    }
 
-    # Track endpoints that should be removed after processing all reminders
-    endpoints_to_delete: set[str] = set()
 
-    for r in reminders:
-        # Try to claim this reminder to avoid duplicate push across workers
+def _subscription_target(sub: dict) -> tuple[str, Any, str]:
+    """(endpoint, subscription_info, content_encoding) for a stored subscription."""
+    ep = str(sub.get("endpoint") or "")
+    info = sub.get("subscription") or {"endpoint": ep, "keys": sub.get("keys")}
+    content_enc = (
+        sub.get("content_encoding")
+        or sub.get("contentEncoding")
+        or (info.get("contentEncoding") if isinstance(info, dict) else None)
+    )
+    try:
+        ce = str(content_enc).strip().lower() if content_enc is not None else ""
+    except Exception:
+        ce = ""
+    if ce not in ("aesgcm", "aes128gcm"):
+        ce = "aes128gcm"
+    return ep, info, ce
+
+
+def _prefetch_subscriptions(db, user_ids) -> Dict[str, list]:
+    """All subscriptions of the batch's users in one query, grouped by str(user_id)."""
+    variants: list = []
+    for uid in user_ids:
+        variants.extend(_user_id_variants(uid))
+    if not variants:
+        return {}
+    out: Dict[str, list] = {}
+    for sub in db.push_subscriptions.find({"user_id": {"$in": variants}}):
+        if isinstance(sub, dict) and sub.get("user_id") is not None:
+            out.setdefault(str(sub.get("user_id")), []).append(sub)
+    return out
+
+
+def _prefetch_previews(db, reminder_docs: list[dict]) -> Dict[str, str]:
+    """Preview text per note_id for a batch of reminders, with one sticky_notes query."""
+    note_ids = {str(r.get("note_id") or "") for r in reminder_docs} - {""}
+    if not note_ids:
+        return {}
+    keys: list = []
+    for note_id in note_ids:
         try:
-            if not _claim_reminder(db, r):
-                continue
+            from bson import ObjectId  # type: ignore
+
+            keys.append(ObjectId(note_id))
         except Exception:
-            # If claiming fails unexpectedly, fall back to best-effort send
             pass
-        title_text = "🔔 יש פתק ממתין"
-        body_text = _coerce_preview(db, r)
-        note_id_str = str(r.get("note_id") or "")
-        file_id_str = str(r.get("file_id") or "")
-        board_id_str = str(r.get("board_id") or "")
+        keys.append(note_id)
+    try:
+        notes = [n for n in db.sticky_notes.find({"_id": {"$in": keys}}, {"content": 1, "anchor_text": 1}) if isinstance(n, dict)]
+    except Exception:
+        return {}
+    out: Dict[str, str] = {}
+    # מסמך עם _id מסוג ObjectId גובר על מסמך עם _id מחרוזתי זהה
+    for note in sorted(notes, key=lambda n: isinstance(n.get("_id"), str)):
+        out.setdefault(str(note.get("_id")), _preview_text(note))
+    return out
 
-        # Payload format: notification object at top level (FCM standard)
-        # data object for custom handling in SW
-        payload = {
-            "notification": {
-                "title": title_text,
-                "body": body_text,
-                "icon": "/static/icons/app-icon-512.png",
-                "badge": "/static/icons/app-icon-512.png",
-                "tag": f"reminder-{note_id_str}" if note_id_str else "reminder",
-                "silent": False,
-                "requireInteraction": False,
-                "actions": [
-                    {"action": "open_note", "title": "פתח פתק"},
-                    {"action": "snooze_10", "title": "דחה 10 דק׳"},
-                    {"action": "snooze_60", "title": "דחה שעה"},
-                    {"action": "snooze_1440", "title": "דחה 24 שעות"},
-                ],
-            },
-            "data": {
-                "type": "reminder",
-                "note_id": note_id_str,
-                "file_id": file_id_str,
-                "board_id": board_id_str,
-                "title": title_text,
-                "body": body_text,
-            },
-        }
-        success_any = False
-        # Telemetry: attempt send for this reminder batch
-        try:
-            from observability import emit_event  # type: ignore
 
-            emit_event(
-                "push_send_attempt",
-                severity="info",
-                user_id=str(user_id),
-                reminder_id=str(r.get("_id") or ""),
-                subs=len(subs),
-            )
-        except Exception:
-            pass
+_PUSH_HTTP_SESSION: Any = None
 
-        for sub in subs:
-            ep = str(sub.get("endpoint") or "")
-            if ep and ep in endpoints_to_delete:
-                continue
-            info = sub.get("subscription") or {"endpoint": ep, "keys": sub.get("keys")}
-            content_enc = (
-                sub.get("content_encoding")
-                or sub.get("contentEncoding")
-                or (info.get("contentEncoding") if isinstance(info, dict) else None)
+
+def _get_push_http_session():
+    """Shared requests.Session with a connection pool sized for the delivery concurrency."""
+    global _PUSH_HTTP_SESSION
+    if _PUSH_HTTP_SESSION is not None:
+        return _PUSH_HTTP_SESSION
+    try:
+        import requests  # type: ignore
+        from requests.adapters import HTTPAdapter  # type: ignore
+
+        sess = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, _PUSH_DELIVERY_CONCURRENCY))
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        _PUSH_HTTP_SESSION = sess
+        return sess
+    except Exception:
+        return None
+
+
+def _delivery_sender():
+    """Return send(info, payload, ce, idempotency_key) -> (ok, status, error) for the configured path.
+
+    None when local delivery is selected but VAPID private key / pywebpush are missing.
+    """
+    session = _get_push_http_session()
+    if bool(_remote_delivery_cfg().get("enabled")):
+
+        def _send_remote(info, payload, ce, idempotency_key):
+            return _post_to_worker(
+                info if isinstance(info, dict) else {},
+                payload,
+                content_encoding=ce,
+                idempotency_key=idempotency_key,
+                ttl=_PUSH_DELIVERY_TTL_SECONDS,
+                urgency=_PUSH_DELIVERY_URGENCY,
+                session=session,
             )
-            try:
-                ce = str(content_enc).strip().lower() if content_enc is not None else ""
-            except Exception:
-                ce = ""
-            if ce not in ("aesgcm", "aes128gcm"):
-                ce = "aes128gcm"
 
-            if use_remote:
-                ok, status_code, _err = _post_to_worker(
-                    info if isinstance(info, dict) else {},
-                    payload,
+        return _send_remote
+
+    # Local pywebpush path requires private key
+    _, vapid_private = _coerce_vapid_pair()
+    vapid_email = (os.getenv("VAPID_SUB_EMAIL") or os.getenv("SUPPORT_EMAIL") or "").strip()
+    if not vapid_private:
+        return None
+    try:
+        from pywebpush import webpush, WebPushException  # type: ignore
+        import json
+    except Exception:
+        return None
+    claims_sub = (f"mailto:{vapid_email}" if vapid_email and not vapid_email.startswith("mailto:") else vapid_email) or "mailto:support@example.com"
+    urgency_headers = {"Urgency": _PUSH_DELIVERY_URGENCY} if _PUSH_DELIVERY_URGENCY else None
+
+    def _send_local(info, payload, ce, idempotency_key):
+        last_err: Exception | None = None
+        for key_variant in _vapid_key_candidates(vapid_private):
+            try:
+                webpush(
+                    subscription_info=info,
+                    data=json.dumps(payload, ensure_ascii=False),
+                    vapid_private_key=key_variant,
+                    vapid_claims={"sub": claims_sub},
                     content_encoding=ce,
-                    idempotency_key=str(r.get("_id") or ""),
                     ttl=_PUSH_DELIVERY_TTL_SECONDS,
-                    urgency=_PUSH_DELIVERY_URGENCY,
+                    headers=urgency_headers,
+                    requests_session=session,
                 )
-                if ok:
-                    success_any = True
-                else:
-                    if status_code in (404, 410) and ep:
-                        endpoints_to_delete.add(ep)
-                    try:
-                        from observability import emit_event  # type: ignore
+                return True, 201, ""
+            except Exception as inner_ex:
+                last_err = inner_ex
+        # רושמים כל חריגה, לא רק WebPushException. בעבר שגיאות אחרות
+        # (מפתחות/הצפנה/תלויות) נבלעו כאן בשקט, והלוג הראה רק
+        # "sent: 0" בלי סיבה — מה שהפך כל אבחון לניחוש.
+        status = 0
+        if isinstance(last_err, WebPushException):
+            status = int(getattr(getattr(last_err, "response", None), "status_code", 0) or 0)
+        try:
+            err_str = f"{type(last_err).__name__}: {last_err}"
+        except Exception:
+            err_str = "unknown_error"
+        return False, status, err_str
 
-                        emit_event(
-                            "push_send_error",
-                            severity="warning",
-                            user_id=str(user_id),
-                            # אותה סכמה כמו במסלול המקומי: hash בלבד, ועם
-                            # פירוט השגיאה. קודם נרשם כאן ה-endpoint המלא.
-                            endpoint_hash=_hash_endpoint(ep),
-                            status_code=int(status_code or 0),
-                            error=_redact_error(_err)[:300],
-                        )
-                    except Exception:
-                        pass
-                continue
+    return _send_local
 
-            # Local pywebpush path
-            try:
-                delivered = False
-                last_err: Exception | None = None
-                urgency_headers = {"Urgency": _PUSH_DELIVERY_URGENCY} if _PUSH_DELIVERY_URGENCY else None
-                for key_variant in _vapid_key_candidates(vapid_private):
-                    try:
-                        webpush(
-                            subscription_info=info,
-                            data=json.dumps(payload, ensure_ascii=False),
-                            vapid_private_key=key_variant,
-                            vapid_claims={"sub": (f"mailto:{vapid_email}" if vapid_email and not vapid_email.startswith("mailto:") else vapid_email) or "mailto:support@example.com"},
-                            content_encoding=ce,
-                            ttl=_PUSH_DELIVERY_TTL_SECONDS,
-                            headers=urgency_headers,
-                        )
-                        delivered = True
-                        last_err = None
-                        break
-                    except Exception as inner_ex:
-                        last_err = inner_ex
-                        continue
-                if not delivered and last_err is not None:
-                    raise last_err
-                if delivered:
-                    success_any = True
-            except Exception as ex:
-                # רושמים כל חריגה, לא רק WebPushException. בעבר שגיאות אחרות
-                # (מפתחות/הצפנה/תלויות) נבלעו כאן בשקט, והלוג הראה רק
-                # "sent: 0" בלי סיבה — מה שהפך כל אבחון לניחוש.
-                status = 0
-                try:
-                    err_str = f"{type(ex).__name__}: {ex}"
-                except Exception:
-                    err_str = "unknown_error"
-                try:
-                    from pywebpush import WebPushException  # type: ignore
 
-                    if isinstance(ex, WebPushException):
-                        status = int(getattr(getattr(ex, "response", None), "status_code", 0) or 0)
-                        if status in (404, 410) and ep:
-                            endpoints_to_delete.add(ep)
-                except Exception:
-                    pass
-                try:
-                    from observability import emit_event  # type: ignore
+def _as_utc(value: Any) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
 
-                    emit_event(
-                        "push_send_error",
-                        severity="warning",
-                        user_id=str(user_id),
-                        # hash בלבד — ה-endpoint המלא הוא מזהה מכשיר ולא נרשם ללוג
-                        endpoint_hash=_hash_endpoint(ep),
-                        status_code=int(status or 0),
-                        error=_redact_error(err_str)[:300],
-                    )
-                except Exception:
-                    pass
-                continue
-        if success_any:
-            try:
-                # Race condition protection: only mark as sent if remind_at hasn't changed
-                # (i.e., user didn't snooze during the push). If snoozed, the new remind_at
-                # means we should NOT clear needs_push - the snoozed reminder needs its push.
-                original_remind_at = r.get("remind_at")
-                db.note_reminders.update_one(
-                    {"_id": r.get("_id"), "remind_at": original_remind_at},
-                    {"$set": {
-                        "last_push_success_at": datetime.now(timezone.utc),
-                        "updated_at": datetime.now(timezone.utc),
-                        "needs_push": False,
-                    }},
-                )
-            except Exception:
-                pass
 
-    # After processing all reminders for this user, remove dead endpoints once
-    if endpoints_to_delete:
-        try:
-            db.push_subscriptions.delete_many({"user_id": {"$in": _user_id_variants(user_id)}, "endpoint": {"$in": list(endpoints_to_delete)}})
-            # Telemetry: cleaned dead endpoints
-            try:
-                from observability import emit_event  # type: ignore
+def _mark_reminders_sent(db, reminder_docs: list[dict]) -> None:
+    if not reminder_docs:
+        return
+    now = datetime.now(timezone.utc)
+    # Race condition protection: only mark as sent if remind_at hasn't changed
+    # (i.e., user didn't snooze during the push). If snoozed, the new remind_at
+    # means we should NOT clear needs_push - the snoozed reminder needs its push.
+    ops = [
+        ({"_id": r.get("_id"), "remind_at": r.get("remind_at")},
+         {"$set": {"last_push_success_at": now, "updated_at": now, "needs_push": False}})
+        for r in reminder_docs
+    ]
+    try:
+        from pymongo import UpdateOne  # type: ignore
 
-                emit_event(
-                    "push_deleted_dead_endpoints",
-                    severity="info",
-                    user_id=str(user_id),
-                    deleted_count=int(len(endpoints_to_delete)),
-                )
-            except Exception:
-                pass
+        db.note_reminders.bulk_write([UpdateOne(f, u) for f, u in ops], ordered=False)
+        return
+    except Exception:
+        pass
+    for filt, upd in ops:
+        try:
+            db.note_reminders.update_one(filt, upd)
         except Exception:
             pass
 
 
-def _coerce_preview(db, reminder_doc: dict) -> str:
+def _emit(event: str, **fields: Any) -> None:
+    try:
+        from observability import emit_event  # type: ignore
+
+        emit_event(event, **fields)
+    except Exception:
+        pass
+
+
+def _deliver_reminders(db, reminders: list[dict]) -> dict[str, int]:
+    """Delivery pipeline for a batch of due reminders (across users).
+
+    1. one query for all subscriptions of the batch's users
+    2. bulk claim (update_many + find) instead of update_one per reminder
+    3. one sticky_notes query for all previews
+    4. send every (reminder, subscription) pair through a pooled HTTP session
+       with at most PUSH_DELIVERY_CONCURRENCY requests in flight
+    5. one bulk_write marking sent reminders, dead endpoints deleted per user
+
+    Reports remind_at -> first successful send latency via metrics.
+    """
+    stats = {"reminders": len(reminders), "claimed": 0, "sent": 0, "failed": 0, "deliveries": 0}
+    if not reminders:
+        return stats
+    started = datetime.now(timezone.utc)
     try:
-        note_id = str(reminder_doc.get("note_id") or "")
-        if not note_id:
-            return ""
-        # Try ObjectId, else raw
+        subs_by_user = _prefetch_subscriptions(db, {str(r.get("user_id")) for r in reminders if r.get("user_id") is not None})
+    except Exception:
+        return stats
+    sendable: list[dict] = []
+    for r in reminders:
+        if subs_by_user.get(str(r.get("user_id"))):
+            sendable.append(r)
+    for uid in sorted({str(r.get("user_id")) for r in reminders if r.get("user_id") is not None} - set(subs_by_user)):
+        # Telemetry: no subscriptions for user
+        _emit("push_send_no_subscriptions", severity="info", user_id=uid)
+    if not sendable:
+        return stats
+    send = _delivery_sender()
+    if send is None:
+        _emit("push_send_missing_vapid_private", severity="warning", users=len({str(r.get("user_id")) for r in sendable}))
+        return stats
+
+    claimed = _claim_reminders(db, sendable)
+    stats["claimed"] = len(claimed)
+    if not claimed:
+        return stats
+    previews = _prefetch_previews(db, claimed)
+
+    jobs: list[tuple[dict, str, Any, str, dict]] = []
+    for r in claimed:
+        subs = subs_by_user.get(str(r.get("user_id"))) or []
+        payload = _reminder_payload(r, previews.get(str(r.get("note_id") or ""), ""))
+        # Telemetry: attempt send for this reminder
+        _emit(
+            "push_send_attempt",
+            severity="info",
+            user_id=str(r.get("user_id")),
+            reminder_id=str(r.get("_id") or ""),
+            subs=len(subs),
+        )
+        for sub in subs:
+            ep, info, ce = _subscription_target(sub)
+            jobs.append((r, ep, info, ce, payload))
+
+    def _run(job):
+        r, ep, info, ce, payload = job
         try:
-            from bson import ObjectId  # type: ignore
+            ok, status, err = send(info, payload, ce, str(r.get("_id") or ""))
+        except Exception as e:
+            ok, status, err = False, 0, f"{type(e).__name__}: {e}"
+        return ok, int(status or 0), str(err or ""), datetime.now(timezone.utc)
 
-            oid = ObjectId(note_id)
-        except Exception:
-            oid = None
-        note = None
-        if oid is not None:
-            try:
-                note = db.sticky_notes.find_one({"_id": oid})
-            except Exception:
-                note = None
-        if note is None and note_id:
-            try:
-                note = db.sticky_notes.find_one({"_id": note_id})
-            except Exception:
-                note = None
-        if not isinstance(note, dict):
-            return ""
-        content = str(note.get("content") or note.get("anchor_text") or "").strip()
-        if not content:
-            return ""
-        parts = [w for w in content.split() if w]
-        if not parts:
-            return ""
-        head = parts[:6]
-        out = " ".join(head)
-        if len(parts) > 6:
-            out += "…"
-        return out
+    if len(jobs) == 1 or _PUSH_DELIVERY_CONCURRENCY <= 1:
+        results = [_run(job) for job in jobs]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(
+            max_workers=min(_PUSH_DELIVERY_CONCURRENCY, len(jobs)), thread_name_prefix="push-deliver"
+        ) as pool:
+            results = list(pool.map(_run, jobs))
+    stats["deliveries"] = len(jobs)
+
+    first_success: Dict[str, datetime] = {}
+    dead_by_user: Dict[str, set] = {}
+    for (r, ep, _info, _ce, _payload), (ok, status, err, done_at) in zip(jobs, results):
+        rid = str(r.get("_id"))
+        uid = str(r.get("user_id"))
+        if ok:
+            if rid not in first_success or done_at < first_success[rid]:
+                first_success[rid] = done_at
+            continue
+        stats["failed"] += 1
+        if status in (404, 410) and ep:
+            dead_by_user.setdefault(uid, set()).add(ep)
+        _emit(
+            "push_send_error",
+            severity="warning",
+            user_id=uid,
+            # hash בלבד — ה-endpoint המלא הוא מזהה מכשיר ולא נרשם ללוג
+            endpoint_hash=_hash_endpoint(ep),
+            status_code=int(status or 0),
+            error=_redact_error(err)[:300],
+        )
+
+    sent_docs = [r for r in claimed if str(r.get("_id")) in first_success]
+    stats["sent"] = len(sent_docs)
+    _mark_reminders_sent(db, sent_docs)
+
+    latencies: list[float] = []
+    for r in sent_docs:
+        remind_at = _as_utc(r.get("remind_at"))
+        if remind_at is not None:
+            latencies.append(max(0.0, (first_success[str(r.get("_id"))] - remind_at).total_seconds()))
+    try:
+        from metrics import record_push_delivery  # type: ignore
+
+        for latency in latencies:
+            record_push_delivery("sent", latency)
+        for _ in range(len(claimed) - len(sent_docs)):
+            record_push_delivery("failed")
     except Exception:
+        pass
+
+    # Remove dead endpoints once per user after the whole batch
+    for uid, endpoints in dead_by_user.items():
+        try:
+            db.push_subscriptions.delete_many({"user_id": {"$in": _user_id_variants(uid)}, "endpoint": {"$in": list(endpoints)}})
+            # Telemetry: cleaned dead endpoints
+            _emit("push_deleted_dead_endpoints", severity="info", user_id=uid, deleted_count=int(len(endpoints)))
+        except Exception:
+            pass
+
+    _emit(
+        "push_delivery_batch",
+        severity="info",
+        duration_ms=int((datetime.now(timezone.utc) - started).total_seconds() * 1000),
+        max_latency_seconds=round(max(latencies), 3) if latencies else None,
+        **stats,
+    )
+    return stats
+
+
+def _send_for_user(user_id: int | str, reminders: list[dict]) -> None:
+    """Single-user entry point kept for callers; delegates to the batch pipeline."""
+    _deliver_reminders(get_db(), [dict(r, user_id=r.get("user_id", user_id)) for r in reminders])
+
+
+def _preview_text(note: dict) -> str:
+    content = str(note.get("content") or note.get("anchor_text") or "").strip()
+    if not content:
+        return ""
+    parts = [w for w in content.split() if w]
+    if not parts:
         return ""
+    head = parts[:6]
+    out = " ".join(head)
+    if len(parts) > 6:
+        out += "…"
+    return out
 
 
 @push_bp.route("/test", methods=["POST"])
@@ -201,9 +201,75 @@ def api_tree():
     """
     db = get_db()
     repo_name = get_current_repo_name()
-    path = request.args.get('path', '')
+    path = request.args.get('path', '').strip('/')
     types_param = request.args.get('types', '').strip()
-    
+    types_list = [t.strip() for t in types_param.split(',') if t.strip()] if types_param else []
+
+    # עץ מוחשב (repo_dirs + parent_dir): רמה אחת = שתי שאילתות אינדקס, בלי regex על כל הריפו
+    result = _tree_level_from_dirs(db, repo_name, path, types_list)
+    if result is None:
+        result = _tree_level_from_paths(db, repo_name, path, types_list)
+    return jsonify(result)
+
+
+def _tree_level_from_dirs(db, repo_name: str, path: str, types_list: list):
+    """רמה בעץ מתוך repo_dirs; None אם העץ עוד לא נבנה לריפו (ריפו ישן / לפני sync)."""
+    try:
+        dirs_coll = db.repo_dirs
+        if not dirs_coll.find_one({"repo_name": repo_name, "path": ""}, {"_id": 1}):
+            return None
+        dir_docs = list(dirs_coll.find(
+            {"repo_name": repo_name, "parent_dir": path},
+            {"_id": 0, "name": 1, "path": 1, "file_count": 1, "total_size": 1, "languages": 1},
+        ).sort("name", 1))
+        file_query: dict = {"repo_name": repo_name, "parent_dir": path}
+        if types_list:
+            file_query["language"] = {"$in": types_list}
+        files = list(db.repo_files.find(
+            file_query,
+            {"path": 1, "language": 1, "size": 1, "lines": 1}
+        ).sort("path", 1))
+    except Exception as e:
+        logger.warning(f"repo_dirs tree lookup failed for {repo_name}: {e}")
+        return None
+
+    result = []
+    for d in dir_docs:
+        languages = d.get("languages") or {}
+        file_count = int(d.get("file_count") or 0)
+        if types_list:
+            # סינון תיקיות לפי היסטוגרמת השפות - תיקייה בלי אף קובץ מתאים לא מוצגת
+            file_count = sum(int(languages.get(t) or 0) for t in types_list)
+            if file_count <= 0:
+                continue
+        result.append({
+            "name": d.get("name") or str(d.get("path", "")).split("/")[-1],
+            "path": d.get("path"),
+            "type": "directory",
+            "file_count": file_count,
+            "size": int(d.get("total_size") or 0),
+            "languages": languages,
+        })
+    result.extend(_file_entries(files))
+    return result
+
+
+def _file_entries(files) -> list:
+    return [
+        {
+            "name": f["path"].split("/")[-1],
+            "path": f["path"],
+            "type": "file",
+            "language": f.get("language", "text"),
+            "size": f.get("size", 0),
+            "lines": f.get("lines", 0)
+        }
+        for f in files
+    ]
+
+
+def _tree_level_from_paths(db, repo_name: str, path: str, types_list: list) -> list:
+    """גזירת רמה בעץ מנתיבי repo_files (מסלול ישן, לריפו שעוד אין לו repo_dirs)."""
     # Build tree from MongoDB
     if path:
         # Get children of specific folder
@@ -220,10 +286,8 @@ def api_tree():
     }
     
     # Add language filter if specified
-    if types_param:
-        types_list = [t.strip() for t in types_param.split(',') if t.strip()]
-        if types_list:
-            query["language"] = {"$in": types_list}
+    if types_list:
+        query["language"] = {"$in": types_list}
     
     # Get files matching pattern
     files = list(db.repo_files.find(
@@ -245,10 +309,8 @@ def api_tree():
         "repo_name": repo_name,
         "path": {"$regex": dir_pattern},
     }
-    if types_param:
-        types_list = [t.strip() for t in types_param.split(',') if t.strip()]
-        if types_list:
-            dir_query["language"] = {"$in": types_list}
+    if types_list:
+        dir_query["language"] = {"$in": types_list}
 
     all_paths = db.repo_files.distinct(
         "path",
@@ -280,18 +342,8 @@ def api_tree():
         })
     
     # Add files
-    for f in files:
-        name = f["path"].split("/")[-1]
-        result.append({
-            "name": name,
-            "path": f["path"],
-            "type": "file",
-            "language": f.get("language", "text"),
-            "size": f.get("size", 0),
-            "lines": f.get("lines", 0)
-        })
-    
-    return jsonify(result)
+    result.extend(_file_entries(files))
+    return result
 
 
 @repo_bp.route('/api/file/<path:file_path>')